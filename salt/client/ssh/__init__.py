@@ -17,6 +17,8 @@ import os
 import re
 import sys
 import time
+import select
+import collections
 import yaml
 import uuid
 import tempfile
@@ -196,6 +198,19 @@ if not is_windows():
 log = logging.getLogger(__name__)
 
 
+class _PipeQueue(object):
+    '''
+    Queue like wrapper around the worker end of a pipe. A put is fully sent
+    when it returns, there is no feeder thread or shared lock a worker which
+    dies could leave behind.
+    '''
+    def __init__(self, conn):
+        self.conn = conn
+
+    def put(self, obj):
+        self.conn.send(obj)
+
+
 class SSH(object):
     '''
     Create an SSH execution system
@@ -212,6 +227,8 @@ class SSH(object):
         else:
             self.event = None
         self.opts = opts
+        # Host throughput of the last handle_ssh run
+        self.run_stats = {}
         if self.opts['regen_thin']:
             self.opts['ssh_wipe'] = True
         if not salt.utils.which('ssh'):
@@ -438,86 +455,146 @@ class SSH(object):
             }
         que.put(ret)
 
+    def handle_worker(self, conn, opts, mine=False):
+        '''
+        Run the routines of the hosts received on the ``conn`` pipe, sending
+        their returns back on it, until the ``None`` sentinel is received
+        '''
+        que = _PipeQueue(conn)
+        while True:
+            try:
+                task = conn.recv()
+            except EOFError:
+                break
+            if task is None:
+                break
+            host, target = task
+            self.handle_routine(que, opts, host, target, mine)
+
     def handle_ssh(self, mine=False):
         '''
         Spin up the needed threads or processes and execute the subsequent
         routines
+
+        A pool of at most ``ssh_max_procs`` worker processes is started and
+        each worker is handed a new host as soon as it returns the previous
+        one. Every worker has its own pipe, a worker which dies shows up as
+        the end of its pipe and a host which does not return within
+        ``ssh_run_timeout`` seconds has its worker terminated, both are
+        reported as failed and the worker is replaced. Returns are yielded as
+        soon as they are received.
         '''
-        que = multiprocessing.Queue()
-        running = {}
-        target_iter = self.targets.__iter__()
+        if not self.targets:
+            log.error('No matching targets found in roster.')
+            return
+        start = time.time()
+        waiting = collections.deque(self.targets)
+        procs = min(self.opts.get('ssh_max_procs', 25), len(self.targets))
+        run_timeout = self.opts.get('ssh_run_timeout', 0)
+        # Maps the parent end of the pipe of a worker to the worker process
+        workers = {}
+        # Maps the pipe of a worker to the host it runs and when it started
+        assigned = {}
+        # The workers which were sent the sentinel
+        finished = []
         returned = set()
-        rets = set()
-        init = False
-        while True:
-            if not self.targets:
-                log.error('No matching targets found in roster.')
-                break
-            if len(running) < self.opts.get('ssh_max_procs', 25) and not init:
+
+        def _dispatch(conn):
+            '''
+            Hand the next host to a worker, or stop it when none are left
+            '''
+            if not waiting:
                 try:
-                    host = next(target_iter)
-                except StopIteration:
-                    init = True
-                    continue
-                for default in self.defaults:
-                    if default not in self.targets[host]:
-                        self.targets[host][default] = self.defaults[default]
-                args = (
-                        que,
-                        self.opts,
-                        host,
-                        self.targets[host],
-                        mine,
-                        )
-                routine = MultiprocessingProcess(
-                                target=self.handle_routine,
-                                args=args)
-                routine.start()
-                running[host] = {'thread': routine}
-                continue
-            ret = {}
+                    conn.send(None)
+                except (IOError, OSError):
+                    pass
+                conn.close()
+                finished.append(workers.pop(conn))
+                return
+            host = waiting.popleft()
+            for default in self.defaults:
+                if default not in self.targets[host]:
+                    self.targets[host][default] = self.defaults[default]
             try:
-                ret = que.get(False)
-                if 'id' in ret:
+                conn.send((host, self.targets[host]))
+            except (IOError, OSError):
+                # The worker is gone, the end of its pipe will be read next
+                waiting.appendleft(host)
+                return
+            assigned[conn] = (host, time.time())
+
+        def _spawn():
+            conn, child_conn = multiprocessing.Pipe()
+            worker = MultiprocessingProcess(
+                    target=self.handle_worker,
+                    args=(child_conn, self.opts, mine))
+            worker.start()
+            child_conn.close()
+            workers[conn] = worker
+            _dispatch(conn)
+
+        def _retire(conn):
+            '''
+            Stop a worker and return the host it did not finish
+            '''
+            worker = workers.pop(conn)
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+            conn.close()
+            return assigned.pop(conn, (None, None))[0]
+
+        for _ in range(procs):
+            _spawn()
+
+        while len(returned) < len(self.targets):
+            failed = []
+            readable = select.select(list(workers), [], [], 1)[0] if workers else []
+            for conn in readable:
+                try:
+                    ret = conn.recv()
+                except (EOFError, IOError, OSError):
+                    failed.append((conn, 'Target \'{0}\' did not return any '
+                                         'data, probably due to an error.'))
+                    continue
+                assigned.pop(conn, None)
+                if 'id' in ret and ret['id'] not in returned:
                     returned.add(ret['id'])
                     yield {ret['id']: ret['ret']}
-            except Exception:
-                # This bare exception is here to catch spurious exceptions
-                # thrown by que.get during healthy operation. Please do not
-                # worry about this bare exception, it is entirely here to
-                # control program flow.
-                pass
-            for host in running:
-                if not running[host]['thread'].is_alive():
-                    if host not in returned:
-                        # Try to get any returns that came through since we
-                        # last checked
-                        try:
-                            while True:
-                                ret = que.get(False)
-                                if 'id' in ret:
-                                    returned.add(ret['id'])
-                                    yield {ret['id']: ret['ret']}
-                        except Exception:
-                            pass
-
-                        if host not in returned:
-                            error = ('Target \'{0}\' did not return any data, '
-                                     'probably due to an error.').format(host)
-                            ret = {'id': host,
-                                   'ret': error}
-                            log.error(error)
-                            yield {ret['id']: ret['ret']}
-                    running[host]['thread'].join()
-                    rets.add(host)
-            for host in rets:
-                if host in running:
-                    running.pop(host)
-            if len(rets) >= len(self.targets):
-                break
-            # Sleep when limit or all threads started
-            if len(running) >= self.opts.get('ssh_max_procs', 25) or len(self.targets) >= len(running):
-                time.sleep(0.1)
+                _dispatch(conn)
+            if run_timeout:
+                now = time.time()
+                dead = set(conn for conn, _ in failed)
+                for conn, (host, started) in list(assigned.items()):
+                    if conn not in dead and now - started > run_timeout:
+                        failed.append((conn, 'Target \'{{0}}\' did not return '
+                                             'within {0} seconds.'.format(run_timeout)))
+            for conn, error in failed:
+                host = _retire(conn)
+                if host is not None and host not in returned:
+                    error = error.format(host)
+                    log.error(error)
+                    returned.add(host)
+                    yield {host: error}
+            while waiting and len(workers) < procs:
+                # Hosts are still waiting, replace the retired workers
+                _spawn()
+
+        for worker in finished + list(workers.values()):
+            worker.join()
+
+        duration = time.time() - start
+        self.run_stats = {
+            'hosts': len(returned),
+            'procs': procs,
+            'duration': duration,
+            'hosts_per_second': len(returned) / duration if duration else 0.0,
+        }
+        log.info(
+            'salt-ssh returned from {hosts} hosts in {duration:.2f} seconds '
+            'using {procs} processes ({hosts_per_second:.2f} hosts/s)'
+            .format(**self.run_stats)
+        )
 
     def run_iter(self, mine=False, jid=None):
         '''
@@ -168,6 +168,9 @@ VALID_OPTS = {
     # '': Disable the key cache [default]
     'key_cache': str,
 
+    # The number of minion public keys and key states each master worker keeps parsed in memory
+    'minion_key_cache_size': int,
+
     # The user under which the daemon should run
     'user': str,
 
@@ -264,6 +267,10 @@ VALID_OPTS = {
     # Refuse to load these modules
     'disable_modules': list,
 
+    # Keep an index of the module files and the modules whose __virtual__
+    # function returned False under the cachedir
+    'loader_index': bool,
+
     # Refuse to load these returners
     'disable_returners': list,
 
@@ -322,6 +329,10 @@ VALID_OPTS = {
     # The chunk size to use when streaming files with the file server
     'file_buffer_size': int,
 
+    # The block size used to fetch only the changed blocks of cached files from the master,
+    # 0 fetches whole files
+    'file_delta_block_size': int,
+
     # The TCP port on which minion events should be published if ipc_mode is TCP
     'tcp_pub_port': int,
 
@@ -407,6 +418,13 @@ VALID_OPTS = {
     # When true, states run in the order defined in an SLS file, unless requisites re-order them
     'state_auto_order': bool,
 
+    # The number of processes used to run independent state chunks at the same time, 0 runs the
+    # chunks one after another
+    'state_parallel': int,
+
+    # State modules which are never run in a parallel process when state_parallel is set
+    'state_parallel_exclusive': list,
+
     # Fire events as state chunks are processed by the state compiler
     'state_events': bool,
 
@@ -473,6 +491,17 @@ VALID_OPTS = {
     # returner specified by 'event_return'
     'event_return_queue': int,
 
+    # Flush the queued events once the oldest one has waited this many seconds, 0 disables
+    'event_return_queue_max_seconds': int,
+
+    # The number of flushed events which may wait for each event returner, at least four times
+    # event_return_queue, 0 is unbounded
+    'event_return_max_pending': int,
+
+    # What to do with new events once a returner has event_return_max_pending events
+    # waiting: block, drop_oldest or spill
+    'event_return_overflow': str,
+
     # Only forward events to an event returner if it matches one of the tags in this list
     'event_return_whitelist': list,
 
@@ -518,6 +547,12 @@ VALID_OPTS = {
     # http://api.zeromq.org/3-2:zmq-setsockopt
     'pub_hwm': int,
 
+    # The number of bytes which may wait to be sent to a subscriber of the TCP publisher
+    'tcp_pub_hwm': int,
+
+    # What to do with the TCP subscribers over tcp_pub_hwm, 'drop' publications or 'disconnect'
+    'tcp_pub_hwm_action': str,
+
     # IPC buffer size
     # Refs https://github.com/saltstack/salt/issues/34215
     'ipc_write_buffer': int,
@@ -533,6 +568,24 @@ VALID_OPTS = {
     # The number of hours to keep jobs around in the job cache on the master
     'keep_jobs': int,
 
+    # Keep a registry of the running jobs from the job events, read by jobs.active
+    'running_jobs_registry': bool,
+
+    # The number of seconds after which a registry snapshot is considered out of date
+    'running_jobs_registry_timeout': int,
+
+    # The age in seconds of the jobs which jobs.active confirm=True checks with find_job
+    'running_jobs_stale_age': int,
+
+    # Keep a table of the time each minion was last seen alive, read by manage.status
+    'minion_liveness': bool,
+
+    # The number of seconds after which the liveness table is considered out of date
+    'minion_liveness_timeout': int,
+
+    # The number of seconds since a minion was last seen for manage.status to report it up
+    'minion_liveness_max_age': int,
+
     # If the returner supports `clean_old_jobs`, then at cleanup time,
     # archive the job data before deleting it.
     'archive_jobs': bool,
@@ -594,6 +647,13 @@ VALID_OPTS = {
     # Specify a list of external pillar systems to use
     'ext_pillar': list,
 
+    # The number of threads used to evaluate the ext_pillar sources at the same time, 0 or 1
+    # evaluates them one after another
+    'ext_pillar_concurrency': int,
+
+    # The number of seconds a concurrently evaluated ext_pillar source may take, 0 waits forever
+    'ext_pillar_timeout': int,
+
     # Reserved for future use to version the pillar structure
     'pillar_version': int,
 
@@ -687,12 +747,24 @@ VALID_OPTS = {
     # Specify whether the master should store end times for jobs as returns come in
     'job_cache_store_endtime': bool,
 
+    # Keep a time ordered index of the jobs in the local job cache so listing and expiring jobs
+    # does not require walking the whole job cache
+    'job_cache_index': bool,
+
     # The minion data cache is a cache of information about the minions stored on the master.
     # This information is primarily the pillar and grains data. The data is cached in the master
     # cachedir under the name of the minion and used to predetermine what minions are expected to
     # reply from executions.
     'minion_data_cache': bool,
 
+    # Keep the accepted minion ids and the minion data cache in memory in the master workers,
+    # reloaded when the key dir or a cache entry changes, so target checks do not read every minion
+    'minion_registry': bool,
+
+    # The minimum number of seconds between two checks of the minion data cache for changes by
+    # the minion registry
+    'minion_registry_sync_interval': float,
+
     # The number of seconds between AES key rotations on the master
     'publish_session': int,
 
@@ -764,6 +836,14 @@ VALID_OPTS = {
     # The number of minutes between the minion refreshing its cache of grains
     'grains_refresh_every': int,
 
+    # Only rerun the grain functions whose TTL has expired on a grains refresh
+    # and send the master the grains which changed
+    'grains_incremental': bool,
+
+    # A dict of grain functions (globs of 'module.function') and the number of
+    # seconds their return may be reused for with grains_incremental enabled
+    'grains_ttl': dict,
+
     # Use lspci to gather system data for grains on a minion
     'enable_lspci': bool,
 
@@ -778,6 +858,9 @@ VALID_OPTS = {
     # If this is set to True the first newline after a Jinja block is removed
     'jinja_trim_blocks': bool,
 
+    # Keep the compiled Jinja templates under the cachedir between processes
+    'jinja_bytecode_cache': bool,
+
     # Cache minion ID to file
     'minion_id_caching': bool,
 
@@ -821,12 +904,21 @@ VALID_OPTS = {
     # The length that the syndic event queue must hit before events are popped off and forwarded
     'syndic_jid_forward_cache_hwm': int,
 
+    # The size in bytes of the returns after which the syndic forwards them without waiting
+    'syndic_forward_batch_size': int,
+
+    # The size in bytes of the returns the syndic keeps in memory while the masters are busy,
+    # spilling the next ones to disk
+    'syndic_max_buffer_size': int,
+
     # Salt SSH configuration
     'ssh_passwd': str,
     'ssh_port': str,
     'ssh_sudo': bool,
     'ssh_sudo_user': str,
     'ssh_timeout': float,
+    # The number of seconds salt-ssh waits for a single target to return, 0 waits forever
+    'ssh_run_timeout': float,
     'ssh_user': str,
     'ssh_scan_ports': str,
     'ssh_scan_timeout': float,
@@ -871,6 +963,15 @@ VALID_OPTS = {
     # implications in large setups.
     'max_minions': int,
 
+    # The number of minion authentications per second admitted by each request server, 0 for no limit
+    'auth_rate_limit': int,
+
+    # The number of minion authentications admitted at once before the rate limit applies
+    'auth_rate_burst': int,
+
+    # The number of worker threads which may authenticate minions at the same time, 0 for no limit
+    'auth_workers': int,
+
 
     'username': str,
     'password': str,
@@ -992,10 +1093,13 @@ DEFAULT_MINION_OPTS = {
     'grains_cache': False,
     'grains_cache_expiration': 300,
     'grains_deep_merge': False,
+    'grains_incremental': False,
+    'grains_ttl': {},
     'conf_file': os.path.join(salt.syspaths.CONFIG_DIR, 'minion'),
     'sock_dir': os.path.join(salt.syspaths.SOCK_DIR, 'minion'),
     'backup_mode': '',
     'renderer': 'yaml_jinja',
+    'jinja_bytecode_cache': False,
     'renderer_whitelist': [],
     'renderer_blacklist': [],
     'failhard': False,
@@ -1069,6 +1173,7 @@ DEFAULT_MINION_OPTS = {
     'gitfs_saltenv': [],
     'hash_type': 'sha256',
     'disable_modules': [],
+    'loader_index': False,
     'disable_returners': [],
     'whitelist_modules': [],
     'module_dirs': [],
@@ -1091,6 +1196,7 @@ DEFAULT_MINION_OPTS = {
     'ipc_write_buffer': _DFLT_IPC_WBUFFER,
     'ipv6': False,
     'file_buffer_size': 262144,
+    'file_delta_block_size': 0,
     'tcp_pub_port': 4510,
     'tcp_pull_port': 4511,
     'log_file': os.path.join(salt.syspaths.LOGS_DIR, 'minion'),
@@ -1112,6 +1218,8 @@ DEFAULT_MINION_OPTS = {
     'state_output': 'full',
     'state_output_diff': False,
     'state_auto_order': True,
+    'state_parallel': 0,
+    'state_parallel_exclusive': ['pkg', 'pkgrepo'],
     'state_events': False,
     'state_aggregate': False,
     'snapper_states': False,
@@ -1217,6 +1325,8 @@ DEFAULT_MASTER_OPTS = {
     'publish_port': 4505,
     'zmq_backlog': 1000,
     'pub_hwm': 1000,
+    'tcp_pub_hwm': 0,
+    'tcp_pub_hwm_action': 'drop',
     'auth_mode': 1,
     'user': 'root',
     'worker_threads': 5,
@@ -1225,9 +1335,16 @@ DEFAULT_MASTER_OPTS = {
     'timeout': 5,
     'keep_jobs': 24,
     'archive_jobs': False,
+    'running_jobs_registry': False,
+    'running_jobs_registry_timeout': 30,
+    'running_jobs_stale_age': 60,
+    'minion_liveness': False,
+    'minion_liveness_timeout': 30,
+    'minion_liveness_max_age': 300,
     'root_dir': salt.syspaths.ROOT_DIR,
     'pki_dir': os.path.join(salt.syspaths.CONFIG_DIR, 'pki', 'master'),
     'key_cache': '',
+    'minion_key_cache_size': 1000,
     'cachedir': os.path.join(salt.syspaths.CACHE_DIR, 'master'),
     'file_roots': {
         'base': [salt.syspaths.BASE_FILE_ROOTS_DIR,
@@ -1299,6 +1416,8 @@ DEFAULT_MASTER_OPTS = {
     'minionfs_whitelist': [],
     'minionfs_blacklist': [],
     'ext_pillar': [],
+    'ext_pillar_concurrency': 0,
+    'ext_pillar_timeout': 0,
     'pillar_version': 2,
     'pillar_opts': False,
     'pillar_safe_render_error': True,
@@ -1325,6 +1444,7 @@ DEFAULT_MASTER_OPTS = {
     'token_expire': 43200,
     'token_expire_user_override': False,
     'extension_modules': os.path.join(salt.syspaths.CACHE_DIR, 'master', 'extmods'),
+    'loader_index': False,
     'file_recv': False,
     'file_recv_max_size': 100,
     'file_buffer_size': 1048576,
@@ -1340,6 +1460,7 @@ DEFAULT_MASTER_OPTS = {
     'open_mode': False,
     'auto_accept': False,
     'renderer': 'yaml_jinja',
+    'jinja_bytecode_cache': False,
     'renderer_whitelist': [],
     'renderer_blacklist': [],
     'failhard': False,
@@ -1351,7 +1472,10 @@ DEFAULT_MASTER_OPTS = {
     'ext_job_cache': '',
     'master_job_cache': 'local_cache',
     'job_cache_store_endtime': False,
+    'job_cache_index': False,
     'minion_data_cache': True,
+    'minion_registry': False,
+    'minion_registry_sync_interval': 5,
     'enforce_mine_cache': False,
     'ipc_mode': _DFLT_IPC_MODE,
     'ipc_write_buffer': _DFLT_IPC_WBUFFER,
@@ -1380,6 +1504,9 @@ DEFAULT_MASTER_OPTS = {
     'engines': [],
     'event_return': '',
     'event_return_queue': 0,
+    'event_return_queue_max_seconds': 0,
+    'event_return_max_pending': 10000,
+    'event_return_overflow': 'block',
     'event_return_whitelist': [],
     'event_return_blacklist': [],
     'event_match_type': 'startswith',
@@ -1389,6 +1516,8 @@ DEFAULT_MASTER_OPTS = {
     'state_output': 'full',
     'state_output_diff': False,
     'state_auto_order': True,
+    'state_parallel': 0,
+    'state_parallel_exclusive': ['pkg', 'pkgrepo'],
     'state_events': False,
     'state_aggregate': False,
     'search': '',
@@ -1430,12 +1559,15 @@ DEFAULT_MASTER_OPTS = {
     'gather_job_timeout': 10,
     'syndic_event_forward_timeout': 0.5,
     'syndic_jid_forward_cache_hwm': 100,
+    'syndic_forward_batch_size': 0,
+    'syndic_max_buffer_size': 0,
     'regen_thin': False,
     'ssh_passwd': '',
     'ssh_port': '22',
     'ssh_sudo': False,
     'ssh_sudo_user': '',
     'ssh_timeout': 60,
+    'ssh_run_timeout': 3600,
     'ssh_user': 'root',
     'ssh_scan_ports': '22',
     'ssh_scan_timeout': 0.01,
@@ -1462,6 +1594,9 @@ DEFAULT_MASTER_OPTS = {
     'queue_dirs': [],
     'cli_summary': False,
     'max_minions': 0,
+    'auth_rate_limit': 0,
+    'auth_rate_burst': 0,
+    'auth_workers': 0,
     'master_sign_key_name': 'master_sign',
     'master_sign_pubkey': False,
     'master_pubkey_signature': 'master_pubkey_signature',
@@ -3351,6 +3486,19 @@ def apply_master_config(overrides=None, defaults=None):
         )
         opts['worker_threads'] = 3
 
+    # The concurrent ext_pillar sources cannot see the data returned by the
+    # sources configured before them
+    if opts.get('ext_pillar_concurrency', 0) > 1 \
+            and isinstance(opts.get('ext_pillar'), list) \
+            and len(opts['ext_pillar']) > 1:
+        log.warning(
+            "The 'ext_pillar_concurrency' setting on '{0}' runs the "
+            'ext_pillar sources concurrently, every source receives the '
+            'pillar data from before any ext_pillar source ran. Do not set '
+            'it if a source depends on the data returned by an earlier '
+            'source.'.format(opts['conf_file'])
+        )
+
     opts.setdefault('pillar_source_merging_strategy', 'smart')
 
     # Make sure hash_type is lowercase
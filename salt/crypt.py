@@ -10,6 +10,7 @@ import os
 import sys
 import copy
 import time
+import random
 import hmac
 import base64
 import hashlib
@@ -43,6 +44,7 @@ import salt.transport.frame
 import salt.utils.rsax931
 import salt.utils.verify
 import salt.version
+from salt.utils.odict import OrderedDict
 from salt.exceptions import (
     AuthenticationError, SaltClientError, SaltReqTimeoutError
 )
@@ -128,13 +130,149 @@ def gen_keys(keydir, keyname, keysize, user=None):
     return priv
 
 
+# Parsed private keys, maps the key path to (mtime, key)
+_RSA_KEYS = {}
+
+
+def get_rsa_key(path):
+    '''
+    Return the parsed RSA private key stored at path. The key is parsed once
+    per process and only read again when the mtime of the file changes.
+    '''
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+    cached = _RSA_KEYS.get(path)
+    if mtime is not None and cached is not None and cached[0] == mtime:
+        return cached[1]
+    log.debug('salt.crypt.get_rsa_key: Loading private key')
+    with salt.utils.fopen(path) as f:
+        key = RSA.importKey(f.read())
+    if mtime is not None:
+        _RSA_KEYS[path] = (mtime, key)
+    return key
+
+
+class MinionKeyCache(object):
+    '''
+    Bounded, least recently used cache of the minion public keys and key
+    states, kept by each master worker so the keys of the minions which keep
+    sending requests are not read and parsed on every request.
+
+    A parsed public key is used for as long as the mtime, size and inode of
+    its file are unchanged. The key state of a minion is used for as long as
+    the mtimes of the accepted, pending and rejected key directories are
+    unchanged, which accepting, rejecting or deleting any key changes. The
+    ``invalidate`` method drops the entries of a minion the worker changed
+    itself.
+    '''
+    STATES = (('rejected', 'minions_rejected'),
+              ('accepted', 'minions'),
+              ('pending', 'minions_pre'))
+
+    def __init__(self, opts, size=None):
+        self.opts = opts
+        self.size = opts.get('minion_key_cache_size', 1000) if size is None else size
+        self.keys = OrderedDict()
+        self.states = OrderedDict()
+        self.stats = {'key_hits': 0,
+                      'key_misses': 0,
+                      'state_hits': 0,
+                      'state_misses': 0}
+
+    def _store(self, cache, id_, entry, mtimes):
+        # Entries read in the same second as the last change are not kept,
+        # the mtime granularity of the filesystem could hide the next one
+        cache.pop(id_, None)
+        if self.size <= 0 or time.time() - max(mtimes) < 1:
+            return
+        cache[id_] = entry
+        while len(cache) > self.size:
+            cache.popitem(last=False)
+
+    def _count(self, stat):
+        self.stats[stat] += 1
+        lookups = sum(six.itervalues(self.stats))
+        if lookups % 10000 == 0:
+            log.debug('Minion key cache statistics: {0}'.format(self.stats))
+
+    def invalidate(self, id_):
+        '''
+        Drop the cached key and key state of a minion
+        '''
+        self.keys.pop(id_, None)
+        self.states.pop(id_, None)
+
+    def key_state(self, id_):
+        '''
+        Return 'rejected', 'accepted' or 'pending' according to the directory
+        the key of the minion is in, checked in that order, or None if there
+        is no key for the minion
+        '''
+        signature = []
+        for _, dirname in self.STATES:
+            try:
+                signature.append(os.stat(os.path.join(self.opts['pki_dir'], dirname)).st_mtime)
+            except OSError:
+                signature.append(None)
+        cached = self.states.get(id_)
+        if cached is not None and cached[0] == signature:
+            self._count('state_hits')
+            self.states[id_] = self.states.pop(id_)
+            return cached[1]
+        self._count('state_misses')
+        state = None
+        for name, dirname in self.STATES:
+            if os.path.isfile(os.path.join(self.opts['pki_dir'], dirname, id_)):
+                state = name
+                break
+        self._store(self.states, id_, (signature, state),
+                    [mtime or 0 for mtime in signature])
+        return state
+
+    def _entry(self, id_):
+        path = os.path.join(self.opts['pki_dir'], 'minions', id_)
+        try:
+            stat = os.stat(path)
+        except OSError as exc:
+            self.keys.pop(id_, None)
+            raise IOError(exc.errno, exc.strerror, path)
+        signature = (stat.st_mtime, stat.st_size, stat.st_ino)
+        cached = self.keys.get(id_)
+        if cached is not None and cached[0] == signature:
+            self._count('key_hits')
+            self.keys[id_] = self.keys.pop(id_)
+            return cached
+        self._count('key_misses')
+        with salt.utils.fopen(path, 'r') as fp_:
+            entry = [signature, fp_.read(), None]
+        self._store(self.keys, id_, entry, [stat.st_mtime])
+        return entry
+
+    def get_pub_str(self, id_):
+        '''
+        Return the accepted public key of a minion as a string, raises IOError
+        if the minion has no accepted key
+        '''
+        return self._entry(id_)[1]
+
+    def get_pub(self, id_):
+        '''
+        Return the parsed accepted public key of a minion, raises IOError if
+        the minion has no accepted key and ValueError if it is corrupt
+        '''
+        entry = self._entry(id_)
+        if entry[2] is None:
+            entry[2] = RSA.importKey(entry[1])
+        return entry[2]
+
+
 def sign_message(privkey_path, message):
     '''
     Use Crypto.Signature.PKCS1_v1_5 to sign a message. Returns the signature.
     '''
-    log.debug('salt.crypt.sign_message: Loading private key')
-    with salt.utils.fopen(privkey_path) as f:
-        key = RSA.importKey(f.read())
+    key = get_rsa_key(privkey_path)
     log.debug('salt.crypt.sign_message: Signing message.')
     signer = PKCS1_v1_5.new(key)
     return signer.sign(SHA.new(message))
@@ -477,6 +615,8 @@ class AsyncAuth(object):
             except SaltClientError as exc:
                 error = exc
                 break
+            if creds == 'busy':
+                continue
             if creds == 'retry':
                 if self.opts.get('detect_mode') is True:
                     error = SaltClientError('Detect mode is on')
@@ -513,6 +653,23 @@ class AsyncAuth(object):
             event = salt.utils.event.get_event(self.opts.get('__role'), opts=self.opts, listen=False)
             event.fire_event({'key': key, 'creds': creds}, salt.utils.event.tagify(prefix='auth', suffix='creds'))
 
+    def _busy_wait(self, load):
+        '''
+        Return the number of seconds to wait before authenticating again when
+        the master is deferring authentications, from its retry_after hint
+        with up to a second of jitter
+        '''
+        try:
+            retry_after = max(float(load.get('retry_after', 0)), 0)
+        except (TypeError, ValueError):
+            retry_after = 0
+        if not retry_after:
+            retry_after = self.opts['acceptance_wait_time']
+        wait = retry_after + random.random()
+        log.info('The Salt Master is deferring authentications, waiting {0:.1f} '
+                 'seconds before retry.'.format(wait))
+        return wait
+
     @tornado.gen.coroutine
     def sign_in(self, timeout=60, safe=True, tries=1, channel=None):
         '''
@@ -589,6 +746,10 @@ class AsyncAuth(object):
                 # has the master returned that its maxed out with minions?
                 elif payload['load']['ret'] == 'full':
                     raise tornado.gen.Return('full')
+                # is the master deferring authentications?
+                elif payload['load']['ret'] == 'busy':
+                    yield tornado.gen.sleep(self._busy_wait(payload['load']))
+                    raise tornado.gen.Return('busy')
                 else:
                     log.error(
                         'The Salt Master has cached the public key for this '
@@ -1044,6 +1205,8 @@ class SAuth(AsyncAuth):
             acceptance_wait_time_max = acceptance_wait_time
         while True:
             creds = self.sign_in(channel=channel)
+            if creds == 'busy':
+                continue
             if creds == 'retry':
                 if self.opts.get('caller'):
                     print('Minion failed to authenticate with the master, '
@@ -1131,6 +1294,10 @@ class SAuth(AsyncAuth):
                 # has the master returned that its maxed out with minions?
                 elif payload['load']['ret'] == 'full':
                     return 'full'
+                # is the master deferring authentications?
+                elif payload['load']['ret'] == 'busy':
+                    time.sleep(self._busy_wait(payload['load']))
+                    return 'busy'
                 else:
                     log.error(
                         'The Salt Master has cached the public key for this '
@@ -455,8 +455,11 @@ class RemoteFuncs(object):
         '''
         fs_ = salt.fileserver.Fileserver(self.opts)
         self._serve_file = fs_.serve_file
+        self._serve_file_blocks = fs_.serve_file_blocks
+        self._serve_files = fs_.serve_files
         self._file_find = fs_._find_file
         self._file_hash = fs_.file_hash
+        self._file_manifest = fs_.file_manifest
         self._file_list = fs_.file_list
         self._file_list_emptydirs = fs_.file_list_emptydirs
         self._dir_list = fs_.dir_list
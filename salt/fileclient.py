@@ -6,10 +6,12 @@ from __future__ import absolute_import
 
 # Import python libs
 import contextlib
+import hashlib
 import logging
 import os
 import string
 import shutil
+import tempfile
 import ftplib
 from tornado.httputil import parse_response_start_line, HTTPInputError
 
@@ -202,9 +204,14 @@ class Client(object):
         return ret
 
     def cache_dir(self, path, saltenv='base', include_empty=False,
-                  include_pat=None, exclude_pat=None, cachedir=None):
+                  include_pat=None, exclude_pat=None, cachedir=None,
+                  manifest=False):
         '''
         Download all of the files in a subdir of the master
+
+        With ``manifest`` the listing of the files, with their hashes and
+        modes, is fetched in a single request and only the files which differ
+        from the cached copies are downloaded, in batches.
         '''
         ret = []
 
@@ -220,17 +227,28 @@ class Client(object):
                 path, saltenv
             )
         )
-        # go through the list of all files finding ones that are in
-        # the target directory and caching them
-        for fn_ in self.file_list(saltenv):
-            fn_ = sdecode(fn_)
-            if fn_.strip() and fn_.startswith(path):
-                if salt.utils.check_include_exclude(
-                        fn_, include_pat, exclude_pat):
-                    fn_ = self.cache_file(
-                        salt.utils.url.create(fn_), saltenv, cachedir=cachedir)
-                    if fn_:
-                        ret.append(fn_)
+        files = None
+        if manifest:
+            files = self.file_manifest(saltenv, path)
+        if files:
+            files = dict(
+                (fn_, info) for fn_, info in six.iteritems(files)
+                if fn_.startswith(path) and salt.utils.check_include_exclude(
+                    fn_, include_pat, exclude_pat)
+            )
+            ret.extend(self.cache_manifest(files, saltenv, cachedir=cachedir))
+        else:
+            # go through the list of all files finding ones that are in
+            # the target directory and caching them
+            for fn_ in self.file_list(saltenv):
+                fn_ = sdecode(fn_)
+                if fn_.strip() and fn_.startswith(path):
+                    if salt.utils.check_include_exclude(
+                            fn_, include_pat, exclude_pat):
+                        fn_ = self.cache_file(
+                            salt.utils.url.create(fn_), saltenv, cachedir=cachedir)
+                        if fn_:
+                            ret.append(fn_)
 
         if include_empty:
             # Break up the path into a list containing the bottom-level
@@ -288,6 +306,26 @@ class Client(object):
         '''
         return []
 
+    def file_manifest(self, saltenv='base', prefix=''):
+        '''
+        Return the hash, hash type, mode and size of the files under
+        ``prefix``, or None if the file server cannot list them at once
+        '''
+        return None
+
+    def cache_manifest(self, manifest, saltenv='base', cachedir=None):
+        '''
+        Bring the cached copies of the files of a manifest returned by
+        file_manifest up to date
+        '''
+        ret = []
+        for path in sorted(manifest):
+            fn_ = self.cache_file(
+                salt.utils.url.create(path), saltenv, cachedir=cachedir)
+            if fn_:
+                ret.append(fn_)
+        return ret
+
     def dir_list(self, saltenv='base', prefix=''):
         '''
         This function must be overwritten
@@ -1088,6 +1126,11 @@ class RemoteClient(Client):
                     )
                     return dest2check
 
+        if dest2check and self._get_file_blocks(
+                path, saltenv, dest2check, hash_server, gzip):
+            self._set_file_mode(dest2check, mode_server, saltenv, path)
+            return dest2check
+
         log.debug(
             'Fetching file from saltenv \'%s\', ** attempting ** \'%s\'',
             saltenv, path
@@ -1203,25 +1246,237 @@ class RemoteClient(Client):
                 saltenv, path
             )
 
-        if not salt.utils.is_windows():
-            if mode_server is not None:
-                try:
-                    if os.stat(dest).st_mode != mode_server:
-                        try:
-                            os.chmod(dest, mode_server)
-                            log.info(
-                                'Fetching file from saltenv \'%s\', '
-                                '** done ** \'%s\', mode set to %s',
-                                saltenv,
-                                path,
-                                salt.utils.st_mode_to_octal(mode_server)
-                            )
-                        except OSError:
-                            log.warning('Failed to chmod %s: %s', dest, exc)
-                except OSError:
-                    pass
+        self._set_file_mode(dest, mode_server, saltenv, path)
         return dest
 
+    def _set_file_mode(self, dest, mode_server, saltenv, path):
+        '''
+        Set the mode of a fetched file to the mode of the file on the master
+        '''
+        if salt.utils.is_windows() or mode_server is None:
+            return
+        try:
+            if os.stat(dest).st_mode != mode_server:
+                try:
+                    os.chmod(dest, mode_server)
+                    log.info(
+                        'Fetching file from saltenv \'%s\', '
+                        '** done ** \'%s\', mode set to %s',
+                        saltenv,
+                        path,
+                        salt.utils.st_mode_to_octal(mode_server)
+                    )
+                except OSError as exc:
+                    log.warning('Failed to chmod %s: %s', dest, exc)
+        except OSError:
+            pass
+
+    def _get_file_blocks(self, path, saltenv, dest, hash_server, gzip=None):
+        '''
+        Fetch a file from the master by blocks of ``file_delta_block_size``
+        bytes, only the blocks which differ from the copy already at ``dest``
+        are transferred. The new file is only moved into place if it matches
+        the hash of the file on the master.
+
+        Returns False if block transfers are disabled, the master does not
+        support them or the transfer failed, the caller then falls back to
+        fetching the whole file.
+        '''
+        block_size = self.opts.get('file_delta_block_size', 0)
+        if not block_size or not isinstance(hash_server, dict):
+            return False
+        destdir = os.path.dirname(dest)
+        if not os.path.isdir(destdir) or os.path.isdir(dest):
+            return False
+        hash_type = salt.utils.to_str(hash_server.get('hash_type', 'sha256'))
+        sigs = []
+        if os.path.isfile(dest):
+            try:
+                sigs = salt.utils.get_block_hashes(dest, hash_type, block_size)
+            except (IOError, OSError, ValueError) as exc:
+                log.debug('Unable to hash the blocks of %s: %s', dest, exc)
+                return False
+        load = {'path': self._check_proto(path),
+                'saltenv': saltenv,
+                'block_size': block_size,
+                'hash_type': hash_type,
+                'sigs': sigs,
+                'loc': 0,
+                'cmd': '_serve_file_blocks'}
+        if gzip:
+            load['gzip'] = int(gzip)
+
+        fd_, tmp = tempfile.mkstemp(
+            dir=destdir, prefix='.{0}.'.format(os.path.basename(dest)))
+        os.close(fd_)
+        received = 0
+        try:
+            with salt.utils.fopen(tmp, 'wb') as ofile:
+                local = salt.utils.fopen(dest, 'rb') if sigs else None
+                try:
+                    written = 0
+
+                    def _copy_local(stop):
+                        # Copy the unchanged blocks up to block ``stop``
+                        for idx in range(written, stop):
+                            local.seek(idx * block_size)
+                            ofile.write(local.read(block_size))
+
+                    while True:
+                        data = self.channel.send(load, raw=True)
+                        if six.PY3 and isinstance(data, dict):
+                            data = decode_dict_keys_to_str(data)
+                        if not isinstance(data, dict) or 'blocks' not in data:
+                            log.debug('The master does not serve file blocks')
+                            return False
+                        for idx, block in data['blocks']:
+                            _copy_local(idx)
+                            if data.get('gzip'):
+                                block = salt.utils.gzip_util.uncompress(block)
+                            if six.PY3 and isinstance(block, str):
+                                block = block.encode()
+                            ofile.write(block)
+                            received += len(block)
+                            written = idx + 1
+                        if data['next'] is None:
+                            break
+                        load['loc'] = data['next']
+                        load['sigs'] = sigs[load['loc']:]
+                    size = data['size']
+                    _copy_local(-(-size // block_size))
+                    ofile.truncate(size)
+                finally:
+                    if local is not None:
+                        local.close()
+            hsum = salt.utils.get_hash(tmp, hash_type)
+            if hsum != salt.utils.to_str(hash_server.get('hsum')):
+                log.warning(
+                    'Bad block transfer of file %s, fetching the whole file',
+                    path
+                )
+                return False
+            if os.path.isfile(dest):
+                shutil.copymode(dest, tmp)
+            salt.utils.files.rename(tmp, dest)
+            tmp = None
+        except (IOError, OSError, TypeError, KeyError, ValueError) as exc:
+            log.debug('Block transfer of %s failed: %s', path, exc)
+            return False
+        finally:
+            if tmp is not None and os.path.isfile(tmp):
+                os.remove(tmp)
+        log.info(
+            'Fetching file from saltenv \'%s\', ** done ** \'%s\', '
+            'transferred %d of %d bytes',
+            saltenv, path, received, size
+        )
+        return True
+
+    def file_manifest(self, saltenv='base', prefix=''):
+        '''
+        Return the hash, hash type, mode and size of the files under
+        ``prefix`` on the master, or None if the master cannot list them
+        '''
+        load = {'saltenv': saltenv,
+                'prefix': prefix,
+                'cmd': '_file_manifest'}
+        ret = self.channel.send(load)
+        if not isinstance(ret, dict):
+            return None
+        return dict((sdecode(fn_), info) for fn_, info in six.iteritems(ret))
+
+    def cache_manifest(self, manifest, saltenv='base', cachedir=None):
+        '''
+        Bring the cached copies of the files of a manifest returned by
+        file_manifest up to date. Only the files whose size or hash differ
+        from the manifest are downloaded, as many of them per request as fit
+        in a reply.
+        '''
+        ret = []
+        dests = {}
+        fetch = []
+        for path in sorted(manifest):
+            info = manifest[path]
+            with self._cache_loc(path, saltenv, cachedir=cachedir) as dest:
+                dests[path] = dest
+            if os.path.isfile(dest) \
+                    and os.path.getsize(dest) == info['size'] \
+                    and salt.utils.get_hash(
+                        dest, salt.utils.to_str(info['hash_type'])) \
+                    == salt.utils.to_str(info['hsum']):
+                self._set_file_mode(dest, info['mode'], saltenv, path)
+                ret.append(dest)
+            else:
+                fetch.append(path)
+
+        if fetch:
+            log.debug(
+                'Fetching %d of %d files in saltenv \'%s\'',
+                len(fetch), len(manifest), saltenv
+            )
+            missing = self._get_files(fetch, saltenv, manifest, dests)
+            ret.extend(dests[path] for path in fetch if path not in missing)
+            for path in missing:
+                fn_ = self.get_file(
+                    salt.utils.url.create(path), dests[path], saltenv=saltenv,
+                    cachedir=cachedir)
+                if fn_:
+                    ret.append(fn_)
+        return sorted(ret)
+
+    def _get_files(self, paths, saltenv, manifest, dests):
+        '''
+        Fetch whole files from the master, several of them per request, and
+        write them to their destination in ``dests``. Returns the files which
+        were not transferred, because the master does not serve files in
+        batches, they are too large for a reply or they do not match the hash
+        of the manifest.
+        '''
+        missing = set(paths)
+        load = {'paths': paths,
+                'saltenv': saltenv,
+                'loc': 0,
+                'cmd': '_serve_files'}
+        while True:
+            data = self.channel.send(load, raw=True)
+            if six.PY3 and isinstance(data, dict):
+                data = decode_dict_keys_to_str(data)
+            if not isinstance(data, dict) or 'files' not in data:
+                log.debug('The master does not serve files in batches')
+                break
+            for path, contents in data['files']:
+                path = sdecode(salt.utils.to_str(path))
+                if path not in missing:
+                    continue
+                if data.get('gzip'):
+                    contents = salt.utils.gzip_util.uncompress(contents)
+                if six.PY3 and isinstance(contents, str):
+                    contents = contents.encode()
+                info = manifest[path]
+                hsum = hashlib.new(
+                    salt.utils.to_str(info['hash_type']), contents).hexdigest()
+                if hsum != salt.utils.to_str(info['hsum']):
+                    log.warning(
+                        'Bad download of file %s, fetching it on its own', path
+                    )
+                    continue
+                dest = dests[path]
+                if os.path.isdir(dest):
+                    salt.utils.rm_rf(dest)
+                with salt.utils.fopen(dest, 'wb+') as ofile:
+                    ofile.write(contents)
+                self._set_file_mode(dest, info['mode'], saltenv, path)
+                missing.discard(path)
+                log.info(
+                    'Fetching file from saltenv \'%s\', ** done ** \'%s\'',
+                    saltenv, path
+                )
+            if data.get('next') is None:
+                break
+            load['loc'] = data['next']
+            load['paths'] = paths[load['loc']:]
+        return missing
+
     def file_list(self, saltenv='base', prefix=''):
         '''
         List the files on the master
@@ -8,6 +8,7 @@ from __future__ import absolute_import
 import collections
 import errno
 import fnmatch
+import hashlib
 import logging
 import os
 import re
@@ -16,6 +17,7 @@ import time
 # Import salt libs
 import salt.loader
 import salt.utils
+import salt.utils.gzip_util
 import salt.utils.locales
 
 # Import 3rd-party libs
@@ -24,6 +26,35 @@ import salt.ext.six as six
 
 log = logging.getLogger(__name__)
 
+# The number of file_buffer_size chunks a serve_file_blocks reply may carry
+BLOCK_REPLY_BUFFERS = 16
+
+# The smallest block size a minion may ask for, the largest one is a whole
+# reply, and the most blocks a served file may be split into
+BLOCK_SIZE_MIN = 4096
+MAX_FILE_BLOCKS = 8192
+
+# Block hashes of served files, keyed on the path, mtime, size, block size and
+# hash type of the file
+_BLOCK_HASHES = collections.OrderedDict()
+BLOCK_HASHES_SIZE = 64
+
+
+def _block_hashes(path, block_size, hash_type):
+    '''
+    Return the block hashes of a served file, the hashes of the most recently
+    served files are kept in memory
+    '''
+    stat = os.stat(path)
+    key = (path, stat.st_mtime, stat.st_size, block_size, hash_type)
+    hashes = _BLOCK_HASHES.pop(key, None)
+    if hashes is None:
+        hashes = salt.utils.get_block_hashes(path, hash_type, block_size)
+        while len(_BLOCK_HASHES) >= BLOCK_HASHES_SIZE:
+            _BLOCK_HASHES.popitem(last=False)
+    _BLOCK_HASHES[key] = hashes
+    return stat.st_size, hashes
+
 
 def _unlock_cache(w_lock):
     '''
@@ -597,6 +628,128 @@ class Fileserver(object):
             return self.servers[fstr](load, fnd)
         return ret
 
+    def serve_file_blocks(self, load):
+        '''
+        Serve the blocks of a file which differ from the block hashes of the
+        requester's copy. Blocks are returned from block ``loc`` on, ``sigs``
+        holds the hashes of the requester's blocks from ``loc`` on, so a
+        continuation does not resend the hashes of the blocks already served.
+        Each reply holds up to BLOCK_REPLY_BUFFERS times ``file_buffer_size``
+        bytes and ``next`` is the block to ask for next.
+
+        The block size must be between BLOCK_SIZE_MIN and the size of a
+        reply, and the file must not be split in more than MAX_FILE_BLOCKS
+        blocks, otherwise nothing is returned and the minion fetches the
+        whole file.
+        '''
+        if 'path' not in load or 'saltenv' not in load \
+                or 'block_size' not in load:
+            return {}
+        if not isinstance(load['saltenv'], six.string_types):
+            load['saltenv'] = six.text_type(load['saltenv'])
+        try:
+            block_size = int(load['block_size'])
+            loc = int(load.get('loc', 0))
+        except (TypeError, ValueError):
+            return {}
+        hash_type = salt.utils.to_str(load.get('hash_type', 'sha256'))
+        limit = self.opts['file_buffer_size'] * BLOCK_REPLY_BUFFERS
+        if not BLOCK_SIZE_MIN <= block_size <= limit:
+            log.debug('Refusing to serve blocks of %s bytes, the block size '
+                      'must be between %s and %s', block_size,
+                      BLOCK_SIZE_MIN, limit)
+            return {}
+        if not hasattr(hashlib, hash_type):
+            return {}
+
+        fnd = self.find_file(load['path'], load['saltenv'])
+        if not fnd.get('path'):
+            return {}
+        try:
+            blocks = -(-os.path.getsize(fnd['path']) // block_size)
+        except OSError:
+            return {}
+        if blocks > MAX_FILE_BLOCKS:
+            log.debug('Refusing to serve %s in %s blocks, at most %s blocks '
+                      'are served per file', fnd['rel'], blocks,
+                      MAX_FILE_BLOCKS)
+            return {}
+        size, hashes = _block_hashes(fnd['path'], block_size, hash_type)
+        sigs = [salt.utils.to_str(sig) for sig in load.get('sigs') or ()]
+        gzip = load.get('gzip', None)
+        ret = {'dest': fnd['rel'],
+               'size': size,
+               'block_size': block_size,
+               'blocks': [],
+               'next': None}
+        if gzip:
+            ret['gzip'] = gzip
+        sent = 0
+        with salt.utils.fopen(os.path.normpath(fnd['path']), 'rb') as fp_:
+            for idx in range(loc, len(hashes)):
+                if idx - loc < len(sigs) and sigs[idx - loc] == hashes[idx]:
+                    continue
+                if sent + block_size > limit:
+                    ret['next'] = idx
+                    break
+                fp_.seek(idx * block_size)
+                data = fp_.read(block_size)
+                sent += len(data)
+                if gzip:
+                    data = salt.utils.gzip_util.compress(data, gzip)
+                ret['blocks'].append([idx, data])
+        return ret
+
+    def serve_files(self, load):
+        '''
+        Serve several whole files in one reply. ``paths`` holds the files
+        from index ``loc`` of the requested list on, so a continuation does
+        not resend the files already served. Each reply holds up to
+        BLOCK_REPLY_BUFFERS times ``file_buffer_size`` bytes and ``next`` is
+        the index to ask for next. Files larger than a reply are listed in
+        ``skipped`` and have to be fetched with serve_file.
+        '''
+        if 'paths' not in load or 'saltenv' not in load:
+            return {}
+        if not isinstance(load['saltenv'], six.string_types):
+            load['saltenv'] = six.text_type(load['saltenv'])
+        try:
+            loc = int(load.get('loc', 0))
+        except (TypeError, ValueError):
+            return {}
+        paths = load['paths']
+        gzip = load.get('gzip', None)
+        ret = {'files': [],
+               'skipped': [],
+               'next': None}
+        if gzip:
+            ret['gzip'] = gzip
+        limit = self.opts['file_buffer_size'] * BLOCK_REPLY_BUFFERS
+        sent = 0
+        for idx in range(loc, loc + len(paths)):
+            path = salt.utils.locales.sdecode(paths[idx - loc])
+            fnd = self.find_file(path, load['saltenv'])
+            if not fnd.get('path'):
+                continue
+            fpath = os.path.normpath(fnd['path'])
+            try:
+                size = os.path.getsize(fpath)
+            except OSError:
+                continue
+            if size > limit:
+                ret['skipped'].append(path)
+                continue
+            if sent and sent + size > limit:
+                ret['next'] = idx
+                break
+            with salt.utils.fopen(fpath, 'rb') as fp_:
+                data = fp_.read()
+            sent += size
+            if gzip:
+                data = salt.utils.gzip_util.compress(data, gzip)
+            ret['files'].append([path, data])
+        return ret
+
     def __file_hash_and_stat(self, load):
         '''
         Common code for hashing and stating files
@@ -644,6 +797,40 @@ class Fileserver(object):
         except (IndexError, TypeError):
             return '', None
 
+    def file_manifest(self, load):
+        '''
+        Return the hash, hash type, mode and size of every file under
+        ``prefix``, so that a whole tree can be compared with a single request
+        '''
+        if 'saltenv' not in load:
+            return {}
+        if not isinstance(load['saltenv'], six.string_types):
+            load['saltenv'] = six.text_type(load['saltenv'])
+        saltenv = load['saltenv']
+        ret = {}
+        for path in self.file_list({'saltenv': saltenv,
+                                    'prefix': load.get('prefix', '')}):
+            fnd = self.find_file(path, saltenv)
+            if not fnd.get('back'):
+                continue
+            fstr = '{0}.file_hash'.format(fnd['back'])
+            if fstr not in self.servers:
+                continue
+            hsum = self.servers[fstr]({'path': path, 'saltenv': saltenv}, fnd)
+            if not hsum or 'hsum' not in hsum:
+                continue
+            stat_result = fnd.get('stat')
+            if not stat_result:
+                try:
+                    stat_result = list(os.stat(fnd['path']))
+                except OSError:
+                    continue
+            ret[path] = {'hsum': hsum['hsum'],
+                         'hash_type': hsum['hash_type'],
+                         'mode': stat_result[0],
+                         'size': stat_result[6]}
+        return ret
+
     def clear_file_list_cache(self, load):
         '''
         Deletes the file_lists cache files
@@ -19,17 +19,33 @@ from __future__ import absolute_import
 
 # Import python libs
 import os
-import errno
+import shutil
 import logging
 
+try:
+    import sqlite3
+    HAS_SQLITE = True
+except ImportError:
+    HAS_SQLITE = False
+
 # Import salt libs
 import salt.fileserver
 import salt.utils
 from salt.utils.event import tagify
+from salt.utils.odict import OrderedDict
 import salt.ext.six as six
 
 log = logging.getLogger(__name__)
 
+# In-process view of the hash index, maps (saltenv, path, hash_type) to
+# (mtime, size, inode, hsum). The least recently used entries are dropped
+# past HASHES_MAX entries, they are still in the persistent index.
+_HASHES = OrderedDict()
+HASHES_MAX = 10000
+# sqlite connection to the persistent hash index, keyed by pid so forked
+# workers do not share a connection
+_HASH_DB = {}
+
 
 def find_file(path, saltenv='base', **kwargs):
     '''
@@ -143,14 +159,10 @@ def update():
     '''
     When we are asked to update (regular interval) lets reap the cache
     '''
-    try:
-        salt.fileserver.reap_fileserver_cache_dir(
-            os.path.join(__opts__['cachedir'], 'roots/hash'),
-            find_file
-        )
-    except (IOError, OSError):
-        # Hash file won't exist if no files have yet been served up
-        pass
+    # The per-file "hash:mtime" cache has been replaced by the hash index
+    legacy_hash_dir = os.path.join(__opts__['cachedir'], 'roots/hash')
+    if os.path.isdir(legacy_hash_dir):
+        shutil.rmtree(legacy_hash_dir, ignore_errors=True)
 
     mtime_map_path = os.path.join(__opts__['cachedir'], 'roots/mtime_map')
     # data to send on event
@@ -167,9 +179,10 @@ def update():
         with salt.utils.fopen(mtime_map_path, 'r') as fp_:
             for line in fp_:
                 try:
-                    file_path, mtime = line.replace('\n', '').split(':', 1)
+                    file_path, mtime = line.replace('\n', '').rsplit(':', 1)
+                    mtime = float(mtime)
                     old_mtime_map[file_path] = mtime
-                    if mtime != str(new_mtime_map.get(file_path, mtime)):
+                    if mtime != new_mtime_map.get(file_path, mtime):
                         data['files']['changed'].append(file_path)
                 except ValueError:
                     # Document the invalid entry in the log
@@ -185,14 +198,17 @@ def update():
     data['files']['removed'] = list(old_files - new_files)
     data['files']['added'] = list(new_files - old_files)
 
+    _refresh_hash_index(data['files']['changed'] + data['files']['removed'])
+
     # write out the new map
     mtime_map_path_dir = os.path.dirname(mtime_map_path)
     if not os.path.exists(mtime_map_path_dir):
         os.makedirs(mtime_map_path_dir)
     with salt.utils.fopen(mtime_map_path, 'w') as fp_:
         for file_path, mtime in six.iteritems(new_mtime_map):
-            fp_.write('{file_path}:{mtime}\n'.format(file_path=file_path,
-                                                     mtime=mtime))
+            # repr keeps the full float precision of the mtime on Python 2
+            fp_.write('{file_path}:{mtime!r}\n'.format(file_path=file_path,
+                                                       mtime=mtime))
 
     if __opts__.get('fileserver_events', False):
         # if there is a change, fire an event
@@ -205,6 +221,93 @@ def update():
         event.fire_event(data, tagify(['roots', 'update'], prefix='fileserver'))
 
 
+def _get_hash_entry(key):
+    '''
+    Return the in-process hash index entry, marking it as recently used
+    '''
+    entry = _HASHES.pop(key, None)
+    if entry is not None:
+        _HASHES[key] = entry
+    return entry
+
+
+def _set_hash_entry(key, entry):
+    '''
+    Set an in-process hash index entry, dropping the least recently used
+    entries past HASHES_MAX
+    '''
+    _HASHES.pop(key, None)
+    _HASHES[key] = entry
+    while len(_HASHES) > HASHES_MAX:
+        _HASHES.popitem(last=False)
+
+
+def _hash_db():
+    '''
+    Return the connection to the persistent hash index, or None if sqlite is
+    not available or the database cannot be opened
+    '''
+    if not HAS_SQLITE:
+        return None
+    pid = os.getpid()
+    if pid in _HASH_DB:
+        return _HASH_DB[pid]
+    _HASH_DB.clear()
+    db_path = os.path.join(__opts__['cachedir'], 'roots', 'hash_index.db')
+    try:
+        if not os.path.isdir(os.path.dirname(db_path)):
+            os.makedirs(os.path.dirname(db_path))
+        con = sqlite3.connect(db_path, timeout=30)
+        with con:
+            con.execute(
+                'CREATE TABLE IF NOT EXISTS hashes ('
+                'saltenv TEXT, path TEXT, hash_type TEXT, mtime REAL, '
+                'size INTEGER, inode INTEGER, hsum TEXT, '
+                'PRIMARY KEY (saltenv, path, hash_type))'
+            )
+    except (OSError, sqlite3.Error) as exc:
+        log.error('Unable to open fileserver hash index {0}: {1}'.format(db_path, exc))
+        con = None
+    _HASH_DB[pid] = con
+    return con
+
+
+def _refresh_hash_index(paths):
+    '''
+    Rehash the indexed entries of files which changed since the last update
+    and drop the entries of files which are gone
+    '''
+    con = _hash_db()
+    if con is None or not paths:
+        return
+    try:
+        with con:
+            for path in paths:
+                rows = con.execute(
+                    'SELECT saltenv, hash_type FROM hashes WHERE path = ?',
+                    (path,)
+                ).fetchall()
+                for saltenv, hash_type in rows:
+                    _HASHES.pop((saltenv, path, hash_type), None)
+                con.execute('DELETE FROM hashes WHERE path = ?', (path,))
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                for saltenv, hash_type in rows:
+                    entry = (stat.st_mtime,
+                             stat.st_size,
+                             stat.st_ino,
+                             salt.utils.get_hash(path, hash_type))
+                    con.execute(
+                        'INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        (saltenv, path, hash_type) + entry
+                    )
+                    _set_hash_entry((saltenv, path, hash_type), entry)
+    except (IOError, OSError, sqlite3.Error) as exc:
+        log.error('Unable to refresh the fileserver hash index: {0}'.format(exc))
+
+
 def file_hash(load, fnd):
     '''
     Return a file hash, the hash type is set in the master config file
@@ -224,64 +327,56 @@ def file_hash(load, fnd):
     ret = {}
 
     # if the file doesn't exist, we can't get a hash
-    if not path or not os.path.isfile(path):
+    if not path:
+        return ret
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return ret
+    if not os.path.isfile(path):
         return ret
 
     # set the hash_type as it is determined by config-- so mechanism won't change that
-    ret['hash_type'] = __opts__['hash_type']
-
-    # check if the hash is cached
-    # cache file's contents should be "hash:mtime"
-    cache_path = os.path.join(__opts__['cachedir'],
-                              'roots/hash',
-                              load['saltenv'],
-                              u'{0}.hash.{1}'.format(fnd['rel'],
-                              __opts__['hash_type']))
-    # if we have a cache, serve that if the mtime hasn't changed
-    if os.path.exists(cache_path):
-        try:
-            with salt.utils.fopen(cache_path, 'r') as fp_:
-                try:
-                    hsum, mtime = fp_.read().split(':')
-                except ValueError:
-                    log.debug('Fileserver attempted to read incomplete cache file. Retrying.')
-                    # Delete the file since its incomplete (either corrupted or incomplete)
-                    try:
-                        os.unlink(cache_path)
-                    except OSError:
-                        pass
-                    return file_hash(load, fnd)
-                if os.path.getmtime(path) == mtime:
-                    # check if mtime changed
-                    ret['hsum'] = hsum
-                    return ret
-        except (os.error, IOError):  # Can't use Python select() because we need Windows support
-            log.debug("Fileserver encountered lock when reading cache file. Retrying.")
-            # Delete the file since its incomplete (either corrupted or incomplete)
-            try:
-                os.unlink(cache_path)
-            except OSError:
-                pass
-            return file_hash(load, fnd)
+    hash_type = __opts__['hash_type']
+    ret['hash_type'] = hash_type
+
+    # Index entries are only valid while the mtime, size and inode of the
+    # file are unchanged
+    key = (load['saltenv'], path, hash_type)
+    valid = (stat.st_mtime, stat.st_size, stat.st_ino)
+    entry = _get_hash_entry(key)
+    if entry is not None and entry[:3] == valid:
+        ret['hsum'] = entry[3]
+        return ret
 
-    # if we don't have a cache entry-- lets make one
-    ret['hsum'] = salt.utils.get_hash(path, __opts__['hash_type'])
-    cache_dir = os.path.dirname(cache_path)
-    # make cache directory if it doesn't exist
-    if not os.path.exists(cache_dir):
+    con = _hash_db()
+    if con is not None:
         try:
-            os.makedirs(cache_dir)
-        except OSError as err:
-            if err.errno == errno.EEXIST:
-                # rarely, the directory can be already concurrently created between
-                # the os.path.exists and the os.makedirs lines above
-                pass
-            else:
-                raise
-    # save the cache object "hash:mtime"
-    cache_object = '{0}:{1}'.format(ret['hsum'], os.path.getmtime(path))
-    with salt.utils.flopen(cache_path, 'w') as fp_:
-        fp_.write(cache_object)
+            row = con.execute(
+                'SELECT mtime, size, inode, hsum FROM hashes '
+                'WHERE saltenv = ? AND path = ? AND hash_type = ?',
+                key
+            ).fetchone()
+        except sqlite3.Error as exc:
+            log.debug('Unable to read the fileserver hash index: {0}'.format(exc))
+            row = None
+        if row is not None and tuple(row[:3]) == valid:
+            ret['hsum'] = str(row[3])
+            _set_hash_entry(key, valid + (ret['hsum'],))
+            return ret
+
+    # if we don't have a valid index entry-- lets make one
+    ret['hsum'] = salt.utils.get_hash(path, hash_type)
+    _set_hash_entry(key, valid + (ret['hsum'],))
+    if con is not None:
+        try:
+            with con:
+                con.execute(
+                    'INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    key + valid + (ret['hsum'],)
+                )
+        except sqlite3.Error as exc:
+            log.debug('Unable to update the fileserver hash index: {0}'.format(exc))
     return ret
 
 
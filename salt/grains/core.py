@@ -27,6 +27,22 @@ from salt.ext.six.moves import range
 __proxyenabled__ = ['*']
 __FQDN__ = None
 
+# Seconds the return of a grain function may be reused for when
+# ``grains_incremental`` is enabled. Grain functions not listed here are only
+# computed once per minion process (or on module reload), the ones listed
+# with 0 are recomputed on every grains refresh.
+__grains_ttl__ = {
+    'dns': 0,
+    'get_master': 0,
+    'hostname': 0,
+    'hwaddr_interfaces': 0,
+    'ip4_interfaces': 0,
+    'ip6_interfaces': 0,
+    'ip_fqdn': 0,
+    'ip_interfaces': 0,
+    'memdata': 0,
+}
+
 # Extend the default list of supported distros. This will be used for the
 # /etc/DISTRO-release checking that is part of platform.linux_distribution()
 from platform import _supported_dists
@@ -1264,7 +1280,6 @@ def os_data():
     elif salt.utils.is_windows():
         grains['os'] = 'Windows'
         grains['os_family'] = 'Windows'
-        grains.update(_memdata(grains))
         grains.update(_windows_platform_data())
         grains.update(_windows_cpudata())
         grains.update(_windows_virtual(grains))
@@ -1642,8 +1657,6 @@ def os_data():
         osarch = grains['cpuarch']
     grains['osarch'] = osarch
 
-    grains.update(_memdata(grains))
-
     # Get the hardware and bios data
     grains.update(_hw_data(grains))
 
@@ -1696,6 +1709,19 @@ def locale_info():
     return grains
 
 
+def memdata():
+    '''
+    Return the total amount of system memory
+
+    .. versionadded:: Nitrogen
+    '''
+    # Provides:
+    #   mem_total
+    if salt.utils.is_proxy():
+        return {}
+    return _memdata({'kernel': platform.system()})
+
+
 def hostname():
     '''
     Return fqdn, hostname, domainname
@@ -9,9 +9,13 @@ plugin interfaces used by Salt.
 from __future__ import absolute_import
 import os
 import imp
+import copy
 import sys
+import json
 import salt
 import time
+import fnmatch
+import hashlib
 import logging
 import inspect
 import tempfile
@@ -24,10 +28,12 @@ from salt.exceptions import LoaderError
 from salt.template import check_render_pipe_str
 from salt.utils.decorators import Depends
 from salt.utils import is_proxy
+import salt.utils.atomicfile
 import salt.utils.context
 import salt.utils.lazy
 import salt.utils.event
 import salt.utils.odict
+from salt.version import __version__
 
 # Solve the Chicken and egg problem where grains need to run before any
 # of the modules are loaded and are generally available for any usage.
@@ -41,6 +47,11 @@ try:
     HAS_PKG_RESOURCES = True
 except ImportError:
     HAS_PKG_RESOURCES = False
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
 
 __salt__ = {
     'cmd.run': salt.modules.cmdmod._run_quiet
@@ -614,6 +625,56 @@ def grain_funcs(opts, proxy=None):
     )
 
 
+# Results of the grain functions, per grain module, reused between grains
+# refreshes when ``grains_incremental`` is enabled.
+GRAINS_CACHE = {}
+
+
+def _grains_ttl(opts, key, module):
+    '''
+    Return the number of seconds the return of the grain function ``key``
+    may be reused for, or None if it never expires. The ``grains_ttl`` option
+    takes precedence over the ``__grains_ttl__`` mapping of the grain module.
+    '''
+    ttls = opts.get('grains_ttl') or {}
+    if key in ttls:
+        return ttls[key]
+    for pattern in sorted(ttls, key=len, reverse=True):
+        if fnmatch.fnmatch(key, pattern):
+            return ttls[pattern]
+    module_ttls = getattr(module, '__grains_ttl__', None) or {}
+    return module_ttls.get(key.split('.', 1)[1])
+
+
+def _call_grain_func(opts, key, fun, args):
+    '''
+    Call the grain function ``fun``, reusing the return of an earlier call
+    while it is within the TTL of the function.
+    '''
+    module = sys.modules.get(getattr(fun, '__module__', None))
+    mod_name = key.split('.', 1)[0]
+    try:
+        mtime = os.path.getmtime(module.__file__)
+    except (AttributeError, OSError, TypeError):
+        mtime = None
+    mod_cache = GRAINS_CACHE.get(mod_name)
+    if mod_cache is None or mod_cache['mtime'] != mtime:
+        # The grain module is new or has been changed (e.g. by
+        # saltutil.sync_grains), whatever it returned before is stale
+        mod_cache = GRAINS_CACHE[mod_name] = {'mtime': mtime, 'funcs': {}}
+
+    ttl = _grains_ttl(opts, key, module)
+    now = time.time()
+    cached = mod_cache['funcs'].get(key)
+    if cached is not None and (ttl is None or now - cached[0] < ttl):
+        log.trace('Reusing cached return of {0} grain'.format(key))
+        return copy.deepcopy(cached[1])
+    ret = fun(*args)
+    if isinstance(ret, dict):
+        mod_cache['funcs'][key] = (now, copy.deepcopy(ret))
+    return ret
+
+
 def grains(opts, force_refresh=False, proxy=None):
     '''
     Return the functions for the dynamic grains and the values for the static
@@ -632,6 +693,12 @@ def grains(opts, force_refresh=False, proxy=None):
         __opts__ = salt.config.minion_config('/etc/salt/minion')
         __grains__ = salt.loader.grains(__opts__)
         print __grains__['id']
+
+    With ``grains_incremental`` enabled, the return of each grain function is
+    kept and only recomputed once its TTL (see ``grains_ttl``) has expired or
+    its grain module file has changed, so a refresh only reruns the volatile
+    grain functions. ``force_refresh`` reloads the grain modules and drops all
+    of the kept returns.
     '''
     # if we have no grains, lets try loading from disk (TODO: move to decorator?)
     cfn = os.path.join(
@@ -668,6 +735,7 @@ def grains(opts, force_refresh=False, proxy=None):
     if opts.get('skip_grains', False):
         return {}
     grains_deep_merge = opts.get('grains_deep_merge', False) is True
+    grains_incremental = opts.get('grains_incremental', False)
     if 'conf_file' in opts:
         pre_opts = {}
         pre_opts.update(salt.config.load_config(
@@ -695,12 +763,17 @@ def grains(opts, force_refresh=False, proxy=None):
     funcs = grain_funcs(opts, proxy=proxy)
     if force_refresh:  # if we refresh, lets reload grain modules
         funcs.clear()
+        # and forget what the reloaded grain modules returned before
+        GRAINS_CACHE.clear()
     # Run core grains
     for key, fun in six.iteritems(funcs):
         if not key.startswith('core.'):
             continue
         log.trace('Loading {0} grain'.format(key))
-        ret = fun()
+        if grains_incremental:
+            ret = _call_grain_func(opts, key, fun, ())
+        else:
+            ret = fun()
         if not isinstance(ret, dict):
             continue
         if grains_deep_merge:
@@ -720,9 +793,13 @@ def grains(opts, force_refresh=False, proxy=None):
             # proxymodule for retrieving information from the connected
             # device.
             if fun.__code__.co_argcount == 1:
-                ret = fun(proxy)
+                args = (proxy,)
+            else:
+                args = ()
+            if grains_incremental:
+                ret = _call_grain_func(opts, key, fun, args)
             else:
-                ret = fun()
+                ret = fun(*args)
         except Exception:
             if is_proxy():
                 log.info('The following CRITICAL message may not be an error; the proxy may not be completely established yet.')
@@ -988,6 +1065,249 @@ class FilterDictWrapper(MutableMapping):
                 yield key.replace(self.suffix, '')
 
 
+class _RecordingDict(MutableMapping, dict):
+    '''
+    Wrap a dict and record the keys read from it, used to find out what a
+    __virtual__ function depends on
+
+    MUST inherit from dict to pass the isinstance checks of the modules
+    '''
+    def __init__(self, wrapped):  # pylint: disable=W0231
+        self._wrapped = wrapped
+        self.keys_read = set()
+        self.read_all = False
+        # The C level copies of a dict subclass, e.g. dict(d), read the dict
+        # storage itself on python 2 without calling any of the methods
+        # below. Keep the data there too, unless the wrapped mapping is
+        # lazy, but the keys read can then not be told.
+        self._mirrored = not isinstance(wrapped, salt.utils.lazy.LazyDict)
+        if self._mirrored:
+            super(_RecordingDict, self).__init__(wrapped)
+
+    def __getitem__(self, key):
+        self.keys_read.add(key)
+        return self._wrapped[key]
+
+    def __contains__(self, key):
+        self.keys_read.add(key)
+        return key in self._wrapped
+
+    def __setitem__(self, key, val):
+        self._wrapped[key] = val
+        if self._mirrored:
+            dict.__setitem__(self, key, val)
+
+    def __delitem__(self, key):
+        del self._wrapped[key]
+        dict.pop(self, key, None)
+
+    def __iter__(self):
+        self.read_all = True
+        return iter(self._wrapped)
+
+    def __len__(self):
+        self.read_all = True
+        return len(self._wrapped)
+
+    def __repr__(self):
+        self.read_all = True
+        return repr(self._wrapped)
+
+    def __getattr__(self, name):
+        # The other attributes of the wrapped mapping, e.g. of a LazyLoader
+        if name.startswith('__') or name == '_wrapped':
+            raise AttributeError(name)
+        self.read_all = True
+        return getattr(self._wrapped, name)
+
+    def copy(self):
+        self.read_all = True
+        return dict(self._wrapped)
+
+    def recorded(self):
+        '''
+        Return the keys read, None if the whole dict was read or may have
+        been copied unseen
+        '''
+        if self.read_all or (six.PY2 and self._mirrored):
+            return None
+        return sorted(self.keys_read, key=str)
+
+    def accessed(self):
+        '''
+        Return True if anything was seen read from the dict
+        '''
+        return self.read_all or bool(self.keys_read)
+
+
+class LoaderIndex(object):
+    '''
+    The persistent index of a loader, kept under the cachedir. It records the
+    file mapping along with the mtimes of the directories it was built from,
+    and the modules whose __virtual__ function returned False, reading no
+    other global than the grains and opts, along with the grains and opts the
+    function read. Neither is used once the directories,
+    the grains or opts read, the module file, or the directories in the PATH
+    and sys.path, where new binaries and libraries get installed, change.
+    '''
+    # A directory modified this close to the time the index was written may
+    # have been modified after its mtime was recorded
+    MTIME_SLACK = 2
+
+    def __init__(self, path):
+        self.path = path
+        self.dirty = False
+        self.environment = {'salt': __version__,
+                            'python': sys.version,
+                            'dirs': self._mtimes(self.environment_dirs())}
+        self.data = self._read()
+
+    @staticmethod
+    def environment_dirs():
+        '''
+        Return the directories new binaries and python libraries are
+        installed to
+        '''
+        return os.environ.get('PATH', '').split(os.pathsep) + sys.path
+
+    @staticmethod
+    def _mtimes(paths):
+        mtimes = {}
+        for path in paths:
+            if not path:
+                continue
+            try:
+                mtimes[path] = os.stat(path).st_mtime
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    @staticmethod
+    def fingerprint(mapping, keys):
+        '''
+        Return a hash of the values of the keys of the mapping, or of the
+        whole mapping if keys is None. None is returned if the values can not
+        be serialized.
+        '''
+        if keys is None:
+            values = dict(mapping)
+        else:
+            values = dict((key, mapping.get(key, '<missing>')) for key in keys)
+        try:
+            data = json.dumps(values, sort_keys=True, default=repr)
+            return hashlib.sha1(data.encode('utf-8')).hexdigest()
+        except (TypeError, ValueError, UnicodeError):
+            return None
+
+    def _fresh(self, recorded, current):
+        '''
+        Return True if the mtimes are unchanged and were recorded safely
+        '''
+        if recorded != current:
+            return False
+        cutoff = self.data.get('time', 0) - self.MTIME_SLACK
+        return all(mtime is None or mtime < cutoff
+                   for mtime in six.itervalues(current))
+
+    def _read(self):
+        if not HAS_MSGPACK:
+            return {}
+        kwargs = {'raw': False} if six.PY3 else {}
+        try:
+            with salt.utils.fopen(self.path, 'rb') as fp_:
+                data = msgpack.load(fp_, **kwargs)
+        except (IOError, OSError, ValueError):
+            return {}
+        except Exception as exc:
+            log.debug('Unable to read loader index {0}: {1}'.format(self.path, exc))
+            return {}
+        if not isinstance(data, dict) or 'time' not in data:
+            return {}
+        self.data = data
+        if data.get('environment', {}).get('salt') != __version__ \
+                or data['environment'].get('python') != sys.version \
+                or not self._fresh(data['environment'].get('dirs'),
+                                   self.environment['dirs']):
+            data['virtual'] = {}
+            self.dirty = True
+        return data
+
+    def get_mapping(self):
+        '''
+        Return the file mapping as a list of (name, path, suffix), or None if
+        it is not known or out of date
+        '''
+        mapping = self.data.get('mapping')
+        if not mapping:
+            return None
+        if not self._fresh(mapping['dirs'], self._mtimes(mapping['dirs'])):
+            return None
+        return mapping['files']
+
+    def set_mapping(self, files, dirs):
+        self.data['mapping'] = {'files': files, 'dirs': self._mtimes(dirs)}
+        self.dirty = True
+
+    def known_false(self, name, fpath, grains, opts):
+        '''
+        Return the record of the module if its __virtual__ function returned
+        False and the record still holds, None otherwise
+        '''
+        record = self.data.get('virtual', {}).get(name)
+        if not record or record['path'] != fpath:
+            return None
+        if self._mtimes([fpath]) != {fpath: record['mtime']} \
+                or record['mtime'] >= self.data.get('time', 0) - self.MTIME_SLACK:
+            return None
+        for key, current in (('grains', grains), ('opts', opts)):
+            fingerprint = self.fingerprint(current, record[key + '_keys'])
+            if fingerprint is None or fingerprint != record[key + '_hash']:
+                return None
+        return record
+
+    def set_false(self, name, fpath, grains, opts, error):
+        '''
+        Record that the __virtual__ function of the module returned False,
+        grains and opts are the _RecordingDicts it was called with
+        '''
+        try:
+            error = None if error is None else six.text_type(error)
+        except UnicodeError:
+            error = None
+        record = {'path': fpath,
+                  'mtime': self._mtimes([fpath])[fpath],
+                  'error': error}
+        for key, recording in (('grains', grains), ('opts', opts)):
+            record[key + '_keys'] = recording.recorded()
+            record[key + '_hash'] = self.fingerprint(recording._wrapped,
+                                                     recording.recorded())
+            if record[key + '_hash'] is None:
+                return
+        self.data.setdefault('virtual', {})[name] = record
+        self.dirty = True
+
+    def forget(self, name):
+        if self.data.get('virtual', {}).pop(name, None) is not None:
+            self.dirty = True
+
+    def save(self):
+        '''
+        Write the index if it has changed
+        '''
+        if not self.dirty or not HAS_MSGPACK:
+            return
+        self.data['time'] = time.time()
+        self.data['environment'] = self.environment
+        try:
+            if not os.path.isdir(os.path.dirname(self.path)):
+                os.makedirs(os.path.dirname(self.path))
+            with salt.utils.atomicfile.atomic_open(self.path, 'wb') as fp_:
+                msgpack.dump(self.data, fp_)
+            self.dirty = False
+        except (IOError, OSError) as exc:
+            log.debug('Unable to write loader index {0}: {1}'.format(self.path, exc))
+
+
 class LazyLoader(salt.utils.lazy.LazyDict):
     '''
     A pseduo-dictionary which has a set of keys which are the
@@ -1071,6 +1391,7 @@ class LazyLoader(salt.utils.lazy.LazyDict):
 
         self.disabled = set(self.opts.get('disable_{0}s'.format(self.tag), []))
 
+        self._index = None
         self.refresh_file_mapping()
 
         super(LazyLoader, self).__init__()  # late init the lazy loader
@@ -1167,7 +1488,16 @@ class LazyLoader(salt.utils.lazy.LazyDict):
         # The files are added in order of priority, so order *must* be retained.
         self.file_mapping = salt.utils.odict.OrderedDict()
 
-        for mod_dir in self.module_dirs:
+        # Take the mapping from the index if the directories are unchanged,
+        # and only scan them otherwise
+        index = self._get_index()
+        mapping = index.get_mapping() if index is not None else None
+        for f_noext, fpath, ext in mapping or ():
+            self.file_mapping[f_noext] = (fpath, ext)
+        scanned_dirs = []
+
+        for mod_dir in self.module_dirs if mapping is None else ():
+            scanned_dirs.append(mod_dir)
             files = []
             try:
                 files = os.listdir(mod_dir)
@@ -1194,6 +1524,7 @@ class LazyLoader(salt.utils.lazy.LazyDict):
                     # if its a directory, lets allow us to load that
                     if ext == '':
                         # is there something __init__?
+                        scanned_dirs.append(fpath)
                         subfiles = os.listdir(fpath)
                         for suffix in suffix_order:
                             if '' == suffix:
@@ -1221,10 +1552,37 @@ class LazyLoader(salt.utils.lazy.LazyDict):
 
                 except OSError:
                     continue
+        if index is not None and mapping is None:
+            index.set_mapping(
+                [[f_noext, fpath, ext]
+                 for f_noext, (fpath, ext) in six.iteritems(self.file_mapping)],
+                scanned_dirs)
+            index.save()
         for smod in self.static_modules:
             f_noext = smod.split('.')[-1]
             self.file_mapping[f_noext] = (smod, '.o')
 
+    def _get_index(self):
+        '''
+        Return the persistent index of this loader if loader_index is enabled
+        '''
+        if self._index is None and self.opts.get('loader_index', False) \
+                and self.opts.get('cachedir'):
+            key = json.dumps([self.tag,
+                              self.module_dirs,
+                              sorted(self.suffix_map),
+                              sorted(self.disabled),
+                              self.virtual_enable,
+                              self.virtual_funcs],
+                             default=repr)
+            self._index = LoaderIndex(os.path.join(
+                self.opts['cachedir'],
+                'loader',
+                '{0}-{1}.p'.format(
+                    self.tag,
+                    hashlib.sha1(key.encode('utf-8')).hexdigest()[:16])))
+        return self._index
+
     def clear(self):
         '''
         Clear the dict
@@ -1293,6 +1651,16 @@ class LazyLoader(salt.utils.lazy.LazyDict):
         mod = None
         fpath, suffix = self.file_mapping[name]
         self.loaded_files.add(name)
+        if self._index is not None and self.virtual_enable:
+            record = self._index.known_false(name,
+                                             fpath,
+                                             self.pack['__grains__'],
+                                             self.opts)
+            if record is not None:
+                log.trace('Skipping {0}.{1}, its __virtual__ function '
+                          'returned False before'.format(self.tag, name))
+                self.missing_modules[name] = record['error']
+                return False
         fpath_dirname = os.path.dirname(fpath)
         try:
             sys.path.append(fpath_dirname)
@@ -1403,25 +1771,51 @@ class LazyLoader(salt.utils.lazy.LazyDict):
         # if virtual modules are enabled, we need to look for the
         # __virtual__() function inside that module and run it.
         if self.virtual_enable:
-            virtual_funcs_to_process = ['__virtual__'] + self.virtual_funcs
-            for virtual_func in virtual_funcs_to_process:
-                (virtual_ret, module_name, virtual_err) = self.process_virtual(
-                    mod,
-                    module_name,
-                )
-                if virtual_err is not None:
-                    log.trace('Error loading {0}.{1}: {2}'.format(self.tag,
-                                                                  module_name,
-                                                                  virtual_err,
-                                                                  ))
-
-                # if process_virtual returned a non-True value then we are
-                # supposed to not process this module
-                if virtual_ret is not True and module_name not in self.missing_modules:
-                    # If a module has information about why it could not be loaded, record it
-                    self.missing_modules[module_name] = virtual_err
-                    self.missing_modules[name] = virtual_err
-                    return False
+            index = self._index if suffix not in ('', '.o') else None
+            if index is not None:
+                # Record what the __virtual__ functions read, the outcome
+                # only holds as long as that is unchanged. It is not kept at
+                # all if they used any of the other globals, e.g. __salt__ or
+                # __pillar__, which are not tracked.
+                orig_globals = {}
+                for global_name in set(self.pack) | set(['__grains__', '__opts__']):
+                    value = getattr(mod, global_name, None)
+                    if isinstance(value, MutableMapping):
+                        orig_globals[global_name] = value
+                        setattr(mod, global_name, _RecordingDict(value))
+            try:
+                virtual_funcs_to_process = ['__virtual__'] + self.virtual_funcs
+                for virtual_func in virtual_funcs_to_process:
+                    (virtual_ret, module_name, virtual_err) = self.process_virtual(
+                        mod,
+                        module_name,
+                    )
+                    if virtual_err is not None:
+                        log.trace('Error loading {0}.{1}: {2}'.format(self.tag,
+                                                                      module_name,
+                                                                      virtual_err,
+                                                                      ))
+
+                    # if process_virtual returned a non-True value then we are
+                    # supposed to not process this module
+                    if virtual_ret is not True and module_name not in self.missing_modules:
+                        # If a module has information about why it could not be loaded, record it
+                        self.missing_modules[module_name] = virtual_err
+                        self.missing_modules[name] = virtual_err
+                        if index is not None and not any(
+                                getattr(mod, global_name).accessed()
+                                for global_name in orig_globals
+                                if global_name not in ('__grains__', '__opts__')):
+                            index.set_false(name,
+                                            fpath,
+                                            mod.__grains__,
+                                            mod.__opts__,
+                                            virtual_err)
+                        return False
+            finally:
+                if index is not None:
+                    for global_name, value in six.iteritems(orig_globals):
+                        setattr(mod, global_name, value)
 
         # If this is a proxy minion then MOST modules cannot work. Therefore, require that
         # any module that does work with salt-proxy-minion define __proxyenabled__ as a list
@@ -1487,6 +1881,8 @@ class LazyLoader(salt.utils.lazy.LazyDict):
                      'for reasons: {0}'.format(exc))
 
         self.loaded_modules[module_name] = mod_dict
+        if self._index is not None:
+            self._index.forget(name)
         return True
 
     def _load(self, key):
@@ -1531,6 +1927,8 @@ class LazyLoader(salt.utils.lazy.LazyDict):
                     reloaded = True
                 continue
 
+        if self._index is not None:
+            self._index.save()
         return ret
 
     def _load_all(self):
@@ -1543,6 +1941,8 @@ class LazyLoader(salt.utils.lazy.LazyDict):
             self._load_module(name)
 
         self.loaded = True
+        if self._index is not None:
+            self._index.save()
 
     def _apply_outputter(self, func, mod):
         '''
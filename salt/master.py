@@ -575,6 +575,14 @@ class Master(SMaster):
                 log.info('Creating master event return process')
                 self.process_manager.add_process(salt.utils.event.EventReturn, args=(self.opts,))
 
+            if self.opts.get('running_jobs_registry'):
+                log.info('Creating master running jobs registry process')
+                self.process_manager.add_process(salt.utils.job.RunningJobsRegistry, args=(self.opts,))
+
+            if self.opts.get('minion_liveness'):
+                log.info('Creating master minion liveness process')
+                self.process_manager.add_process(salt.utils.master.LivenessTracker, args=(self.opts,))
+
             ext_procs = self.opts.get('ext_processes', [])
             for proc in ext_procs:
                 log.info('Creating ext_processes process: {0}'.format(proc))
@@ -969,8 +977,11 @@ class AESFuncs(object):
         '''
         self.fs_ = salt.fileserver.Fileserver(self.opts)
         self._serve_file = self.fs_.serve_file
+        self._serve_file_blocks = self.fs_.serve_file_blocks
+        self._serve_files = self.fs_.serve_files
         self._file_find = self.fs_._find_file
         self._file_hash = self.fs_.file_hash
+        self._file_manifest = self.fs_.file_manifest
         self._file_list = self.fs_.file_list
         self._file_list_emptydirs = self.fs_.file_list_emptydirs
         self._dir_list = self.fs_.dir_list
@@ -1631,9 +1642,13 @@ class ClearFuncs(object):
     # the clear:
     # publish (The publish from the LocalClient)
     # _auth
+    PUB_STATS_TAG = 'salt/publish/stats'
+
     def __init__(self, opts, key):
         self.opts = opts
         self.key = key
+        # When the publish counters were last fired, by transport
+        self._pub_stats_fired = {}
         # Create the event manager
         self.event = salt.utils.event.get_master_event(self.opts, self.opts['sock_dir'], listen=False)
         # Make a client
@@ -2305,6 +2320,26 @@ class ClearFuncs(object):
         for transport, opts in iter_transport_opts(self.opts):
             chan = salt.transport.server.PubServerChannel.factory(opts)
             chan.publish(load)
+            self._fire_pub_stats(transport, chan)
+
+    def _fire_pub_stats(self, transport, chan):
+        '''
+        Fire the publish counters of the channel, if it keeps any, at most
+        every loop_interval seconds
+        '''
+        publish_stats = getattr(chan, 'publish_stats', None)
+        if publish_stats is None:
+            return
+        now = time.time()
+        if 0 <= now - self._pub_stats_fired.get(transport, 0) < self.opts['loop_interval']:
+            return
+        self._pub_stats_fired[transport] = now
+        stats = publish_stats()
+        log.debug('Publish stats of the {0} transport: {1}'.format(transport, stats))
+        self.event.fire_event({'pid': os.getpid(),
+                               'transport': transport,
+                               'stats': stats},
+                              self.PUB_STATS_TAG)
 
     def _prep_pub(self, minions, jid, clear_load, extra):
         '''
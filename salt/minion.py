@@ -1838,11 +1838,38 @@ class Minion(MinionBase):
         Refresh the functions and returners.
         '''
         log.debug('Refreshing modules. Notify={0}'.format(notify))
+        old_grains = self.opts.get('grains', {})
         self.functions, self.returners, _, self.executors = self._load_modules(force_refresh, notify=notify)
 
         self.schedule.functions = self.functions
         self.schedule.returners = self.returners
 
+        if self.opts.get('grains_incremental', False):
+            self._fire_grains_changes(old_grains, self.opts['grains'])
+
+    def _fire_grains_changes(self, old_grains, new_grains):
+        '''
+        Send the master the grains which changed in a refresh, rather than
+        the whole set of grains.
+        '''
+        if not old_grains or not self.connected:
+            return
+        changed = dict(
+            (key, val) for key, val in six.iteritems(new_grains)
+            if key not in old_grains or old_grains[key] != val
+        )
+        removed = [key for key in old_grains if key not in new_grains]
+        if not changed and not removed:
+            log.debug('Grains refresh did not change any grains')
+            return
+        log.debug('Grains refresh changed {0} grain(s) and removed {1}'.format(
+            len(changed), len(removed)))
+        self._fire_master(
+            {'changed': changed, 'removed': removed},
+            tagify([self.opts['id'], 'grains'], 'minion'),
+            sync=False
+        )
+
     # TODO: only allow one future in flight at a time?
     @tornado.gen.coroutine
     def pillar_refresh(self, force_refresh=False):
@@ -2585,7 +2612,8 @@ class SyndicManager(MinionBase):
         self.max_auth_wait = self.opts['acceptance_wait_time_max']
 
         self._has_master = threading.Event()
-        self.jid_forward_cache = set()
+        # The jids whose load was forwarded, in the order they were seen
+        self.jid_forward_cache = OrderedDict()
 
         if io_loop is None:
             if HAS_ZMQ:
@@ -2598,11 +2626,16 @@ class SyndicManager(MinionBase):
         self.raw_events = []
         # Dict of rets: {master_id: {event_tag: job_ret, ...}, ...}
         self.job_rets = {}
+        # Size of the returns in job_rets: {master_id: bytes, ...}
+        self.job_rets_size = {}
         # List of delayed job_rets which was unable to send for some reason and will be resend to
         # any available master
         self.delayed = []
         # Active pub futures: {master_id: (future, [job_ret, ...]), ...}
         self.pub_futures = {}
+        # Directory of the batches of returns spilled to disk while the masters are slow
+        self.spool_dir = os.path.join(self.opts['cachedir'], 'syndic_spool')
+        self.serial = salt.payload.Serial(self.opts)
 
     def _spawn_syndics(self):
         '''
@@ -2746,6 +2779,7 @@ class SyndicManager(MinionBase):
 
     def _reset_event_aggregation(self):
         self.job_rets = {}
+        self.job_rets_size = {}
         self.raw_events = []
 
     def reconnect_event_bus(self, something):
@@ -2812,12 +2846,10 @@ class SyndicManager(MinionBase):
                     jdict['__load__'].update(
                         self.mminion.returners[fstr](data['jid'])
                         )
-                    self.jid_forward_cache.add(data['jid'])
+                    self.jid_forward_cache[data['jid']] = True
                     if len(self.jid_forward_cache) > self.opts['syndic_jid_forward_cache_hwm']:
                         # Pop the oldest jid from the cache
-                        tmp = sorted(list(self.jid_forward_cache))
-                        tmp.pop(0)
-                        self.jid_forward_cache = set(tmp)
+                        self.jid_forward_cache.popitem(last=False)
             if master is not None:
                 # __'s to make sure it doesn't print out on the master cli
                 jdict['__master_id__'] = master
@@ -2826,6 +2858,11 @@ class SyndicManager(MinionBase):
                 if key in data:
                     ret[key] = data[key]
             jdict[data['id']] = ret
+            self.job_rets_size[master] = self.job_rets_size.get(master, 0) + len(raw)
+            batch_size = self.opts.get('syndic_forward_batch_size')
+            if batch_size and self.job_rets_size[master] >= batch_size:
+                # Stream the returns as soon as a batch is full
+                self._forward_job_rets(master)
         else:
             # TODO: config to forward these? If so we'll have to keep track of who
             # has seen them
@@ -2851,11 +2888,71 @@ class SyndicManager(MinionBase):
             res = self._return_pub_syndic(self.delayed)
             if res:
                 self.delayed = []
+        if not self.delayed:
+            self._forward_spool()
         for master in list(six.iterkeys(self.job_rets)):
-            values = self.job_rets[master].values()
-            res = self._return_pub_syndic(values, master_id=master)
-            if res:
+            self._forward_job_rets(master)
+
+    def _forward_job_rets(self, master):
+        '''
+        Send the returns buffered for a master. If the master is not ready
+        for them and the buffered returns are over syndic_max_buffer_size,
+        spill them to disk to be sent later.
+        '''
+        values = list(self.job_rets[master].values())
+        if self._return_pub_syndic(values, master_id=master):
+            del self.job_rets[master]
+            self.job_rets_size.pop(master, None)
+            return
+        max_buffer_size = self.opts.get('syndic_max_buffer_size')
+        if max_buffer_size and sum(six.itervalues(self.job_rets_size)) > max_buffer_size:
+            if self._spill(master, values):
                 del self.job_rets[master]
+                self.job_rets_size.pop(master, None)
+
+    def _spill(self, master, values):
+        '''
+        Write a batch of returns to the spool directory, returns True if it
+        was written
+        '''
+        path = os.path.join(self.spool_dir, '{0:.6f}_{1}.p'.format(time.time(), os.getpid()))
+        log.warning('The masters are not accepting returns fast enough, spilling '
+                    '{0} bytes of returns to {1}'.format(self.job_rets_size.get(master, 0), path))
+        try:
+            if not os.path.isdir(self.spool_dir):
+                os.makedirs(self.spool_dir)
+            with salt.utils.fopen(path, 'wb') as fp_:
+                self.serial.dump({'master': master, 'values': values}, fp_)
+        except (IOError, OSError) as exc:
+            log.error('Unable to spill returns to {0}: {1}'.format(path, exc))
+            return False
+        return True
+
+    def _forward_spool(self):
+        '''
+        Send the batches of returns spilled to disk, oldest first, until a
+        master is not ready for them
+        '''
+        try:
+            batches = sorted(os.listdir(self.spool_dir))
+        except OSError:
+            return
+        for batch in batches:
+            path = os.path.join(self.spool_dir, batch)
+            try:
+                with salt.utils.fopen(path, 'rb') as fp_:
+                    spilled = self.serial.load(fp_)
+            except Exception as exc:
+                log.error('Unable to read spilled returns from {0}, discarding '
+                          'them: {1}'.format(path, exc))
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            if not self._return_pub_syndic(spilled['values'], master_id=spilled['master']):
+                break
+            os.remove(path)
 
 
 class Matcher(object):
@@ -3048,6 +3145,29 @@ class Matcher(object):
                 return False
         return False
 
+    def _compound_eval(self, node, ref):
+        '''
+        Evaluate a compiled compound target, short-circuiting ``and`` and
+        ``or`` so the matchers of the right operand only run when needed
+        '''
+        if node[0] == 'and':
+            return self._compound_eval(node[1], ref) and self._compound_eval(node[2], ref)
+        if node[0] == 'or':
+            return self._compound_eval(node[1], ref) or self._compound_eval(node[2], ref)
+        if node[0] == 'not':
+            return not self._compound_eval(node[1], ref)
+        _, engine, pattern, delimiter, word = node
+        if engine is None:
+            # The match is not explicitly defined, evaluate it as a glob
+            return bool(self.glob_match(word))
+        if not ref.get(engine):
+            raise ValueError('unrecognized target engine "{0}" for target '
+                             'expression "{1}"'.format(engine, word))
+        engine_kwargs = {}
+        if delimiter:
+            engine_kwargs['delimiter'] = delimiter
+        return bool(getattr(self, '{0}_match'.format(ref[engine]))(pattern, **engine_kwargs))
+
     def compound_match(self, tgt):
         '''
         Runs the compound target check
@@ -3061,77 +3181,21 @@ class Matcher(object):
                'I': 'pillar',
                'J': 'pillar_pcre',
                'L': 'list',
-               'N': None,      # Nodegroups should already be expanded
                'S': 'ipcidr',
                'E': 'pcre'}
         if HAS_RANGE:
             ref['R'] = 'range'
 
-        results = []
-        opers = ['and', 'or', 'not', '(', ')']
-
-        if isinstance(tgt, six.string_types):
-            words = tgt.split()
-        else:
-            words = tgt
-
-        for word in words:
-            target_info = salt.utils.minions.parse_target(word)
-
-            # Easy check first
-            if word in opers:
-                if results:
-                    if results[-1] == '(' and word in ('and', 'or'):
-                        log.error('Invalid beginning operator after "(": {0}'.format(word))
-                        return False
-                    if word == 'not':
-                        if not results[-1] in ('and', 'or', '('):
-                            results.append('and')
-                    results.append(word)
-                else:
-                    # seq start with binary oper, fail
-                    if word not in ['(', 'not']:
-                        log.error('Invalid beginning operator: {0}'.format(word))
-                        return False
-                    results.append(word)
-
-            elif target_info and target_info['engine']:
-                if 'N' == target_info['engine']:
-                    # Nodegroups should already be expanded/resolved to other engines
-                    log.error('Detected nodegroup expansion failure of "{0}"'.format(word))
-                    return False
-                engine = ref.get(target_info['engine'])
-                if not engine:
-                    # If an unknown engine is called at any time, fail out
-                    log.error('Unrecognized target engine "{0}" for'
-                              ' target expression "{1}"'.format(
-                                  target_info['engine'],
-                                  word,
-                                )
-                        )
-                    return False
-
-                engine_args = [target_info['pattern']]
-                engine_kwargs = {}
-                if target_info['delimiter']:
-                    engine_kwargs['delimiter'] = target_info['delimiter']
-
-                results.append(
-                    str(getattr(self, '{0}_match'.format(engine))(*engine_args, **engine_kwargs))
-                )
-
-            else:
-                # The match is not explicitly defined, evaluate it as a glob
-                results.append(str(self.glob_match(word)))
-
-        results = ' '.join(results)
-        log.debug('compound_match {0} ? "{1}" => "{2}"'.format(self.opts['id'], tgt, results))
+        tree = salt.utils.minions.compile_compound(tgt)
+        if tree is None:
+            return False
         try:
-            return eval(results)  # pylint: disable=W0123
-        except Exception:
-            log.error('Invalid compound target: {0} for results: {1}'.format(tgt, results))
+            result = self._compound_eval(tree, ref)
+        except ValueError as exc:
+            log.error('Invalid compound target {0}: {1}'.format(tgt, exc))
             return False
-        return False
+        log.debug('compound_match {0} ? "{1}" => "{2}"'.format(self.opts['id'], tgt, result))
+        return result
 
     def nodegroup_match(self, tgt, nodegroups):
         '''
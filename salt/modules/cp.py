@@ -454,7 +454,7 @@ def cache_files(paths, saltenv='base'):
 
 
 def cache_dir(path, saltenv='base', include_empty=False, include_pat=None,
-              exclude_pat=None):
+              exclude_pat=None, manifest=False):
     '''
     Download and cache everything under a directory from the master
 
@@ -478,6 +478,13 @@ def cache_dir(path, saltenv='base', include_empty=False, include_pat=None,
 
         .. versionadded:: 2014.7.0
 
+    manifest : False
+        Fetch the hashes, modes and sizes of all of the files under the
+        directory in a single request, and only download the files which
+        differ from the cached copies, several of them per request.
+
+        .. versionadded:: Nitrogen
+
 
     CLI Examples:
 
@@ -485,9 +492,11 @@ def cache_dir(path, saltenv='base', include_empty=False, include_pat=None,
 
         salt '*' cp.cache_dir salt://path/to/dir
         salt '*' cp.cache_dir salt://path/to/dir include_pat='E@*.py$'
+        salt '*' cp.cache_dir salt://path/to/dir manifest=True
     '''
     return _client().cache_dir(
-        path, saltenv, include_empty, include_pat, exclude_pat
+        path, saltenv, include_empty, include_pat, exclude_pat,
+        manifest=manifest
     )
 
 
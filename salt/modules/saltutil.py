@@ -678,7 +678,7 @@ def refresh_pillar():
 pillar_refresh = salt.utils.alias_function(refresh_pillar, 'pillar_refresh')
 
 
-def refresh_modules(async=True):
+def refresh_modules(async=True, force_refresh=False):
     '''
     Signal the minion to refresh the module and grain data
 
@@ -686,19 +686,31 @@ def refresh_modules(async=True):
     until the module refresh is complete, set the 'async' flag
     to False.
 
+    force_refresh : False
+        .. versionadded:: Nitrogen
+
+        Reload the grain modules and rerun all of the grain functions,
+        ignoring the grains cache and the returns kept by
+        ``grains_incremental``.
+
     CLI Example:
 
     .. code-block:: bash
 
         salt '*' saltutil.refresh_modules
+        salt '*' saltutil.refresh_modules force_refresh=True
     '''
+    data = {}
+    if force_refresh:
+        data['force_refresh'] = True
     try:
         if async:
             #  If we're going to block, first setup a listener
-            ret = __salt__['event.fire']({}, 'module_refresh')
+            ret = __salt__['event.fire'](data, 'module_refresh')
         else:
             eventer = salt.utils.event.get_event('minion', opts=__opts__, listen=True)
-            ret = __salt__['event.fire']({'notify': True}, 'module_refresh')
+            data['notify'] = True
+            ret = __salt__['event.fire'](data, 'module_refresh')
             # Wait for the finish event to fire
             log.trace('refresh_modules waiting for module refresh to complete')
             # Blocks until we hear this event or until the timeout expires
@@ -8,7 +8,12 @@ from __future__ import absolute_import
 import copy
 import os
 import collections
+import hashlib
+import json
 import logging
+import re
+import threading
+import time
 import tornado.gen
 
 # Import salt libs
@@ -17,6 +22,7 @@ import salt.fileclient
 import salt.minion
 import salt.crypt
 import salt.transport
+import salt.utils
 import salt.utils.url
 import salt.utils.cache
 from salt.exceptions import SaltClientError
@@ -28,9 +34,33 @@ from salt.utils.locales import decode_recursively
 
 # Import 3rd-party libs
 import salt.ext.six as six
+from salt.ext.six.moves import queue  # pylint: disable=import-error
 
 log = logging.getLogger(__name__)
 
+# Patterns matching the ways a template or top file reads a single grain,
+# anchored at the word "grains"
+GRAIN_REF_RES = (
+    re.compile(r'''grains\s*\[\s*['"]([^'"]+)['"]\s*\]'''),
+    re.compile(r'''grains\.get\s*\(\s*['"]([^'"]+)['"]'''),
+    re.compile(r'''grains\.(?:get|item|fetch)['"]\s*\]\s*\(\s*['"]([^'"]+)['"]'''),
+    re.compile(r'''grains\.([A-Za-z_]\w*)\b(?!\s*\()'''),
+)
+GRAIN_WORD_RE = re.compile(r'\bgrains\b')
+# The match type of a top file target, only the ones matching on the minion
+# id alone do not read the grains
+TOP_MATCH_RE = re.compile(r'''match['"]?\s*:\s*['"]?(\w+)''')
+ID_MATCH_TYPES = ('glob', 'pcre', 'list')
+# How long, in seconds, the stat of the pillar_roots files is reused for the
+# pillar cache fingerprint
+ROOTS_SIGNATURE_TTL = 10
+
+# The threads still running a call to an ext_pillar source which timed out,
+# keyed by the position and name of the source. The source is skipped until
+# that call has finished, so a hung source holds at most one thread.
+_EXT_PILLAR_TIMED_OUT = {}
+_EXT_PILLAR_LOCK = threading.Lock()
+
 
 def get_pillar(opts, grains, minion_id, saltenv=None, ext=None, funcs=None,
                pillar=None, pillarenv=None, rend=None):
@@ -47,7 +77,7 @@ def get_pillar(opts, grains, minion_id, saltenv=None, ext=None, funcs=None,
         log.info('Compiling pillar from cache')
         log.debug('get_pillar using pillar cache with ext: {0}'.format(ext))
         return PillarCache(opts, grains, minion_id, saltenv, ext=ext, functions=funcs,
-                pillar=pillar, pillarenv=pillarenv)
+                pillar=pillar, pillarenv=pillarenv, rend=rend)
     return ptype(opts, grains, minion_id, saltenv, ext, functions=funcs,
                  pillar=pillar, pillarenv=pillarenv, rend=rend)
 
@@ -174,23 +204,69 @@ class RemotePillar(object):
         return decode_recursively(ret_pillar)
 
 
+def _grain_references(paths):
+    '''
+    Scan the given files for the grains they read and return the set of
+    top-level grain names, or None if any file uses the grains in a way that
+    cannot be narrowed down to single keys (``grains.items()``, any other than
+    glob, pcre or list matching in a top file, ``__grains__`` in a python
+    renderer, etc.)
+    '''
+    refs = set()
+    for path in paths:
+        try:
+            with salt.utils.fopen(path, 'rb') as fp_:
+                text = fp_.read().decode('utf-8', 'replace')
+        except (IOError, OSError):
+            continue
+        if '__grains__' in text:
+            return None
+        for match in TOP_MATCH_RE.finditer(text):
+            if match.group(1) not in ID_MATCH_TYPES:
+                return None
+        for word in GRAIN_WORD_RE.finditer(text):
+            for regex in GRAIN_REF_RES:
+                match = regex.match(text, word.start())
+                if match:
+                    refs.add(match.group(1).split(':')[0])
+                    break
+            else:
+                return None
+    return refs
+
+
 class PillarCache(object):
     '''
     Return a cached pillar if it exists, otherwise cache it.
 
     Pillar caches are structed in two diminensions: minion_id with a dict of saltenvs.
-    Each saltenv contains a pillar dict
+    Each saltenv contains the compiled pillar along with the fingerprint of the
+    inputs it was compiled from and the time it was stored. A cached pillar is
+    only used while its fingerprint matches the current inputs, that is the
+    grains read by the pillar_roots files, the files in the pillar_roots and
+    the ext_pillar configuration.
 
     Example data structure:
 
     ```
     {'minion_1':
-        {'base': {'pilar_key_1' 'pillar_val_1'}
+        {'base': {'fingerprint': '4b2d...',
+                  'time': 1476791732.3,
+                  'pillar': {'pilar_key_1' 'pillar_val_1'}}
     }
     '''
+    # The memory backend has to outlive the request to be of any use, share
+    # one store between all of the instances in a process
+    _memory_cache = None
+    # The grains read by the pillar_roots, keyed by the roots signature
+    _grain_refs = (None, None)
+    # The last roots signature, along with the pillar_roots and the time it
+    # was taken
+    _roots = (None, 0, None)
+
     # TODO ABC?
     def __init__(self, opts, grains, minion_id, saltenv, ext=None, functions=None,
-            pillar=None, pillarenv=None):
+            pillar=None, pillarenv=None, rend=None):
         # Yes, we need all of these because we need to route to the Pillar object
         # if we have no cache. This is another refactor target.
 
@@ -202,6 +278,7 @@ class PillarCache(object):
         self.functions = functions
         self.pillar = pillar
         self.pillarenv = pillarenv
+        self.rend = rend
 
         if saltenv is None:
             self.saltenv = 'base'
@@ -209,10 +286,17 @@ class PillarCache(object):
             self.saltenv = saltenv
 
         # Determine caching backend
-        self.cache = salt.utils.cache.CacheFactory.factory(
-                self.opts['pillar_cache_backend'],
-                self.opts['pillar_cache_ttl'],
-                minion_cache_path=self._minion_cache_path(minion_id))
+        if self.opts['pillar_cache_backend'] == 'memory':
+            if PillarCache._memory_cache is None:
+                PillarCache._memory_cache = salt.utils.cache.CacheFactory.factory(
+                        'memory',
+                        self.opts['pillar_cache_ttl'])
+            self.cache = PillarCache._memory_cache
+        else:
+            self.cache = salt.utils.cache.CacheFactory.factory(
+                    self.opts['pillar_cache_backend'],
+                    self.opts['pillar_cache_ttl'],
+                    minion_cache_path=self._minion_cache_path(minion_id))
 
     def _minion_cache_path(self, minion_id):
         '''
@@ -222,6 +306,63 @@ class PillarCache(object):
         '''
         return os.path.join(self.opts['cachedir'], 'pillar_cache', minion_id)
 
+    def _roots_signature(self):
+        '''
+        Return the path, mtime and size of every file in the pillar_roots. The
+        files are only walked again once the last signature is
+        ROOTS_SIGNATURE_TTL seconds old.
+        '''
+        roots = self.opts.get('pillar_roots', {})
+        now = time.time()
+        if PillarCache._roots[0] == roots \
+                and 0 <= now - PillarCache._roots[1] < ROOTS_SIGNATURE_TTL:
+            return PillarCache._roots[2]
+        signature = []
+        for saltenv in sorted(roots):
+            for root in roots[saltenv]:
+                for path, dirs, files in os.walk(root):
+                    dirs.sort()
+                    for name in sorted(files):
+                        full = os.path.join(path, name)
+                        try:
+                            stat = os.stat(full)
+                        except OSError:
+                            continue
+                        signature.append((full, stat.st_mtime, stat.st_size))
+        PillarCache._roots = (copy.deepcopy(roots), now, signature)
+        return signature
+
+    def fingerprint(self):
+        '''
+        Return a hash of the inputs the pillar of this minion is compiled
+        from. Unless external pillars are configured, which may read any of
+        the grains, only the grains which are read by the pillar_roots files
+        are taken into account, so a change to any other grain does not
+        invalidate the cached pillar.
+        '''
+        roots = self._roots_signature()
+        if self.opts.get('ext_pillar') or self.ext:
+            refs = None
+        elif PillarCache._grain_refs[0] == roots:
+            refs = PillarCache._grain_refs[1]
+        else:
+            refs = _grain_references([path for path, _, _ in roots])
+            PillarCache._grain_refs = (roots, refs)
+        grains = self.grains or {}
+        if refs is not None:
+            grains = dict((key, grains[key]) for key in refs if key in grains)
+        inputs = {
+            'saltenv': self.saltenv,
+            'pillarenv': self.pillarenv or self.opts.get('pillarenv'),
+            'grains': grains,
+            'roots': roots,
+            'ext_pillar': self.opts.get('ext_pillar'),
+            'ext': self.ext,
+            'pillar': self.pillar,
+        }
+        data = json.dumps(inputs, sort_keys=True, default=repr)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
     def fetch_pillar(self):
         '''
         In the event of a cache miss, we need to incur the overhead of caching
@@ -235,32 +376,34 @@ class PillarCache(object):
                                  ext=self.ext,
                                  functions=self.functions,
                                  pillar=self.pillar,
-                                 pillarenv=self.pillarenv)
+                                 pillarenv=self.pillarenv,
+                                 rend=self.rend)
         return fresh_pillar.compile_pillar()  # FIXME We are not yet passing pillar_dirs in here
 
     def compile_pillar(self, *args, **kwargs):  # Will likely just be pillar_dirs
         log.debug('Scanning pillar cache for information about minion {0} and saltenv {1}'.format(self.minion_id, self.saltenv))
-        log.debug('Scanning cache: {0}'.format(self.cache._dict))
-        # Check the cache!
+        fingerprint = self.fingerprint()
+        envs = {}
         if self.minion_id in self.cache:  # Keyed by minion_id
-            # TODO Compare grains, etc?
-            if self.saltenv in self.cache[self.minion_id]:
+            envs = self.cache[self.minion_id]
+            entry = envs.get(self.saltenv)
+            if isinstance(entry, dict) \
+                    and entry.get('fingerprint') == fingerprint \
+                    and time.time() - entry.get('time', 0) <= self.opts['pillar_cache_ttl']:
                 # We have a cache hit! Send it back.
                 log.debug('Pillar cache hit for minion {0} and saltenv {1}'.format(self.minion_id, self.saltenv))
-                return self.cache[self.minion_id][self.saltenv]
-            else:
-                # We found the minion but not the env. Store it.
-                fresh_pillar = self.fetch_pillar()
-                self.cache[self.minion_id][self.saltenv] = fresh_pillar
-                log.debug('Pillar cache miss for saltenv {0} for minion {1}'.format(self.saltenv, self.minion_id))
-                return fresh_pillar
+                return copy.deepcopy(entry['pillar'])
+            log.debug('Pillar cache miss for saltenv {0} for minion {1}'.format(self.saltenv, self.minion_id))
         else:
-            # We haven't seen this minion yet in the cache. Store it.
-            fresh_pillar = self.fetch_pillar()
-            self.cache[self.minion_id] = {self.saltenv: fresh_pillar}
             log.debug('Pillar cache miss for minion {0}'.format(self.minion_id))
-            log.debug('Current pillar cache: {0}'.format(self.cache._dict))  # FIXME hack!
-            return fresh_pillar
+        fresh_pillar = self.fetch_pillar()
+        # Assign a new dict so that the disk backend persists the change
+        envs = dict(envs)
+        envs[self.saltenv] = {'fingerprint': fingerprint,
+                              'time': time.time(),
+                              'pillar': copy.deepcopy(fresh_pillar)}
+        self.cache[self.minion_id] = envs
+        return fresh_pillar
 
 
 class Pillar(object):
@@ -736,19 +879,111 @@ class Pillar(object):
                                             val)
         return ext
 
+    def _ext_pillar_time(self, key, start):
+        '''
+        Record and log how long an ext_pillar source took
+        '''
+        duration = time.time() - start
+        self.ext_pillar_times.append((key, duration))
+        log.profile(
+            'Time (in seconds) to render ext_pillar \'{0}\' for minion '
+            '{1}: {2}'.format(key, self.minion_id, duration)
+        )
+
+    def _ext_pillar_concurrent(self, pillar, sources, pillar_dirs, errors):
+        '''
+        Evaluate the ext_pillar sources in a pool of up to
+        ``ext_pillar_concurrency`` threads and return their data in the
+        configured order, ``None`` for the sources which failed. Every source
+        receives a copy of the pillar data as it was before the ext_pillar
+        sources ran, a source which takes longer than ``ext_pillar_timeout``
+        seconds is left out. A source is skipped as long as its call which
+        timed out in an earlier run is still going.
+        '''
+        timeout = self.opts.get('ext_pillar_timeout', 0)
+        tasks = queue.Queue()
+        skipped = set()
+        with _EXT_PILLAR_LOCK:
+            for num, (key, val) in enumerate(sources):
+                thread = _EXT_PILLAR_TIMED_OUT.get((num, key))
+                if thread is not None and thread.is_alive():
+                    skipped.add(num)
+                    continue
+                _EXT_PILLAR_TIMED_OUT.pop((num, key), None)
+                tasks.put((num, key, val))
+        starts = [None] * len(sources)
+        results = [None] * len(sources)
+        threads = [None] * len(sources)
+        done = [threading.Event() for _ in sources]
+
+        def _worker():
+            while True:
+                try:
+                    num, key, val = tasks.get_nowait()
+                except queue.Empty:
+                    return
+                threads[num] = threading.current_thread()
+                starts[num] = time.time()
+                try:
+                    results[num] = self._external_pillar_data(
+                        copy.deepcopy(pillar), val, pillar_dirs, key)
+                except Exception as exc:
+                    results[num] = exc
+                self._ext_pillar_time(key, starts[num])
+                with _EXT_PILLAR_LOCK:
+                    done[num].set()
+                    if _EXT_PILLAR_TIMED_OUT.get((num, key)) is threads[num]:
+                        _EXT_PILLAR_TIMED_OUT.pop((num, key))
+
+        def _start_worker():
+            thread = threading.Thread(target=_worker)
+            thread.daemon = True
+            thread.start()
+
+        for _ in range(min(self.opts['ext_pillar_concurrency'], len(sources))):
+            _start_worker()
+
+        exts = [None] * len(sources)
+        for num, (key, _) in enumerate(sources):
+            if num in skipped:
+                errors.append('ext_pillar {0} skipped, its call which timed '
+                              'out is still running'.format(key))
+                continue
+            while not done[num].wait(0.1):
+                if timeout and starts[num] is not None \
+                        and time.time() - starts[num] >= timeout:
+                    break
+            with _EXT_PILLAR_LOCK:
+                timed_out = not done[num].is_set()
+                if timed_out:
+                    _EXT_PILLAR_TIMED_OUT[(num, key)] = threads[num]
+            if timed_out:
+                errors.append('ext_pillar {0} timed out after {1} '
+                              'seconds'.format(key, timeout))
+                # The timed out source keeps its thread, replace it so the
+                # remaining sources still get started
+                _start_worker()
+                continue
+            if isinstance(results[num], Exception):
+                errors.append('Failed to load ext_pillar {0}: {1}'.format(
+                    key, results[num]))
+                continue
+            exts[num] = results[num]
+        return exts
+
     def ext_pillar(self, pillar, pillar_dirs, errors=None):
         '''
         Render the external pillar data
         '''
         if errors is None:
             errors = []
+        self.ext_pillar_times = []
         if 'ext_pillar' not in self.opts:
             return pillar, errors
         if not isinstance(self.opts['ext_pillar'], list):
             errors.append('The "ext_pillar" option is malformed')
             log.critical(errors[-1])
             return pillar, errors
-        ext = None
         # Bring in CLI pillar data
         if self.pillar_override and isinstance(self.pillar_override, dict):
             pillar = merge(pillar,
@@ -757,6 +992,7 @@ class Pillar(object):
                            self.opts.get('renderer', 'yaml'),
                            self.opts.get('pillar_merge_lists', False))
 
+        sources = []
         for run in self.opts['ext_pillar']:
             if not isinstance(run, dict):
                 errors.append('The "ext_pillar" option is malformed')
@@ -771,14 +1007,28 @@ class Pillar(object):
                         'unavailable'.format(key)
                     )
                     continue
+                sources.append((key, val))
+
+        if self.opts.get('ext_pillar_concurrency', 0) > 1 and len(sources) > 1:
+            exts = self._ext_pillar_concurrent(
+                pillar, sources, pillar_dirs, errors)
+        else:
+            exts = None
+        for num, (key, val) in enumerate(sources):
+            if exts is not None:
+                ext = exts[num]
+            else:
+                start = time.time()
                 try:
                     ext = self._external_pillar_data(pillar,
-                                                        val,
-                                                        pillar_dirs,
-                                                        key)
+                                                     val,
+                                                     pillar_dirs,
+                                                     key)
                 except Exception as exc:
                     errors.append('Failed to load ext_pillar {0}: {1}'.format(
                         key, exc))
+                    ext = None
+                self._ext_pillar_time(key, start)
             if ext:
                 pillar = merge(
                     pillar,
@@ -786,7 +1036,6 @@ class Pillar(object):
                     self.merge_strategy,
                     self.opts.get('renderer', 'yaml'),
                     self.opts.get('pillar_merge_lists', False))
-                ext = None
         return pillar, errors
 
     def compile_pillar(self, ext=True, pillar_dirs=None):
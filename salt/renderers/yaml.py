@@ -8,6 +8,7 @@ For YAML usage information see :ref:`Understanding YAML <yaml>`.
 from __future__ import absolute_import
 
 # Import python libs
+import hashlib
 import logging
 import warnings
 from yaml.scanner import ScannerError
@@ -16,7 +17,11 @@ from yaml.constructor import ConstructorError
 
 # Import salt libs
 import salt.utils.url
-from salt.utils.yamlloader import SaltYamlSafeLoader, load
+from salt.utils.yamlloader import (
+    SaltYamlSafeLoader,
+    SaltYamlSafeFastLoader,
+    load
+)
 from salt.utils.odict import OrderedDict
 from salt.exceptions import SaltRenderError
 import salt.ext.six as six
@@ -30,70 +35,126 @@ _ERROR_MAP = {
      "start any token"): 'Illegal tab character'
 }
 
+# The data parsed from the most recently rendered documents, keyed by the hash
+# of the document, so that a document rendered again by this process is not
+# parsed again
+_CACHE = OrderedDict()
+CACHE_SIZE = 256
 
-def get_yaml_loader(argline):
+
+def get_yaml_loader(argline, loader=SaltYamlSafeFastLoader):
     '''
     Return the ordered dict yaml loader
     '''
     def yaml_loader(*args):
-        return SaltYamlSafeLoader(*args, dictclass=OrderedDict)
+        return loader(*args, dictclass=OrderedDict)
     return yaml_loader
 
 
-def render(yaml_data, saltenv='base', sls='', argline='', **kws):
+def _parse(yaml_data, argline):
     '''
-    Accepts YAML as a string or as a file object and runs it through the YAML
-    parser.
-
-    :rtype: A Python data structure
+    Parse the document and return the data along with the warnings raised
     '''
-    if not isinstance(yaml_data, string_types):
-        yaml_data = yaml_data.read()
     with warnings.catch_warnings(record=True) as warn_list:
         try:
-            data = load(yaml_data, Loader=get_yaml_loader(argline))
+            try:
+                data = load(yaml_data, Loader=get_yaml_loader(argline))
+            except ScannerError as exc:
+                if exc.problem_mark.buffer is not None \
+                        or SaltYamlSafeFastLoader is SaltYamlSafeLoader:
+                    raise
+                # The C parser does not keep the buffer in its marks, parse
+                # again to report the error with its context
+                data = load(yaml_data,
+                            Loader=get_yaml_loader(argline, SaltYamlSafeLoader))
         except ScannerError as exc:
             err_type = _ERROR_MAP.get(exc.problem, exc.problem)
             line_num = exc.problem_mark.line + 1
             raise SaltRenderError(err_type, line_num, exc.problem_mark.buffer)
         except (ParserError, ConstructorError) as exc:
             raise SaltRenderError(exc)
-        if len(warn_list) > 0:
-            for item in warn_list:
-                log.warning(
-                    '{warn} found in {sls} saltenv={env}'.format(
-                        warn=item.message, sls=salt.utils.url.create(sls), env=saltenv
-                    )
-                )
-        if not data:
-            data = {}
+    return data, [item.message for item in warn_list]
+
+
+def _copy(data, memo=None):
+    '''
+    Copy the containers of the parsed data, the scalars YAML produces are
+    immutable. Containers shared through anchors stay shared in the copy.
+    '''
+    if memo is None:
+        memo = {}
+    if isinstance(data, (dict, list, set, tuple)):
+        if id(data) in memo:
+            return memo[id(data)]
+        if isinstance(data, dict):
+            ret = memo[id(data)] = data.__class__()
+            for key, value in six.iteritems(data):
+                ret[key] = _copy(value, memo)
+        elif isinstance(data, list):
+            ret = memo[id(data)] = []
+            ret.extend(_copy(item, memo) for item in data)
         else:
-            if 'config.get' in __salt__:
-                if __salt__['config.get']('yaml_utf8', False):
-                    data = _yaml_result_unicode_to_utf8(data)
-            elif __opts__.get('yaml_utf8'):
+            ret = memo[id(data)] = data.__class__(
+                _copy(item, memo) for item in data)
+        return ret
+    return data
+
+
+def render(yaml_data, saltenv='base', sls='', argline='', **kws):
+    '''
+    Accepts YAML as a string or as a file object and runs it through the YAML
+    parser.
+
+    :rtype: A Python data structure
+    '''
+    if not isinstance(yaml_data, string_types):
+        yaml_data = yaml_data.read()
+    if isinstance(yaml_data, six.text_type):
+        key = hashlib.sha1(yaml_data.encode('utf-8')).hexdigest()
+    else:
+        key = hashlib.sha1(yaml_data).hexdigest()
+    cached = _CACHE.pop(key, None)
+    if cached is None:
+        cached = _parse(yaml_data, argline)
+    _CACHE[key] = cached
+    while len(_CACHE) > CACHE_SIZE:
+        _CACHE.popitem(last=False)
+    data = _copy(cached[0])
+    for message in cached[1]:
+        log.warning(
+            '{warn} found in {sls} saltenv={env}'.format(
+                warn=message, sls=salt.utils.url.create(sls), env=saltenv
+            )
+        )
+    if not data:
+        data = {}
+    else:
+        if 'config.get' in __salt__:
+            if __salt__['config.get']('yaml_utf8', False):
                 data = _yaml_result_unicode_to_utf8(data)
-        log.debug('Results of YAML rendering: \n{0}'.format(data))
-
-        def _validate_data(data):
-            '''
-            PyYAML will for some reason allow improper YAML to be formed into
-            an unhashable dict (that is, one with a dict as a key). This
-            function will recursively go through and check the keys to make
-            sure they're not dicts.
-            '''
-            if isinstance(data, dict):
-                for key, value in six.iteritems(data):
-                    if isinstance(key, dict):
-                        raise SaltRenderError(
-                            'Invalid YAML, possible double curly-brace')
-                    _validate_data(value)
-            elif isinstance(data, list):
-                for item in data:
-                    _validate_data(item)
-
-        _validate_data(data)
-        return data
+        elif __opts__.get('yaml_utf8'):
+            data = _yaml_result_unicode_to_utf8(data)
+    log.debug('Results of YAML rendering: \n{0}'.format(data))
+
+    def _validate_data(data):
+        '''
+        PyYAML will for some reason allow improper YAML to be formed into
+        an unhashable dict (that is, one with a dict as a key). This
+        function will recursively go through and check the keys to make
+        sure they're not dicts.
+        '''
+        if isinstance(data, dict):
+            for key, value in six.iteritems(data):
+                if isinstance(key, dict):
+                    raise SaltRenderError(
+                        'Invalid YAML, possible double curly-brace')
+                _validate_data(value)
+        elif isinstance(data, list):
+            for item in data:
+                _validate_data(item)
+
+    _validate_data(data)
+    return data
 
 
 def _yaml_result_unicode_to_utf8(data):
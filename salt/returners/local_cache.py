@@ -11,6 +11,7 @@ import glob
 import logging
 import os
 import shutil
+import tempfile
 import time
 import bisect
 
@@ -20,6 +21,7 @@ import salt.utils
 import salt.utils.files
 import salt.utils.jid
 import salt.exceptions
+import salt.transport.frame
 
 # Import 3rd-party libs
 import msgpack
@@ -42,6 +44,16 @@ RETURN_P = 'return.p'
 OUT_P = 'out.p'
 # endtime is the end time for a job, not stored as msgpack
 ENDTIME = 'endtime'
+# directory next to the jobs dir holding the time ordered jid index, one
+# append-only file of msgpack records per hour of jids
+JOB_INDEX = 'jobs_index'
+INDEX_BUCKET = '{0}.idx'
+# the parts of the load kept in the index, enough to format a job listing
+INDEX_KEYS = ('fun', 'arg', 'tgt', 'tgt_type', 'user', 'metadata')
+# how often, in seconds, the job cache dirs are still swept with the index
+# enabled, for the jobs the index missed and the corrupt entries
+INDEX_SWEEP_INTERVAL = 3600
+INDEX_SWEEP = '.last_sweep'
 
 
 def _job_dir():
@@ -73,6 +85,220 @@ def _walk_through(job_dir):
             yield jid, job, t_path, final
 
 
+def _index_dir():
+    '''
+    Return the directory of the jid index
+    '''
+    return os.path.join(__opts__['cachedir'], JOB_INDEX)
+
+
+def _use_index():
+    '''
+    Return True if the jid index is enabled
+    '''
+    return __opts__.get('job_cache_index', False)
+
+
+def _index_bucket(jid):
+    '''
+    Return the name of the hourly bucket a jid belongs to
+    '''
+    jid = str(jid)
+    if len(jid) >= 10 and jid[:10].isdigit():
+        return jid[:10]
+    return time.strftime('%Y%m%d%H')
+
+
+def _index_record(jid, load=None):
+    '''
+    Build the index record of a job, records without a load only mark the
+    jid for expiry
+    '''
+    record = {'jid': jid}
+    if load is not None:
+        for key in INDEX_KEYS:
+            if key in load:
+                record[key] = load[key]
+        if 'metadata' not in record \
+                and isinstance(load.get('kwargs'), dict) \
+                and 'metadata' in load['kwargs']:
+            record['metadata'] = load['kwargs']['metadata']
+        record.setdefault('fun', 'unknown-function')
+    return record
+
+
+def _append_index(records, index_dir=None):
+    '''
+    Append records to the hourly buckets of the jid index
+    '''
+    serial = salt.payload.Serial(__opts__)
+    if index_dir is None:
+        index_dir = _index_dir()
+    buckets = {}
+    for record in records:
+        buckets.setdefault(_index_bucket(record['jid']), []).append(
+            serial.dumps(record)
+        )
+    for bucket, data in six.iteritems(buckets):
+        path = os.path.join(index_dir, INDEX_BUCKET.format(bucket))
+        try:
+            # The records of a bucket are appended with a single unbuffered
+            # write, O_APPEND keeps the appends of other processes from
+            # interleaving with them
+            fd_ = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd_, b''.join(data))
+            finally:
+                os.close(fd_)
+        except (IOError, OSError) as exc:
+            log.error('Could not update the job cache index: {0}'.format(exc))
+
+
+def _ensure_index():
+    '''
+    Create the jid index, indexing the jobs already in the job cache the
+    first time. The index is built in a temporary directory which is only
+    renamed into place once complete, so a crash leaves no partial index.
+    '''
+    index_dir = _index_dir()
+    if os.path.isdir(index_dir):
+        return
+    tmp_dir = tempfile.mkdtemp(dir=__opts__['cachedir'],
+                               prefix='.{0}-'.format(JOB_INDEX))
+    try:
+        records = []
+        job_dir = _job_dir()
+        if os.path.isdir(job_dir):
+            for top in os.listdir(job_dir):
+                t_path = os.path.join(job_dir, top)
+                if not os.path.isdir(t_path):
+                    continue
+                for final in os.listdir(t_path):
+                    f_path = os.path.join(t_path, final)
+                    load_path = os.path.join(f_path, LOAD_P)
+                    jid_path = os.path.join(f_path, 'jid')
+                    try:
+                        if os.path.isfile(load_path):
+                            job = salt.payload.Serial(__opts__).load(
+                                salt.utils.fopen(load_path, 'rb')
+                            )
+                            records.append(_index_record(job['jid'], job))
+                        elif os.path.isfile(jid_path):
+                            with salt.utils.fopen(jid_path, 'rb') as fp_:
+                                records.append(_index_record(
+                                    salt.utils.to_str(fp_.read().strip())
+                                ))
+                    except (IOError, KeyError, TypeError) as exc:
+                        log.warning('Unable to index job cache entry {0}: {1}'.format(f_path, exc))
+        _append_index(records, tmp_dir)
+        try:
+            os.rename(tmp_dir, index_dir)
+        except OSError as exc:
+            if exc.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                raise
+            # Another process put its index in place first, the records
+            # it missed are added by the appends which follow
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _touch_sweep():
+    '''
+    Record that the job cache dirs were swept
+    '''
+    try:
+        with salt.utils.fopen(os.path.join(_index_dir(), INDEX_SWEEP), 'w'):
+            pass
+    except IOError as exc:
+        log.warning('Unable to record the job cache sweep: {0}'.format(exc))
+
+
+def _sweep_due(cur):
+    '''
+    Return True if the job cache dirs were not swept in the last
+    INDEX_SWEEP_INTERVAL seconds
+    '''
+    try:
+        last = os.path.getmtime(os.path.join(_index_dir(), INDEX_SWEEP))
+    except OSError:
+        return True
+    return cur - last >= INDEX_SWEEP_INTERVAL
+
+
+def _read_index_bucket(path):
+    '''
+    Return the records of a bucket, merged by jid
+    '''
+    ret = {}
+    try:
+        with salt.utils.fopen(path, 'rb') as fp_:
+            for record in msgpack.Unpacker(fp_, use_list=True):
+                if six.PY3:
+                    record = salt.transport.frame.decode_embedded_strs(record)
+                if not isinstance(record, dict) or 'jid' not in record:
+                    continue
+                if 'fun' in record or record['jid'] not in ret:
+                    ret[record['jid']] = record
+    except (IOError, ValueError, msgpack.exceptions.UnpackException) as exc:
+        log.warning('Unable to read job cache index {0}: {1}'.format(path, exc))
+    return ret
+
+
+def _index_buckets(reverse=False):
+    '''
+    Return the sorted list of bucket names in the jid index
+    '''
+    _ensure_index()
+    try:
+        buckets = [fn_[:-len('.idx')] for fn_ in os.listdir(_index_dir())
+                   if fn_.endswith('.idx')]
+    except OSError:
+        return []
+    return sorted(buckets, reverse=reverse)
+
+
+def _iter_index(reverse=False):
+    '''
+    Yield (jid, record) for the published jobs in the jid index in jid order
+    '''
+    for bucket in _index_buckets(reverse):
+        records = _read_index_bucket(
+            os.path.join(_index_dir(), INDEX_BUCKET.format(bucket))
+        )
+        for jid in sorted(records, reverse=reverse):
+            if 'fun' in records[jid]:
+                yield jid, records[jid]
+
+
+def _clean_old_jobs_index(cur):
+    '''
+    Drop the index buckets, and the jobs they list, which are entirely older
+    than keep_jobs
+    '''
+    job_dir = _job_dir()
+    for bucket in _index_buckets():
+        try:
+            start = time.mktime(time.strptime(bucket, '%Y%m%d%H'))
+        except ValueError:
+            continue
+        if (cur - (start + 3600)) / 3600.0 <= __opts__['keep_jobs']:
+            # Buckets are sorted, all following buckets are newer
+            break
+        path = os.path.join(_index_dir(), INDEX_BUCKET.format(bucket))
+        for jid in _read_index_bucket(path):
+            jid_dir = salt.utils.jid.jid_dir(jid, job_dir, __opts__['hash_type'])
+            shutil.rmtree(jid_dir, ignore_errors=True)
+            try:
+                os.rmdir(os.path.dirname(jid_dir))
+            except OSError:
+                # Other jobs still share the directory
+                pass
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
 #TODO: add to returner docs-- this is a new one
 def prep_jid(nocache=False, passed_jid=None, recurse_count=0):
     '''
@@ -118,6 +344,10 @@ def prep_jid(nocache=False, passed_jid=None, recurse_count=0):
         return prep_jid(passed_jid=jid, nocache=nocache,
                         recurse_count=recurse_count+1)
 
+    if _use_index():
+        _ensure_index()
+        _append_index([_index_record(jid)])
+
     return jid
 
 
@@ -219,6 +449,10 @@ def save_load(jid, clear_load, minions=None, recurse_count=0):
         return save_load(jid=jid, clear_load=clear_load,
                          recurse_count=recurse_count+1)
 
+    if _use_index():
+        _ensure_index()
+        _append_index([_index_record(jid, clear_load)])
+
     # if you have a tgt, save that for the UI etc
     if 'tgt' in clear_load and clear_load['tgt'] != '':
         if minions is None:
@@ -349,7 +583,11 @@ def get_jids():
     Return a dict mapping all job ids to job information
     '''
     ret = {}
-    for jid, job, _, _ in _walk_through(_job_dir()):
+    if _use_index():
+        jobs = _iter_index()
+    else:
+        jobs = ((jid, job) for jid, job, _, _ in _walk_through(_job_dir()))
+    for jid, job in jobs:
         ret[jid] = salt.utils.jid.format_jid_instance(jid, job)
 
         if __opts__.get('job_cache_store_endtime'):
@@ -366,6 +604,18 @@ def get_jids_filter(count, filter_find_job=True):
     :param int count: show not more than the count of most recent jobs
     :param bool filter_find_jobs: filter out 'saltutil.find_job' jobs
     '''
+    if _use_index():
+        ret = []
+        for jid, job in _iter_index(reverse=True):
+            if len(ret) >= count:
+                break
+            job = salt.utils.jid.format_jid_instance_ext(jid, job)
+            if filter_find_job and job['Function'] == 'saltutil.find_job':
+                continue
+            ret.append(job)
+        ret.reverse()
+        return ret
+
     keys = []
     ret = []
     for jid, job, _, _ in _walk_through(_job_dir()):
@@ -394,6 +644,14 @@ def clean_old_jobs():
         if not os.path.exists(jid_root):
             return
 
+        if _use_index():
+            _clean_old_jobs_index(cur)
+            # Still sweep the dirs now and then, for the jobs missing from
+            # the index and the corrupt entries
+            if not _sweep_due(cur):
+                return
+            _touch_sweep()
+
         # Keep track of any empty t_path dirs that need to be removed later
         dirs_to_remove = set()
 
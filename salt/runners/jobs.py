@@ -8,12 +8,15 @@ from __future__ import absolute_import, print_function
 import fnmatch
 import logging
 import os
+import time
 
 # Import salt libs
 import salt.client
 import salt.payload
 import salt.utils
+import salt.utils.event
 import salt.utils.jid
+import salt.utils.job
 import salt.minion
 import salt.returners
 
@@ -30,17 +33,42 @@ except ImportError:
 log = logging.getLogger(__name__)
 
 
-def active(display_progress=False):
+def active(display_progress=False, confirm=True):
     '''
     Return a report on all actively running jobs from a job id centric
     perspective
 
+    With :conf_master:`running_jobs_registry` enabled on the master the
+    report is read from the registry of running jobs the master keeps from
+    the job events, instead of asking every minion for its running jobs.
+
+    confirm : True
+        When reading the registry, ask the minions which have not returned
+        jobs started, or last confirmed, more than
+        :conf_master:`running_jobs_stale_age` seconds ago whether they are
+        still running them, with a single
+        :py:func:`saltutil.running <salt.modules.saltutil.running>` call for
+        all the stale jobs. Jobs published without a list of expected
+        minions, e.g. through a syndic, are confirmed on their original
+        target, or on all the minions when several of them are stale. Set to ``False`` to report
+        the registry as is.
+
+        .. versionadded:: Nitrogen
+
     CLI Example:
 
     .. code-block:: bash
 
         salt-run jobs.active
+        salt-run jobs.active confirm=False
     '''
+    if __opts__.get('running_jobs_registry', False):
+        registry = salt.utils.job.get_running_jobs(__opts__)
+        if registry is not None:
+            return _active_from_registry(registry['jobs'], confirm)
+        log.warning('The running jobs registry is not available, asking the '
+                    'minions for their running jobs')
+
     ret = {}
     client = salt.client.get_local_client(__opts__['conf_file'])
     try:
@@ -76,6 +104,84 @@ def active(display_progress=False):
     return ret
 
 
+def _active_from_registry(jobs, confirm=True):
+    '''
+    Format the jobs of the running jobs registry like active does
+    '''
+    ret = {}
+    stale_age = __opts__.get('running_jobs_stale_age', 60)
+    now = time.time()
+    confirmed = {}
+    if confirm:
+        stale = dict((jid, job) for jid, job in six.iteritems(jobs)
+                     if now - job.get('checked', job['time']) > stale_age)
+        if stale:
+            client = salt.client.get_local_client(__opts__['conf_file'])
+            confirmed = _confirm_running(client, stale)
+    for jid, job in six.iteritems(jobs):
+        running = confirmed.get(jid)
+        if running is None:
+            running = dict((minion, None) for minion in job['minions'])
+        # Jobs without expected minions are listed until they are confirmed
+        if not running and job.get('expected', True):
+            continue
+        ret[jid] = _format_jid_instance(jid, job['load'])
+        ret[jid].update({
+            'Running': [{minion: pid} for minion, pid in sorted(six.iteritems(running))],
+            'Returned': list(job['returned'])})
+    return ret
+
+
+def _confirm_running(client, jobs):
+    '''
+    Ask the minions whether they still run the given jobs, with a single
+    saltutil.running call for all of them. Returns the pids of the jobs by
+    minion, by jid. The master is told about the minions which no longer run
+    each job.
+    '''
+    if all(job.get('expected', True) for job in six.itervalues(jobs)):
+        minions = set()
+        for job in six.itervalues(jobs):
+            minions.update(job['minions'])
+        tgt, tgt_type = sorted(minions), 'list'
+    elif len(jobs) == 1:
+        load = next(six.itervalues(jobs))['load']
+        tgt = load.get('tgt', '*')
+        tgt_type = load.get('tgt_type', 'glob')
+    else:
+        # The jobs without expected minions may target any minion
+        tgt, tgt_type = '*', 'glob'
+    try:
+        found = client.cmd(tgt, 'saltutil.running',
+                           tgt_type=tgt_type,
+                           timeout=__opts__['gather_job_timeout'])
+    except SaltClientError as client_error:
+        log.error('Unable to confirm the running jobs: {0}'.format(client_error))
+        return {}
+    ret = dict((jid, {}) for jid in jobs)
+    for minion, data in six.iteritems(found):
+        if not isinstance(data, list):
+            continue
+        for job in data:
+            if isinstance(job, dict) and job.get('jid') in ret:
+                ret[job['jid']][minion] = job.get('pid')
+    # Record the confirmations, so the jobs are not asked about again before
+    # running_jobs_stale_age seconds have passed
+    event = salt.utils.event.get_master_event(
+        __opts__, __opts__['sock_dir'], listen=False)
+    for jid, job in six.iteritems(jobs):
+        running = ret[jid]
+        if job.get('expected', True):
+            # Only the minions the job was published to are running it
+            running = ret[jid] = dict(
+                (minion, pid) for minion, pid in six.iteritems(running)
+                if minion in job['minions'])
+        event.fire_event({'minions': sorted(set(job['minions']) - set(running)),
+                          'running': sorted(running)},
+                         salt.utils.event.tagify([jid, 'stale'], 'job'))
+    return ret
+
+
 def lookup_jid(jid,
                ext_source=None,
                returned=True,
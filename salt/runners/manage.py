@@ -22,6 +22,7 @@ from salt.ext.six.moves.urllib.request import urlopen as _urlopen  # pylint: dis
 # Import salt libs
 import salt.key
 import salt.utils
+import salt.utils.master
 import salt.utils.minions
 import salt.client
 import salt.client.ssh
@@ -58,7 +59,34 @@ def _ping(tgt, tgt_type, timeout):
     return list(returned), list(not_returned)
 
 
-def status(output=True, tgt='*', tgt_type='glob', expr_form=None):
+def _liveness(tgt, tgt_type, max_age):
+    '''
+    Split the targeted minions in up and down from the minion liveness table,
+    returns None when the table is disabled or out of date
+    '''
+    if not __opts__.get('minion_liveness') \
+            or not __opts__.get('presence_events'):
+        # Without the presence events the connected minions which do not run
+        # jobs would age out of the table
+        return None
+    last_seen = salt.utils.master.get_minion_liveness(__opts__)
+    if last_seen is None:
+        return None
+    if max_age is None:
+        max_age = __opts__.get('minion_liveness_max_age', 300)
+    ckminions = salt.utils.minions.CkMinions(__opts__)
+    now = time.time()
+    returned = []
+    not_returned = []
+    for minion in ckminions.check_minions(tgt, tgt_type):
+        if now - last_seen.get(minion, 0) <= max_age:
+            returned.append(minion)
+        else:
+            not_returned.append(minion)
+    return returned, not_returned
+
+
+def status(output=True, tgt='*', tgt_type='glob', expr_form=None, max_age=None):
     '''
     .. versionchanged:: Nitrogen
         The ``expr_form`` argument has been renamed to ``tgt_type``, earlier
@@ -66,12 +94,19 @@ def status(output=True, tgt='*', tgt_type='glob', expr_form=None):
 
     Print the status of all known salt minions
 
+    When :conf_master:`minion_liveness` and :conf_master:`presence_events`
+    are enabled the status is answered from the minion liveness table kept by the master, without sending a
+    ``test.ping`` to the minions. A minion is up if it was seen alive in the
+    last ``max_age`` seconds, which defaults to
+    :conf_master:`minion_liveness_max_age`.
+
     CLI Example:
 
     .. code-block:: bash
 
         salt-run manage.status
         salt-run manage.status tgt="webservers" tgt_type="nodegroup"
+        salt-run manage.status max_age=120
     '''
     # remember to remove the expr_form argument from this function when
     # performing the cleanup on this deprecation.
@@ -85,7 +120,10 @@ def status(output=True, tgt='*', tgt_type='glob', expr_form=None):
         tgt_type = expr_form
 
     ret = {}
-    ret['up'], ret['down'] = _ping(tgt, tgt_type, __opts__['timeout'])
+    liveness = _liveness(tgt, tgt_type, max_age)
+    if liveness is None:
+        liveness = _ping(tgt, tgt_type, __opts__['timeout'])
+    ret['up'], ret['down'] = liveness
     return ret
 
 
@@ -141,7 +179,7 @@ def key_regen():
     return msg
 
 
-def down(removekeys=False, tgt='*', tgt_type='glob', expr_form=None):
+def down(removekeys=False, tgt='*', tgt_type='glob', expr_form=None, max_age=None):
     '''
     .. versionchanged:: Nitrogen
         The ``expr_form`` argument has been renamed to ``tgt_type``, earlier
@@ -150,6 +188,9 @@ def down(removekeys=False, tgt='*', tgt_type='glob', expr_form=None):
     Print a list of all the down or unresponsive salt minions
     Optionally remove keys of down minions
 
+    With ``removekeys=True`` the down minions are sent a ``test.ping`` first,
+    and only the keys of the minions which do not answer are removed.
+
     CLI Example:
 
     .. code-block:: bash
@@ -157,17 +198,22 @@ def down(removekeys=False, tgt='*', tgt_type='glob', expr_form=None):
         salt-run manage.down
         salt-run manage.down removekeys=True
         salt-run manage.down tgt="webservers" tgt_type="nodegroup"
+        salt-run manage.down max_age=600
 
     '''
-    ret = status(output=False, tgt=tgt, tgt_type=tgt_type).get('down', [])
-    for minion in ret:
-        if removekeys:
+    ret = status(output=False, tgt=tgt, tgt_type=tgt_type,
+                 max_age=max_age).get('down', [])
+    if removekeys and ret:
+        # Only delete the keys of the minions which do not answer a ping
+        confirmed = _ping(ret, 'list', __opts__['timeout'])
+        ret = confirmed[1] if confirmed else []
+        for minion in ret:
             wheel = salt.wheel.Wheel(__opts__)
             wheel.call_func('key.delete', match=minion)
     return ret
 
 
-def up(tgt='*', tgt_type='glob', expr_form=None):  # pylint: disable=C0103
+def up(tgt='*', tgt_type='glob', expr_form=None, max_age=None):  # pylint: disable=C0103
     '''
     .. versionchanged:: Nitrogen
         The ``expr_form`` argument has been renamed to ``tgt_type``, earlier
@@ -181,8 +227,10 @@ def up(tgt='*', tgt_type='glob', expr_form=None):  # pylint: disable=C0103
 
         salt-run manage.up
         salt-run manage.up tgt="webservers" tgt_type="nodegroup"
+        salt-run manage.up max_age=120
     '''
-    ret = status(output=False, tgt=tgt, tgt_type=tgt_type).get('up', [])
+    ret = status(output=False, tgt=tgt, tgt_type=tgt_type,
+                 max_age=max_age).get('up', [])
     return ret
 
 
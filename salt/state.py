@@ -17,6 +17,7 @@ from __future__ import absolute_import
 import os
 import sys
 import copy
+import bisect
 import site
 import fnmatch
 import logging
@@ -24,6 +25,8 @@ import datetime
 import traceback
 import re
 import random
+import select
+import multiprocessing
 
 # Import salt libs
 import salt.utils
@@ -95,6 +98,7 @@ STATE_RUNTIME_KEYWORDS = frozenset([
     'saltenv',
     'use',
     'use_in',
+    '__auto_order__',
     '__env__',
     '__sls__',
     '__id__',
@@ -159,6 +163,89 @@ def trim_req(req):
     return req
 
 
+class RequisiteIndex(object):
+    '''
+    Lookup table used to resolve requisites against a list of low chunks.
+
+    Literal requisite values are answered from dicts keyed on ``__id__``,
+    ``name``, ``(state, name)`` and ``__sls__``. Values which contain glob
+    characters (or are not strings) fall back to the ``fnmatch`` scan over
+    the chunk list, so the chunks returned and their order are the same as
+    a full scan would produce.
+    '''
+    GLOB_CHARS = frozenset('*?[')
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.by_ref = {}
+        self.by_state = {}
+        self.by_sls = {}
+        for chunk in chunks:
+            keys = []
+            for key in ('name', '__id__'):
+                val = self._normcase(chunk.get(key))
+                if val not in keys:
+                    keys.append(val)
+            for val in keys:
+                self._add(self.by_ref, val, chunk)
+                self._add(self.by_state, (chunk.get('state'), val), chunk)
+            self._add(self.by_sls, self._normcase(chunk.get('__sls__')), chunk)
+
+    @staticmethod
+    def _add(index, key, chunk):
+        try:
+            index.setdefault(key, []).append(chunk)
+        except TypeError:
+            # Unhashable name, only reachable through the fnmatch scan
+            pass
+
+    @staticmethod
+    def _normcase(val):
+        '''
+        fnmatch normalizes the case of both sides, do the same for the keys
+        '''
+        if isinstance(val, six.string_types):
+            return os.path.normcase(val)
+        return val
+
+    def is_literal(self, req_val):
+        '''
+        Return True if the requisite value can be answered from the index
+        '''
+        return (isinstance(req_val, six.string_types) and
+                not self.GLOB_CHARS.intersection(req_val))
+
+    def match(self, req_key, req_val):
+        '''
+        Return the list of chunks matched by the requisite ``req_key: req_val``
+        in chunk order
+        '''
+        if req_val is None:
+            return []
+        if self.is_literal(req_val):
+            req_val = os.path.normcase(req_val)
+            if req_key == 'sls':
+                return list(self.by_sls.get(req_val, ()))
+            if req_key == 'id':
+                return list(self.by_ref.get(req_val, ()))
+            return list(self.by_state.get((req_key, req_val), ()))
+        ret = []
+        for chunk in self.chunks:
+            if req_key == 'sls':
+                # Allow requisite tracking of entire sls files
+                if fnmatch.fnmatch(chunk['__sls__'], req_val):
+                    ret.append(chunk)
+                continue
+            try:
+                if (fnmatch.fnmatch(chunk['name'], req_val) or
+                    fnmatch.fnmatch(chunk['__id__'], req_val)):
+                    if req_key == 'id' or chunk['state'] == req_key:
+                        ret.append(chunk)
+            except KeyError:
+                raise SaltRenderError('Could not locate requisite of [{0}] present in state with name [{1}]'.format(req_key, chunk['name']))
+        return ret
+
+
 def state_args(id_, state, high):
     '''
     Return a set of the arguments passed to the named state
@@ -668,6 +755,7 @@ class State(object):
         self.mod_init = set()
         self.pre = {}
         self.__run_num = 0
+        self._requisite_index = None
         self.jid = jid
         self.instance_id = str(id(self))
         self.inject_globals = {}
@@ -1893,6 +1981,10 @@ class State(object):
         Iterate over a list of chunks and call them, checking for requires.
         '''
         running = {}
+        self._requisite_index = RequisiteIndex(chunks)
+        workers = self.parallel_workers(chunks)
+        if workers:
+            return self.call_chunks_parallel(chunks, running, workers)
         for low in chunks:
             if '__FAILHARD__' in running:
                 running.pop('__FAILHARD__')
@@ -1905,6 +1997,252 @@ class State(object):
             self.active = set()
         return running
 
+    def parallel_workers(self, chunks):
+        '''
+        Return the number of processes to run the chunks with, 0 means the
+        chunks are run one after another
+        '''
+        workers = self.opts.get('state_parallel', 0)
+        if workers is True:
+            workers = multiprocessing.cpu_count()
+        if not workers or workers < 2 or len(chunks) < 2:
+            return 0
+        if salt.utils.is_windows():
+            return 0
+        for low in chunks:
+            if 'prereq' in low or 'prerequired' in low:
+                log.debug('Running states in order, prereq is not supported '
+                          'by state_parallel')
+                return 0
+        return workers
+
+    def _parallel_inline(self, low):
+        '''
+        Return True if the chunk has to run in this process, either because
+        its state module is listed in state_parallel_exclusive or because it
+        reloads the modules, grains or pillar used by the following chunks
+        '''
+        if low['state'] in self.opts.get('state_parallel_exclusive', ()):
+            return True
+        for key in ('reload_modules', 'reload_grains', 'reload_pillar'):
+            if low.get(key):
+                return True
+        return False
+
+    @staticmethod
+    def _parallel_groups(lows):
+        '''
+        Map the tags of the chunks to their order group, a group only starts
+        once all of the chunks in the lower groups are done. Chunks with an
+        explicit order are grouped by its value, ignoring the fractions added
+        for the names of an ID. The chunks ordered by state_auto_order
+        between two explicit order values share a group placed just before
+        the higher one.
+        '''
+        def _order(low):
+            order = low.get('order', 0)
+            if not isinstance(order, (int, float)):
+                return 0
+            return order
+
+        explicit = sorted(set(int(_order(low)) for low in six.itervalues(lows)
+                              if not low.get('__auto_order__')))
+        groups = {}
+        for tag, low in six.iteritems(lows):
+            if low.get('__auto_order__'):
+                pos = bisect.bisect_right(explicit, _order(low))
+                if pos < len(explicit):
+                    groups[tag] = explicit[pos] - 0.5
+                else:
+                    groups[tag] = float('inf')
+            else:
+                groups[tag] = int(_order(low))
+        return groups
+
+    def _parallel_plan(self, chunks):
+        '''
+        Map the chunks to their tags and requisite tags and return them with
+        the tags in the order a serial run would call them
+        '''
+        index = self.requisite_index(chunks)
+        lows = {}
+        deps = {}
+        for low in chunks:
+            tag = _gen_tag(low)
+            if tag in lows:
+                continue
+            lows[tag] = low
+            deps[tag] = []
+            for requisite in ('require', 'watch', 'onfail', 'onchanges'):
+                for req in low.get(requisite) or ():
+                    if isinstance(req, six.string_types):
+                        req = {'id': req}
+                    req = trim_req(req)
+                    req_key = next(iter(req))
+                    for chunk in index.match(req_key, req[req_key]):
+                        ctag = _gen_tag(chunk)
+                        if ctag != tag and ctag not in deps[tag]:
+                            deps[tag].append(ctag)
+        plan = []
+        seen = set()
+
+        def _visit(tag):
+            seen.add(tag)
+            for ctag in deps[tag]:
+                if ctag in lows and ctag not in seen:
+                    _visit(ctag)
+            plan.append(tag)
+
+        for low in chunks:
+            tag = _gen_tag(low)
+            if tag not in seen:
+                _visit(tag)
+        return lows, deps, plan
+
+    def _call_chunk_child(self, low, running, chunks, run_num, conn):
+        '''
+        Run a chunk in a forked process and send the new running entries to
+        the parent
+        '''
+        self.__run_num = run_num
+        known = set(running)
+        tag = _gen_tag(low)
+        try:
+            running = self.call_chunk(low, running, chunks)
+            ret = dict((rtag, running[rtag]) for rtag in running
+                       if rtag not in known and rtag != '__FAILHARD__')
+        except Exception:
+            ret = {tag: {'changes': {},
+                         'result': False,
+                         'comment': 'An exception occurred in this state: '
+                                    '{0}'.format(traceback.format_exc()),
+                         '__sls__': low.get('__sls__')}}
+        try:
+            conn.send(ret)
+        except Exception as exc:
+            conn.send({tag: {'changes': {},
+                             'result': False,
+                             'comment': 'Unable to return the state result '
+                                        'from the parallel process: '
+                                        '{0}'.format(exc),
+                             '__sls__': low.get('__sls__')}})
+        conn.close()
+
+    def call_chunks_parallel(self, chunks, running, workers):
+        '''
+        Call the chunks with up to ``workers`` forked processes, a chunk is
+        started as soon as all of its requisites and all of the chunks in
+        the lower order groups are done. The __run_num__ of each return is
+        the one a serial run would have given it.
+        '''
+        lows, deps, plan = self._parallel_plan(chunks)
+        base = self.__run_num
+        run_nums = dict((tag, base + num) for num, tag in enumerate(plan))
+        tag_groups = self._parallel_groups(lows)
+        groups = sorted(set(six.itervalues(tag_groups)))
+        group_num = -1
+        eligible = set()
+        pending = list(plan)
+        done = set()
+        in_flight = {}
+        failhard = False
+
+        def _finish(tag, ret):
+            for rtag, rret in six.iteritems(ret):
+                running[rtag] = rret
+            running.pop('__FAILHARD__', None)
+            done.add(tag)
+            if tag in running:
+                running[tag]['__run_num__'] = run_nums[tag]
+                return self.check_failhard(lows[tag], running)
+            return False
+
+        while pending or in_flight:
+            if not failhard and eligible.issubset(done) and \
+                    group_num + 1 < len(groups):
+                # Open the next order group along with the requisites of its
+                # chunks from the groups after it
+                group_num += 1
+                stack = [tag for tag in pending
+                         if tag_groups[tag] <= groups[group_num]]
+                while stack:
+                    tag = stack.pop()
+                    if tag in eligible:
+                        continue
+                    eligible.add(tag)
+                    stack.extend(ctag for ctag in deps[tag] if ctag in lows)
+            inline = False
+            if not failhard:
+                for tag in list(pending):
+                    if tag not in eligible:
+                        continue
+                    if not all(ctag in done for ctag in deps[tag]
+                               if ctag in lows):
+                        continue
+                    low = lows[tag]
+                    if self._parallel_inline(low):
+                        pending.remove(tag)
+                        self.__run_num = run_nums[tag]
+                        known = set(running)
+                        running = self.call_chunk(low, running, chunks)
+                        self.active = set()
+                        failhard = _finish(
+                            tag,
+                            dict((rtag, running[rtag]) for rtag in running
+                                 if rtag not in known))
+                        inline = True
+                        break
+                    if len(in_flight) >= workers:
+                        continue
+                    pending.remove(tag)
+                    recv_conn, send_conn = multiprocessing.Pipe(False)
+                    proc = multiprocessing.Process(
+                        target=self._call_chunk_child,
+                        args=(low, running, chunks, run_nums[tag], send_conn))
+                    proc.start()
+                    send_conn.close()
+                    in_flight[recv_conn] = (proc, tag)
+            if not in_flight:
+                if inline:
+                    continue
+                if failhard or not eligible.issubset(done):
+                    # Nothing can be started, leave what is left to the
+                    # serial run which reports recursive requisites
+                    break
+                continue
+            ready = select.select(list(in_flight), [], [],
+                                  0 if inline else None)[0]
+            for conn in ready:
+                proc, tag = in_flight.pop(conn)
+                try:
+                    ret = conn.recv()
+                except EOFError:
+                    ret = {tag: {'changes': {},
+                                 'result': False,
+                                 'comment': 'The process running the state '
+                                            'exited without a return',
+                                 '__sls__': lows[tag].get('__sls__')}}
+                conn.close()
+                proc.join()
+                if _finish(tag, ret):
+                    failhard = True
+                if tag in running:
+                    # The child refreshed its own modules, do the same here
+                    self.check_refresh(lows[tag], running[tag])
+
+        if not failhard:
+            for tag in pending:
+                if tag in running:
+                    continue
+                running = self.call_chunk(lows[tag], running, chunks)
+                self.active = set()
+                if '__FAILHARD__' in running or \
+                        self.check_failhard(lows[tag], running):
+                    break
+        running.pop('__FAILHARD__', None)
+        self.__run_num = max(self.__run_num, base + len(plan))
+        return running
+
     def check_failhard(self, low, running):
         '''
         Check if the low data chunk should send a failhard signal
@@ -1919,6 +2257,17 @@ class State(object):
             return not running[tag]['result']
         return False
 
+    def requisite_index(self, chunks):
+        '''
+        Return the RequisiteIndex for the passed chunk list, the index built
+        by call_chunks is reused as long as the same chunk list is passed in
+        '''
+        index = self._requisite_index
+        if index is None or index.chunks is not chunks:
+            index = RequisiteIndex(chunks)
+            self._requisite_index = index
+        return index
+
     def check_requisite(self, low, running, chunks, pre=False):
         '''
         Look into the running data to check the status of all requisite
@@ -1954,34 +2303,18 @@ class State(object):
                 'onchanges': []}
         if pre:
             reqs['prerequired'] = []
+        index = self.requisite_index(chunks)
         for r_state in reqs:
             if r_state in low and low[r_state] is not None:
                 for req in low[r_state]:
                     if isinstance(req, six.string_types):
                         req = {'id': req}
                     req = trim_req(req)
-                    found = False
-                    for chunk in chunks:
-                        req_key = next(iter(req))
-                        req_val = req[req_key]
-                        if req_val is None:
-                            continue
-                        if req_key == 'sls':
-                            # Allow requisite tracking of entire sls files
-                            if fnmatch.fnmatch(chunk['__sls__'], req_val):
-                                found = True
-                                reqs[r_state].append(chunk)
-                            continue
-                        try:
-                            if (fnmatch.fnmatch(chunk['name'], req_val) or
-                                fnmatch.fnmatch(chunk['__id__'], req_val)):
-                                if req_key == 'id' or chunk['state'] == req_key:
-                                    found = True
-                                    reqs[r_state].append(chunk)
-                        except KeyError:
-                            raise SaltRenderError('Could not locate requisite of [{0}] present in state with name [{1}]'.format(req_key, chunk['name']))
+                    req_key = next(iter(req))
+                    found = index.match(req_key, req[req_key])
                     if not found:
                         return 'unmet', ()
+                    reqs[r_state].extend(found)
         fun_stats = set()
         for r_state, chunks in six.iteritems(reqs):
             if r_state == 'prereq':
@@ -2095,6 +2428,7 @@ class State(object):
         if status == 'unmet':
             lost = {}
             reqs = []
+            index = self.requisite_index(chunks)
             for requisite in requisites:
                 lost[requisite] = []
                 if requisite not in low:
@@ -2103,29 +2437,14 @@ class State(object):
                     if isinstance(req, six.string_types):
                         req = {'id': req}
                     req = trim_req(req)
-                    found = False
                     req_key = next(iter(req))
-                    req_val = req[req_key]
-                    for chunk in chunks:
-                        if req_val is None:
-                            continue
-                        if req_key == 'sls':
-                            # Allow requisite tracking of entire sls files
-                            if fnmatch.fnmatch(chunk['__sls__'], req_val):
-                                if requisite == 'prereq':
-                                    chunk['__prereq__'] = True
-                                reqs.append(chunk)
-                                found = True
-                            continue
-                        if (fnmatch.fnmatch(chunk['name'], req_val) or
-                            fnmatch.fnmatch(chunk['__id__'], req_val)):
-                            if req_key == 'id' or chunk['state'] == req_key:
-                                if requisite == 'prereq':
-                                    chunk['__prereq__'] = True
-                                elif requisite == 'prerequired':
-                                    chunk['__prerequired__'] = True
-                                reqs.append(chunk)
-                                found = True
+                    found = index.match(req_key, req[req_key])
+                    for chunk in found:
+                        if requisite == 'prereq':
+                            chunk['__prereq__'] = True
+                        elif requisite == 'prerequired' and req_key != 'sls':
+                            chunk['__prerequired__'] = True
+                    reqs.extend(found)
                     if not found:
                         lost[requisite].append(req)
             if lost['require'] or lost['watch'] or lost['prereq'] or lost['onfail'] or lost['onchanges'] or lost.get('prerequired'):
@@ -3226,6 +3545,9 @@ class BaseHighState(object):
         Take a state and apply the iorder system
         '''
         if self.opts['state_auto_order']:
+            # Parallel runs may run the auto ordered states together, they
+            # are only marked then so the high data is otherwise unchanged
+            mark_auto = bool(self.opts.get('state_parallel'))
             for name in state:
                 for s_dec in state[name]:
                     if not isinstance(s_dec, six.string_types):
@@ -3255,6 +3577,8 @@ class BaseHighState(object):
                         state[name][s_dec].append(
                                 {'order': self.iorder}
                                 )
+                        if mark_auto:
+                            state[name][s_dec].append({'__auto_order__': True})
                         self.iorder += 1
         return state
 
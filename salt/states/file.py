@@ -2840,6 +2840,7 @@ def recurse(name,
             maxdepth=None,
             keep_symlinks=False,
             force_symlinks=False,
+            manifest=False,
             **kwargs):
     '''
     Recurse through a subdirectory on the master and copy said subdirectory
@@ -2977,6 +2978,16 @@ def recurse(name,
         If a file or directory is obstructing symlink creation it will be
         recursively removed so that symlink creation can proceed. This
         option is usually not needed except in special circumstances.
+
+    manifest
+        Fetch the hashes, modes and sizes of all of the files under ``source``
+        in a single request, and only download the files which differ from
+        the copies cached on the minion, several of them per request. The
+        files which are not templated are then managed from the minion's
+        cache, without contacting the master for each file. This speeds up
+        recursing into directories holding many files.
+
+        .. versionadded:: Nitrogen
     '''
     if 'env' in kwargs:
         salt.utils.warn_until(
@@ -3116,6 +3127,12 @@ def recurse(name,
                                            'new file'}
                 merge_ret(path, _ret)
 
+        if source_cache and not template:
+            # The cached copy was just checked against the master
+            cached = __salt__['cp.is_cached'](source, senv)
+            if cached in source_cache:
+                source = cached
+
         # Conflicts can occur if some kwargs are passed in here
         pass_kwargs = {}
         faults = ['mode', 'makedirs']
@@ -3173,6 +3190,15 @@ def recurse(name,
         maxdepth,
         include_empty)
 
+    source_cache = set()
+    if manifest and mng_files:
+        source_cache.update(__salt__['cp.cache_dir'](
+            source,
+            senv,
+            include_pat=include_pat,
+            exclude_pat=exclude_pat,
+            manifest=True))
+
     for srelpath, ltarget in mng_symlinks:
         _ret = symlink(os.path.join(name, srelpath),
                        ltarget,
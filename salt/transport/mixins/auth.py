@@ -9,6 +9,7 @@ import os
 import hashlib
 import shutil
 import binascii
+import time
 
 # Import Salt Libs
 import salt.crypt
@@ -22,7 +23,6 @@ from salt.utils.cache import CacheCli
 # Import Third Party Libs
 import tornado.gen
 from Crypto.Cipher import PKCS1_OAEP
-from Crypto.PublicKey import RSA
 
 
 log = logging.getLogger(__name__)
@@ -52,11 +52,87 @@ class AESPubClientMixin(object):
         raise tornado.gen.Return(payload)
 
 
+class AuthAdmission(object):
+    '''
+    Admission control of the minion authentications, shared by all of the
+    workers of a request server.
+
+    Authentications are admitted at ``auth_rate_limit`` per second, with
+    bursts of up to ``auth_rate_burst``, by a token bucket. The minions
+    which are not admitted are told to retry at distinct times, spaced by the
+    rate limit, so they come back at the rate the master can take them in.
+    At most ``auth_workers`` workers authenticate minions at the same time,
+    so the others keep serving the minions which are already authenticated.
+    '''
+    # Indexes in the shared state
+    TOKENS, REFILLED, NEXT_SLOT, DEFERRED_SINCE, DEFERRED = range(5)
+
+    def __init__(self, opts):
+        self.rate = float(opts.get('auth_rate_limit') or 0)
+        self.burst = max(float(opts.get('auth_rate_burst') or self.rate), 1.0)
+        self.state = multiprocessing.Array(
+            ctypes.c_double, [self.burst, time.time(), 0.0, 0.0, 0.0])
+        self.workers = None
+        if opts.get('auth_workers'):
+            self.workers = multiprocessing.BoundedSemaphore(int(opts['auth_workers']))
+
+    def acquire_worker(self):
+        '''
+        Return True if this worker may authenticate a minion now
+        '''
+        return self.workers is None or self.workers.acquire(False)
+
+    def release_worker(self):
+        if self.workers is not None:
+            self.workers.release()
+
+    def worker_retry_after(self):
+        '''
+        The number of seconds to retry after when all of the auth workers are
+        busy
+        '''
+        return 1.0 / self.rate if self.rate else 1.0
+
+    def admit(self, now=None):
+        '''
+        Take a token for an authentication. Returns 0 if the authentication
+        may go ahead, otherwise the number of seconds after which the minion
+        should retry.
+        '''
+        if self.rate <= 0:
+            return 0
+        if now is None:
+            now = time.time()
+        with self.state.get_lock():
+            state = self.state
+            state[self.TOKENS] = min(
+                self.burst,
+                state[self.TOKENS] + (now - state[self.REFILLED]) * self.rate)
+            state[self.REFILLED] = now
+            if state[self.TOKENS] >= 1:
+                state[self.TOKENS] -= 1
+                if state[self.DEFERRED] and state[self.NEXT_SLOT] <= now:
+                    log.info(
+                        'Deferred {0:.0f} authentication requests over {1:.1f} '
+                        'seconds'.format(state[self.DEFERRED],
+                                         now - state[self.DEFERRED_SINCE]))
+                    state[self.DEFERRED] = 0
+                return 0
+            if not state[self.DEFERRED]:
+                state[self.DEFERRED_SINCE] = now
+            state[self.DEFERRED] += 1
+            state[self.NEXT_SLOT] = max(now, state[self.NEXT_SLOT]) + 1.0 / self.rate
+            return state[self.NEXT_SLOT] - now
+
+
 # TODO: rename?
 class AESReqServerMixin(object):
     '''
     Mixin to house all of the master-side auth crypto
     '''
+    # The number of seconds the connected minion ids are cached for the
+    # max_minions check
+    CONNECTED_IDS_TTL = 10
 
     def pre_fork(self, _):
         '''
@@ -71,6 +147,7 @@ class AESReqServerMixin(object):
                               salt.crypt.Crypticle.generate_key_string()),
                 'reload': salt.crypt.Crypticle.generate_key_string
             }
+        self.auth_admission = AuthAdmission(self.opts)
 
     def post_fork(self, _, __):
         self.serial = salt.payload.Serial(self.opts)
@@ -88,24 +165,22 @@ class AESReqServerMixin(object):
             self.cache_cli = False
             # Make an minion checker object
             self.ckminions = salt.utils.minions.CkMinions(self.opts)
+        self._connected_ids = None
 
         self.master_key = salt.crypt.MasterKeys(self.opts)
+        self.key_cache = salt.crypt.MinionKeyCache(self.opts)
 
     def _encrypt_private(self, ret, dictkey, target):
         '''
         The server equivalent of ReqChannel.crypted_transfer_decode_dictentry
         '''
         # encrypt with a specific AES key
-        pubfn = os.path.join(self.opts['pki_dir'],
-                             'minions',
-                             target)
         key = salt.crypt.Crypticle.generate_key_string()
         pcrypt = salt.crypt.Crypticle(
             self.opts,
             key)
         try:
-            with salt.utils.fopen(pubfn) as f:
-                pub = RSA.importKey(f.read())
+            pub = self.key_cache.get_pub(target)
         except (ValueError, IndexError, TypeError):
             return self.crypticle.dumps({})
         except IOError:
@@ -145,6 +220,38 @@ class AESReqServerMixin(object):
         return payload
 
     def _auth(self, load):
+        '''
+        Authenticate the client if the auth admission control lets it in,
+        otherwise tell it how many seconds to wait before trying again
+        '''
+        if self.auth_admission.acquire_worker():
+            retry_after = self.auth_admission.admit()
+            if not retry_after:
+                try:
+                    return self._auth_minion(load)
+                finally:
+                    self.auth_admission.release_worker()
+            self.auth_admission.release_worker()
+        else:
+            retry_after = self.auth_admission.worker_retry_after()
+        log.debug('Deferring authentication request from {0} for {1:.1f} '
+                  'seconds'.format(load.get('id'), retry_after))
+        return {'enc': 'clear',
+                'load': {'ret': 'busy',
+                         'retry_after': retry_after}}
+
+    def _connected_minions(self):
+        '''
+        Return the ids of the connected minions for the max_minions check,
+        refreshed every CONNECTED_IDS_TTL seconds
+        '''
+        now = time.time()
+        if self._connected_ids is None \
+                or now - self._connected_ids[0] > self.CONNECTED_IDS_TTL:
+            self._connected_ids = (now, set(self.ckminions.connected_ids()))
+        return self._connected_ids[1]
+
+    def _auth_minion(self, load):
         '''
         Authenticate the client, use the sent public key to encrypt the AES key
         which was generated at start up.
@@ -174,7 +281,7 @@ class AESReqServerMixin(object):
             if self.cache_cli:
                 minions = self.cache_cli.get_cached()
             else:
-                minions = self.ckminions.connected_ids()
+                minions = self._connected_minions()
                 if len(minions) > 1000:
                     log.info('With large numbers of minions it is advised '
                              'to enable the ConCache with \'con_cache: True\' '
@@ -214,11 +321,12 @@ class AESReqServerMixin(object):
         pubfn_denied = os.path.join(self.opts['pki_dir'],
                                     'minions_denied',
                                     load['id'])
+        key_state = self.key_cache.key_state(load['id'])
         if self.opts['open_mode']:
             # open mode is turned on, nuts to checks and overwrite whatever
             # is there
             pass
-        elif os.path.isfile(pubfn_rejected):
+        elif key_state == 'rejected':
             # The key has been rejected, don't place it in pending
             log.info('Public key rejected for {0}. Key is present in '
                      'rejection key dir.'.format(load['id']))
@@ -229,26 +337,25 @@ class AESReqServerMixin(object):
             return {'enc': 'clear',
                     'load': {'ret': False}}
 
-        elif os.path.isfile(pubfn):
+        elif key_state == 'accepted':
             # The key has been accepted, check it
-            with salt.utils.fopen(pubfn, 'r') as pubfn_handle:
-                if pubfn_handle.read().strip() != load['pub'].strip():
-                    log.error(
-                        'Authentication attempt from {id} failed, the public '
-                        'keys did not match. This may be an attempt to compromise '
-                        'the Salt cluster.'.format(**load)
-                    )
-                    # put denied minion key into minions_denied
-                    with salt.utils.fopen(pubfn_denied, 'w+') as fp_:
-                        fp_.write(load['pub'])
-                    eload = {'result': False,
-                             'id': load['id'],
-                             'pub': load['pub']}
-                    self.event.fire_event(eload, salt.utils.event.tagify(prefix='auth'))
-                    return {'enc': 'clear',
-                            'load': {'ret': False}}
+            if self.key_cache.get_pub_str(load['id']).strip() != load['pub'].strip():
+                log.error(
+                    'Authentication attempt from {id} failed, the public '
+                    'keys did not match. This may be an attempt to compromise '
+                    'the Salt cluster.'.format(**load)
+                )
+                # put denied minion key into minions_denied
+                with salt.utils.fopen(pubfn_denied, 'w+') as fp_:
+                    fp_.write(load['pub'])
+                eload = {'result': False,
+                         'id': load['id'],
+                         'pub': load['pub']}
+                self.event.fire_event(eload, salt.utils.event.tagify(prefix='auth'))
+                return {'enc': 'clear',
+                        'load': {'ret': False}}
 
-        elif not os.path.isfile(pubfn_pend):
+        elif key_state != 'pending':
             # The key has not been accepted, this is a new minion
             if os.path.isdir(pubfn_pend):
                 # The key path is a directory, error out
@@ -283,6 +390,7 @@ class AESReqServerMixin(object):
                 # Write the key to the appropriate location
                 with salt.utils.fopen(key_path, 'w+') as fp_:
                     fp_.write(load['pub'])
+                self.key_cache.invalidate(load['id'])
                 ret = {'enc': 'clear',
                        'load': {'ret': key_result}}
                 eload = {'result': key_result,
@@ -292,7 +400,7 @@ class AESReqServerMixin(object):
                 self.event.fire_event(eload, salt.utils.event.tagify(prefix='auth'))
                 return ret
 
-        elif os.path.isfile(pubfn_pend):
+        else:
             # This key is in the pending dir and is awaiting acceptance
             if auto_reject:
                 # We don't care if the keys match, this minion is being
@@ -302,6 +410,7 @@ class AESReqServerMixin(object):
                     shutil.move(pubfn_pend, pubfn_rejected)
                 except (IOError, OSError):
                     pass
+                self.key_cache.invalidate(load['id'])
                 log.info('Pending public key for {id} rejected via '
                          'autoreject_file'.format(**load))
                 ret = {'enc': 'clear',
@@ -373,22 +482,13 @@ class AESReqServerMixin(object):
                     else:
                         pass
 
-        else:
-            # Something happened that I have not accounted for, FAIL!
-            log.warning('Unaccounted for authentication failure')
-            eload = {'result': False,
-                     'id': load['id'],
-                     'pub': load['pub']}
-            self.event.fire_event(eload, salt.utils.event.tagify(prefix='auth'))
-            return {'enc': 'clear',
-                    'load': {'ret': False}}
-
         log.info('Authentication accepted from {id}'.format(**load))
         # only write to disk if you are adding the file, and in open mode,
         # which implies we accept any key from a minion.
-        if not os.path.isfile(pubfn) and not self.opts['open_mode']:
+        if key_state != 'accepted' and not self.opts['open_mode']:
             with salt.utils.fopen(pubfn, 'w+') as fp_:
                 fp_.write(load['pub'])
+            self.key_cache.invalidate(load['id'])
         elif self.opts['open_mode']:
             disk_key = ''
             if os.path.isfile(pubfn):
@@ -398,6 +498,7 @@ class AESReqServerMixin(object):
                 log.debug('Host key change detected in open mode.')
                 with salt.utils.fopen(pubfn, 'w+') as fp_:
                     fp_.write(load['pub'])
+                self.key_cache.invalidate(load['id'])
 
         pub = None
 
@@ -408,8 +509,7 @@ class AESReqServerMixin(object):
         # The key payload may sometimes be corrupt when using auto-accept
         # and an empty request comes in
         try:
-            with salt.utils.fopen(pubfn) as f:
-                pub = RSA.importKey(f.read())
+            pub = self.key_cache.get_pub(load['id'])
         except (ValueError, IndexError, TypeError) as err:
             log.error('Corrupt public key "{0}": {1}'.format(pubfn, err))
             return {'enc': 'clear',
@@ -465,6 +565,8 @@ class AESReqServerMixin(object):
         # Be aggressive about the signature
         digest = hashlib.sha256(aes).hexdigest()
         ret['sig'] = salt.crypt.private_encrypt(self.master_key.key, digest)
+        if self._connected_ids is not None:
+            self._connected_ids[1].add(load['id'])
         eload = {'result': True,
                  'act': 'accept',
                  'id': load['id'],
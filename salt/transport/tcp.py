@@ -13,6 +13,7 @@ import msgpack
 import socket
 import os
 import weakref
+import functools
 import time
 import traceback
 import errno
@@ -1012,6 +1013,9 @@ class Subscriber(object):
         self._closing = False
         self._read_until_future = None
         self.id_ = None
+        # The number of bytes published to the subscriber which are still in
+        # the write buffer of the stream
+        self.backlog = 0
 
     def close(self):
         if self._closing:
@@ -1032,6 +1036,53 @@ class Subscriber(object):
         self.close()
 
 
+def _percentile(values, percent):
+    '''
+    Return the percentile of a sorted list of values
+    '''
+    return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
+
+
+class FanOut(object):
+    '''
+    Follow the writes of a publication to the subscribers, to release their
+    backlog when the payload is sent, to drop the subscribers whose stream
+    closed and to log the fan-out latency percentiles once all of the writes
+    completed
+    '''
+    def __init__(self, server, size):
+        self.server = server
+        self.size = size
+        self.start = time.time()
+        self.pending = 0
+        self.dropped = 0
+        self.latencies = []
+
+    def add(self, client, future):
+        self.pending += 1
+        self.server.io_loop.add_future(future, functools.partial(self.done, client))
+
+    def done(self, client, future):
+        client.backlog -= self.size
+        self.latencies.append(time.time() - self.start)
+        if future.exception() is not None:
+            self.server._remove_client(client)
+        self.pending -= 1
+        if not self.pending:
+            self.latencies.sort()
+            log.debug(
+                'TCP PubServer published {0} bytes to {1} subscribers, '
+                '{2} dropped, fan-out latency p50 {3:.3f}s p90 {4:.3f}s '
+                'p99 {5:.3f}s max {6:.3f}s'.format(
+                    self.size,
+                    len(self.latencies),
+                    self.dropped,
+                    _percentile(self.latencies, 50),
+                    _percentile(self.latencies, 90),
+                    _percentile(self.latencies, 99),
+                    self.latencies[-1]))
+
+
 class PubServer(tornado.tcpserver.TCPServer, object):
     '''
     TCP publisher
@@ -1043,6 +1094,8 @@ class PubServer(tornado.tcpserver.TCPServer, object):
         self.clients = set()
         self.aes_funcs = salt.master.AESFuncs(self.opts)
         self.present = {}
+        self.hwm = int(self.opts.get('tcp_pub_hwm') or 0)
+        self.hwm_action = self.opts.get('tcp_pub_hwm_action', 'drop')
         self.presence_events = False
         if self.opts.get('presence_events', False):
             tcp_only = True
@@ -1162,11 +1215,44 @@ class PubServer(tornado.tcpserver.TCPServer, object):
         self.clients.add(client)
         self.io_loop.spawn_callback(self._stream_read, client)
 
+    def _remove_client(self, client):
+        log.debug('Subscriber at {0} has disconnected from publisher'.format(client.address))
+        client.close()
+        self._remove_client_present(client)
+        self.clients.discard(client)
+
+    def _write(self, client, payload, fanout):
+        '''
+        Write the framed payload to a subscriber, unless its backlog would
+        go over the high-water mark. Returns False if the subscriber has to
+        be disconnected.
+        '''
+        if self.hwm and client.backlog + fanout.size > self.hwm:
+            if self.hwm_action == 'disconnect':
+                log.warning('Disconnecting slow subscriber at {0}, {1} bytes '
+                            'are waiting to be sent'.format(client.address, client.backlog))
+                return False
+            log.warning('Dropping publication to slow subscriber at {0}, {1} '
+                        'bytes are waiting to be sent'.format(client.address, client.backlog))
+            fanout.dropped += 1
+            return True
+        try:
+            # Write the packed str
+            future = client.stream.write(payload)
+        except tornado.iostream.StreamClosedError:
+            return False
+        client.backlog += fanout.size
+        fanout.add(client, future)
+        return True
+
     # TODO: ACK the publish through IPC
     @tornado.gen.coroutine
     def publish_payload(self, package, _):
         log.debug('TCP PubServer sending payload: {0}'.format(package))
+        # The payload is framed once and the same buffer is written to all of
+        # the subscribers
         payload = salt.transport.frame.frame_msg(package['payload'])
+        fanout = FanOut(self, len(payload))
 
         to_remove = []
         if 'topic_lst' in package:
@@ -1179,27 +1265,16 @@ class PubServer(tornado.tcpserver.TCPServer, object):
                     # restarts and the master is yet to detect the disconnect
                     # via TCP keep-alive.
                     for client in self.present[topic]:
-                        try:
-                            # Write the packed str
-                            f = client.stream.write(payload)
-                            self.io_loop.add_future(f, lambda f: True)
-                        except tornado.iostream.StreamClosedError:
+                        if not self._write(client, payload, fanout):
                             to_remove.append(client)
                 else:
                     log.debug('Publish target {0} not connected'.format(topic))
         else:
             for client in self.clients:
-                try:
-                    # Write the packed str
-                    f = client.stream.write(payload)
-                    self.io_loop.add_future(f, lambda f: True)
-                except tornado.iostream.StreamClosedError:
+                if not self._write(client, payload, fanout):
                     to_remove.append(client)
         for client in to_remove:
-            log.debug('Subscriber at {0} has disconnected from publisher'.format(client.address))
-            client.close()
-            self._remove_client_present(client)
-            self.clients.discard(client)
+            self._remove_client(client)
         log.trace('TCP PubServer finished publishing payload')
 
 
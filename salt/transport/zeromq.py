@@ -9,6 +9,7 @@ import os
 import sys
 import copy
 import errno
+import time
 import signal
 import hashlib
 import logging
@@ -686,6 +687,16 @@ class ZeroMQPubServerChannel(salt.transport.server.PubServerChannel):
     '''
     Encapsulate synchronous operations for a publisher channel
     '''
+    # A new channel is created for every publish, the PUSH socket to the
+    # publisher daemon and the Crypticle for the current AES key are kept
+    # per process and reused
+    _push_socks = {}
+    _crypticle = None
+    _stats = {'publish_count': 0,
+              'publish_time_total': 0.0,
+              'publish_time_max': 0.0,
+              'publish_time_last': 0.0}
+
     def __init__(self, opts):
         self.opts = opts
         self.serial = salt.payload.Serial(self.opts)  # TODO: in init?
@@ -801,26 +812,16 @@ class ZeroMQPubServerChannel(salt.transport.server.PubServerChannel):
 
         :param dict load: A load to be sent across the wire to minions
         '''
+        start = time.time()
         payload = {'enc': 'aes'}
 
-        crypticle = salt.crypt.Crypticle(self.opts, salt.master.SMaster.secrets['aes']['secret'].value)
-        payload['load'] = crypticle.dumps(load)
+        payload['load'] = self._get_crypticle().dumps(load)
         if self.opts['sign_pub_messages']:
             master_pem_path = os.path.join(self.opts['pki_dir'], 'master.pem')
             log.debug("Signing data packet")
             payload['sig'] = salt.crypt.sign_message(master_pem_path, payload['load'])
         # Send 0MQ to the publisher
-        context = zmq.Context(1)
-        pub_sock = context.socket(zmq.PUSH)
-        if self.opts.get('ipc_mode', '') == 'tcp':
-            pull_uri = 'tcp://127.0.0.1:{0}'.format(
-                self.opts.get('tcp_master_publish_pull', 4514)
-                )
-        else:
-            pull_uri = 'ipc://{0}'.format(
-                os.path.join(self.opts['sock_dir'], 'publish_pull.ipc')
-                )
-        pub_sock.connect(pull_uri)
+        pub_sock = self._get_push_sock()
         int_payload = {'payload': self.serial.dumps(payload)}
 
         # add some targeting stuff for lists only (for now)
@@ -839,8 +840,66 @@ class ZeroMQPubServerChannel(salt.transport.server.PubServerChannel):
             int_payload['topic_lst'] = match_ids
 
         pub_sock.send(self.serial.dumps(int_payload))
-        pub_sock.close()
-        context.term()
+        self._update_stats(time.time() - start)
+
+    def _get_crypticle(self):
+        '''
+        Return the Crypticle for the current AES key, it is only rebuilt
+        when the key has been rotated
+        '''
+        aes = salt.master.SMaster.secrets['aes']['secret'].value
+        cls = ZeroMQPubServerChannel
+        if cls._crypticle is None or cls._crypticle.key_string != aes:
+            cls._crypticle = salt.crypt.Crypticle(self.opts, aes)
+        return cls._crypticle
+
+    def _get_push_sock(self):
+        '''
+        Return the PUSH socket connected to the publisher daemon, the socket
+        is created once per process
+        '''
+        if self.opts.get('ipc_mode', '') == 'tcp':
+            pull_uri = 'tcp://127.0.0.1:{0}'.format(
+                self.opts.get('tcp_master_publish_pull', 4514)
+                )
+        else:
+            pull_uri = 'ipc://{0}'.format(
+                os.path.join(self.opts['sock_dir'], 'publish_pull.ipc')
+                )
+        key = (os.getpid(), pull_uri)
+        socks = ZeroMQPubServerChannel._push_socks
+        if key not in socks:
+            # Sockets inherited from the parent process can not be used
+            for old_key in [k for k in socks if k[0] != key[0]]:
+                socks.pop(old_key)
+            context = zmq.Context(1)
+            pub_sock = context.socket(zmq.PUSH)
+            pub_sock.connect(pull_uri)
+            socks[key] = (context, pub_sock)
+        return socks[key][1]
+
+    @classmethod
+    def _update_stats(cls, duration):
+        stats = cls._stats
+        stats['publish_count'] += 1
+        stats['publish_time_total'] += duration
+        stats['publish_time_last'] = duration
+        if duration > stats['publish_time_max']:
+            stats['publish_time_max'] = duration
+        log.trace('Published job in {0:.6f} seconds'.format(duration))
+
+    @classmethod
+    def publish_stats(cls):
+        '''
+        Return the publish counters of this process: the number of publishes
+        and the total, max and last time spent in publish, in seconds
+        '''
+        ret = dict(cls._stats)
+        if ret['publish_count']:
+            ret['publish_time_avg'] = ret['publish_time_total'] / ret['publish_count']
+        else:
+            ret['publish_time_avg'] = 0.0
+        return ret
 
 
 # TODO: unit tests!
@@ -2114,6 +2114,20 @@ def get_hash(path, form='sha256', chunk_size=65536):
         return hash_obj.hexdigest()
 
 
+def get_block_hashes(path, form='sha256', block_size=131072):
+    '''
+    Get the hash sums of the fixed size blocks of a file, the last block may
+    be shorter than ``block_size``
+    '''
+    hash_type = hasattr(hashlib, form) and getattr(hashlib, form) or None
+    if hash_type is None:
+        raise ValueError('Invalid hash type: {0}'.format(form))
+
+    with salt.utils.fopen(path, 'rb') as ifile:
+        return [hash_type(block).hexdigest()
+                for block in iter(lambda: ifile.read(block_size), b'')]
+
+
 def namespaced_function(function, global_dict, defaults=None, preserve_context=False):
     '''
     Redefine (clone) a function under a different globals() namespace scope
@@ -14,6 +14,8 @@ except ImportError:
 # Import salt libs
 import salt.config
 import salt.payload
+import salt.utils
+import salt.utils.atomicfile
 import salt.utils.dictupdate
 
 # Import third party libs
@@ -137,8 +139,14 @@ class CacheDisk(CacheDict):
         '''
         if not HAS_MSGPACK or not os.path.exists(self._path):
             return
-        with salt.utils.fopen(self._path, 'r') as fp_:
-            cache = msgpack.load(fp_)
+        try:
+            with salt.utils.fopen(self._path, 'rb') as fp_:
+                cache = msgpack.load(fp_)
+        except Exception as exc:
+            log.warning(
+                'Unable to read disk cache {0}: {1}'.format(self._path, exc)
+            )
+            return
         if "CacheDisk_cachetime" in cache:  # new format
             self._dict = cache["CacheDisk_data"]
             self._key_cache_time = cache["CacheDisk_cachetime"]
@@ -158,7 +166,9 @@ class CacheDisk(CacheDict):
             return
         # TODO Add check into preflight to ensure dir exists
         # TODO Dir hashing?
-        with salt.utils.fopen(self._path, 'w+') as fp_:
+        # Write to a temporary file and rename it into place, so that a
+        # concurrent reader never sees a partially written cache
+        with salt.utils.atomicfile.atomic_open(self._path, 'wb') as fp_:
             cache = {
                 "CacheDisk_data": self._dict,
                 "CacheDisk_cachetime": self._key_cache_time
@@ -59,7 +59,8 @@ import fnmatch
 import hashlib
 import logging
 import datetime
-from collections import MutableMapping
+import threading
+from collections import MutableMapping, deque
 from multiprocessing.util import Finalize
 from salt.ext.six.moves import range
 
@@ -73,6 +74,7 @@ import salt.config
 import salt.payload
 import salt.utils
 import salt.utils.async
+import salt.utils.atomicfile
 import salt.utils.cache
 import salt.utils.dicttrim
 import salt.utils.process
@@ -1154,11 +1156,227 @@ class EventPublisher(salt.utils.process.SignalHandlingMultiprocessingProcess):
         self.close()
 
 
+class EventReturnWorker(threading.Thread):
+    '''
+    A thread which passes batches of events to a single event returner.
+
+    Batches wait in a queue of at most ``max_pending`` events. When a new
+    batch does not fit, the ``overflow`` policy decides what happens:
+    ``block`` waits for the returner to catch up, ``drop_oldest`` discards
+    the oldest queued events and ``spill`` writes the batch to ``spill_dir``
+    so it can be returned once the queue has drained.
+    '''
+    OVERFLOW_POLICIES = ('block', 'drop_oldest', 'spill')
+
+    def __init__(self, opts, returner, func, max_pending=0, overflow='block'):
+        super(EventReturnWorker, self).__init__(
+            name='EventReturn-{0}'.format(returner))
+        self.daemon = True
+        self.returner = returner
+        self.func = func
+        self.max_pending = max_pending
+        if overflow not in self.OVERFLOW_POLICIES:
+            log.warning('Unknown event_return_overflow policy \'{0}\', '
+                        'using \'block\''.format(overflow))
+            overflow = 'block'
+        self.overflow = overflow
+        self.serial = salt.payload.Serial(opts)
+        self.batches = deque()
+        self.pending = 0
+        self.cond = threading.Condition()
+        self.stopping = False
+        self.spill_dir = os.path.join(opts['cachedir'], 'event_return_spill')
+        self.spill_files = deque()
+        self.spill_seq = 0
+        if overflow == 'spill':
+            self._load_spill_dir()
+        self.stats = {'flushes': 0,
+                      'events': 0,
+                      'errors': 0,
+                      'dropped': 0,
+                      'spilled': 0,
+                      'latency_last': 0.0,
+                      'latency_max': 0.0,
+                      'latency_total': 0.0}
+
+    def _load_spill_dir(self):
+        '''
+        Pick up the batches left on disk by a previous run
+        '''
+        if not os.path.isdir(self.spill_dir):
+            os.makedirs(self.spill_dir)
+            return
+        prefix = '{0}-'.format(self.returner)
+        for fn_ in sorted(os.listdir(self.spill_dir)):
+            if fn_.startswith(prefix):
+                self.spill_files.append(os.path.join(self.spill_dir, fn_))
+
+    def _spill(self, batch):
+        '''
+        Write a batch to disk, the caller holds the condition
+        '''
+        self.spill_seq += 1
+        path = os.path.join(
+            self.spill_dir,
+            '{0}-{1:017.6f}-{2:08d}.p'.format(
+                self.returner, time.time(), self.spill_seq))
+        try:
+            with salt.utils.fopen(path, 'wb') as fp_:
+                self.serial.dump(batch, fp_)
+        except (IOError, OSError, TypeError) as exc:
+            log.error('Could not spill {0} events for returner \'{1}\' to '
+                      '{2}: {3}'.format(len(batch), self.returner, path, exc))
+            self.stats['dropped'] += len(batch)
+            return
+        self.spill_files.append(path)
+        self.stats['spilled'] += len(batch)
+        self.cond.notify_all()
+
+    def _read_spill(self, path):
+        '''
+        Read a spilled batch back from disk and remove the file
+        '''
+        batch = []
+        try:
+            with salt.utils.fopen(path, 'rb') as fp_:
+                batch = self.serial.load(fp_)
+        except Exception as exc:
+            log.error('Could not read spilled events from {0}: '
+                      '{1}'.format(path, exc))
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return batch
+
+    def put(self, batch):
+        '''
+        Queue a batch of events, applying the overflow policy when the
+        queue is full
+        '''
+        if not batch:
+            return
+        with self.cond:
+            over = self.max_pending and \
+                self.pending + len(batch) > self.max_pending
+            if self.overflow == 'spill':
+                # Keep the events in order, once something was spilled the
+                # new batches go to disk until the spill is drained
+                if over or self.spill_files:
+                    self._spill(batch)
+                    return
+            elif over and self.overflow == 'drop_oldest':
+                dropped = 0
+                while self.batches and \
+                        self.pending + len(batch) > self.max_pending:
+                    old = self.batches.popleft()
+                    self.pending -= len(old)
+                    dropped += len(old)
+                room = max(self.max_pending - self.pending, 0)
+                if len(batch) > room:
+                    dropped += len(batch) - room
+                    batch = batch[len(batch) - room:]
+                if dropped:
+                    self.stats['dropped'] += dropped
+                    log.warning('Event returner \'{0}\' is behind, dropped '
+                                '{1} events'.format(self.returner, dropped))
+                if not batch:
+                    return
+            elif over:
+                while self.pending and not self.stopping and \
+                        self.pending + len(batch) > self.max_pending:
+                    self.cond.wait(1)
+            self.batches.append(batch)
+            self.pending += len(batch)
+            self.cond.notify_all()
+
+    def run(self):
+        '''
+        Return the queued batches until stopped, the batches still in memory
+        are returned before the thread exits
+        '''
+        while True:
+            path = None
+            with self.cond:
+                while not self.batches and not self.stopping and \
+                        not self.spill_files:
+                    self.cond.wait(1)
+                if self.batches:
+                    batch = self.batches.popleft()
+                elif self.spill_files and not self.stopping:
+                    path = self.spill_files.popleft()
+                else:
+                    return
+            if path is not None:
+                self._return(self._read_spill(path))
+                continue
+            self._return(batch)
+            with self.cond:
+                self.pending -= len(batch)
+                self.cond.notify_all()
+
+    def _return(self, batch):
+        '''
+        Pass a batch to the returner and record the flush latency
+        '''
+        if not batch:
+            return
+        start = time.time()
+        try:
+            self.func(batch)
+        except Exception as exc:
+            self.stats['errors'] += 1
+            log.error('Could not store events - returner \'{0}\' raised '
+                      'exception: {1}'.format(self.returner, exc))
+            # don't waste processing power unnecessarily on converting a
+            # potentially huge dataset to a string
+            if log.level <= logging.DEBUG:
+                log.debug('Event data that caused an exception: {0}'.format(
+                    batch))
+        latency = time.time() - start
+        self.stats['flushes'] += 1
+        self.stats['events'] += len(batch)
+        self.stats['latency_last'] = latency
+        self.stats['latency_total'] += latency
+        self.stats['latency_max'] = max(self.stats['latency_max'], latency)
+
+    def get_stats(self):
+        '''
+        Return the flush and drop counters of this returner
+        '''
+        with self.cond:
+            stats = dict(self.stats)
+            stats['pending'] = self.pending
+            stats['spill_files'] = len(self.spill_files)
+        total = stats.pop('latency_total')
+        stats['latency_avg'] = total / stats['flushes'] if stats['flushes'] else 0.0
+        return stats
+
+    def stop(self):
+        '''
+        Ask the thread to exit once the batches in memory are returned
+        '''
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+
+
 class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
     '''
     A dedicated process which listens to the master event bus and queues
     and forwards events to the specified returner.
+
+    The queue is flushed once it holds ``event_return_queue`` events or its
+    oldest event is ``event_return_queue_max_seconds`` old. Each returner
+    receives the flushed batches in its own EventReturnWorker thread so a
+    slow returner does not hold up reading the event bus.
     '''
+    # The tag of the returner statistics, which are never returned
+    STATS_TAG = 'salt/event_return/stats'
+    # How long to wait for the returner threads to return their queued
+    # events when stopping
+    STOP_TIMEOUT = 10
+
     def __init__(self, opts, log_queue=None):
         '''
         Initialize the EventReturn system
@@ -1169,10 +1387,14 @@ class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
 
         self.opts = opts
         self.event_return_queue = self.opts['event_return_queue']
+        self.event_return_queue_max_seconds = \
+            self.opts.get('event_return_queue_max_seconds', 0)
         local_minion_opts = self.opts.copy()
         local_minion_opts['file_client'] = 'local'
         self.minion = salt.minion.MasterMinion(local_minion_opts)
         self.event_queue = []
+        self.event_queue_start = 0
+        self.workers = {}
         self.stop = False
 
     # __setstate__ and __getstate__ are only used on Windows.
@@ -1190,24 +1412,81 @@ class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
         # Flush and terminate
         if self.event_queue:
             self.flush_events()
+        self.stop_workers()
         self.stop = True
         super(EventReturn, self)._handle_signals(signum, sigframe)
 
-    def flush_events(self):
+    def _event_returners(self):
+        '''
+        Return the names of the configured event_return functions
+        '''
         if isinstance(self.opts['event_return'], list):
             # Multiple event returners
-            for r in self.opts['event_return']:
-                log.debug('Calling event returner {0}, one of many.'.format(r))
-                event_return = '{0}.event_return'.format(r)
+            return ['{0}.event_return'.format(r)
+                    for r in self.opts['event_return']]
+        # Only a single event returner
+        return ['{0}.event_return'.format(self.opts['event_return'])]
+
+    def _max_pending(self):
+        '''
+        Return the number of flushed events which may wait for a returner,
+        room is kept for a few full batches
+        '''
+        max_pending = self.opts.get('event_return_max_pending', 10000)
+        if max_pending and max_pending < 4 * self.event_return_queue:
+            max_pending = 4 * self.event_return_queue
+        return max_pending
+
+    def start_workers(self):
+        '''
+        Start an EventReturnWorker thread for each configured returner
+        '''
+        for event_return in self._event_returners():
+            if event_return in self.workers:
+                continue
+            if event_return not in self.minion.returners:
+                log.error('Could not store return for event(s) - returner '
+                          '\'%s\' not found.', event_return)
+                continue
+            worker = EventReturnWorker(
+                self.opts,
+                event_return,
+                self.minion.returners[event_return],
+                max_pending=self._max_pending(),
+                overflow=self.opts.get('event_return_overflow', 'block'))
+            worker.start()
+            self.workers[event_return] = worker
+
+    def stop_workers(self, timeout=None):
+        '''
+        Stop the returner threads after they returned their queued batches,
+        waiting at most ``timeout`` seconds (STOP_TIMEOUT by default) for all
+        of them
+        '''
+        if timeout is None:
+            timeout = self.STOP_TIMEOUT
+        for worker in six.itervalues(self.workers):
+            worker.stop()
+        deadline = time.time() + timeout
+        for event_return, worker in six.iteritems(self.workers):
+            worker.join(max(deadline - time.time(), 0))
+            if worker.is_alive():
+                log.warning('Event returner \'{0}\' did not return its queued '
+                            'events in time, leaving {1} events '
+                            'behind'.format(event_return, worker.pending))
+        self.workers = {}
+
+    def flush_events(self):
+        batch = list(self.event_queue)
+        for event_return in self._event_returners():
+            worker = self.workers.get(event_return)
+            if worker is not None:
+                log.debug('Queueing {0} events for event returner '
+                          '{1}'.format(len(batch), event_return))
+                worker.put(batch)
+            else:
+                log.debug('Calling event returner {0}'.format(event_return))
                 self._flush_event_single(event_return)
-        else:
-            # Only a single event returner
-            log.debug('Calling event returner {0}, only one '
-                      'configured.'.format(self.opts['event_return']))
-            event_return = '{0}.event_return'.format(
-                self.opts['event_return']
-                )
-            self._flush_event_single(event_return)
         del self.event_queue[:]
 
     def _flush_event_single(self, event_return):
@@ -1226,27 +1505,58 @@ class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
             log.error('Could not store return for event(s) - returner '
                       '\'%s\' not found.', event_return)
 
+    def fire_stats(self):
+        '''
+        Fire the flush latency and drop counters of the returners
+        '''
+        stats = dict((name, worker.get_stats())
+                     for name, worker in six.iteritems(self.workers))
+        self.event.fire_event({'returners': stats}, self.STATS_TAG)
+
+    def _wait_time(self):
+        '''
+        Return how long to wait for the next event before the queued events
+        are due to be flushed
+        '''
+        if not self.event_queue or not self.event_return_queue_max_seconds:
+            return 5
+        due = self.event_queue_start + self.event_return_queue_max_seconds
+        return min(max(due - time.time(), 0.01), 5)
+
     def run(self):
         '''
         Spin up the multiprocess event returner
         '''
         salt.utils.appendproctitle(self.__class__.__name__)
         self.event = get_event('master', opts=self.opts, listen=True)
-        events = self.event.iter_events(full=True)
         self.event.fire_event({}, 'salt/event_listen/start')
+        self.start_workers()
+        stats_interval = self.opts.get('loop_interval', 60)
+        last_stats = time.time()
         try:
-            for event in events:
-                if event['tag'] == 'salt/event/exit':
-                    self.stop = True
-                if self._filter(event):
-                    self.event_queue.append(event)
-                if len(self.event_queue) >= self.event_return_queue:
+            while not self.stop:
+                event = self.event.get_event(wait=self._wait_time(), full=True)
+                if event is not None:
+                    if event['tag'] == 'salt/event/exit':
+                        self.stop = True
+                    if self._filter(event):
+                        if not self.event_queue:
+                            self.event_queue_start = time.time()
+                        self.event_queue.append(event)
+                now = time.time()
+                if self.event_queue and (
+                        len(self.event_queue) >= self.event_return_queue or
+                        (self.event_return_queue_max_seconds and
+                         now - self.event_queue_start >=
+                         self.event_return_queue_max_seconds)):
                     self.flush_events()
-                if self.stop:
-                    break
+                if self.workers and now - last_stats >= stats_interval:
+                    self.fire_stats()
+                    last_stats = now
         finally:  # flush all we have at this moment
             if self.event_queue:
                 self.flush_events()
+            self.stop_workers()
 
     def _filter(self, event):
         '''
@@ -1255,6 +1565,9 @@ class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
         Returns True if event should be stored, else False
         '''
         tag = event['tag']
+        if tag == self.STATS_TAG:
+            # Returning the stats would make every stats event flush again
+            return False
         if self.opts['event_return_whitelist']:
             ret = False
         else:
@@ -1270,6 +1583,129 @@ class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
         return ret
 
 
+def read_event_snapshot(opts, path, timeout):
+    '''
+    Return the latest snapshot written by an EventSnapshot process to
+    ``path``, or None if it is missing or was not written in the last
+    ``timeout`` seconds
+    '''
+    serial = salt.payload.Serial(opts)
+    try:
+        with salt.utils.fopen(path, 'rb') as fp_:
+            snapshot = serial.load(fp_)
+    except (IOError, OSError, ValueError, TypeError) as exc:
+        log.debug('Unable to read the snapshot {0}: {1}'.format(path, exc))
+        return None
+    if not isinstance(snapshot, dict):
+        return None
+    if time.time() - snapshot.get('time', 0) > timeout:
+        log.debug('The snapshot {0} is out of date'.format(path))
+        return None
+    return snapshot
+
+
+class EventSnapshot(salt.utils.process.SignalHandlingMultiprocessingProcess):
+    '''
+    Base class of the master processes which keep some state from the events
+    on the master event bus. A snapshot of the state is written to
+    ``FILENAME`` in the cachedir when it changed, at most once a second, and
+    at least every few seconds to show that the process is alive.
+
+    Subclasses implement ``handle_event`` and ``snapshot``.
+    '''
+    FILENAME = None
+    WRITE_INTERVAL = 1
+    HEARTBEAT_INTERVAL = 5
+
+    def __init__(self, opts, log_queue=None):
+        super(EventSnapshot, self).__init__(log_queue=log_queue)
+        self.opts = opts
+        self.serial = salt.payload.Serial(opts)
+        self.path = self.snapshot_path(opts)
+
+    # __setstate__ and __getstate__ are only used on Windows.
+    # We do this so that __init__ will be invoked on Windows in the child
+    # process so that a register_after_fork() equivalent will work on Windows.
+    def __setstate__(self, state):
+        self._is_child = True
+        self.__init__(state['opts'], log_queue=state['log_queue'])
+
+    def __getstate__(self):
+        return {'opts': self.opts,
+                'log_queue': self.log_queue}
+
+    @classmethod
+    def snapshot_path(cls, opts):
+        '''
+        Return the path of the snapshot file
+        '''
+        return os.path.join(opts['cachedir'], cls.FILENAME)
+
+    def handle_event(self, tag, data):
+        '''
+        Update the state from an event, returns True if it changed
+        '''
+        raise NotImplementedError()
+
+    def snapshot(self):
+        '''
+        Return the state as a serializable dict
+        '''
+        raise NotImplementedError()
+
+    def expire(self, now):
+        '''
+        Drop the outdated parts of the state before it is written
+        '''
+
+    def read(self):
+        '''
+        Return the snapshot written before the master was restarted, whatever
+        its age
+        '''
+        try:
+            with salt.utils.fopen(self.path, 'rb') as fp_:
+                snapshot = self.serial.load(fp_)
+        except (IOError, OSError, ValueError, TypeError):
+            return {}
+        return snapshot if isinstance(snapshot, dict) else {}
+
+    def write(self):
+        '''
+        Write a snapshot of the state
+        '''
+        snapshot = dict(self.snapshot(), time=time.time())
+        try:
+            with salt.utils.atomicfile.atomic_open(self.path, 'wb') as fp_:
+                self.serial.dump(snapshot, fp_)
+        except (IOError, OSError, TypeError) as exc:
+            log.error('Unable to write the snapshot {0}: {1}'.format(
+                self.path, exc))
+
+    def run(self):
+        '''
+        Keep the state up to date until the master exits
+        '''
+        salt.utils.appendproctitle(self.__class__.__name__)
+        event = get_event('master', opts=self.opts, listen=True)
+        dirty = True
+        last_write = 0
+        while True:
+            data = event.get_event(wait=self.WRITE_INTERVAL, full=True)
+            if data is not None:
+                if data['tag'] == 'salt/event/exit':
+                    break
+                if self.handle_event(data['tag'], data['data']):
+                    dirty = True
+            now = time.time()
+            if (dirty and now - last_write >= self.WRITE_INTERVAL) \
+                    or now - last_write >= self.HEARTBEAT_INTERVAL:
+                self.expire(now)
+                self.write()
+                dirty = False
+                last_write = now
+
+
 class StateFire(object):
     '''
     Evaluate the data from a state run and fire events on the master and minion
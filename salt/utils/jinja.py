@@ -9,6 +9,7 @@ import collections
 import json
 import pprint
 import logging
+import os
 import re
 from os import path
 from functools import wraps
@@ -25,6 +26,7 @@ import yaml
 # Import salt libs
 import salt
 import salt.utils
+import salt.utils.atomicfile
 import salt.utils.url
 import salt.fileclient
 from salt.utils.odict import OrderedDict
@@ -32,6 +34,7 @@ from salt.utils.odict import OrderedDict
 log = logging.getLogger(__name__)
 
 __all__ = [
+    'SaltBytecodeCache',
     'SaltCacheLoader',
     'SerializerExtension'
 ]
@@ -61,18 +64,34 @@ class SaltCacheLoader(BaseLoader):
         self.opts = opts
         self.saltenv = saltenv
         self.encoding = encoding
-        if self.opts['file_roots'] is self.opts['pillar_roots']:
-            if saltenv not in self.opts['file_roots']:
-                self.searchpath = []
-            else:
-                self.searchpath = opts['file_roots'][saltenv]
-        else:
-            self.searchpath = [path.join(opts['cachedir'], 'files', saltenv)]
+        self.searchpath = self.get_searchpath(opts, saltenv)
         log.debug('Jinja search path: %s', self.searchpath)
         self._file_client = None
         self.cached = []
         self.pillar_rend = pillar_rend
 
+    @staticmethod
+    def get_searchpath(opts, saltenv):
+        '''
+        Return the directories the templates of the saltenv are read from
+        '''
+        if opts['file_roots'] is opts['pillar_roots']:
+            if saltenv not in opts['file_roots']:
+                return []
+            return opts['file_roots'][saltenv]
+        return [path.join(opts['cachedir'], 'files', saltenv)]
+
+    def reset(self, opts):
+        '''
+        Prepare a loader kept between renders for the next render. The
+        templates are fetched again from the server the first time they are
+        used, and the file client is recreated if the opts have changed.
+        '''
+        if opts is not self.opts:
+            self.opts = opts
+            self._file_client = None
+        self.cached = []
+
     def file_client(self):
         '''
         Return a file client. Instantiates on first call.
@@ -126,6 +145,13 @@ class SaltCacheLoader(BaseLoader):
                     mtime = path.getmtime(filepath)
 
                     def uptodate():
+                        # Jinja asks this before reusing a template it has
+                        # already compiled, so make sure that the cached
+                        # file is current first
+                        try:
+                            self.check_cache(template)
+                        except Exception:
+                            return False
                         try:
                             return path.getmtime(filepath) == mtime
                         except OSError:
@@ -140,6 +166,50 @@ class SaltCacheLoader(BaseLoader):
         raise TemplateNotFound(template)
 
 
+class SaltBytecodeCache(jinja2.BytecodeCache):
+    '''
+    A jinja bytecode cache which keeps the compiled templates in memory and,
+    when a directory is passed, on disk so that they outlive the process.
+    Jinja keys the buckets by template name and checks the checksum of the
+    source when loading them, so a changed template is compiled again.
+    '''
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._memory = {}
+
+    def _cache_path(self, bucket):
+        return path.join(self.directory, '{0}.cache'.format(bucket.key))
+
+    def load_bytecode(self, bucket):
+        data = self._memory.get(bucket.key)
+        if data is None and self.directory:
+            try:
+                with salt.utils.fopen(self._cache_path(bucket), 'rb') as fp_:
+                    data = fp_.read()
+            except (IOError, OSError):
+                return
+            self._memory[bucket.key] = data
+        if data is not None:
+            bucket.bytecode_from_string(data)
+
+    def dump_bytecode(self, bucket):
+        data = bucket.bytecode_to_string()
+        self._memory[bucket.key] = data
+        if not self.directory:
+            return
+        try:
+            if not path.isdir(self.directory):
+                os.makedirs(self.directory)
+            with salt.utils.atomicfile.atomic_open(
+                    self._cache_path(bucket), 'wb') as fp_:
+                fp_.write(data)
+        except (IOError, OSError) as exc:
+            log.debug('Unable to write jinja bytecode cache: %s', exc)
+
+    def clear(self):
+        self._memory.clear()
+
+
 class PrintableDict(OrderedDict):
     '''
     Ensures that dict str() and repr() are YAML friendly.
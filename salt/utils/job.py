@@ -2,6 +2,7 @@
 
 # Import Python libs
 from __future__ import absolute_import
+import time
 import logging
 
 # Import Salt libs
@@ -10,6 +11,9 @@ import salt.utils.jid
 import salt.utils.event
 import salt.utils.verify
 
+# Import 3rd-party libs
+import salt.ext.six as six
+
 log = logging.getLogger(__name__)
 
 
@@ -138,4 +142,125 @@ def get_retcode(ret):
         return 1
     return retcode
 
+
+class RunningJobs(object):
+    '''
+    A registry of the jobs which are running on the minions, kept from the
+    publish (``salt/job/<jid>/new``) and return (``salt/job/<jid>/ret/<id>``)
+    events seen on the master event bus
+    '''
+    # The fields of a publish kept for the reports of the running jobs
+    LOAD_KEYS = ('fun', 'arg', 'tgt', 'tgt_type', 'user', 'metadata', 'kwargs')
+
+    def __init__(self, max_age=86400):
+        self.max_age = max_age
+        self.jobs = {}
+
+    def handle_event(self, tag, data):
+        '''
+        Update the registry from an event, returns True if it changed
+        '''
+        if not tag.startswith('salt/job/') or not isinstance(data, dict):
+            return False
+        parts = tag.split('/')
+        if len(parts) < 4:
+            return False
+        jid, kind = parts[2], parts[3]
+        if kind == 'new':
+            # Jobs published through a syndic do not list the minions they
+            # are expected on, they are kept until they are confirmed
+            minions = data.get('minions') or ()
+            now = time.time()
+            self.jobs[jid] = {
+                'load': dict((key, data[key]) for key in self.LOAD_KEYS
+                             if key in data),
+                'minions': set(minions),
+                'expected': bool(minions),
+                'returned': set(),
+                'time': now,
+                'checked': now}
+            return True
+        job = self.jobs.get(jid)
+        if job is None:
+            return False
+        if kind == 'ret':
+            minion = data.get('id', parts[4] if len(parts) > 4 else None)
+            job['minions'].discard(minion)
+            job['returned'].add(minion)
+        elif kind == 'stale':
+            # The minions were asked whether they still run the job, the
+            # ones listed in ``minions`` do not
+            job['minions'].difference_update(data.get('minions', ()))
+            if not job['expected'] and 'running' in data:
+                job['minions'] = set(data['running']) - job['returned']
+                job['expected'] = True
+            job['checked'] = time.time()
+        else:
+            return False
+        if job['expected'] and not job['minions']:
+            del self.jobs[jid]
+        return True
+
+    def expire(self, now=None):
+        '''
+        Forget the jobs started more than ``max_age`` seconds ago
+        '''
+        if now is None:
+            now = time.time()
+        expired = [jid for jid, job in six.iteritems(self.jobs)
+                   if now - job['time'] > self.max_age]
+        for jid in expired:
+            del self.jobs[jid]
+        return bool(expired)
+
+    def snapshot(self):
+        '''
+        Return the registry as serializable data
+        '''
+        return {'time': time.time(),
+                'jobs': dict(
+                    (jid, {'load': job['load'],
+                           'minions': sorted(job['minions']),
+                           'expected': job['expected'],
+                           'returned': sorted(job['returned']),
+                           'time': job['time'],
+                           'checked': job['checked']})
+                    for jid, job in six.iteritems(self.jobs))}
+
+
+def get_running_jobs(opts):
+    '''
+    Return the latest snapshot of the running jobs registry kept by the
+    RunningJobsRegistry process, or None if it is missing or has not been
+    updated for ``running_jobs_registry_timeout`` seconds
+    '''
+    snapshot = salt.utils.event.read_event_snapshot(
+        opts,
+        RunningJobsRegistry.snapshot_path(opts),
+        opts.get('running_jobs_registry_timeout', 30))
+    if snapshot is None or 'jobs' not in snapshot:
+        return None
+    return snapshot
+
+
+class RunningJobsRegistry(salt.utils.event.EventSnapshot):
+    '''
+    A dedicated master process which keeps the RunningJobs registry from the
+    master event bus and writes it to the cachedir
+    '''
+    FILENAME = 'running_jobs.p'
+
+    def __init__(self, opts, log_queue=None):
+        super(RunningJobsRegistry, self).__init__(opts, log_queue=log_queue)
+        self.registry = RunningJobs(opts.get('keep_jobs', 24) * 3600)
+
+    def handle_event(self, tag, data):
+        return self.registry.handle_event(tag, data)
+
+    def snapshot(self):
+        return self.registry.snapshot()
+
+    def expire(self, now):
+        self.registry.expire(now)
+
 # vim:set et sts=4 ts=4 tw=80:
@@ -10,6 +10,7 @@
 # Import python libs
 from __future__ import absolute_import
 import os
+import time
 import logging
 import signal
 from threading import Thread, Event
@@ -21,6 +22,7 @@ import salt.client
 import salt.pillar
 import salt.utils
 import salt.utils.atomicfile
+import salt.utils.event
 import salt.utils.minions
 import salt.payload
 from salt.exceptions import SaltException
@@ -664,6 +666,86 @@ class ConnectedCache(MultiprocessingProcess):
         log.debug('ConCache Shutting down')
 
 
+class MinionLiveness(object):
+    '''
+    The time each minion was last seen alive by the master, kept from the
+    presence events, accepted authentications, minion start and ping events
+    and job returns seen on the master event bus
+    '''
+    def __init__(self, last_seen=None):
+        self.last_seen = dict(last_seen or {})
+
+    @staticmethod
+    def _seen_ids(tag, data):
+        '''
+        Return the ids of the minions an event shows to be alive
+        '''
+        if tag == 'salt/presence/present':
+            return data.get('present') or ()
+        if tag == 'salt/presence/change':
+            return data.get('new') or ()
+        if 'id' not in data:
+            return ()
+        if tag == 'salt/auth':
+            return (data['id'],) if data.get('act') == 'accept' else ()
+        if tag == 'minion_ping' \
+                or tag.startswith('salt/job/') and '/ret/' in tag \
+                or tag.startswith('salt/minion/') and tag.endswith('/start'):
+            return (data['id'],)
+        return ()
+
+    def handle_event(self, tag, data, now=None):
+        '''
+        Update the table from an event, returns True if it changed
+        '''
+        if not isinstance(data, dict):
+            return False
+        if tag == 'salt/key' and data.get('act') == 'delete':
+            return self.last_seen.pop(data.get('id'), None) is not None
+        ids = self._seen_ids(tag, data)
+        if not ids:
+            return False
+        if now is None:
+            now = time.time()
+        for id_ in ids:
+            self.last_seen[id_] = now
+        return True
+
+
+def get_minion_liveness(opts):
+    '''
+    Return the time each minion was last seen alive from the table kept by
+    the LivenessTracker process, or None if the table is missing or has not
+    been updated for ``minion_liveness_timeout`` seconds
+    '''
+    snapshot = salt.utils.event.read_event_snapshot(
+        opts,
+        LivenessTracker.snapshot_path(opts),
+        opts.get('minion_liveness_timeout', 30))
+    if snapshot is None or 'last_seen' not in snapshot:
+        return None
+    return snapshot['last_seen']
+
+
+class LivenessTracker(salt.utils.event.EventSnapshot):
+    '''
+    A dedicated master process which keeps the MinionLiveness table from the
+    master event bus and writes it to the cachedir. The table is read back
+    when the master starts.
+    '''
+    FILENAME = 'minion_liveness.p'
+
+    def __init__(self, opts, log_queue=None):
+        super(LivenessTracker, self).__init__(opts, log_queue=log_queue)
+        self.table = MinionLiveness(self.read().get('last_seen'))
+
+    def handle_event(self, tag, data):
+        return self.table.handle_event(tag, data)
+
+    def snapshot(self):
+        return {'last_seen': self.table.last_seen}
+
+
 def ping_all_connected_minions(opts):
     client = salt.client.LocalClient()
     if opts['minion_data_cache']:
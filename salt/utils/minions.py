@@ -7,8 +7,10 @@ expected to return
 # Import python libs
 from __future__ import absolute_import
 import os
+import bisect
 import fnmatch
 import re
+import time
 import logging
 
 # Import salt libs
@@ -35,6 +37,15 @@ except ImportError:
 
 log = logging.getLogger(__name__)
 
+# Compiled compound target expressions, keyed by the target expression
+_COMPOUND_CACHE = {}
+COMPOUND_CACHE_SIZE = 1000
+COMPOUND_OPERS = ('and', 'or', 'not', '(', ')')
+
+# Minion registries, one per process since each keeps its own copy of the
+# minion ids and data
+_REGISTRIES = {}
+
 TARGET_REX = re.compile(
         r'''(?x)
         (
@@ -63,6 +74,107 @@ def parse_target(target_expression):
     return ret
 
 
+class _CompoundParser(object):
+    '''
+    Recursive descent parser of compound target expressions. ``not`` binds
+    tighter than ``and``, which binds tighter than ``or``, and a ``not``
+    following a target is an implicit ``and not``.
+    '''
+    def __init__(self, words):
+        self.words = words
+        self.pos = 0
+
+    def _peek(self):
+        if self.pos < len(self.words):
+            return self.words[self.pos]
+        return None
+
+    def parse(self):
+        node = self._or()
+        if self.pos < len(self.words):
+            raise ValueError('unexpected "{0}"'.format(self.words[self.pos]))
+        return node
+
+    def _or(self):
+        node = self._and()
+        while self._peek() == 'or':
+            self.pos += 1
+            node = ('or', node, self._and())
+        return node
+
+    def _and(self):
+        node = self._not()
+        while self._peek() in ('and', 'not'):
+            if self._peek() == 'and':
+                self.pos += 1
+            node = ('and', node, self._not())
+        return node
+
+    def _not(self):
+        if self._peek() == 'not':
+            self.pos += 1
+            return ('not', self._not())
+        return self._atom()
+
+    def _atom(self):
+        word = self._peek()
+        if word is None:
+            raise ValueError('missing target at the end')
+        self.pos += 1
+        if word == '(':
+            node = self._or()
+            if self._peek() != ')':
+                raise ValueError('missing ")"')
+            self.pos += 1
+            return node
+        if word in COMPOUND_OPERS:
+            raise ValueError('unexpected "{0}"'.format(word))
+        target_info = parse_target(word)
+        if target_info['engine'] == 'N':
+            # Nodegroups should already be expanded/resolved to other engines
+            raise ValueError('nodegroup expansion failure of "{0}"'.format(word))
+        return ('match',
+                target_info['engine'],
+                target_info['pattern'],
+                target_info['delimiter'],
+                word)
+
+
+def compile_compound(tgt):
+    '''
+    Parse a compound target expression, as a string or a list of words, into
+    a tree of ``('and', left, right)``, ``('or', left, right)``,
+    ``('not', node)`` and ``('match', engine, pattern, delimiter, word)``
+    tuples. The engine is None for the words matched as globs.
+
+    The trees are cached by expression, so the master and the minions only
+    parse the expressions they see repeatedly once. Returns None if the
+    expression is invalid.
+    '''
+    if isinstance(tgt, six.string_types):
+        key = tgt
+    elif isinstance(tgt, (list, tuple)) \
+            and all(isinstance(word, six.string_types) for word in tgt):
+        key = tuple(tgt)
+    else:
+        log.error('Compound target that is neither string, list nor tuple')
+        return None
+    try:
+        tree, error = _COMPOUND_CACHE[key]
+    except KeyError:
+        words = key.split() if isinstance(key, six.string_types) else key
+        try:
+            tree, error = _CompoundParser(words).parse(), None
+        except ValueError as exc:
+            tree, error = None, str(exc)
+        if len(_COMPOUND_CACHE) >= COMPOUND_CACHE_SIZE:
+            _COMPOUND_CACHE.clear()
+        _COMPOUND_CACHE[key] = (tree, error)
+    if error:
+        log.error('Invalid compound target {0}: {1}'.format(tgt, error))
+    return tree
+
+
 def get_minion_data(minion, opts):
     '''
     Get the grains/pillar for a specific minion.  If minion is None, it
@@ -168,6 +280,272 @@ def nodegroup_comp(nodegroup, nodegroups, skip=None, first_call=True):
         return ret
 
 
+def get_registry(opts):
+    '''
+    Return the MinionRegistry for this process, creating it on first use
+    '''
+    key = (os.getpid(), opts['pki_dir'], opts['cachedir'])
+    if key not in _REGISTRIES:
+        _REGISTRIES[key] = MinionRegistry(opts)
+    return _REGISTRIES[key]
+
+
+class MinionRegistry(object):
+    '''
+    Long lived, in-memory view of the accepted minion keys and of the grains
+    and pillar data in the minion data cache.
+
+    The registry is loaded from the PKI dir and the cache once, then kept up
+    to date by ``sync``: the accepted minion ids are reloaded when the mtime
+    of the accepted keys directory changes, and the data of a single minion
+    is reloaded when the ``updated`` time the cache reports for its data
+    changes. The cache is checked at most every
+    ``minion_registry_sync_interval`` seconds. Target checks are then answered without listing the PKI dir or
+    deserializing the data of every minion.
+
+    Grains and pillar values are kept in an inverted index keyed on
+    ``(search_type, top level key, lowercased value)`` so that the common
+    ``G@os:Ubuntu`` style targets are a dict lookup. Values the index cannot
+    represent (nested dicts, lists of dicts) are recorded under a ``None``
+    value and always checked with :py:func:`salt.utils.subdict_match`.
+    '''
+    GLOB_CHARS = frozenset('*?[')
+
+    def __init__(self, opts):
+        self.opts = opts
+        self.cache = salt.cache.Cache(opts)
+        if self.opts.get('transport', 'zeromq') in ('zeromq', 'tcp'):
+            self.acc = 'minions'
+        else:
+            self.acc = 'accepted'
+        self.ids_loaded = False
+        self.data_loaded = False
+        # Sorted (case insensitive) list of accepted ids, with the sort keys
+        # kept in a parallel list for bisect
+        self._ids = []
+        self._id_keys = []
+        self._ids_mtime = None
+        self.data = {}
+        # The cache update time of the loaded data of each minion
+        self._data_mtimes = {}
+        self._index = {}
+        self._minion_index = {}
+        # When the minion data cache was last checked
+        self._data_synced = None
+
+    @staticmethod
+    def _settled(mtime):
+        '''
+        Return True if a change made in the same second as ``mtime`` would
+        already have been read, otherwise the mtime granularity could hide it
+        '''
+        return mtime is not None and time.time() - mtime >= 1
+
+    def _accepted_mtime(self):
+        try:
+            return os.stat(os.path.join(self.opts['pki_dir'], self.acc)).st_mtime
+        except OSError:
+            return None
+
+    def sync(self):
+        '''
+        Reload whatever changed on disk since the registry was last synced.
+        Returns False if the minion data cache could not be checked and the
+        registry can not be trusted.
+        '''
+        if self.ids_loaded and self._accepted_mtime() != self._ids_mtime:
+            self.ids_loaded = False
+        if not self.data_loaded:
+            return True
+        now = time.time()
+        if self._data_synced is not None \
+                and 0 <= now - self._data_synced < self.opts.get('minion_registry_sync_interval', 5):
+            return True
+        try:
+            cached = set(self.cache.list('minions') or [])
+            for id_ in cached.union(self.data):
+                if id_ not in cached:
+                    self.update_data(id_, None)
+                elif id_ in self.data:
+                    if self.cache.updated('minions/{0}'.format(id_), 'data') \
+                            != self._data_mtimes.get(id_):
+                        self.load_minion_data(id_)
+                elif self.cache.contains('minions/{0}'.format(id_), 'data'):
+                    self.load_minion_data(id_)
+        except SaltCacheError as exc:
+            log.error('Unable to check the minion data cache: {0}'.format(exc))
+            self.data_loaded = False
+            return False
+        self._data_synced = now
+        return True
+
+    def _load_ids(self):
+        minions = []
+        accdir = os.path.join(self.opts['pki_dir'], self.acc)
+        mtime = self._accepted_mtime()
+        try:
+            for fn_ in os.listdir(accdir):
+                if not fn_.startswith('.') and os.path.isfile(os.path.join(accdir, fn_)):
+                    minions.append(fn_)
+        except OSError as exc:
+            log.error('Encountered OSError while evaluating minions in PKI dir: {0}'.format(exc))
+        self._ids = sorted(minions, key=self._sort_key)
+        self._id_keys = [self._sort_key(id_) for id_ in self._ids]
+        self._ids_mtime = mtime if self._settled(mtime) else None
+        self.ids_loaded = True
+
+    def _load_data(self):
+        self.data = {}
+        self._data_mtimes = {}
+        self._index = {}
+        self._minion_index = {}
+        self._data_synced = time.time()
+        for id_ in self.cache.list('minions') or []:
+            self.load_minion_data(id_)
+        self.data_loaded = True
+
+    @staticmethod
+    def _sort_key(id_):
+        return (id_.lower(), id_)
+
+    def minions(self):
+        '''
+        Return the sorted list of accepted minion ids
+        '''
+        if not self.ids_loaded:
+            self._load_ids()
+        return list(self._ids)
+
+    def has(self, id_):
+        '''
+        Return True if the minion id is accepted
+        '''
+        if not self.ids_loaded:
+            self._load_ids()
+        key = self._sort_key(id_)
+        pos = bisect.bisect_left(self._id_keys, key)
+        return pos < len(self._id_keys) and self._id_keys[pos] == key
+
+    def cached_minions(self):
+        '''
+        Return the ids which have grains or pillar data in the cache
+        '''
+        if not self.data_loaded:
+            self._load_data()
+        return list(self.data)
+
+    def load_minion_data(self, id_):
+        '''
+        Reload the cached data of a single minion
+        '''
+        bank = 'minions/{0}'.format(id_)
+        try:
+            mtime = self.cache.updated(bank, 'data')
+            mdata = self.cache.fetch(bank, 'data') if mtime is not None else None
+        except SaltCacheError:
+            mtime = mdata = None
+        self.update_data(id_, mdata)
+        if mdata is not None:
+            self._data_mtimes[id_] = mtime if self._settled(mtime) else None
+
+    def update_data(self, id_, mdata):
+        '''
+        Replace the cached data of a minion and re-index it, passing None
+        drops the minion from the data index
+        '''
+        for ikey in self._minion_index.pop(id_, ()):
+            ids = self._index.get(ikey)
+            if ids is not None:
+                ids.discard(id_)
+                if not ids:
+                    self._index.pop(ikey)
+        if mdata is None:
+            self.data.pop(id_, None)
+            self._data_mtimes.pop(id_, None)
+            return
+        self.data[id_] = mdata
+        ikeys = set()
+        for search_type in ('grains', 'pillar'):
+            sdata = mdata.get(search_type)
+            if not isinstance(sdata, dict):
+                continue
+            for key, val in six.iteritems(sdata):
+                ikeys.update(self._index_keys(search_type, key, val))
+        for ikey in ikeys:
+            self._index.setdefault(ikey, set()).add(id_)
+        self._minion_index[id_] = ikeys
+
+    @staticmethod
+    def _index_keys(search_type, key, val):
+        '''
+        Return the index keys for a top level grain or pillar value, the
+        lowercased string mirrors what subdict_match compares against
+        '''
+        if isinstance(val, list):
+            members = val
+        else:
+            members = [val]
+        ret = []
+        for member in members:
+            if isinstance(member, dict):
+                ret.append((search_type, key, None))
+                continue
+            try:
+                ret.append((search_type, key, str(member).lower()))
+            except Exception:
+                ret.append((search_type, key, None))
+        return ret
+
+    def match_data(self,
+                   expr,
+                   delimiter,
+                   search_type,
+                   regex_match=False,
+                   exact_match=False):
+        '''
+        Return the set of cached minions whose grains or pillar data match
+        the expression, with the same semantics as subdict_match
+        '''
+        if not self.data_loaded:
+            self._load_data()
+
+        def _check(id_):
+            return salt.utils.subdict_match(self.data[id_].get(search_type),
+                                            expr,
+                                            delimiter=delimiter,
+                                            regex_match=regex_match,
+                                            exact_match=exact_match)
+
+        if not regex_match and expr.count(delimiter) == 1:
+            key, val = expr.split(delimiter)
+            if exact_match or not self.GLOB_CHARS.intersection(val):
+                ret = set(self._index.get((search_type, key, val.lower()), ()))
+                ret.update(id_ for id_ in self._index.get((search_type, key, None), ())
+                           if _check(id_))
+                return ret
+        return set(id_ for id_ in self.data if _check(id_))
+
+    def check_cache_minions(self,
+                            expr,
+                            delimiter,
+                            greedy,
+                            search_type,
+                            regex_match=False,
+                            exact_match=False):
+        '''
+        Registry backed version of CkMinions._check_cache_minions
+        '''
+        matched = self.match_data(expr,
+                                  delimiter,
+                                  search_type,
+                                  regex_match=regex_match,
+                                  exact_match=exact_match)
+        if greedy:
+            return [id_ for id_ in self.minions()
+                    if id_ not in self.data or id_ in matched]
+        return list(matched)
+
+
 class CkMinions(object):
     '''
     Used to check what minions should respond from a target
@@ -186,6 +564,22 @@ class CkMinions(object):
             self.acc = 'minions'
         else:
             self.acc = 'accepted'
+        self._registry = None
+
+    @property
+    def registry(self):
+        '''
+        Return the process wide MinionRegistry if it is enabled and in sync
+        with the PKI dir and the minion data cache, otherwise None
+        '''
+        if not self.opts.get('minion_registry', False) \
+                or self.opts.get('__role') != 'master':
+            return None
+        if self._registry is None:
+            self._registry = get_registry(self.opts)
+        if not self._registry.sync():
+            return None
+        return self._registry
 
     def _check_nodegroup_minions(self, expr, greedy):  # pylint: disable=unused-argument
         '''
@@ -207,7 +601,8 @@ class CkMinions(object):
         '''
         if isinstance(expr, six.string_types):
             expr = [m for m in expr.split(',') if m]
-        return [x for x in expr if x in self._pki_minions()]
+        minions = set(self._pki_minions())
+        return [x for x in expr if x in minions]
 
     def _check_pcre_minions(self, expr, greedy):  # pylint: disable=unused-argument
         '''
@@ -221,6 +616,9 @@ class CkMinions(object):
         Retreive complete minion list from PKI dir.
         Respects cache if configured
         '''
+        registry = self.registry
+        if registry is not None:
+            return registry.minions()
         minions = []
         pki_cache_fn = os.path.join(self.opts['pki_dir'], self.acc, '.key_cache')
         try:
@@ -252,6 +650,15 @@ class CkMinions(object):
         cache_enabled = self.opts.get('minion_data_cache', False)
         cdir = os.path.join(self.opts['cachedir'], 'minions')
 
+        registry = self.registry
+        if cache_enabled and registry is not None:
+            return registry.check_cache_minions(expr,
+                                                delimiter,
+                                                greedy,
+                                                search_type,
+                                                regex_match=regex_match,
+                                                exact_match=exact_match)
+
         def list_cached_minions():
             if not os.path.isdir(cdir):
                 return []
@@ -429,6 +836,37 @@ class CkMinions(object):
                                             greedy,
                                             pillar_exact=True)
 
+    def _eval_compound(self, node, minions, ref, greedy):
+        '''
+        Return the set of minions matched by a compiled compound target,
+        skipping the right operand of ``and`` when the left one matched no
+        minions and of ``or`` when it matched them all
+        '''
+        if node[0] == 'and':
+            matched = self._eval_compound(node[1], minions, ref, greedy)
+            if not matched:
+                return matched
+            return matched & self._eval_compound(node[2], minions, ref, greedy)
+        if node[0] == 'or':
+            matched = self._eval_compound(node[1], minions, ref, greedy)
+            if matched >= minions:
+                return matched
+            return matched | self._eval_compound(node[2], minions, ref, greedy)
+        if node[0] == 'not':
+            return minions - self._eval_compound(node[1], minions, ref, greedy)
+        _, engine, pattern, delimiter, word = node
+        if engine is None:
+            # The match is not explicitly defined, evaluate as a glob
+            return set(self._check_glob_minions(word, True))
+        if engine not in ref:
+            raise ValueError('unrecognized target engine "{0}" for target '
+                             'expression "{1}"'.format(engine, word))
+        engine_args = [pattern]
+        if engine in ('G', 'P', 'I', 'J'):
+            engine_args.append(delimiter or ':')
+        engine_args.append(greedy)
+        return set(ref[engine](*engine_args))
+
     def _check_compound_minions(self,
                                 expr,
                                 delimiter,
@@ -445,127 +883,24 @@ class CkMinions(object):
         log.debug('minions: {0}'.format(minions))
 
         if self.opts.get('minion_data_cache', False):
+            tree = compile_compound(expr)
+            if tree is None:
+                return []
             ref = {'G': self._check_grain_minions,
                    'P': self._check_grain_pcre_minions,
                    'I': self._check_pillar_minions,
                    'J': self._check_pillar_pcre_minions,
                    'L': self._check_list_minions,
-                   'N': None,    # nodegroups should already be expanded
                    'S': self._check_ipcidr_minions,
                    'E': self._check_pcre_minions,
                    'R': self._all_minions}
             if pillar_exact:
                 ref['I'] = self._check_pillar_exact_minions
                 ref['J'] = self._check_pillar_exact_minions
-
-            results = []
-            unmatched = []
-            opers = ['and', 'or', 'not', '(', ')']
-
-            if isinstance(expr, six.string_types):
-                words = expr.split()
-            else:
-                words = expr
-
-            for word in words:
-                target_info = parse_target(word)
-
-                # Easy check first
-                if word in opers:
-                    if results:
-                        if results[-1] == '(' and word in ('and', 'or'):
-                            log.error('Invalid beginning operator after "(": {0}'.format(word))
-                            return []
-                        if word == 'not':
-                            if not results[-1] in ('&', '|', '('):
-                                results.append('&')
-                            results.append('(')
-                            results.append(str(set(minions)))
-                            results.append('-')
-                            unmatched.append('-')
-                        elif word == 'and':
-                            results.append('&')
-                        elif word == 'or':
-                            results.append('|')
-                        elif word == '(':
-                            results.append(word)
-                            unmatched.append(word)
-                        elif word == ')':
-                            if not unmatched or unmatched[-1] != '(':
-                                log.error('Invalid compound expr (unexpected '
-                                          'right parenthesis): {0}'
-                                          .format(expr))
-                                return []
-                            results.append(word)
-                            unmatched.pop()
-                            if unmatched and unmatched[-1] == '-':
-                                results.append(')')
-                                unmatched.pop()
-                        else:  # Won't get here, unless oper is added
-                            log.error('Unhandled oper in compound expr: {0}'
-                                      .format(expr))
-                            return []
-                    else:
-                        # seq start with oper, fail
-                        if word == 'not':
-                            results.append('(')
-                            results.append(str(set(minions)))
-                            results.append('-')
-                            unmatched.append('-')
-                        elif word == '(':
-                            results.append(word)
-                            unmatched.append(word)
-                        else:
-                            log.error(
-                                'Expression may begin with'
-                                ' binary operator: {0}'.format(word)
-                            )
-                            return []
-
-                elif target_info and target_info['engine']:
-                    if 'N' == target_info['engine']:
-                        # Nodegroups should already be expanded/resolved to other engines
-                        log.error('Detected nodegroup expansion failure of "{0}"'.format(word))
-                        return []
-                    engine = ref.get(target_info['engine'])
-                    if not engine:
-                        # If an unknown engine is called at any time, fail out
-                        log.error(
-                            'Unrecognized target engine "{0}" for'
-                            ' target expression "{1}"'.format(
-                                target_info['engine'],
-                                word,
-                            )
-                        )
-                        return []
-
-                    engine_args = [target_info['pattern']]
-                    if target_info['engine'] in ('G', 'P', 'I', 'J'):
-                        engine_args.append(target_info['delimiter'] or ':')
-                    engine_args.append(greedy)
-
-                    results.append(str(set(engine(*engine_args))))
-                    if unmatched and unmatched[-1] == '-':
-                        results.append(')')
-                        unmatched.pop()
-
-                else:
-                    # The match is not explicitly defined, evaluate as a glob
-                    results.append(str(set(self._check_glob_minions(word, True))))
-                    if unmatched and unmatched[-1] == '-':
-                        results.append(')')
-                        unmatched.pop()
-
-            # Add a closing ')' for each item left in unmatched
-            results.extend([')' for item in unmatched])
-
-            results = ' '.join(results)
-            log.debug('Evaluating final compound matching expr: {0}'
-                      .format(results))
             try:
-                return list(eval(results))  # pylint: disable=W0123
-            except Exception:
-                log.error('Invalid compound target: {0}'.format(expr))
+                return list(self._eval_compound(tree, minions, ref, greedy))
+            except ValueError as exc:
+                log.error('Invalid compound target {0}: {1}'.format(expr, exc))
                 return []
 
         return list(minions)
@@ -616,6 +951,9 @@ class CkMinions(object):
         '''
         Return a list of all minions that have auth'd
         '''
+        registry = self.registry
+        if registry is not None:
+            return registry.minions()
         mlist = []
         for fn_ in salt.utils.isorted(os.listdir(os.path.join(self.opts['pki_dir'], self.acc))):
             if not fn_.startswith('.') and os.path.isfile(os.path.join(self.opts['pki_dir'], self.acc, fn_)):
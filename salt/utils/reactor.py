@@ -2,15 +2,22 @@
 from __future__ import absolute_import
 
 # Import python libs
+import copy
 import fnmatch
 import glob
+import json
 import logging
+import os
+import re
 
+import jinja2
+import jinja2.meta
 import yaml
 
 # Import salt libs
 import salt.runner
 import salt.state
+import salt.template
 import salt.utils
 import salt.utils.cache
 import salt.utils.event
@@ -20,6 +27,88 @@ from salt.ext.six import string_types, iterkeys
 from salt._compat import string_types
 log = logging.getLogger(__name__)
 
+# Renderers whose output only depends on the file contents, and for jinja on
+# the variables the template uses
+STATIC_RENDERERS = frozenset(('jinja', 'yaml', 'json', 'yamlex'))
+# The variables of the event, a jinja template using none of the other
+# variables renders the same for the same values of these
+EVENT_VARS = ('tag', 'data')
+# How long, in seconds, the local copy of a salt:// reaction file is used
+# before it is fetched again from the fileserver
+SALT_REF_TTL = 10
+
+
+class TagMatcher(object):
+    '''
+    Match event tags against the tag globs of a reactor map
+
+    Literal tags are looked up in a dict. Globs are stored in a prefix trie
+    keyed on the literal part before their first glob character, so an event
+    tag is only tested against the globs which share its prefix.
+    '''
+    GLOB_CHARS = frozenset('*?[')
+
+    def __init__(self, react_map):
+        self.literal = {}
+        self.trie = {}
+        self.size = 0
+        for ropt in react_map:
+            if not isinstance(ropt, dict):
+                continue
+            if len(ropt) != 1:
+                continue
+            key = next(iterkeys(ropt))
+            val = ropt[key]
+            if not isinstance(key, string_types):
+                continue
+            if isinstance(val, string_types):
+                val = [val]
+            elif not isinstance(val, list):
+                continue
+            self.add(key, val)
+
+    def add(self, tag, reactors):
+        '''
+        Add the reactors for a tag glob, matches are returned in the order
+        the globs were added
+        '''
+        tag = os.path.normcase(tag)
+        entry = (self.size, reactors)
+        self.size += 1
+        for pos, char in enumerate(tag):
+            if char in self.GLOB_CHARS:
+                break
+        else:
+            self.literal.setdefault(tag, []).append(entry)
+            return
+        node = self.trie
+        for char in tag[:pos]:
+            node = node.setdefault(char, {})
+        match = re.compile(fnmatch.translate(tag)).match
+        node.setdefault(None, []).append((match,) + entry)
+
+    def match(self, tag):
+        '''
+        Return the list of reactors for the given tag
+        '''
+        tag = os.path.normcase(tag)
+        found = list(self.literal.get(tag, ()))
+        node = self.trie
+        pos = 0
+        while node is not None:
+            for match, idx, reactors in node.get(None, ()):
+                if match(tag):
+                    found.append((idx, reactors))
+            if pos == len(tag):
+                break
+            node = node.get(tag[pos])
+            pos += 1
+        found.sort(key=lambda entry: entry[0])
+        ret = []
+        for _, reactors in found:
+            ret.extend(reactors)
+        return ret
+
 
 class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.state.Compiler):
     '''
@@ -34,6 +123,17 @@ class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.stat
         local_minion_opts['file_client'] = 'local'
         self.minion = salt.minion.MasterMinion(local_minion_opts)
         salt.state.Compiler.__init__(self, opts, self.minion.rend)
+        # The compiled reactor map, rebuilt when the map changes
+        self._matcher = None
+        self._matcher_stamp = None
+        # Local paths of salt:// reaction files, the files are only fetched
+        # again from the fileserver once their entry expired
+        self._cached_refs = salt.utils.cache.CacheDict(
+            min(opts.get('reactor_refresh_interval', 60), SALT_REF_TTL))
+        # Maps a reaction file to its (mtime, size), the event variables it
+        # uses, their values and its rendered data. The data is not kept for
+        # files which use anything else than the event variables.
+        self._render_cache = {}
 
     # We need __setstate__ and __getstate__ to avoid pickling errors since
     # 'self.rend' (from salt.state.Compiler) contains a function reference
@@ -58,16 +158,19 @@ class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.stat
         react = {}
 
         if glob_ref.startswith('salt://'):
-            glob_ref = self.minion.functions['cp.cache_file'](glob_ref)
+            url = glob_ref
+            # CacheDict only expires the entries on item access, not on get
+            glob_ref = self._cached_refs[url] if url in self._cached_refs else None
+            if glob_ref is None:
+                glob_ref = self.minion.functions['cp.cache_file'](url)
+                if glob_ref:
+                    self._cached_refs[url] = glob_ref
         globbed_ref = glob.glob(glob_ref)
         if not globbed_ref:
             log.error('Can not render SLS {0} for tag {1}. File missing or not found.'.format(glob_ref, tag))
         for fn_ in globbed_ref:
             try:
-                res = self.render_template(
-                    fn_,
-                    tag=tag,
-                    data=data)
+                res = self._render_cached(fn_, tag, data)
 
                 # for #20841, inject the sls name here since verify_high()
                 # assumes it exists in case there are any errors
@@ -79,44 +182,125 @@ class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.stat
                 log.error('Failed to render "{0}": '.format(fn_), exc_info=True)
         return react
 
+    def _render_cached(self, fn_, tag, data):
+        '''
+        Render a reaction file, reusing the last rendered data of the file
+        when it only depends on its contents and on event variables which
+        have the same values
+        '''
+        try:
+            stat = os.stat(fn_)
+        except OSError:
+            return self.render_template(fn_, tag=tag, data=data)
+        stamp = (stat.st_mtime, stat.st_size)
+        cached = self._render_cache.get(fn_)
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, self._event_vars(fn_), None, None)
+        names = cached[1]
+        if names is None:
+            self._render_cache[fn_] = cached
+            return self.render_template(fn_, tag=tag, data=data)
+        key = self._event_key(names, tag, data)
+        if key is not None and cached[2] == key:
+            return copy.deepcopy(cached[3])
+        res = self.render_template(fn_, tag=tag, data=data)
+        if key is not None:
+            self._render_cache[fn_] = (stamp, names, key, copy.deepcopy(res))
+        else:
+            self._render_cache[fn_] = cached
+        return res
+
+    @staticmethod
+    def _event_key(names, tag, data):
+        '''
+        Return the values of the event variables used by a reaction file
+        serialized, or None if they can not be
+        '''
+        values = {'tag': tag, 'data': data}
+        try:
+            return json.dumps([values[name] for name in names], sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+
+    def _event_vars(self, fn_):
+        '''
+        Return the event variables the rendered data of a reaction file
+        depends on, or None if it may depend on anything else than them and
+        the file contents: other variables like salt or pillar, or other
+        templates it includes
+        '''
+        try:
+            pipe = salt.template.template_shebang(
+                fn_,
+                self.rend,
+                self.opts['renderer'],
+                self.opts['renderer_blacklist'],
+                self.opts['renderer_whitelist'],
+                '')
+            names = [render.__module__.split('.')[-1] for render, _ in pipe]
+            if not names or not STATIC_RENDERERS.issuperset(names):
+                return None
+            if 'jinja' not in names:
+                return ()
+            with salt.utils.fopen(fn_, 'r') as fp_:
+                ast = jinja2.Environment().parse(fp_.read())
+            if list(jinja2.meta.find_referenced_templates(ast)):
+                return None
+            used = jinja2.meta.find_undeclared_variables(ast)
+            if not used.issubset(EVENT_VARS):
+                return None
+            return tuple(name for name in EVENT_VARS if name in used)
+        except Exception:
+            return None
+
+    def _read_react_map(self):
+        '''
+        Read and parse the reactor map file
+        '''
+        try:
+            with salt.utils.fopen(self.opts['reactor']) as fp_:
+                return yaml.safe_load(fp_.read()) or []
+        except (OSError, IOError):
+            log.error(
+                'Failed to read reactor map: "{0}"'.format(
+                    self.opts['reactor']
+                    )
+                )
+        except Exception:
+            log.error(
+                'Failed to parse YAML in reactor map: "{0}"'.format(
+                    self.opts['reactor']
+                    )
+                )
+        return []
+
+    def compiled_map(self):
+        '''
+        Return the TagMatcher of the reactor map, the map file is only read
+        again once its mtime or size changes
+        '''
+        reactor = self.opts['reactor']
+        if isinstance(reactor, string_types):
+            try:
+                stat = os.stat(reactor)
+                stamp = (reactor, stat.st_mtime, stat.st_size)
+            except OSError:
+                stamp = (reactor, None, None)
+            if self._matcher is None or self._matcher_stamp != stamp:
+                self._matcher = TagMatcher(self._read_react_map())
+                self._matcher_stamp = stamp
+        elif self._matcher is None or self._matcher_stamp != id(reactor):
+            self._matcher = TagMatcher(reactor)
+            self._matcher_stamp = id(reactor)
+        return self._matcher
+
     def list_reactors(self, tag):
         '''
         Take in the tag from an event and return a list of the reactors to
         process
         '''
         log.debug('Gathering reactors for tag {0}'.format(tag))
-        reactors = []
-        if isinstance(self.opts['reactor'], string_types):
-            try:
-                with salt.utils.fopen(self.opts['reactor']) as fp_:
-                    react_map = yaml.safe_load(fp_.read())
-            except (OSError, IOError):
-                log.error(
-                    'Failed to read reactor map: "{0}"'.format(
-                        self.opts['reactor']
-                        )
-                    )
-            except Exception:
-                log.error(
-                    'Failed to parse YAML in reactor map: "{0}"'.format(
-                        self.opts['reactor']
-                        )
-                    )
-        else:
-            react_map = self.opts['reactor']
-        for ropt in react_map:
-            if not isinstance(ropt, dict):
-                continue
-            if len(ropt) != 1:
-                continue
-            key = next(iterkeys(ropt))
-            val = ropt[key]
-            if fnmatch.fnmatch(tag, key):
-                if isinstance(val, string_types):
-                    reactors.append(val)
-                elif isinstance(val, list):
-                    reactors.extend(val)
-        return reactors
+        return self.compiled_map().match(tag)
 
     def list_all(self):
         '''
@@ -124,21 +308,7 @@ class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.stat
         '''
         if isinstance(self.minion.opts['reactor'], string_types):
             log.debug('Reading reactors from yaml {0}'.format(self.opts['reactor']))
-            try:
-                with salt.utils.fopen(self.opts['reactor']) as fp_:
-                    react_map = yaml.safe_load(fp_.read())
-            except (OSError, IOError):
-                log.error(
-                    'Failed to read reactor map: "{0}"'.format(
-                        self.opts['reactor']
-                        )
-                    )
-            except Exception:
-                log.error(
-                    'Failed to parse YAML in reactor map: "{0}"'.format(
-                        self.opts['reactor']
-                        )
-                    )
+            react_map = self._read_react_map()
         else:
             log.debug('Not reading reactors from yaml')
             react_map = self.minion.opts['reactor']
@@ -155,6 +325,7 @@ class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.stat
                 return {'status': False, 'comment': 'Reactor already exists.'}
 
         self.minion.opts['reactor'].append({tag: reaction})
+        self._matcher = None
         return {'status': True, 'comment': 'Reactor added.'}
 
     def delete_reactor(self, tag):
@@ -166,6 +337,7 @@ class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.stat
             _tag = next(iterkeys(reactor))
             if _tag == tag:
                 self.minion.opts['reactor'].remove(reactor)
+                self._matcher = None
                 return {'status': True, 'comment': 'Reactor deleted.'}
 
         return {'status': False, 'comment': 'Reactor does not exists.'}
@@ -326,6 +326,7 @@ import sys
 import time
 import signal
 import datetime
+import heapq
 import itertools
 import threading
 import logging
@@ -371,6 +372,29 @@ except ImportError:
 
 log = logging.getLogger(__name__)
 
+_TIME_ELEMENTS = ('seconds', 'minutes', 'hours', 'days')
+_SCHEDULING_ELEMENTS = ('when', 'cron', 'once')
+
+_INVALID_SCHED_COMBOS = [set(i)
+        for i in itertools.combinations(_SCHEDULING_ELEMENTS, 2)]
+
+_INVALID_TIME_COMBOS = []
+for _item in _SCHEDULING_ELEMENTS:
+    _INVALID_TIME_COMBOS.append(
+        set(itertools.combinations(itertools.chain([_item], _TIME_ELEMENTS), 2)))
+del _item
+
+
+def _job_seconds(data):
+    '''
+    Add up the time elements of a job into its interval in seconds
+    '''
+    seconds = int(data.get('seconds', 0))
+    seconds += int(data.get('minutes', 0)) * 60
+    seconds += int(data.get('hours', 0)) * 3600
+    seconds += int(data.get('days', 0)) * 86400
+    return seconds
+
 
 class Schedule(object):
     '''
@@ -413,6 +437,11 @@ class Schedule(object):
         self.schedule_returner = self.option('schedule_returner')
         # Keep track of the lowest loop interval needed in this variable
         self.loop_interval = six.MAXSIZE
+        # Heap of (next fire time, sequence, job name), rebuilt from the
+        # schedule when it changes
+        self._fire_queue = None
+        self._fire_queue_ref = None
+        self._fire_queue_seq = 0
         clean_proc_dir(opts)
         if cleanup:
             for prefix in cleanup:
@@ -477,6 +506,8 @@ class Schedule(object):
             schedule = self.opts['pillar']['schedule']
             log.warning('Pillar schedule deleted. Pillar refresh recommended. Run saltutil.refresh_pillar.')
 
+        self._reset_fire_queue()
+
         # Fire the complete event back along with updated list of schedule
         evt = salt.utils.event.get_event('minion', opts=self.opts, listen=False)
         evt.fire_event({'complete': True, 'schedule': schedule},
@@ -508,6 +539,8 @@ class Schedule(object):
             schedule = self.opts['pillar']['schedule']
             log.warning('Pillar schedule deleted. Pillar refresh recommended. Run saltutil.refresh_pillar.')
 
+        self._reset_fire_queue()
+
         # Fire the complete event back along with updated list of schedule
         evt = salt.utils.event.get_event('minion', opts=self.opts, listen=False)
         evt.fire_event({'complete': True, 'schedule': schedule},
@@ -552,6 +585,8 @@ class Schedule(object):
 
         schedule.update(data)
 
+        self._reset_fire_queue()
+
         # Fire the complete event back along with updated list of schedule
         evt = salt.utils.event.get_event('minion', opts=self.opts, listen=False)
         evt.fire_event({'complete': True, 'schedule': schedule},
@@ -571,6 +606,8 @@ class Schedule(object):
             schedule = self.option('schedule')
             schedule[name]['enabled'] = True
 
+        self._reset_fire_queue()
+
         # Fire the complete event back along with updated list of schedule
         evt = salt.utils.event.get_event('minion', opts=self.opts, listen=False)
         evt.fire_event({'complete': True, 'schedule': schedule},
@@ -592,6 +629,8 @@ class Schedule(object):
             schedule = self.option('schedule')
             schedule[name]['enabled'] = False
 
+        self._reset_fire_queue()
+
         # Fire the complete event back along with updated list of schedule
         evt = salt.utils.event.get_event('minion', opts=self.opts, listen=False)
         evt.fire_event({'complete': True, 'schedule': schedule},
@@ -615,6 +654,8 @@ class Schedule(object):
                 self.delete_job(name, persist, where=where)
             self.option('schedule')[name] = schedule
 
+        self._reset_fire_queue()
+
         if persist:
             self.persist()
 
@@ -672,6 +713,8 @@ class Schedule(object):
         schedule = self.option('schedule')
         schedule['enabled'] = True
 
+        self._reset_fire_queue()
+
         # Fire the complete event back along with updated list of schedule
         evt = salt.utils.event.get_event('minion', opts=self.opts, listen=False)
         evt.fire_event({'complete': True, 'schedule': schedule},
@@ -699,6 +742,7 @@ class Schedule(object):
         if 'schedule' in schedule:
             schedule = schedule['schedule']
         self.opts.setdefault('schedule', {}).update(schedule)
+        self._reset_fire_queue()
 
     def list(self, where):
         '''
@@ -914,231 +958,227 @@ class Schedule(object):
     def eval(self):
         '''
         Evaluate and execute the schedule
+
+        The time at which each job has to be evaluated next is kept in a
+        heap, so a tick only looks at the jobs which are due.
         '''
         schedule = self.option('schedule')
         if not isinstance(schedule, dict):
             raise ValueError('Schedule must be of type dict.')
         if 'enabled' in schedule and not schedule['enabled']:
             return
-        for job, data in six.iteritems(schedule):
-            if job == 'enabled' or not data:
-                continue
-            if not isinstance(data, dict):
-                log.error('Scheduled job "{0}" should have a dict value, not {1}'.format(job, type(data)))
-                continue
-            # Job is disabled, continue
-            if 'enabled' in data and not data['enabled']:
-                continue
-            if 'function' in data:
-                func = data['function']
-            elif 'func' in data:
-                func = data['func']
-            elif 'fun' in data:
-                func = data['fun']
-            else:
-                func = None
-            if func not in self.functions:
-                log.info(
-                    'Invalid function: {0} in scheduled job {1}.'.format(
-                        func, job
-                    )
-                )
-            if 'name' not in data:
-                data['name'] = job
-            # Add up how many seconds between now and then
-            when = 0
-            seconds = 0
-            cron = 0
-            now = int(time.time())
-
-            if 'until' in data:
-                if not _WHEN_SUPPORTED:
-                    log.error('Missing python-dateutil. '
-                              'Ignoring until.')
-                else:
-                    until__ = dateutil_parser.parse(data['until'])
-                    until = int(time.mktime(until__.timetuple()))
-
-                    if until <= now:
-                        log.debug('Until time has passed '
-                                  'skipping job: {0}.'.format(data['name']))
-                        continue
-
-            if 'after' in data:
-                if not _WHEN_SUPPORTED:
-                    log.error('Missing python-dateutil. '
-                              'Ignoring after.')
-                else:
-                    after__ = dateutil_parser.parse(data['after'])
-                    after = int(time.mktime(after__.timetuple()))
-
-                    if after >= now:
-                        log.debug('After time has not passed '
-                                  'skipping job: {0}.'.format(data['name']))
-                        continue
-
-            # Used for quick lookups when detecting invalid option combinations.
-            schedule_keys = set(data.keys())
-
-            time_elements = ('seconds', 'minutes', 'hours', 'days')
-            scheduling_elements = ('when', 'cron', 'once')
-
-            invalid_sched_combos = [set(i)
-                    for i in itertools.combinations(scheduling_elements, 2)]
-
-            if any(i <= schedule_keys for i in invalid_sched_combos):
-                log.error('Unable to use "{0}" options together. Ignoring.'
-                          .format('", "'.join(scheduling_elements)))
+        if self._fire_queue_stale(schedule):
+            self._build_fire_queue(schedule)
+
+        # Only the jobs whose next fire time has come are evaluated, the
+        # others are left alone until then
+        queue = self._fire_queue
+        now = int(time.time())
+        due = []
+        while queue and queue[0][0] <= now:
+            due.append(heapq.heappop(queue)[2])
+        for job in due:
+            data = schedule.get(job)
+            if not data:
                 continue
+            next_fire = self._eval_job(job, data)
+            if next_fire is not None:
+                self._push_job(queue, next_fire, job)
 
-            invalid_time_combos = []
-            for item in scheduling_elements:
-                all_items = itertools.chain([item], time_elements)
-                invalid_time_combos.append(
-                    set(itertools.combinations(all_items, 2)))
-
-            if any(set(x) <= schedule_keys for x in invalid_time_combos):
-                log.error('Unable to use "{0}" with "{1}" options. Ignoring'
-                          .format('", "'.join(time_elements),
-                                  '", "'.join(scheduling_elements)))
-                continue
+    def _fire_queue_stale(self, schedule):
+        '''
+        Return True when the schedule was changed behind the back of the
+        methods which reset the fire queue, e.g. a pillar or grains refresh
+        '''
+        if self._fire_queue is None:
+            return True
+        ref, size, pillar, grains = self._fire_queue_ref
+        return (ref is not schedule or size != len(schedule)
+                or pillar is not self.opts.get('pillar')
+                or grains is not self.opts.get('grains'))
+
+    def _build_fire_queue(self, schedule):
+        '''
+        Queue every job of the schedule to be evaluated on the next tick
+        '''
+        self._fire_queue = []
+        self._fire_queue_ref = (schedule, len(schedule),
+                                self.opts.get('pillar'), self.opts.get('grains'))
+        for job in schedule:
+            if job != 'enabled':
+                self._push_job(self._fire_queue, 0, job)
+
+    def _push_job(self, queue, next_fire, job):
+        '''
+        Add a job to the fire queue, the sequence number keeps jobs due at the
+        same time in schedule order
+        '''
+        self._fire_queue_seq += 1
+        heapq.heappush(queue, (next_fire, self._fire_queue_seq, job))
 
-            if True in [True for item in time_elements if item in data]:
-                # Add up how many seconds between now and then
-                seconds += int(data.get('seconds', 0))
-                seconds += int(data.get('minutes', 0)) * 60
-                seconds += int(data.get('hours', 0)) * 3600
-                seconds += int(data.get('days', 0)) * 86400
-            elif 'once' in data:
-                once_fmt = data.get('once_fmt', '%Y-%m-%dT%H:%M:%S')
+    def _reset_fire_queue(self):
+        '''
+        Have all the jobs evaluated again on the next tick, to be called
+        whenever the schedule is modified
+        '''
+        self._fire_queue = None
 
-                try:
-                    once = datetime.datetime.strptime(data['once'], once_fmt)
-                    once = int(time.mktime(once.timetuple()))
-                except (TypeError, ValueError):
-                    log.error('Date string could not be parsed: %s, %s',
-                            data['once'], once_fmt)
-                    continue
+    def _eval_job(self, job, data):
+        '''
+        Evaluate and execute a single scheduled job, return the time at which
+        it has to be evaluated again or None if only a change to the schedule
+        can make it run
+        '''
+        if not isinstance(data, dict):
+            log.error('Scheduled job "{0}" should have a dict value, not {1}'.format(job, type(data)))
+            return
+        # Job is disabled, continue
+        if 'enabled' in data and not data['enabled']:
+            return
+        if 'function' in data:
+            func = data['function']
+        elif 'func' in data:
+            func = data['func']
+        elif 'fun' in data:
+            func = data['fun']
+        else:
+            func = None
+        if func not in self.functions:
+            log.info(
+                'Invalid function: {0} in scheduled job {1}.'.format(
+                    func, job
+                )
+            )
+        if 'name' not in data:
+            data['name'] = job
+        # Add up how many seconds between now and then
+        when = 0
+        seconds = 0
+        cron = 0
+        now = int(time.time())
+
+        if 'until' in data:
+            if not _WHEN_SUPPORTED:
+                log.error('Missing python-dateutil. '
+                          'Ignoring until.')
+            else:
+                until__ = dateutil_parser.parse(data['until'])
+                until = int(time.mktime(until__.timetuple()))
+
+                if until <= now:
+                    log.debug('Until time has passed '
+                              'skipping job: {0}.'.format(data['name']))
+                    return
+
+        if 'after' in data:
+            if not _WHEN_SUPPORTED:
+                log.error('Missing python-dateutil. '
+                          'Ignoring after.')
+            else:
+                after__ = dateutil_parser.parse(data['after'])
+                after = int(time.mktime(after__.timetuple()))
 
-                if now != once:
-                    continue
-                else:
-                    seconds = 1
+                if after >= now:
+                    log.debug('After time has not passed '
+                              'skipping job: {0}.'.format(data['name']))
+                    return after + 1
 
-            elif 'when' in data:
-                if not _WHEN_SUPPORTED:
-                    log.error('Missing python-dateutil. '
-                              'Ignoring job {0}.'.format(job))
-                    continue
+        # Used for quick lookups when detecting invalid option combinations.
+        schedule_keys = set(data.keys())
 
-                if isinstance(data['when'], list):
-                    _when = []
-                    for i in data['when']:
-                        if ('pillar' in self.opts and 'whens' in self.opts['pillar'] and
-                                i in self.opts['pillar']['whens']):
-                            if not isinstance(self.opts['pillar']['whens'],
-                                              dict):
-                                log.error('Pillar item "whens" must be dict. '
-                                          'Ignoring')
-                                continue
-                            __when = self.opts['pillar']['whens'][i]
-                            try:
-                                when__ = dateutil_parser.parse(__when)
-                            except ValueError:
-                                log.error('Invalid date string. Ignoring')
-                                continue
-                        elif ('whens' in self.opts['grains'] and
-                              i in self.opts['grains']['whens']):
-                            if not isinstance(self.opts['grains']['whens'],
-                                              dict):
-                                log.error('Grain "whens" must be dict.'
-                                          'Ignoring')
-                                continue
-                            __when = self.opts['grains']['whens'][i]
-                            try:
-                                when__ = dateutil_parser.parse(__when)
-                            except ValueError:
-                                log.error('Invalid date string. Ignoring')
-                                continue
-                        else:
-                            try:
-                                when__ = dateutil_parser.parse(i)
-                            except ValueError:
-                                log.error('Invalid date string {0}. '
-                                          'Ignoring job {1}.'.format(i, job))
-                                continue
-                        when = int(time.mktime(when__.timetuple()))
-                        if when >= now:
-                            _when.append(when)
-                    _when.sort()
-                    if _when:
-                        # Grab the first element
-                        # which is the next run time
-                        when = _when[0]
-
-                        # If we're switching to the next run in a list
-                        # ensure the job can run
-                        if '_when' in data and data['_when'] != when:
-                            data['_when_run'] = True
-                            data['_when'] = when
-                        seconds = when - now
-
-                        # scheduled time is in the past and the run was not triggered before
-                        if seconds < 0 and not data.get('_when_run', False):
-                            continue
+        if any(i <= schedule_keys for i in _INVALID_SCHED_COMBOS):
+            log.error('Unable to use "{0}" options together. Ignoring.'
+                      .format('", "'.join(_SCHEDULING_ELEMENTS)))
+            return
 
-                        if '_when_run' not in data:
-                            data['_when_run'] = True
+        if any(set(x) <= schedule_keys for x in _INVALID_TIME_COMBOS):
+            log.error('Unable to use "{0}" with "{1}" options. Ignoring'
+                      .format('", "'.join(_TIME_ELEMENTS),
+                              '", "'.join(_SCHEDULING_ELEMENTS)))
+            return
 
-                        # Backup the run time
-                        if '_when' not in data:
-                            data['_when'] = when
+        if True in [True for item in _TIME_ELEMENTS if item in data]:
+            # Add up how many seconds between now and then
+            seconds = _job_seconds(data)
+        elif 'once' in data:
+            once_fmt = data.get('once_fmt', '%Y-%m-%dT%H:%M:%S')
 
-                        # A new 'when' ensure _when_run is True
-                        if when > data['_when']:
-                            data['_when'] = when
-                            data['_when_run'] = True
+            try:
+                once = datetime.datetime.strptime(data['once'], once_fmt)
+                once = int(time.mktime(once.timetuple()))
+            except (TypeError, ValueError):
+                log.error('Date string could not be parsed: %s, %s',
+                        data['once'], once_fmt)
+                return
+
+            if now != once:
+                if once > now:
+                    return once
+                return
+            else:
+                seconds = 1
 
-                    else:
-                        continue
+        elif 'when' in data:
+            if not _WHEN_SUPPORTED:
+                log.error('Missing python-dateutil. '
+                          'Ignoring job {0}.'.format(job))
+                return
 
-                else:
+            if isinstance(data['when'], list):
+                _when = []
+                for i in data['when']:
                     if ('pillar' in self.opts and 'whens' in self.opts['pillar'] and
-                            data['when'] in self.opts['pillar']['whens']):
-                        if not isinstance(self.opts['pillar']['whens'], dict):
-                            log.error('Pillar item "whens" must be dict.'
+                            i in self.opts['pillar']['whens']):
+                        if not isinstance(self.opts['pillar']['whens'],
+                                          dict):
+                            log.error('Pillar item "whens" must be dict. '
                                       'Ignoring')
                             continue
-                        _when = self.opts['pillar']['whens'][data['when']]
+                        __when = self.opts['pillar']['whens'][i]
                         try:
-                            when__ = dateutil_parser.parse(_when)
+                            when__ = dateutil_parser.parse(__when)
                         except ValueError:
                             log.error('Invalid date string. Ignoring')
                             continue
                     elif ('whens' in self.opts['grains'] and
-                          data['when'] in self.opts['grains']['whens']):
-                        if not isinstance(self.opts['grains']['whens'], dict):
-                            log.error('Grain "whens" must be dict. Ignoring')
+                          i in self.opts['grains']['whens']):
+                        if not isinstance(self.opts['grains']['whens'],
+                                          dict):
+                            log.error('Grain "whens" must be dict.'
+                                      'Ignoring')
                             continue
-                        _when = self.opts['grains']['whens'][data['when']]
+                        __when = self.opts['grains']['whens'][i]
                         try:
-                            when__ = dateutil_parser.parse(_when)
+                            when__ = dateutil_parser.parse(__when)
                         except ValueError:
                             log.error('Invalid date string. Ignoring')
                             continue
                     else:
                         try:
-                            when__ = dateutil_parser.parse(data['when'])
+                            when__ = dateutil_parser.parse(i)
                         except ValueError:
-                            log.error('Invalid date string. Ignoring')
+                            log.error('Invalid date string {0}. '
+                                      'Ignoring job {1}.'.format(i, job))
                             continue
                     when = int(time.mktime(when__.timetuple()))
-                    now = int(time.time())
+                    if when >= now:
+                        _when.append(when)
+                _when.sort()
+                if _when:
+                    # Grab the first element
+                    # which is the next run time
+                    when = _when[0]
+
+                    # If we're switching to the next run in a list
+                    # ensure the job can run
+                    if '_when' in data and data['_when'] != when:
+                        data['_when_run'] = True
+                        data['_when'] = when
                     seconds = when - now
 
                     # scheduled time is in the past and the run was not triggered before
                     if seconds < 0 and not data.get('_when_run', False):
-                        continue
+                        return
 
                     if '_when_run' not in data:
                         data['_when_run'] = True
@@ -1152,180 +1192,257 @@ class Schedule(object):
                         data['_when'] = when
                         data['_when_run'] = True
 
-            elif 'cron' in data:
-                if not _CRON_SUPPORTED:
-                    log.error('Missing python-croniter. Ignoring job {0}'.format(job))
-                    continue
+                else:
+                    return
 
-                now = int(time.mktime(datetime.datetime.now().timetuple()))
-                try:
-                    cron = int(croniter.croniter(data['cron'], now).get_next())
-                except (ValueError, KeyError):
-                    log.error('Invalid cron string. Ignoring')
-                    continue
-                seconds = cron - now
             else:
-                continue
-
-            # Check if the seconds variable is lower than current lowest
-            # loop interval needed. If it is lower than overwrite variable
-            # external loops using can then check this variable for how often
-            # they need to reschedule themselves
-            # Not used with 'when' parameter, causes run away jobs and CPU
-            # spikes.
-            if 'when' not in data:
-                if seconds < self.loop_interval:
-                    self.loop_interval = seconds
-            run = False
-
-            if 'splay' in data:
-                if 'when' in data:
-                    log.error('Unable to use "splay" with "when" option at this time. Ignoring.')
-                elif 'cron' in data:
-                    log.error('Unable to use "splay" with "cron" option at this time. Ignoring.')
+                if ('pillar' in self.opts and 'whens' in self.opts['pillar'] and
+                        data['when'] in self.opts['pillar']['whens']):
+                    if not isinstance(self.opts['pillar']['whens'], dict):
+                        log.error('Pillar item "whens" must be dict.'
+                                  'Ignoring')
+                        return
+                    _when = self.opts['pillar']['whens'][data['when']]
+                    try:
+                        when__ = dateutil_parser.parse(_when)
+                    except ValueError:
+                        log.error('Invalid date string. Ignoring')
+                        return
+                elif ('whens' in self.opts['grains'] and
+                      data['when'] in self.opts['grains']['whens']):
+                    if not isinstance(self.opts['grains']['whens'], dict):
+                        log.error('Grain "whens" must be dict. Ignoring')
+                        return
+                    _when = self.opts['grains']['whens'][data['when']]
+                    try:
+                        when__ = dateutil_parser.parse(_when)
+                    except ValueError:
+                        log.error('Invalid date string. Ignoring')
+                        return
                 else:
-                    if '_seconds' not in data:
-                        log.debug('The _seconds parameter is missing, '
-                                  'most likely the first run or the schedule '
-                                  'has been refreshed refresh.')
-                        if 'seconds' in data:
-                            data['_seconds'] = data['seconds']
-                        else:
-                            data['_seconds'] = 0
+                    try:
+                        when__ = dateutil_parser.parse(data['when'])
+                    except ValueError:
+                        log.error('Invalid date string. Ignoring')
+                        return
+                when = int(time.mktime(when__.timetuple()))
+                now = int(time.time())
+                seconds = when - now
+
+                # scheduled time is in the past and the run was not triggered before
+                if seconds < 0 and not data.get('_when_run', False):
+                    return
+
+                if '_when_run' not in data:
+                    data['_when_run'] = True
+
+                # Backup the run time
+                if '_when' not in data:
+                    data['_when'] = when
+
+                # A new 'when' ensure _when_run is True
+                if when > data['_when']:
+                    data['_when'] = when
+                    data['_when_run'] = True
+
+        elif 'cron' in data:
+            if not _CRON_SUPPORTED:
+                log.error('Missing python-croniter. Ignoring job {0}'.format(job))
+                return
+
+            now = int(time.mktime(datetime.datetime.now().timetuple()))
+            try:
+                cron = int(croniter.croniter(data['cron'], now).get_next())
+            except (ValueError, KeyError):
+                log.error('Invalid cron string. Ignoring')
+                return
+            seconds = cron - now
+        else:
+            return
 
+        # Check if the seconds variable is lower than current lowest
+        # loop interval needed. If it is lower than overwrite variable
+        # external loops using can then check this variable for how often
+        # they need to reschedule themselves
+        # Not used with 'when' parameter, causes run away jobs and CPU
+        # spikes.
+        if 'when' not in data:
+            if seconds < self.loop_interval:
+                self.loop_interval = seconds
+        run = False
+
+        if 'splay' in data:
             if 'when' in data:
-                # scheduled time is now or in the past, and the run was triggered before
-                if seconds <= 0 and data['_when_run']:
-                    data['_when_run'] = False
-                    run = True
+                log.error('Unable to use "splay" with "when" option at this time. Ignoring.')
             elif 'cron' in data:
-                if seconds == 1:
+                log.error('Unable to use "splay" with "cron" option at this time. Ignoring.')
+            else:
+                if '_seconds' not in data:
+                    log.debug('The _seconds parameter is missing, '
+                              'most likely the first run or the schedule '
+                              'has been refreshed refresh.')
+                    if 'seconds' in data:
+                        data['_seconds'] = data['seconds']
+                    else:
+                        data['_seconds'] = 0
+
+        if 'when' in data:
+            # scheduled time is now or in the past, and the run was triggered before
+            if seconds <= 0 and data['_when_run']:
+                data['_when_run'] = False
+                run = True
+        elif 'cron' in data:
+            if seconds == 1:
+                run = True
+        else:
+            if job in self.intervals:
+                if now - self.intervals[job] >= seconds:
                     run = True
             else:
-                if job in self.intervals:
-                    if now - self.intervals[job] >= seconds:
+                # If run_on_start is True, the job will run when the Salt
+                # minion start.  If the value is False will run at the next
+                # scheduled run.  Default is True.
+                if 'run_on_start' in data:
+                    if data['run_on_start']:
                         run = True
-                else:
-                    # If run_on_start is True, the job will run when the Salt
-                    # minion start.  If the value is False will run at the next
-                    # scheduled run.  Default is True.
-                    if 'run_on_start' in data:
-                        if data['run_on_start']:
-                            run = True
-                        else:
-                            self.intervals[job] = int(time.time())
                     else:
-                        run = True
+                        self.intervals[job] = int(time.time())
+                else:
+                    run = True
 
-            if run:
-                if 'range' in data:
-                    if not _RANGE_SUPPORTED:
-                        log.error('Missing python-dateutil. Ignoring job {0}'.format(job))
-                        continue
-                    else:
-                        if isinstance(data['range'], dict):
-                            try:
-                                start = int(time.mktime(dateutil_parser.parse(data['range']['start']).timetuple()))
-                            except ValueError:
-                                log.error('Invalid date string for start. Ignoring job {0}.'.format(job))
-                                continue
-                            try:
-                                end = int(time.mktime(dateutil_parser.parse(data['range']['end']).timetuple()))
-                            except ValueError:
-                                log.error('Invalid date string for end. Ignoring job {0}.'.format(job))
-                                continue
-                            if end > start:
-                                if 'invert' in data['range'] and data['range']['invert']:
-                                    if now <= start or now >= end:
-                                        run = True
-                                    else:
-                                        run = False
+        if run:
+            if 'range' in data:
+                if not _RANGE_SUPPORTED:
+                    log.error('Missing python-dateutil. Ignoring job {0}'.format(job))
+                    return self._next_fire(job, data, now, when, cron)
+                else:
+                    if isinstance(data['range'], dict):
+                        try:
+                            start = int(time.mktime(dateutil_parser.parse(data['range']['start']).timetuple()))
+                        except ValueError:
+                            log.error('Invalid date string for start. Ignoring job {0}.'.format(job))
+                            return self._next_fire(job, data, now, when, cron)
+                        try:
+                            end = int(time.mktime(dateutil_parser.parse(data['range']['end']).timetuple()))
+                        except ValueError:
+                            log.error('Invalid date string for end. Ignoring job {0}.'.format(job))
+                            return self._next_fire(job, data, now, when, cron)
+                        if end > start:
+                            if 'invert' in data['range'] and data['range']['invert']:
+                                if now <= start or now >= end:
+                                    run = True
                                 else:
-                                    if now >= start and now <= end:
-                                        run = True
-                                    else:
-                                        run = False
+                                    run = False
                             else:
-                                log.error('schedule.handle_func: Invalid range, end must be larger than start. \
-                                         Ignoring job {0}.'.format(job))
-                                continue
+                                if now >= start and now <= end:
+                                    run = True
+                                else:
+                                    run = False
                         else:
-                            log.error('schedule.handle_func: Invalid, range must be specified as a dictionary. \
+                            log.error('schedule.handle_func: Invalid range, end must be larger than start. \
                                      Ignoring job {0}.'.format(job))
-                            continue
+                            return self._next_fire(job, data, now, when, cron)
+                    else:
+                        log.error('schedule.handle_func: Invalid, range must be specified as a dictionary. \
+                                 Ignoring job {0}.'.format(job))
+                        return self._next_fire(job, data, now, when, cron)
 
-            if not run:
-                continue
-            else:
-                if 'splay' in data:
-                    if 'when' in data:
-                        log.error('Unable to use "splay" with "when" option at this time. Ignoring.')
+        if not run:
+            return self._next_fire(job, data, now, when, cron)
+        else:
+            if 'splay' in data:
+                if 'when' in data:
+                    log.error('Unable to use "splay" with "when" option at this time. Ignoring.')
+                else:
+                    if isinstance(data['splay'], dict):
+                        if data['splay']['end'] >= data['splay']['start']:
+                            splay = random.randint(data['splay']['start'], data['splay']['end'])
+                        else:
+                            log.error('schedule.handle_func: Invalid Splay, end must be larger than start. \
+                                     Ignoring splay.')
+                            splay = None
                     else:
-                        if isinstance(data['splay'], dict):
-                            if data['splay']['end'] >= data['splay']['start']:
-                                splay = random.randint(data['splay']['start'], data['splay']['end'])
-                            else:
-                                log.error('schedule.handle_func: Invalid Splay, end must be larger than start. \
-                                         Ignoring splay.')
-                                splay = None
+                        splay = random.randint(0, data['splay'])
+
+                    if splay:
+                        log.debug('schedule.handle_func: Adding splay of '
+                                  '{0} seconds to next run.'.format(splay))
+                        if 'seconds' in data:
+                            data['seconds'] = data['_seconds'] + splay
                         else:
-                            splay = random.randint(0, data['splay'])
+                            data['seconds'] = 0 + splay
 
-                        if splay:
-                            log.debug('schedule.handle_func: Adding splay of '
-                                      '{0} seconds to next run.'.format(splay))
-                            if 'seconds' in data:
-                                data['seconds'] = data['_seconds'] + splay
-                            else:
-                                data['seconds'] = 0 + splay
+            log.info('Running scheduled job: {0}'.format(job))
 
-                log.info('Running scheduled job: {0}'.format(job))
+        if 'jid_include' not in data or data['jid_include']:
+            data['jid_include'] = True
+            log.debug('schedule: This job was scheduled with jid_include, '
+                      'adding to cache (jid_include defaults to True)')
+            if 'maxrunning' in data:
+                log.debug('schedule: This job was scheduled with a max '
+                          'number of {0}'.format(data['maxrunning']))
+            else:
+                log.info('schedule: maxrunning parameter was not specified for '
+                         'job {0}, defaulting to 1.'.format(job))
+                data['maxrunning'] = 1
 
-            if 'jid_include' not in data or data['jid_include']:
-                data['jid_include'] = True
-                log.debug('schedule: This job was scheduled with jid_include, '
-                          'adding to cache (jid_include defaults to True)')
-                if 'maxrunning' in data:
-                    log.debug('schedule: This job was scheduled with a max '
-                              'number of {0}'.format(data['maxrunning']))
-                else:
-                    log.info('schedule: maxrunning parameter was not specified for '
-                             'job {0}, defaulting to 1.'.format(job))
-                    data['maxrunning'] = 1
-
-            multiprocessing_enabled = self.opts.get('multiprocessing', True)
-
-            if salt.utils.is_windows():
-                # Temporarily stash our function references.
-                # You can't pickle function references, and pickling is
-                # required when spawning new processes on Windows.
-                functions = self.functions
-                self.functions = {}
-                returners = self.returners
-                self.returners = {}
-            try:
-                if multiprocessing_enabled:
-                    thread_cls = SignalHandlingMultiprocessingProcess
-                else:
-                    thread_cls = threading.Thread
-                proc = thread_cls(target=self.handle_func, args=(multiprocessing_enabled, func, data))
+        multiprocessing_enabled = self.opts.get('multiprocessing', True)
 
-                if multiprocessing_enabled:
-                    with default_signals(signal.SIGINT, signal.SIGTERM):
-                        # Reset current signals before starting the process in
-                        # order not to inherit the current signal handlers
-                        proc.start()
-                else:
+        if salt.utils.is_windows():
+            # Temporarily stash our function references.
+            # You can't pickle function references, and pickling is
+            # required when spawning new processes on Windows.
+            functions = self.functions
+            self.functions = {}
+            returners = self.returners
+            self.returners = {}
+        try:
+            if multiprocessing_enabled:
+                thread_cls = SignalHandlingMultiprocessingProcess
+            else:
+                thread_cls = threading.Thread
+            proc = thread_cls(target=self.handle_func, args=(multiprocessing_enabled, func, data))
+
+            if multiprocessing_enabled:
+                with default_signals(signal.SIGINT, signal.SIGTERM):
+                    # Reset current signals before starting the process in
+                    # order not to inherit the current signal handlers
                     proc.start()
+            else:
+                proc.start()
 
-                if multiprocessing_enabled:
-                    proc.join()
-            finally:
-                self.intervals[job] = now
-            if salt.utils.is_windows():
-                # Restore our function references.
-                self.functions = functions
-                self.returners = returners
+            if multiprocessing_enabled:
+                proc.join()
+        finally:
+            self.intervals[job] = now
+        if salt.utils.is_windows():
+            # Restore our function references.
+            self.functions = functions
+            self.returners = returners
+        return self._next_fire(job, data, now, when, cron)
+
+    def _next_fire(self, job, data, now, when, cron):
+        '''
+        Return the time at which a job evaluated at ``now`` has to be
+        evaluated again, checked in the same order as ``_eval_job``
+        '''
+        if any(item in data for item in _TIME_ELEMENTS):
+            if 'when' in data or 'cron' in data:
+                # Run as an interval but gated by when/cron, look every tick
+                return now + 1
+        elif 'once' in data:
+            # A once job is only ever looked at on its own second
+            return None
+        elif 'when' in data:
+            if when > now:
+                return when
+            return now + 1
+        elif 'cron' in data:
+            # Cron jobs are run the second before the cron time
+            return max(cron - 1, now + 1)
+        if job not in self.intervals:
+            return now + 1
+        return max(self.intervals[job] + _job_seconds(data), now + 1)
 
 
 def clean_proc_dir(opts):
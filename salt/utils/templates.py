@@ -11,6 +11,7 @@ import os
 import imp
 import logging
 import tempfile
+import threading
 import traceback
 import sys
 
@@ -42,6 +43,11 @@ TEMPLATE_DIRNAME = os.path.join(saltpath[0], 'templates')
 SLS_ENCODING = 'utf-8'  # this one has no BOM.
 SLS_ENCODER = codecs.getencoder(SLS_ENCODING)
 
+# Setting up a jinja environment is expensive, so one is kept per loader
+# configuration and reused between renders. They are kept per thread, the
+# loaders and their file clients are not thread safe.
+JINJA_ENVS = threading.local()
+
 
 class AliasedLoader(object):
     '''
@@ -268,33 +274,13 @@ def _get_jinja_error(trace, context=None):
     return line, out
 
 
-def render_jinja_tmpl(tmplstr, context, tmplpath=None):
-    opts = context['opts']
-    saltenv = context['saltenv']
-    loader = None
-    newline = False
-
-    if tmplstr and not isinstance(tmplstr, six.text_type):
-        # http://jinja.pocoo.org/docs/api/#unicode
-        tmplstr = tmplstr.decode(SLS_ENCODING)
-
-    if tmplstr.endswith('\n'):
-        newline = True
-
-    if not saltenv:
-        if tmplpath:
-            # i.e., the template is from a file outside the state tree
-            #
-            # XXX: FileSystemLoader is not being properly instantiated here is
-            # it? At least it ain't according to:
-            #
-            #   http://jinja.pocoo.org/docs/api/#jinja2.FileSystemLoader
-            loader = jinja2.FileSystemLoader(
-                context, os.path.dirname(tmplpath))
-    else:
-        loader = salt.utils.jinja.SaltCacheLoader(opts, saltenv, pillar_rend=context.get('_pillar_rend', False))
-
-    env_args = {'extensions': [], 'loader': loader}
+def _new_jinja_env(opts, loader, bytecode_cache=None):
+    '''
+    Return a new jinja environment with the salt extensions, filters and
+    globals set up
+    '''
+    env_args = {'extensions': [], 'loader': loader,
+                'bytecode_cache': bytecode_cache}
 
     if hasattr(jinja2.ext, 'with_'):
         env_args['extensions'].append('jinja2.ext.with_')
@@ -341,6 +327,93 @@ def render_jinja_tmpl(tmplstr, context, tmplpath=None):
 
     jinja_env.tests['list'] = salt.utils.is_list
 
+    return jinja_env
+
+
+def _get_jinja_env(opts, saltenv, pillar_rend=False):
+    '''
+    Return the jinja environment of this thread for the loader
+    configuration, creating it on first use. The templates loaded through a
+    reused environment are only compiled again when they have changed.
+    '''
+    bytecode_dir = None
+    if opts.get('jinja_bytecode_cache', False):
+        bytecode_dir = os.path.join(opts['cachedir'], 'jinja')
+    key = (saltenv,
+           bool(pillar_rend),
+           tuple(salt.utils.jinja.SaltCacheLoader.get_searchpath(opts, saltenv)),
+           bool(opts.get('jinja_trim_blocks', False)),
+           bool(opts.get('jinja_lstrip_blocks', False)),
+           bool(opts.get('allow_undefined', False)),
+           bytecode_dir)
+    envs = getattr(JINJA_ENVS, 'envs', None)
+    if envs is None:
+        envs = JINJA_ENVS.envs = {}
+    jinja_env = envs.get(key)
+    if jinja_env is None:
+        loader = salt.utils.jinja.SaltCacheLoader(opts, saltenv,
+                                                  pillar_rend=pillar_rend)
+        jinja_env = _new_jinja_env(
+            opts,
+            loader,
+            salt.utils.jinja.SaltBytecodeCache(bytecode_dir))
+        envs[key] = jinja_env
+    else:
+        jinja_env.loader.reset(opts)
+    return jinja_env
+
+
+def _get_jinja_template(jinja_env, tmplstr, tmplpath):
+    '''
+    Return the template for the source read from tmplpath, reusing the
+    bytecode compiled the last time that the same source was rendered
+    '''
+    bcc = jinja_env.bytecode_cache
+    bucket = bcc.get_bucket(jinja_env, tmplpath, None, tmplstr)
+    code = bucket.code
+    if code is None:
+        code = jinja_env.compile(tmplstr)
+        bucket.code = code
+        bcc.set_bucket(bucket)
+    return jinja_env.template_class.from_code(jinja_env,
+                                              code,
+                                              jinja_env.make_globals(None))
+
+
+def render_jinja_tmpl(tmplstr, context, tmplpath=None):
+    opts = context['opts']
+    saltenv = context['saltenv']
+    loader = None
+    newline = False
+
+    if tmplstr and not isinstance(tmplstr, six.text_type):
+        # http://jinja.pocoo.org/docs/api/#unicode
+        tmplstr = tmplstr.decode(SLS_ENCODING)
+
+    if tmplstr.endswith('\n'):
+        newline = True
+
+    if not saltenv:
+        if tmplpath:
+            # i.e., the template is from a file outside the state tree
+            #
+            # XXX: FileSystemLoader is not being properly instantiated here is
+            # it? At least it ain't according to:
+            #
+            #   http://jinja.pocoo.org/docs/api/#jinja2.FileSystemLoader
+            loader = jinja2.FileSystemLoader(
+                context, os.path.dirname(tmplpath))
+        jinja_env = _new_jinja_env(opts, loader)
+    else:
+        shared_env = _get_jinja_env(opts,
+                                    saltenv,
+                                    pillar_rend=context.get('_pillar_rend', False))
+        # Render through an overlay with globals of its own, the context of
+        # this render must not leak into the next one through the shared
+        # environment. The overlay shares its loader and bytecode cache.
+        jinja_env = shared_env.overlay()
+        jinja_env.globals = dict(shared_env.globals)
+
     decoded_context = {}
     for key, value in six.iteritems(context):
         if not isinstance(value, string_types):
@@ -350,7 +423,10 @@ def render_jinja_tmpl(tmplstr, context, tmplpath=None):
         decoded_context[key] = salt.utils.locales.sdecode(value)
 
     try:
-        template = jinja_env.from_string(tmplstr)
+        if tmplpath and jinja_env.bytecode_cache is not None:
+            template = _get_jinja_template(jinja_env, tmplstr, tmplpath)
+        else:
+            template = jinja_env.from_string(tmplstr)
         template.globals.update(decoded_context)
         output = template.render(**decoded_context)
     except jinja2.exceptions.TemplateSyntaxError as exc:
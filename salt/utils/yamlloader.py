@@ -29,14 +29,13 @@ warnings.simplefilter('always', category=DuplicateKeyWarning)
 
 
 # with code integrated from https://gist.github.com/844388
-class SaltYamlSafeLoader(yaml.SafeLoader, object):
+class SaltYamlSafeLoaderMixin(object):
     '''
-    Create a custom YAML loader that uses the custom constructor. This allows
-    for the YAML loading defaults to be manipulated based on needs within salt
-    to make things like sls file more intuitive.
+    The custom constructor shared by the pure Python and the libyaml based
+    loaders. This allows for the YAML loading defaults to be manipulated based
+    on needs within salt to make things like sls file more intuitive.
     '''
-    def __init__(self, stream, dictclass=dict):
-        yaml.SafeLoader.__init__(self, stream)
+    def _set_dictclass(self, dictclass):
         if dictclass is not dict:
             # then assume ordered dict and use it for both !map and !omap
             self.add_constructor(
@@ -101,7 +100,7 @@ class SaltYamlSafeLoader(yaml.SafeLoader, object):
                 # an empty string. Change it to '0'.
                 if node.value == '':
                     node.value = '0'
-        return super(SaltYamlSafeLoader, self).construct_scalar(node)
+        return super(SaltYamlSafeLoaderMixin, self).construct_scalar(node)
 
     def flatten_mapping(self, node):
         merge = []
@@ -143,3 +142,29 @@ class SaltYamlSafeLoader(yaml.SafeLoader, object):
             mergeable_items = [x for x in merge if x[0].value not in existing_nodes]
 
             node.value = mergeable_items + node.value
+
+
+class SaltYamlSafeLoader(SaltYamlSafeLoaderMixin, yaml.SafeLoader):
+    '''
+    Create a custom YAML loader that uses the custom constructor
+    '''
+    def __init__(self, stream, dictclass=dict):
+        yaml.SafeLoader.__init__(self, stream)
+        self._set_dictclass(dictclass)
+
+
+if hasattr(yaml, 'CSafeLoader'):
+    class SaltYamlSafeCLoader(SaltYamlSafeLoaderMixin, yaml.CSafeLoader):
+        '''
+        The custom YAML loader using libyaml's C parser, the same constructor
+        builds the data so the results match those of SaltYamlSafeLoader. The
+        marks of the parser errors do not include the buffer, though.
+        '''
+        def __init__(self, stream, dictclass=dict):
+            yaml.CSafeLoader.__init__(self, stream)
+            self._set_dictclass(dictclass)
+
+    # The fastest loader available
+    SaltYamlSafeFastLoader = SaltYamlSafeCLoader
+else:
+    SaltYamlSafeFastLoader = SaltYamlSafeLoader
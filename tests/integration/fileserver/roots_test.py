@@ -15,6 +15,7 @@ ensure_in_syspath('../..')
 
 # Import salt libs
 import integration
+import salt.utils
 from salt.fileserver import roots
 from salt import fileclient
 
@@ -112,6 +113,56 @@ class RootsTest(integration.ModuleCase):
                 }
             )
 
+    def test_file_hash_index(self):
+        tmp_root = os.path.join(integration.TMP, 'roots_hash_index')
+        if not os.path.isdir(tmp_root):
+            os.makedirs(tmp_root)
+        tmp_file = os.path.join(tmp_root, 'hashme')
+        with salt.utils.fopen(tmp_file, 'w') as fp_:
+            fp_.write('foo')
+        with patch.dict(roots.__opts__, {'hash_type': 'sha256',
+                                         'cachedir': self.master_opts['cachedir']}):
+            load = {'saltenv': 'base', 'path': 'hashme'}
+            fnd = {'path': tmp_file, 'rel': 'hashme'}
+            ret = roots.file_hash(load, fnd)
+            self.assertEqual(ret['hsum'], salt.utils.get_hash(tmp_file, 'sha256'))
+            self.assertIn(('base', tmp_file, 'sha256'), roots._HASHES)
+
+            # A change in size invalidates the index entry
+            with salt.utils.fopen(tmp_file, 'w') as fp_:
+                fp_.write('foobar')
+            ret = roots.file_hash(load, fnd)
+            self.assertEqual(ret['hsum'], salt.utils.get_hash(tmp_file, 'sha256'))
+
+    def test_file_hash_index_bounded(self):
+        '''
+        The in-process index keeps the most recently used entries only, the
+        dropped ones are read back from the persistent index
+        '''
+        tmp_root = os.path.join(integration.TMP, 'roots_hash_index')
+        if not os.path.isdir(tmp_root):
+            os.makedirs(tmp_root)
+        fnds = []
+        for name in ('one', 'two', 'three'):
+            tmp_file = os.path.join(tmp_root, name)
+            with salt.utils.fopen(tmp_file, 'w') as fp_:
+                fp_.write(name)
+            fnds.append(({'saltenv': 'base', 'path': name},
+                         {'path': tmp_file, 'rel': name}))
+        with patch.dict(roots.__opts__, {'hash_type': 'sha256',
+                                         'cachedir': self.master_opts['cachedir']}), \
+                patch.object(roots, 'HASHES_MAX', 2), \
+                patch.object(roots, '_HASHES', roots.OrderedDict()):
+            for load, fnd in fnds:
+                roots.file_hash(load, fnd)
+            self.assertEqual(list(roots._HASHES),
+                             [('base', fnd['path'], 'sha256') for _, fnd in fnds[1:]])
+            with patch('salt.utils.get_hash', side_effect=AssertionError):
+                ret = roots.file_hash(*fnds[0])
+            self.assertEqual(ret['hsum'], salt.utils.get_hash(fnds[0][1]['path'], 'sha256'))
+            self.assertEqual(len(roots._HASHES), 2)
+            self.assertIn(('base', fnds[0][1]['path'], 'sha256'), roots._HASHES)
+
     def test_file_list_emptydirs(self):
         if integration.TMP_STATE_TREE not in self.master_opts['file_roots']['base']:
             self.skipTest('This test fails when using tests/runtests.py. salt-runtests will be available soon.')
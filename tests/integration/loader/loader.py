@@ -13,16 +13,19 @@ import tempfile
 import shutil
 import os
 import collections
+import time
 
 # Import Salt Testing libs
 from salttesting import TestCase
 from salttesting.helpers import ensure_in_syspath
+from salttesting.mock import MagicMock, patch
 
 ensure_in_syspath('../../')
 
 import integration  # pylint: disable=import-error
 
 # Import Salt libs
+import salt.loader
 import salt.utils
 # pylint: disable=import-error,no-name-in-module,redefined-builtin
 import salt.ext.six as six
@@ -210,6 +213,185 @@ class LazyLoaderWhitelistTest(TestCase):
         self.assertNotIn('grains.get', self.loader)
 
 
+virtual_template = '''
+def __virtual__():
+    if __grains__.get('kernel') == 'Marvin':
+        return True
+    return (False, 'not on this kernel')
+
+def ping():
+    return True
+'''
+
+pillar_virtual_template = '''
+def __virtual__():
+    if __salt__['config.get']('marvin'):
+        return True
+    return (False, 'no marvin')
+
+def ping():
+    return True
+'''
+
+copied_virtual_template = '''
+def __virtual__():
+    if dict(__grains__).get('kernel') == 'Marvin':
+        return True
+    return (False, 'not on this kernel')
+
+def ping():
+    return True
+'''
+
+
+class LazyLoaderIndexTest(TestCase):
+    '''
+    Test the persistent loader index
+    '''
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(dir=integration.TMP)
+        self.module_dir = os.path.join(self.tmpdir, 'modules')
+        os.makedirs(self.module_dir)
+        for name, data in (('indexed', virtual_template),
+                           ('pillared', pillar_virtual_template),
+                           ('copied', copied_virtual_template),
+                           ('plain', 'def ping():\n    return True\n')):
+            with salt.utils.fopen(os.path.join(self.module_dir, name + '.py'), 'w') as fh:
+                fh.write(data)
+        # The index does not trust anything modified right before it was
+        # written
+        past = time.time() - 60
+        for name in os.listdir(self.module_dir) + ['']:
+            os.utime(os.path.join(self.module_dir, name), (past, past))
+        self.opts = minion_config(None)
+        self.opts['cachedir'] = os.path.join(self.tmpdir, 'cache')
+        self.opts['loader_index'] = True
+        self.opts['grains'] = {'kernel': 'Linux'}
+        self.opts['pillar'] = {}
+        # The test suite keeps writing to the directories in sys.path
+        self.patcher = patch('salt.loader.LoaderIndex.environment_dirs',
+                             return_value=[])
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def _loader(self):
+        config_get = self.opts['pillar'].get
+        return LazyLoader([self.module_dir], self.opts, tag='module',
+                          pack={'__salt__': {'config.get': config_get}})
+
+    def test_index(self):
+        loader = self._loader()
+        self.assertTrue(loader['plain.ping']())
+        self.assertNotIn('indexed.ping', loader)
+        self.assertEqual(os.listdir(os.path.join(self.opts['cachedir'], 'loader')),
+                         [os.path.basename(loader._index.path)])
+
+        # Neither the directory is scanned nor the module imported again
+        with patch('salt.loader.os.listdir', side_effect=AssertionError), \
+                patch('salt.loader.imp.load_module', side_effect=AssertionError):
+            loader = self._loader()
+            self.assertEqual(sorted(loader.file_mapping),
+                             ['copied', 'indexed', 'pillared', 'plain'])
+            self.assertNotIn('indexed.ping', loader)
+        self.assertEqual(loader.missing_fun_string('indexed.ping'),
+                         '\'indexed\' __virtual__ returned False: not on this kernel')
+
+        # The outcome does not hold once a grain it read changes
+        self.opts['grains'] = {'kernel': 'Marvin'}
+        self.assertTrue(self._loader()['indexed.ping']())
+        # Even when the grains were read through a copy
+        self.assertTrue(self._loader()['copied.ping']())
+
+    def test_untracked_globals(self):
+        '''
+        The outcome of a __virtual__ function which used other globals than
+        the grains and opts, e.g. __salt__, is not kept
+        '''
+        loader = self._loader()
+        self.assertNotIn('pillared.ping', loader)
+        self.assertNotIn('pillared', loader._index.data.get('virtual', {}))
+        self.opts['pillar'] = {'marvin': True}
+        self.assertTrue(self._loader()['pillared.ping']())
+
+    def test_new_module(self):
+        self.assertNotIn('added.ping', self._loader())
+        with salt.utils.fopen(os.path.join(self.module_dir, 'added.py'), 'w') as fh:
+            fh.write('def ping():\n    return True\n')
+        self.assertTrue(self._loader()['added.ping']())
+
+
+ttl_grains_template = '''
+__grains_ttl__ = {'volatile': 0}
+CALLS = {'static': 0, 'volatile': 0}
+
+def static():
+    CALLS['static'] += 1
+    return {'static': CALLS['static']}
+
+def volatile():
+    CALLS['volatile'] += 1
+    return {'volatile': CALLS['volatile']}
+'''
+
+
+class LoaderGrainsIncrementalTest(TestCase):
+    '''
+    Test reusing the return of grain functions within their TTL
+    '''
+    def setUp(self):
+        self.module_dir = tempfile.mkdtemp(dir=integration.TMP)
+        self.module_file = os.path.join(self.module_dir, 'ttlgrains.py')
+        with salt.utils.fopen(self.module_file, 'w') as fh:
+            fh.write(ttl_grains_template)
+        self.opts = minion_config(None)
+        self.opts['grains_incremental'] = True
+        self.funcs = LazyLoader([self.module_dir], self.opts, tag='grains')
+        salt.loader.GRAINS_CACHE.clear()
+
+    def tearDown(self):
+        salt.loader.GRAINS_CACHE.clear()
+        shutil.rmtree(self.module_dir)
+
+    def _call(self, name):
+        key = 'ttlgrains.' + name
+        return salt.loader._call_grain_func(self.opts, key, self.funcs[key], ())
+
+    def test_module_ttl(self):
+        for _ in range(3):
+            self.assertEqual(self._call('static'), {'static': 1})
+        self.assertEqual(self._call('volatile'), {'volatile': 1})
+        self.assertEqual(self._call('volatile'), {'volatile': 2})
+
+    def test_ttl_option(self):
+        self.opts['grains_ttl'] = {'ttlgrains.*': 0, 'ttlgrains.volatile': 3600}
+        self.assertEqual(self._call('static'), {'static': 1})
+        self.assertEqual(self._call('static'), {'static': 2})
+        self.assertEqual(self._call('volatile'), {'volatile': 1})
+        self.assertEqual(self._call('volatile'), {'volatile': 1})
+
+    def test_cached_return_is_copied(self):
+        self._call('static')['static'] = 'changed'
+        self.assertEqual(self._call('static'), {'static': 1})
+
+    def test_module_changed(self):
+        self.assertEqual(self._call('static'), {'static': 1})
+        mtime = os.path.getmtime(self.module_file) - 60
+        os.utime(self.module_file, (mtime, mtime))
+        self.assertEqual(self._call('static'), {'static': 2})
+
+    def test_force_refresh(self):
+        self.assertEqual(self._call('static'), {'static': 1})
+        with patch('salt.loader.grain_funcs', MagicMock(return_value={})):
+            salt.loader.grains(self.opts)
+            self.assertIn('ttlgrains', salt.loader.GRAINS_CACHE)
+            salt.loader.grains(self.opts, force_refresh=True)
+        self.assertEqual(salt.loader.GRAINS_CACHE, {})
+        self.assertEqual(self._call('static'), {'static': 2})
+
+
 module_template = '''
 __load__ = ['test', 'test_alias']
 __func_alias__ = dict(test_alias='working_alias')
@@ -104,6 +104,40 @@ class ConfigTestCase(TestCase, integration.AdaptedConfigurationTestCaseMixIn):
             if os.path.isfile(fpath):
                 os.unlink(fpath)
 
+    def test_ext_pillar_concurrency_warning(self):
+        fpath = tempfile.mktemp()
+        try:
+            with salt.utils.fopen(fpath, 'w') as fp_:
+                fp_.write(
+                    'root_dir: /\n'
+                    'key_logfile: key\n'
+                    'ext_pillar_concurrency: 4\n'
+                    'ext_pillar:\n'
+                    '  - cmd_yaml: cat /etc/salt/yaml\n'
+                    '  - git: master https://example.com/pillar.git\n'
+                )
+            with patch.object(sconfig.log, 'warning') as warning:
+                sconfig.master_config(fpath)
+            self.assertTrue(any('ext_pillar_concurrency' in call[0][0]
+                                for call in warning.call_args_list))
+
+            # A single source cannot depend on another one
+            with salt.utils.fopen(fpath, 'w') as fp_:
+                fp_.write(
+                    'root_dir: /\n'
+                    'key_logfile: key\n'
+                    'ext_pillar_concurrency: 4\n'
+                    'ext_pillar:\n'
+                    '  - cmd_yaml: cat /etc/salt/yaml\n'
+                )
+            with patch.object(sconfig.log, 'warning') as warning:
+                sconfig.master_config(fpath)
+            self.assertFalse(any('ext_pillar_concurrency' in call[0][0]
+                                 for call in warning.call_args_list))
+        finally:
+            if os.path.isfile(fpath):
+                os.unlink(fpath)
+
     def test_proper_path_joining(self):
         fpath = tempfile.mktemp()
         try:
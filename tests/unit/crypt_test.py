@@ -2,6 +2,9 @@
 
 # python libs
 from __future__ import absolute_import
+import os
+import shutil
+import tempfile
 
 # salt testing libs
 from salttesting import TestCase, skipIf
@@ -104,11 +107,71 @@ class CryptTestCase(TestCase):
         with patch('salt.utils.fopen', mock_open(read_data=PRIVKEY_DATA)):
             self.assertEqual(SIG, crypt.sign_message('/keydir/keyname.pem', MSG))
 
+    @patch('os.path.getmtime', MagicMock(return_value=1))
+    def test_sign_message_key_cached(self):
+        crypt._RSA_KEYS.pop('/keydir/cached.pem', None)
+        with patch('salt.utils.fopen', mock_open(read_data=PRIVKEY_DATA)) as fopen_mock:
+            self.assertEqual(SIG, crypt.sign_message('/keydir/cached.pem', MSG))
+            self.assertEqual(SIG, crypt.sign_message('/keydir/cached.pem', MSG))
+            self.assertEqual(fopen_mock.call_count, 1)
+
     def test_verify_signature(self):
         with patch('salt.utils.fopen', mock_open(read_data=PUBKEY_DATA)):
             self.assertTrue(crypt.verify_signature('/keydir/keyname.pub', MSG, SIG))
 
 
+
+@skipIf(not HAS_PYCRYPTO_RSA, 'pycrypto >= 2.6 is not available')
+class MinionKeyCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.pki_dir = tempfile.mkdtemp()
+        for dirname in ('minions', 'minions_pre', 'minions_rejected'):
+            os.makedirs(os.path.join(self.pki_dir, dirname))
+            self._age(dirname)
+        for id_ in ('web1', 'web2'):
+            self._write('minions', id_, PUBKEY_DATA)
+        self.cache = crypt.MinionKeyCache({'pki_dir': self.pki_dir}, size=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.pki_dir)
+
+    def _age(self, *parts):
+        os.utime(os.path.join(self.pki_dir, *parts), (1000, 1000))
+
+    def _write(self, dirname, id_, data):
+        with salt.utils.fopen(os.path.join(self.pki_dir, dirname, id_), 'w') as fp_:
+            fp_.write(data)
+        self._age(dirname, id_)
+        self._age(dirname)
+
+    def test_get_pub(self):
+        pub = self.cache.get_pub('web1')
+        self.assertIs(self.cache.get_pub('web1'), pub)
+        self.assertEqual(self.cache.get_pub_str('web1'), PUBKEY_DATA)
+        self.assertEqual(self.cache.stats['key_misses'], 1)
+        self.assertEqual(self.cache.stats['key_hits'], 2)
+        # Only one key fits in the cache
+        self.cache.get_pub('web2')
+        self.assertIsNot(self.cache.get_pub('web1'), pub)
+        self.assertEqual(self.cache.stats['key_misses'], 3)
+        self._write('minions', 'web1', 'corrupt')
+        self.assertRaises(ValueError, self.cache.get_pub, 'web1')
+        self.assertRaises(IOError, self.cache.get_pub, 'db1')
+
+    def test_key_state(self):
+        self.assertEqual(self.cache.key_state('web1'), 'accepted')
+        self.assertEqual(self.cache.key_state('web1'), 'accepted')
+        self.assertEqual(self.cache.stats['state_hits'], 1)
+        shutil.move(os.path.join(self.pki_dir, 'minions', 'web1'),
+                    os.path.join(self.pki_dir, 'minions_rejected', 'web1'))
+        os.utime(os.path.join(self.pki_dir, 'minions'), (2000, 2000))
+        self._age('minions_rejected')
+        self.assertEqual(self.cache.key_state('web1'), 'rejected')
+        self.assertEqual(self.cache.key_state('db1'), None)
+        self.assertEqual(self.cache.stats['state_misses'], 3)
+
+
 if __name__ == '__main__':
     from integration import run_tests
-    run_tests(CryptTestCase, needs_daemon=False)
+    run_tests(CryptTestCase, MinionKeyCacheTestCase, needs_daemon=False)
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+'''
+    tests.unit.fileclient_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the block and batched transfers of the remote file client
+'''
+
+# Import python libs
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+
+# Import Salt Testing libs
+from salttesting import TestCase, skipIf
+from salttesting.helpers import ensure_in_syspath
+from salttesting.mock import NO_MOCK, NO_MOCK_REASON, MagicMock, patch
+ensure_in_syspath('../')
+
+# Import salt libs
+import integration
+import salt.fileclient
+import salt.fileserver
+import salt.utils
+import salt.ext.six as six
+
+
+class FakeChannel(object):
+    '''
+    Pass the loads straight to a Fileserver and record them
+    '''
+    def __init__(self, fileserver):
+        self.fileserver = fileserver
+        self.loads = []
+
+    def send(self, load, tries=None, timeout=None, raw=False):  # pylint: disable=unused-argument
+        self.loads.append(dict(load))
+        return getattr(self.fileserver, load['cmd'].lstrip('_'))(dict(load))
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class FileBlocksTestCase(TestCase):
+    '''
+    Test fetching files by blocks
+    '''
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(dir=integration.SYS_TMP_DIR)
+        self.master_file = os.path.join(self.tmp, 'master.bin')
+        self.dest = os.path.join(self.tmp, 'minion.bin')
+        self.data = b''.join(os.urandom(1024) for _ in range(64))
+        with salt.utils.fopen(self.master_file, 'wb') as fp_:
+            fp_.write(self.data)
+
+        fileserver = salt.fileserver.Fileserver.__new__(salt.fileserver.Fileserver)
+        fileserver.opts = {'file_buffer_size': 1024}
+        fileserver.find_file = MagicMock(
+            return_value={'path': self.master_file, 'rel': 'master.bin'})
+        self.channel = FakeChannel(fileserver)
+        self.client = salt.fileclient.RemoteClient.__new__(
+            salt.fileclient.RemoteClient)
+        self.client.opts = {'file_delta_block_size': 4096}
+        self.client.channel = self.channel
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _hash(self):
+        return {'hsum': salt.utils.get_hash(self.master_file, 'sha256'),
+                'hash_type': 'sha256'}
+
+    def _get(self):
+        return self.client._get_file_blocks(
+            'salt://master.bin', 'base', self.dest, self._hash())
+
+    def test_new_file(self):
+        self.assertTrue(self._get())
+        with salt.utils.fopen(self.dest, 'rb') as fp_:
+            self.assertEqual(fp_.read(), self.data)
+        # 16 KiB of blocks fit in one reply
+        self.assertEqual(len(self.channel.loads), 4)
+
+    def test_changed_blocks(self):
+        with salt.utils.fopen(self.dest, 'wb') as fp_:
+            fp_.write(self.data)
+        changed = bytearray(self.data)
+        changed[5000] = (changed[5000] + 1) % 256
+        changed.extend(b'appended')
+        changed = bytes(changed)
+        with salt.utils.fopen(self.master_file, 'wb') as fp_:
+            fp_.write(changed)
+        self.assertTrue(self._get())
+        with salt.utils.fopen(self.dest, 'rb') as fp_:
+            self.assertEqual(fp_.read(), changed)
+        self.assertEqual(len(self.channel.loads), 1)
+        ret = self.channel.fileserver.serve_file_blocks(self.channel.loads[0])
+        self.assertEqual([block[0] for block in ret['blocks']], [1, 16])
+
+    def test_continuation_sigs(self):
+        '''
+        A continuation only sends the hashes of the blocks from ``loc`` on
+        '''
+        with salt.utils.fopen(self.dest, 'wb') as fp_:
+            fp_.write(self.data)
+        sigs = salt.utils.get_block_hashes(self.dest, 'sha256', 4096)
+        changed = bytearray(self.data)
+        for idx in range(len(changed) // 4096):
+            changed[idx * 4096] = (changed[idx * 4096] + 1) % 256
+        changed = bytes(changed)
+        with salt.utils.fopen(self.master_file, 'wb') as fp_:
+            fp_.write(changed)
+        self.assertTrue(self._get())
+        with salt.utils.fopen(self.dest, 'rb') as fp_:
+            self.assertEqual(fp_.read(), changed)
+        self.assertEqual([load['loc'] for load in self.channel.loads],
+                         [0, 4, 8, 12])
+        for load in self.channel.loads:
+            self.assertEqual(load['sigs'], sigs[load['loc']:])
+
+    def test_truncated(self):
+        with salt.utils.fopen(self.dest, 'wb') as fp_:
+            fp_.write(self.data)
+        with salt.utils.fopen(self.master_file, 'wb') as fp_:
+            fp_.write(self.data[:10000])
+        self.assertTrue(self._get())
+        with salt.utils.fopen(self.dest, 'rb') as fp_:
+            self.assertEqual(fp_.read(), self.data[:10000])
+
+    def test_unsupported(self):
+        self.channel.send = MagicMock(return_value=False)
+        self.assertFalse(self._get())
+        self.assertFalse(os.path.exists(self.dest))
+        self.assertEqual(os.listdir(self.tmp), ['master.bin'])
+
+    def test_bad_hash(self):
+        with salt.utils.fopen(self.dest, 'wb') as fp_:
+            fp_.write(b'old')
+        self.assertFalse(self.client._get_file_blocks(
+            'salt://master.bin', 'base', self.dest,
+            {'hsum': 'nope', 'hash_type': 'sha256'}))
+        with salt.utils.fopen(self.dest, 'rb') as fp_:
+            self.assertEqual(fp_.read(), b'old')
+
+    def test_disabled(self):
+        self.client.opts['file_delta_block_size'] = 0
+        self.assertFalse(self._get())
+        self.assertEqual(self.channel.loads, [])
+
+    def test_block_size_bounds(self):
+        serve = self.channel.fileserver.serve_file_blocks
+        load = {'path': 'salt://master.bin', 'saltenv': 'base'}
+        # Smaller than BLOCK_SIZE_MIN, larger than a reply of 16 * 1024
+        for block_size in (1, 4095, 16385, 2 ** 40):
+            load['block_size'] = block_size
+            self.assertEqual(serve(dict(load)), {})
+        load['block_size'] = 16384
+        self.assertEqual(len(serve(dict(load))['blocks']), 1)
+        # Too many blocks for the file
+        with patch.object(salt.fileserver, 'MAX_FILE_BLOCKS', 15):
+            load['block_size'] = 4096
+            self.assertEqual(serve(dict(load)), {})
+            self.assertFalse(self._get())
+        self.assertFalse(os.path.exists(self.dest))
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class FileManifestTestCase(TestCase):
+    '''
+    Test caching directories from a manifest of the files
+    '''
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(dir=integration.SYS_TMP_DIR)
+        self.root = os.path.join(self.tmp, 'root')
+        self.cachedir = os.path.join(self.tmp, 'cache')
+        os.makedirs(os.path.join(self.root, 'dir', 'sub'))
+        self.files = {'dir/a.txt': b'a' * 100,
+                      'dir/b.txt': b'b' * 600,
+                      'dir/sub/c.txt': b'c' * 600}
+        for path, data in six.iteritems(self.files):
+            self._write(path, data)
+        os.chmod(os.path.join(self.root, 'dir', 'a.txt'), 0o750)
+
+        def find_file(path, saltenv):  # pylint: disable=unused-argument
+            fpath = os.path.join(self.root, path)
+            if not os.path.isfile(fpath):
+                return {'path': '', 'rel': ''}
+            return {'path': fpath, 'rel': path, 'back': 'roots',
+                    'stat': list(os.stat(fpath))}
+
+        def file_hash(load, fnd):  # pylint: disable=unused-argument
+            return {'hsum': salt.utils.get_hash(fnd['path'], 'sha256'),
+                    'hash_type': 'sha256'}
+
+        fileserver = salt.fileserver.Fileserver.__new__(salt.fileserver.Fileserver)
+        fileserver.opts = {'file_buffer_size': 64}
+        fileserver.servers = {'roots.file_hash': file_hash}
+        fileserver.find_file = find_file
+        fileserver.file_list = lambda load: sorted(
+            fn_ for fn_ in self.files
+            if fn_.startswith(load.get('prefix', '').strip('/')))
+        self.channel = FakeChannel(fileserver)
+        self.client = salt.fileclient.RemoteClient.__new__(
+            salt.fileclient.RemoteClient)
+        self.client.opts = {'cachedir': self.cachedir}
+        self.client.channel = self.channel
+        self.client.get_file = MagicMock(return_value=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _write(self, path, data):
+        with salt.utils.fopen(os.path.join(self.root, path), 'wb') as fp_:
+            fp_.write(data)
+
+    def _cached(self, path):
+        return os.path.join(self.cachedir, 'files', 'base', path)
+
+    def _cache_dir(self):
+        self.channel.loads = []
+        return self.client.cache_dir('salt://dir', 'base', manifest=True)
+
+    def _cmds(self):
+        return [load['cmd'] for load in self.channel.loads]
+
+    def test_cache_dir(self):
+        ret = self._cache_dir()
+        self.assertEqual(ret, sorted(self._cached(path) for path in self.files))
+        # 16 * 64 bytes fit in one reply, the files are sent in two replies
+        self.assertEqual(self._cmds(),
+                         ['_file_manifest', '_serve_files', '_serve_files'])
+        # The continuation only sends the files from ``loc`` on
+        self.assertEqual(self.channel.loads[2]['loc'], 2)
+        self.assertEqual(self.channel.loads[2]['paths'], ['dir/sub/c.txt'])
+        for path, data in six.iteritems(self.files):
+            with salt.utils.fopen(self._cached(path), 'rb') as fp_:
+                self.assertEqual(fp_.read(), data)
+        if not salt.utils.is_windows():
+            self.assertEqual(
+                os.stat(self._cached('dir/a.txt')).st_mode & 0o777, 0o750)
+
+        # Nothing changed, only the manifest is fetched
+        self.assertEqual(self._cache_dir(), ret)
+        self.assertEqual(self._cmds(), ['_file_manifest'])
+
+        self._write('dir/b.txt', b'changed')
+        self.assertEqual(self._cache_dir(), ret)
+        self.assertEqual(self._cmds(), ['_file_manifest', '_serve_files'])
+        self.assertEqual(self.channel.loads[1]['paths'], ['dir/b.txt'])
+        with salt.utils.fopen(self._cached('dir/b.txt'), 'rb') as fp_:
+            self.assertEqual(fp_.read(), b'changed')
+        self.assertFalse(self.client.get_file.called)
+
+    def test_large_file(self):
+        self._write('dir/sub/c.txt', b'c' * 2048)
+        self._cache_dir()
+        self.client.get_file.assert_called_once_with(
+            'salt://dir/sub/c.txt', self._cached('dir/sub/c.txt'),
+            saltenv='base', cachedir=None)
+
+    def test_unsupported(self):
+        self.channel.fileserver.file_manifest = MagicMock(return_value='')
+        self.client.cache_file = MagicMock(side_effect=lambda path, *args, **kwargs: path)
+        self.assertEqual(self._cache_dir(),
+                         ['salt://' + path for path in sorted(self.files)])
+        self.assertEqual(self._cmds(), ['_file_manifest', '_file_list'])
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(FileBlocksTestCase, needs_daemon=False)
+    run_tests(FileManifestTestCase, needs_daemon=False)
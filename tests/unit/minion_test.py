@@ -7,6 +7,8 @@
 from __future__ import absolute_import
 import copy
 import os
+import shutil
+import tempfile
 
 # Import Salt Testing libs
 from salttesting import TestCase, skipIf
@@ -139,7 +141,91 @@ class MinionTestCase(TestCase):
         finally:
             minion.destroy()
 
+    def test_fire_grains_changes(self):
+        '''
+        Tests that only the changed and removed grains are sent to the master
+        after a grains refresh.
+        '''
+        mock_opts = {'cachedir': '',
+                     'extension_modules': '',
+                     'id': 'minion'}
+        try:
+            minion = salt.minion.Minion(mock_opts, io_loop=tornado.ioloop.IOLoop())
+            minion.connected = True
+            with patch.object(minion, '_fire_master') as fire_master:
+                minion._fire_grains_changes(
+                    {'os': 'Linux', 'mem_total': 1024, 'ipv4': ['10.0.0.1']},
+                    {'os': 'Linux', 'mem_total': 2048, 'ip_fqdn': 'x'})
+                fire_master.assert_called_once_with(
+                    {'changed': {'mem_total': 2048, 'ip_fqdn': 'x'},
+                     'removed': ['ipv4']},
+                    'salt/minion/minion/grains',
+                    sync=False)
+
+                fire_master.reset_mock()
+                minion._fire_grains_changes({'os': 'Linux'}, {'os': 'Linux'})
+                self.assertFalse(fire_master.called)
+        finally:
+            minion.destroy()
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class SyndicManagerTestCase(TestCase):
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cachedir)
+
+    def _manager(self, **opts):
+        mock_opts = {'cachedir': self.cachedir,
+                     'acceptance_wait_time': 10,
+                     'acceptance_wait_time_max': 0,
+                     'master_job_cache': 'local_cache',
+                     'syndic_jid_forward_cache_hwm': 2}
+        mock_opts.update(opts)
+        with patch('salt.minion.MasterMinion', MagicMock()):
+            manager = salt.minion.SyndicManager(mock_opts, io_loop=tornado.ioloop.IOLoop())
+        manager.mminion.returners = {'local_cache.get_load': MagicMock(return_value={})}
+        manager.local = MagicMock()
+        manager.local.event.unpack = lambda raw, serial: raw
+        return manager
+
+    @staticmethod
+    def _ret(jid, id_):
+        return ('salt/job/{0}/ret/{1}'.format(jid, id_),
+                {'jid': jid, 'id': id_, 'fun': 'test.ping', 'return': True})
+
+    def test_jid_forward_cache(self):
+        manager = self._manager()
+        for jid in ('20170101000000000003', '20170101000000000001', '20170101000000000002'):
+            manager._process_event(self._ret(jid, 'web1'))
+        self.assertEqual(list(manager.jid_forward_cache),
+                         ['20170101000000000001', '20170101000000000002'])
+
+    def test_forward_batch(self):
+        manager = self._manager(syndic_forward_batch_size=1)
+        with patch.object(manager, '_return_pub_syndic', MagicMock(return_value=True)) as pub:
+            manager._process_event(self._ret('20170101000000000001', 'web1'))
+            self.assertEqual(pub.call_count, 1)
+            self.assertEqual(pub.call_args[0][0][0]['web1'], {'return': True})
+        self.assertEqual(manager.job_rets, {})
+        self.assertEqual(manager.job_rets_size, {})
+
+    def test_spill(self):
+        manager = self._manager(syndic_max_buffer_size=1)
+        with patch.object(manager, '_return_pub_syndic', MagicMock(return_value=False)):
+            manager._process_event(self._ret('20170101000000000001', 'web1'))
+            manager._forward_events()
+        self.assertEqual(manager.job_rets, {})
+        self.assertEqual(len(os.listdir(manager.spool_dir)), 1)
+
+        with patch.object(manager, '_return_pub_syndic', MagicMock(return_value=True)) as pub:
+            manager._forward_events()
+            self.assertEqual(pub.call_args[0][0][0]['web1'], {'return': True})
+        self.assertEqual(os.listdir(manager.spool_dir), [])
+
 
 if __name__ == '__main__':
     from integration import run_tests
-    run_tests(MinionTestCase, needs_daemon=False)
+    run_tests(MinionTestCase, SyndicManagerTestCase, needs_daemon=False)
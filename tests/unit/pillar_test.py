@@ -9,7 +9,11 @@
 
 # Import python libs
 from __future__ import absolute_import
+import os
+import shutil
 import tempfile
+import threading
+import time
 
 # Import Salt Testing libs
 from salttesting import skipIf, TestCase
@@ -19,6 +23,7 @@ ensure_in_syspath('../')
 
 # Import salt libs
 import salt.pillar
+import salt.utils
 
 
 @skipIf(NO_MOCK, NO_MOCK_REASON)
@@ -277,6 +282,176 @@ p2:
         client.get_state.side_effect = get_state
 
 
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class ExtPillarConcurrencyTestCase(TestCase):
+    '''
+    Test evaluating the ext_pillar sources concurrently
+    '''
+    def _pillar(self, ext_pillar, **opts):
+        def _slow(minion_id, pillar, delay):
+            time.sleep(delay)
+            return {'slow': delay, 'shared': 'slow'}
+
+        def _fail(minion_id, pillar, *args):
+            raise Exception('broken source')
+
+        pillar = salt.pillar.Pillar.__new__(salt.pillar.Pillar)
+        pillar.opts = {'ext_pillar': ext_pillar}
+        pillar.opts.update(opts)
+        pillar.minion_id = 'minion'
+        pillar.pillar_override = {}
+        pillar.merge_strategy = 'smart'
+        pillar.ext_pillars = {
+            'first': lambda minion_id, pillar, val: {'shared': val, 'a': 1},
+            'second': lambda minion_id, pillar, val: {'shared': val, 'b': 2},
+            'slow': _slow,
+            'fail': _fail,
+        }
+        return pillar
+
+    def test_same_as_serial(self):
+        ext_pillar = [{'slow': 0.2}, {'first': 'one'}, {'fail': []},
+                      {'second': 'two'}]
+        serial = self._pillar(ext_pillar).ext_pillar({'base': True}, None)
+        pillar = self._pillar(ext_pillar, ext_pillar_concurrency=4)
+        self.assertEqual(pillar.ext_pillar({'base': True}, None), serial)
+        self.assertEqual(serial[0]['shared'], 'two')
+        self.assertEqual(serial[1],
+                         ['Failed to load ext_pillar fail: broken source'])
+        self.assertEqual(sorted(key for key, _ in pillar.ext_pillar_times),
+                         ['fail', 'first', 'second', 'slow'])
+
+    @patch('salt.pillar._EXT_PILLAR_TIMED_OUT', {})
+    def test_timeout(self):
+        ext_pillar = [{'first': 'one'}, {'slow': 5}, {'slow': 0}, {'second': 'two'}]
+        pillar = self._pillar(ext_pillar,
+                              ext_pillar_concurrency=2,
+                              ext_pillar_timeout=1)
+        start = time.time()
+        ret, errors = pillar.ext_pillar({}, None)
+        self.assertLess(time.time() - start, 4)
+        self.assertEqual(errors, ['ext_pillar slow timed out after 1 seconds'])
+        self.assertEqual(ret, {'shared': 'two', 'a': 1, 'b': 2, 'slow': 0})
+
+    @patch('salt.pillar._EXT_PILLAR_TIMED_OUT', {})
+    def test_timed_out_source_skipped(self):
+        '''
+        A source is not called again while its call which timed out runs
+        '''
+        release = threading.Event()
+        calls = []
+
+        def _hung(minion_id, pillar, val):
+            calls.append(val)
+            release.wait(10)
+            return {'hung': val}
+
+        ext_pillar = [{'first': 'one'}, {'hung': 'x'}]
+        pillar = self._pillar(ext_pillar,
+                              ext_pillar_concurrency=2,
+                              ext_pillar_timeout=0.5)
+        pillar.ext_pillars['hung'] = _hung
+        ret, errors = pillar.ext_pillar({}, None)
+        self.assertEqual(errors, ['ext_pillar hung timed out after 0.5 seconds'])
+        ret, errors = pillar.ext_pillar({}, None)
+        self.assertEqual(errors, ['ext_pillar hung skipped, its call which '
+                                  'timed out is still running'])
+        self.assertEqual(ret, {'shared': 'one', 'a': 1})
+        self.assertEqual(calls, ['x'])
+
+        thread = salt.pillar._EXT_PILLAR_TIMED_OUT[(1, 'hung')]
+        release.set()
+        thread.join(5)
+        self.assertEqual(salt.pillar._EXT_PILLAR_TIMED_OUT, {})
+        ret, errors = pillar.ext_pillar({}, None)
+        self.assertEqual(errors, [])
+        self.assertEqual(ret['hung'], 'x')
+        self.assertEqual(calls, ['x', 'x'])
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class PillarCacheTestCase(TestCase):
+    '''
+    Test the fingerprinted pillar cache
+    '''
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.roots = os.path.join(self.tmpdir, 'pillar')
+        os.makedirs(self.roots)
+        os.makedirs(os.path.join(self.tmpdir, 'cache', 'pillar_cache'))
+        self._write('top.sls', "base:\n  'web*':\n    - match: glob\n    - web\n")
+        self._write('web.sls', "role: {{ grains['role'] }}\n"
+                               "port: {{ grains.get('port:http', 80) }}\n")
+        self.opts = {'cachedir': os.path.join(self.tmpdir, 'cache'),
+                     'pillar_roots': {'base': [self.roots]},
+                     'pillar_cache_backend': 'disk',
+                     'pillar_cache_ttl': 3600,
+                     'ext_pillar': []}
+        salt.pillar.PillarCache._grain_refs = (None, None)
+        salt.pillar.PillarCache._roots = (None, 0, None)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _write(self, name, data):
+        with salt.utils.fopen(os.path.join(self.roots, name), 'w') as fp_:
+            fp_.write(data)
+
+    def _compile(self, grains):
+        cache = salt.pillar.PillarCache(self.opts, grains, 'minion', 'base')
+        with patch.object(salt.pillar.PillarCache, 'fetch_pillar',
+                          MagicMock(return_value={'fresh': True})) as fetch:
+            self.assertEqual(cache.compile_pillar(), {'fresh': True})
+        return fetch.call_count
+
+    def test_grain_references(self):
+        paths = [os.path.join(self.roots, name) for name in ('top.sls', 'web.sls')]
+        self.assertEqual(salt.pillar._grain_references(paths),
+                         set(['role', 'port']))
+        self._write('all.sls', '{% for key in grains.items() %}{% endfor %}')
+        paths.append(os.path.join(self.roots, 'all.sls'))
+        self.assertIsNone(salt.pillar._grain_references(paths))
+        # Matching on anything else than the minion id reads the grains
+        self._write('top.sls', "base:\n  'webservers':\n    - match: nodegroup\n    - web\n")
+        self.assertIsNone(salt.pillar._grain_references(paths[:2]))
+
+    def test_invalidation(self):
+        grains = {'id': 'minion', 'role': 'web', 'port': {'http': 8080}}
+        self.assertEqual(self._compile(grains), 1)
+        self.assertEqual(self._compile(grains), 0)
+        # A grain the pillar_roots do not use does not invalidate the cache
+        grains['uptime'] = 42
+        self.assertEqual(self._compile(grains), 0)
+        grains['role'] = 'db'
+        self.assertEqual(self._compile(grains), 1)
+        self.assertEqual(self._compile(grains), 0)
+        self._write('web.sls', "port: 443\n")
+        salt.pillar.PillarCache._roots = (None, 0, None)
+        self.assertEqual(self._compile(grains), 1)
+        self.opts['ext_pillar'] = [{'cmd_yaml': 'cat /etc/salt/yaml'}]
+        self.assertEqual(self._compile(grains), 1)
+        self.assertEqual(self._compile(grains), 0)
+        # The external pillars may read any grain
+        grains['uptime'] = 43
+        self.assertEqual(self._compile(grains), 1)
+
+    def test_roots_signature_ttl(self):
+        '''
+        The pillar_roots are only walked again once the signature expired
+        '''
+        grains = {'id': 'minion', 'role': 'web'}
+        with patch('os.walk', MagicMock(side_effect=os.walk)) as walk:
+            self.assertEqual(self._compile(grains), 1)
+            self.assertEqual(self._compile(grains), 0)
+            self.assertEqual(walk.call_count, 1)
+            self._write('web.sls', "port: 443\n")
+            self.assertEqual(self._compile(grains), 0)
+            with patch.object(salt.pillar, 'ROOTS_SIGNATURE_TTL', 0):
+                self.assertEqual(self._compile(grains), 1)
+            self.assertEqual(walk.call_count, 2)
+
+
 if __name__ == '__main__':
     from integration import run_tests
-    run_tests(PillarTestCase, needs_daemon=False)
+    run_tests([PillarTestCase, ExtPillarConcurrencyTestCase, PillarCacheTestCase],
+              needs_daemon=False)
@@ -4,13 +4,16 @@
 from __future__ import absolute_import
 
 # Import Salt Testing libs
-from salttesting import TestCase
+from salttesting import TestCase, skipIf
 from salttesting.helpers import ensure_in_syspath
+from salttesting.mock import patch
 
 ensure_in_syspath('../../')
 
 # Import Salt libs
+from salt.exceptions import SaltRenderError
 from salt.renderers import yaml
+from salt.utils import yamlloader
 
 yaml.__salt__ = {}
 yaml.__opts__ = {}
@@ -28,3 +31,38 @@ class YAMLRendererTestCase(TestCase):
         result = yaml.render(data)
 
         self.assertEqual(result, u"python unicode string")
+
+    def test_yaml_render_cached(self):
+        data = "a: &list\n  - 1\nb: *list\nc: {d: 2}\n"
+        with patch.object(yaml, '_parse', wraps=yaml._parse) as parse:
+            result = yaml.render(data)
+            self.assertEqual(list(result), ['a', 'b', 'c'])
+            self.assertIs(result['a'], result['b'])
+            result['c']['d'] = 3
+            result['a'].append(4)
+            # The data is parsed once and every render returns its own copy
+            self.assertEqual(yaml.render(data),
+                             {'a': [1], 'b': [1], 'c': {'d': 2}})
+        self.assertEqual(parse.call_count, 1)
+
+    def test_yaml_render_error(self):
+        with self.assertRaises(SaltRenderError) as err:
+            yaml.render("a: b\n\tc: d\n")
+        self.assertEqual(err.exception.line_num, 2)
+        self.assertIn('Illegal tab character', err.exception.message)
+        self.assertIn('c: d', err.exception.buffer)
+
+    @skipIf(yamlloader.SaltYamlSafeFastLoader is yamlloader.SaltYamlSafeLoader,
+            'libyaml is not available')
+    def test_yaml_c_loader(self):
+        data = ("a: 010\nb: [x, {y: 1.5}]\nc: &c {d: null}\n"
+                "e:\n  <<: *c\n  f: \u00e9\ng: !!python/unicode h\n")
+        fast = yaml.load(data, Loader=yaml.get_yaml_loader(''))
+        slow = yaml.load(data, Loader=yaml.get_yaml_loader(
+            '', yamlloader.SaltYamlSafeLoader))
+        self.assertEqual(fast, slow)
+        self.assertEqual([type(val) for val in fast.values()],
+                         [type(val) for val in slow.values()])
+        self.assertIsInstance(fast['e'], yaml.OrderedDict)
+        with self.assertRaises(SaltRenderError):
+            yaml.render("a: 1\na: 2\n")
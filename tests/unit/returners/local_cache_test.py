@@ -163,6 +163,82 @@ class LocalCacheCleanOldJobsTestCase(TestCase):
         return temp_dir, jid_file_path
 
 
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+@destructiveTest
+class LocalCacheJobIndexTestCase(TestCase):
+    '''
+    Tests for the local_cache jid index
+    '''
+    OPTS = {'cachedir': TMP_CACHE_DIR,
+            'hash_type': 'sha256',
+            'keep_jobs': 1,
+            'job_cache_index': True}
+    JIDS = ('20161018101500000000',
+            '20161018111500000000',
+            '20161018111600000000')
+
+    def setUp(self):
+        with patch.dict(local_cache.__opts__, self.OPTS):
+            for jid in self.JIDS:
+                local_cache.prep_jid(passed_jid=jid)
+                local_cache.save_load(jid, {'jid': jid, 'fun': 'test.ping', 'arg': []})
+            local_cache.save_load('20161018111700000000',
+                                  {'jid': '20161018111700000000',
+                                   'fun': 'saltutil.find_job',
+                                   'arg': []})
+
+    def tearDown(self):
+        if os.path.exists(TMP_CACHE_DIR):
+            shutil.rmtree(TMP_CACHE_DIR)
+
+    def test_get_jids(self):
+        with patch.dict(local_cache.__opts__, self.OPTS):
+            ret = local_cache.get_jids()
+        self.assertEqual(sorted(ret), list(self.JIDS) + ['20161018111700000000'])
+        self.assertEqual(ret[self.JIDS[0]]['Function'], 'test.ping')
+
+    def test_get_jids_filter(self):
+        with patch.dict(local_cache.__opts__, self.OPTS):
+            ret = local_cache.get_jids_filter(2)
+        self.assertEqual([job['JID'] for job in ret], list(self.JIDS[1:]))
+
+    def test_clean_old_jobs(self):
+        with patch.dict(local_cache.__opts__, self.OPTS):
+            local_cache.clean_old_jobs()
+            self.assertEqual(local_cache.get_jids(), {})
+            self.assertEqual(os.listdir(os.path.join(TMP_CACHE_DIR, 'jobs_index')),
+                             [local_cache.INDEX_SWEEP])
+
+    def test_clean_old_jobs_sweep(self):
+        '''
+        The job cache dirs are still swept once per INDEX_SWEEP_INTERVAL with
+        the index enabled, scrubbing the corrupt entries it does not know
+        '''
+        corrupt = os.path.join(TMP_CACHE_DIR, 'jobs', 'zz')
+        os.makedirs(os.path.join(corrupt, 'zzzz'))
+        with patch.dict(local_cache.__opts__, self.OPTS):
+            local_cache.clean_old_jobs()
+            self.assertFalse(os.path.exists(corrupt))
+            # The sweep is not due again yet
+            os.makedirs(os.path.join(corrupt, 'zzzz'))
+            local_cache.clean_old_jobs()
+            self.assertTrue(os.path.exists(corrupt))
+
+    def test_ensure_index_atomic(self):
+        '''
+        An index build which fails leaves no partial index behind, the next
+        build indexes every job
+        '''
+        shutil.rmtree(os.path.join(TMP_CACHE_DIR, 'jobs_index'))
+        with patch.dict(local_cache.__opts__, self.OPTS):
+            with patch('salt.payload.Serial.load', MagicMock(side_effect=RuntimeError)):
+                self.assertRaises(RuntimeError, local_cache.get_jids)
+            self.assertEqual(sorted(os.listdir(TMP_CACHE_DIR)), ['jobs'])
+            self.assertEqual(sorted(local_cache.get_jids()),
+                             list(self.JIDS) + ['20161018111700000000'])
+
+
 if __name__ == '__main__':
     from integration import run_tests
-    run_tests(LocalCacheCleanOldJobsTestCase, needs_daemon=False)
+    run_tests([LocalCacheCleanOldJobsTestCase, LocalCacheJobIndexTestCase],
+              needs_daemon=False)
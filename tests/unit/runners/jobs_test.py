@@ -12,6 +12,7 @@ from salttesting.helpers import ensure_in_syspath
 from salttesting.mock import (
     NO_MOCK,
     NO_MOCK_REASON,
+    MagicMock,
     patch
 )
 
@@ -20,6 +21,8 @@ ensure_in_syspath('../../')
 # Import Salt Libs
 from salt.runners import jobs
 import salt.minion
+import salt.utils.job
+from salt.exceptions import SaltClientError
 
 jobs.__opts__ = {'ext_job_cache': None, 'master_job_cache': 'local_cache'}
 jobs.__salt__ = {}
@@ -81,6 +84,171 @@ class JobsTest(TestCase):
             self.assertEqual(jobs.list_jobs(search_target='non-existant'),
                              returns['non-existant'])
 
+    def _registry(self):
+        registry = salt.utils.job.RunningJobs()
+        registry.handle_event('salt/job/20160524035503086853/new',
+                              {'jid': '20160524035503086853',
+                               'fun': 'state.highstate', 'arg': [],
+                               'tgt': '*', 'tgt_type': 'glob', 'user': 'root',
+                               'minions': ['node-1', 'node-2', 'node-3']})
+        registry.handle_event('salt/job/20160524035503086853/ret/node-1',
+                              {'id': 'node-1', 'return': {}})
+        registry.handle_event('salt/job/20160524035524895387/new',
+                              {'fun': 'test.ping', 'minions': ['node-1'],
+                               'tgt': 'node-1', 'tgt_type': 'glob'})
+        registry.handle_event('salt/job/20160524035524895387/ret/node-1',
+                              {'id': 'node-1', 'return': True})
+        return registry
+
+    def test_running_jobs_registry(self):
+        '''
+        test keeping the running jobs from the job events
+        '''
+        registry = self._registry()
+        # Jobs all the minions returned are dropped
+        self.assertEqual(list(registry.jobs), ['20160524035503086853'])
+        job = registry.jobs['20160524035503086853']
+        self.assertEqual(job['minions'], set(['node-2', 'node-3']))
+        self.assertEqual(job['returned'], set(['node-1']))
+
+        self.assertTrue(registry.handle_event(
+            'salt/job/20160524035503086853/stale', {'minions': ['node-2']}))
+        self.assertEqual(job['minions'], set(['node-3']))
+        # Unknown jobs and other events are ignored
+        self.assertFalse(registry.handle_event(
+            'salt/job/20160524035524895387/ret/node-1', {'id': 'node-1'}))
+        self.assertFalse(registry.handle_event('salt/auth', {'id': 'node-1'}))
+
+        self.assertFalse(registry.expire())
+        self.assertTrue(registry.expire(job['time'] + registry.max_age + 1))
+        self.assertEqual(registry.jobs, {})
+
+    def test_active_from_registry(self):
+        '''
+        test jobs.active reading the running jobs registry
+        '''
+        snapshot = self._registry().snapshot()
+        client = MagicMock()
+        client.cmd.return_value = {
+            'node-2': [{'jid': '20160524035503086853', 'pid': 1234},
+                       {'jid': '20160524035524895387', 'pid': 99}],
+            'node-3': []}
+        event = MagicMock()
+        opts = {'running_jobs_registry': True,
+                'running_jobs_stale_age': 0,
+                'gather_job_timeout': 10,
+                'conf_file': '',
+                'sock_dir': ''}
+        with patch.dict(jobs.__opts__, opts), \
+                patch.object(salt.utils.job, 'get_running_jobs',
+                             MagicMock(return_value=snapshot)), \
+                patch('salt.client.get_local_client',
+                      MagicMock(return_value=client)), \
+                patch('salt.utils.event.get_master_event',
+                      MagicMock(return_value=event)):
+            ret = jobs.active(confirm=False)
+            self.assertEqual(list(ret), ['20160524035503086853'])
+            self.assertEqual(ret['20160524035503086853']['Function'],
+                             'state.highstate')
+            self.assertEqual(ret['20160524035503086853']['Running'],
+                             [{'node-2': None}, {'node-3': None}])
+            self.assertEqual(ret['20160524035503086853']['Returned'],
+                             ['node-1'])
+            self.assertFalse(client.cmd.called)
+
+            ret = jobs.active()
+            self.assertEqual(ret['20160524035503086853']['Running'],
+                             [{'node-2': 1234}])
+            client.cmd.assert_called_once_with(
+                ['node-2', 'node-3'], 'saltutil.running',
+                tgt_type='list', timeout=10)
+            event.fire_event.assert_called_once_with(
+                {'minions': ['node-3'], 'running': ['node-2']},
+                'salt/job/20160524035503086853/stale')
+
+    def test_registry_unexpected_minions(self):
+        '''
+        test the jobs published without a list of expected minions are kept
+        until they are confirmed on their target
+        '''
+        registry = salt.utils.job.RunningJobs()
+        self.assertTrue(registry.handle_event(
+            'salt/job/20160524035503086853/new',
+            {'fun': 'test.sleep', 'tgt': 'web*', 'tgt_type': 'glob'}))
+        self.assertTrue(registry.handle_event(
+            'salt/job/20160524035503086853/ret/web1', {'id': 'web1'}))
+        self.assertIn('20160524035503086853', registry.jobs)
+
+        client = MagicMock()
+        client.cmd.return_value = {
+            'web2': [{'jid': '20160524035503086853', 'pid': 42}], 'web3': []}
+        event = MagicMock()
+        opts = {'running_jobs_stale_age': 60, 'gather_job_timeout': 10,
+                'conf_file': '', 'sock_dir': ''}
+        with patch.dict(jobs.__opts__, opts), \
+                patch('salt.client.get_local_client',
+                      MagicMock(return_value=client)), \
+                patch('salt.utils.event.get_master_event',
+                      MagicMock(return_value=event)):
+            snapshot = registry.snapshot()
+            ret = jobs._active_from_registry(snapshot['jobs'])
+            self.assertEqual(ret['20160524035503086853']['Running'], [])
+            self.assertEqual(ret['20160524035503086853']['Returned'], ['web1'])
+            self.assertFalse(client.cmd.called)
+
+            snapshot['jobs']['20160524035503086853']['checked'] -= 61
+            ret = jobs._active_from_registry(snapshot['jobs'])
+            self.assertEqual(ret['20160524035503086853']['Running'],
+                             [{'web2': 42}])
+            client.cmd.assert_called_once_with(
+                'web*', 'saltutil.running', tgt_type='glob', timeout=10)
+
+        # The confirmation replaces the unknown minions with the running ones
+        self.assertTrue(registry.handle_event(
+            'salt/job/20160524035503086853/stale',
+            event.fire_event.call_args[0][0]))
+        self.assertEqual(registry.jobs['20160524035503086853']['minions'],
+                         set(['web2']))
+        registry.handle_event('salt/job/20160524035503086853/ret/web2',
+                              {'id': 'web2'})
+        self.assertEqual(registry.jobs, {})
+
+
+    def test_confirm_running_batched(self):
+        '''
+        test all the stale jobs are confirmed with a single call
+        '''
+        stale = {'20160524035503086853': {'minions': set(['node-1', 'node-2']),
+                                          'load': {}},
+                 '20160524035524895387': {'minions': set(['node-3']),
+                                          'load': {}}}
+        client = MagicMock()
+        client.cmd.return_value = {
+            'node-1': [{'jid': '20160524035503086853', 'pid': 1}],
+            'node-2': [],
+            'node-3': [{'jid': '20160524035524895387', 'pid': 3},
+                       {'jid': '20160524035503086853', 'pid': 4}]}
+        event = MagicMock()
+        opts = {'gather_job_timeout': 10, 'sock_dir': ''}
+        with patch.dict(jobs.__opts__, opts), \
+                patch('salt.utils.event.get_master_event',
+                      MagicMock(return_value=event)):
+            ret = jobs._confirm_running(client, stale)
+        client.cmd.assert_called_once_with(
+            ['node-1', 'node-2', 'node-3'], 'saltutil.running',
+            tgt_type='list', timeout=10)
+        # node-3 was not sent the first job
+        self.assertEqual(ret, {'20160524035503086853': {'node-1': 1},
+                               '20160524035524895387': {'node-3': 3}})
+        self.assertEqual(event.fire_event.call_count, 2)
+        event.fire_event.assert_any_call(
+            {'minions': ['node-2'], 'running': ['node-1']},
+            'salt/job/20160524035503086853/stale')
+
+        client.cmd.side_effect = SaltClientError
+        with patch.dict(jobs.__opts__, opts):
+            self.assertEqual(jobs._confirm_running(client, stale), {})
+
 
 if __name__ == '__main__':
     from integration import run_tests
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+'''
+unit tests for the manage runner
+'''
+
+# Import Python Libs
+from __future__ import absolute_import
+
+# Import Salt Testing Libs
+from salttesting import skipIf, TestCase
+from salttesting.helpers import ensure_in_syspath
+from salttesting.mock import (
+    NO_MOCK,
+    NO_MOCK_REASON,
+    MagicMock,
+    patch
+)
+
+ensure_in_syspath('../../')
+
+# Import Salt Libs
+from salt.runners import manage
+import salt.utils.master
+
+manage.__opts__ = {'timeout': 5}
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class ManageTest(TestCase):
+    '''
+    Validate the manage runner
+    '''
+    def test_minion_liveness(self):
+        '''
+        test the minion liveness table kept from the master events
+        '''
+        table = salt.utils.master.MinionLiveness()
+        self.assertTrue(table.handle_event('salt/presence/present',
+                                           {'present': ['alpha', 'beta']},
+                                           now=100))
+        self.assertTrue(table.handle_event('salt/job/20170101000000000000/ret/gamma',
+                                           {'id': 'gamma', 'return': True},
+                                           now=110))
+        self.assertTrue(table.handle_event('salt/auth',
+                                           {'act': 'accept', 'id': 'delta', 'result': True},
+                                           now=120))
+        self.assertFalse(table.handle_event('salt/auth',
+                                            {'act': 'pend', 'id': 'epsilon', 'result': True},
+                                            now=120))
+        self.assertTrue(table.handle_event('salt/minion/beta/start',
+                                           {'id': 'beta'},
+                                           now=130))
+        self.assertFalse(table.handle_event('salt/job/20170101000000000000/new',
+                                            {'minions': ['alpha']},
+                                            now=140))
+        self.assertEqual(table.last_seen,
+                         {'alpha': 100, 'beta': 130, 'gamma': 110, 'delta': 120})
+
+        self.assertTrue(table.handle_event('salt/key', {'act': 'delete', 'id': 'delta'}))
+        self.assertFalse(table.handle_event('salt/key', {'act': 'delete', 'id': 'delta'}))
+        self.assertNotIn('delta', table.last_seen)
+
+    def test_status_from_liveness(self):
+        '''
+        test manage.status answered from the minion liveness table
+        '''
+        last_seen = {'alpha': 1000, 'beta': 800}
+        ckminions = MagicMock()
+        ckminions.check_minions.return_value = ['alpha', 'beta', 'gamma']
+        ping = MagicMock()
+        with patch.dict(manage.__opts__, {'minion_liveness': True,
+                                          'presence_events': True,
+                                          'minion_liveness_max_age': 300}), \
+                patch('salt.utils.master.get_minion_liveness',
+                      MagicMock(return_value=last_seen)), \
+                patch('salt.utils.minions.CkMinions', MagicMock(return_value=ckminions)), \
+                patch('time.time', MagicMock(return_value=1200)), \
+                patch('salt.runners.manage._ping', ping):
+            self.assertEqual(manage.status(output=False),
+                             {'up': ['alpha'], 'down': ['beta', 'gamma']})
+            self.assertEqual(manage.up(max_age=600), ['alpha', 'beta'])
+            self.assertEqual(manage.down(max_age=600), ['gamma'])
+        self.assertFalse(ping.called)
+
+    def test_status_liveness_out_of_date(self):
+        '''
+        test manage.status falls back to test.ping without a liveness table
+        '''
+        ping = MagicMock(return_value=(['alpha'], ['beta']))
+        with patch.dict(manage.__opts__, {'minion_liveness': True}), \
+                patch('salt.utils.master.get_minion_liveness',
+                      MagicMock(return_value=None)), \
+                patch('salt.runners.manage._ping', ping):
+            self.assertEqual(manage.status(output=False),
+                             {'up': ['alpha'], 'down': ['beta']})
+        ping.assert_called_once_with('*', 'glob', 5)
+
+    def test_status_liveness_without_presence_events(self):
+        '''
+        test the liveness table is not used without the presence events
+        '''
+        ping = MagicMock(return_value=(['alpha'], ['beta']))
+        get_liveness = MagicMock(return_value={'alpha': 0})
+        with patch.dict(manage.__opts__, {'minion_liveness': True,
+                                          'presence_events': False}), \
+                patch('salt.utils.master.get_minion_liveness', get_liveness), \
+                patch('salt.runners.manage._ping', ping):
+            self.assertEqual(manage.status(output=False),
+                             {'up': ['alpha'], 'down': ['beta']})
+        self.assertFalse(get_liveness.called)
+
+    def test_down_removekeys_confirmed(self):
+        '''
+        test manage.down only removes the keys of the minions which do not
+        answer a ping
+        '''
+        wheel = MagicMock()
+        ping = MagicMock(return_value=(['beta'], ['gamma']))
+        with patch('salt.runners.manage.status',
+                   MagicMock(return_value={'up': ['alpha'],
+                                           'down': ['beta', 'gamma']})), \
+                patch('salt.runners.manage._ping', ping), \
+                patch('salt.wheel.Wheel', MagicMock(return_value=wheel)):
+            self.assertEqual(manage.down(), ['beta', 'gamma'])
+            self.assertFalse(ping.called)
+            self.assertEqual(manage.down(removekeys=True), ['gamma'])
+        ping.assert_called_once_with(['beta', 'gamma'], 'list', 5)
+        wheel.call_func.assert_called_once_with('key.delete', match='gamma')
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(ManageTest, needs_daemon=False)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+'''
+    tests.unit.ssh_test
+    ~~~~~~~~~~~~~~~~~~~
+
+    Test the pool of worker processes salt-ssh runs the targets on
+'''
+
+# Import python libs
+from __future__ import absolute_import
+import os
+import sys
+import time
+
+# Import Salt Testing libs
+from salttesting import TestCase, skipIf
+from salttesting.helpers import ensure_in_syspath
+ensure_in_syspath('../')
+
+# Import Salt libs
+import salt.client.ssh
+
+
+def _routine(que, opts, host, target, mine=False):  # pylint: disable=unused-argument
+    '''
+    Stand in for SSH.handle_routine, the host ``dead`` kills its worker
+    '''
+    if host == 'dead':
+        os._exit(1)
+    if host == 'hung':
+        time.sleep(60)
+    que.put({'id': host, 'ret': {'pid': os.getpid(), 'user': target['user']}})
+
+
+@skipIf(sys.platform.startswith('win'), 'the workers are forked')
+class SSHWorkerPoolTestCase(TestCase):
+    '''
+    Test SSH.handle_ssh
+    '''
+    def _ssh(self, hosts, max_procs):
+        ssh = salt.client.ssh.SSH.__new__(salt.client.ssh.SSH)
+        ssh.opts = {'ssh_max_procs': max_procs, 'ssh_run_timeout': 30}
+        ssh.targets = dict((host, {'host': host}) for host in hosts)
+        ssh.defaults = {'user': 'root'}
+        ssh.run_stats = {}
+        ssh.handle_routine = _routine
+        return ssh
+
+    def _run(self, ssh):
+        ret = {}
+        for host_ret in ssh.handle_ssh():
+            self.assertEqual(len(host_ret), 1)
+            host = next(iter(host_ret))
+            self.assertNotIn(host, ret)
+            ret[host] = host_ret[host]
+        return ret
+
+    def test_dispatch(self):
+        '''
+        Every host is returned once, by no more workers than ssh_max_procs
+        '''
+        hosts = ['host{0}'.format(num) for num in range(10)]
+        ssh = self._ssh(hosts, 3)
+        ret = self._run(ssh)
+        self.assertEqual(sorted(ret), hosts)
+        self.assertLessEqual(len(set(host_ret['pid'] for host_ret in ret.values())), 3)
+        # The defaults are filled in for the targets
+        self.assertEqual(set(host_ret['user'] for host_ret in ret.values()), set(['root']))
+        self.assertEqual(ssh.run_stats['hosts'], 10)
+        self.assertEqual(ssh.run_stats['procs'], 3)
+
+    def test_fewer_hosts_than_procs(self):
+        ssh = self._ssh(['host1', 'host2'], 25)
+        self.assertEqual(sorted(self._run(ssh)), ['host1', 'host2'])
+        self.assertEqual(ssh.run_stats['procs'], 2)
+
+    def test_dead_worker(self):
+        '''
+        A host whose worker died is reported and the remaining hosts still
+        return on a replacement worker, whichever host the dead worker ran
+        before
+        '''
+        hosts = ['host1', 'dead', 'host2', 'host3']
+        ssh = self._ssh(hosts, 1)
+        ret = self._run(ssh)
+        self.assertEqual(sorted(ret), sorted(hosts))
+        self.assertEqual(ret['dead'],
+                         'Target \'dead\' did not return any data, probably '
+                         'due to an error.')
+        self.assertEqual(ssh.run_stats['hosts'], 4)
+
+    def test_run_timeout(self):
+        '''
+        A host which does not return in time is reported and its worker is
+        replaced
+        '''
+        hosts = ['hung', 'host1', 'host2']
+        ssh = self._ssh(hosts, 1)
+        ssh.opts['ssh_run_timeout'] = 1
+        start = time.time()
+        ret = self._run(ssh)
+        self.assertLess(time.time() - start, 30)
+        self.assertEqual(sorted(ret), sorted(hosts))
+        self.assertEqual(ret['hung'],
+                         'Target \'hung\' did not return within 1 seconds.')
+
+    def test_no_targets(self):
+        ssh = self._ssh([], 3)
+        self.assertEqual(list(ssh.handle_ssh()), [])
+        self.assertEqual(ssh.run_stats, {})
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(SSHWorkerPoolTestCase, needs_daemon=False)
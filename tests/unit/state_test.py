@@ -14,7 +14,7 @@ import tempfile
 import integration
 from salttesting import TestCase, skipIf
 from salttesting.helpers import ensure_in_syspath
-from salttesting.mock import NO_MOCK, NO_MOCK_REASON, patch
+from salttesting.mock import NO_MOCK, NO_MOCK_REASON, MagicMock, patch
 
 ensure_in_syspath('../')
 
@@ -24,6 +24,9 @@ import salt.config
 import salt.exceptions
 from salt.utils.odict import OrderedDict, DefaultOrderedDict
 
+# Import 3rd-party libs
+import salt.ext.six as six
+
 
 @skipIf(NO_MOCK, NO_MOCK_REASON)
 class StateCompilerTestCase(TestCase):
@@ -60,6 +63,134 @@ class StateCompilerTestCase(TestCase):
             state_obj.call_high(high_data)
 
 
+class RequisiteIndexTestCase(TestCase):
+    '''
+    TestCase for the requisite lookup index
+    '''
+    def setUp(self):
+        self.chunks = [
+            {'state': 'pkg', '__id__': 'nginx', 'name': 'nginx',
+             '__sls__': 'web', 'fun': 'installed'},
+            {'state': 'file', '__id__': 'nginx_conf', 'name': '/etc/nginx.conf',
+             '__sls__': 'web.config', 'fun': 'managed'},
+            {'state': 'service', '__id__': 'run_nginx', 'name': 'nginx',
+             '__sls__': 'web', 'fun': 'running'},
+            {'state': 'file', '__id__': 'nginx', 'name': '/srv/www',
+             '__sls__': 'web.config', 'fun': 'directory'},
+        ]
+        self.index = salt.state.RequisiteIndex(self.chunks)
+
+    def test_literal_id(self):
+        self.assertEqual(self.index.match('id', 'nginx'),
+                         [self.chunks[0], self.chunks[2], self.chunks[3]])
+
+    def test_literal_state_name(self):
+        self.assertEqual(self.index.match('file', 'nginx'), [self.chunks[3]])
+        self.assertEqual(self.index.match('file', '/etc/nginx.conf'),
+                         [self.chunks[1]])
+        self.assertEqual(self.index.match('pkg', 'missing'), [])
+
+    def test_sls(self):
+        self.assertEqual(self.index.match('sls', 'web'),
+                         [self.chunks[0], self.chunks[2]])
+        self.assertEqual(self.index.match('sls', 'web*'), self.chunks)
+
+    def test_glob(self):
+        self.assertEqual(self.index.match('file', 'nginx*'),
+                         [self.chunks[1], self.chunks[3]])
+        self.assertEqual(self.index.match('id', '*_nginx'), [self.chunks[2]])
+
+    def test_none(self):
+        self.assertEqual(self.index.match('id', None), [])
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+@skipIf(sys.platform.startswith('win'), 'state_parallel is not supported on Windows')
+class StateParallelTestCase(TestCase):
+    '''
+    TestCase for running state chunks in parallel
+    '''
+    def _high(self):
+        states = [
+            ('a', 'succeed_with_changes', {}),
+            ('b', 'succeed_without_changes', {}),
+            ('c', 'succeed_without_changes', {'watch': [{'test': 'a'}]}),
+            ('d', 'fail_without_changes', {}),
+            ('e', 'succeed_with_changes', {'onfail': [{'test': 'd'}]}),
+            ('f', 'succeed_with_changes', {'onchanges': [{'test': 'b'}]}),
+            ('g', 'succeed_with_changes', {'require': [{'test': 'd'}]}),
+            ('h', 'succeed_with_changes', {'require': [{'test': 'i'}]}),
+            ('i', 'succeed_without_changes', {}),
+        ]
+        high = OrderedDict()
+        for num, (name, fun, reqs) in enumerate(states):
+            args = [fun, {'order': 10000 + num}, {'__auto_order__': True}]
+            for req, val in six.iteritems(reqs):
+                args.append({req: val})
+            high[name] = {'test': args, '__sls__': 'par', '__env__': 'base'}
+        return high
+
+    @patch('salt.state.State._gather_pillar', MagicMock(return_value={}))
+    def _run(self, workers):
+        opts = salt.config.minion_config(
+            os.path.join(integration.TMP_CONF_DIR, 'minion'))
+        opts['state_parallel'] = workers
+        state_obj = salt.state.State(opts)
+        ret = state_obj.call_high(self._high())
+        # A serial mod_watch call skips a __run_num__, compare the order
+        order = sorted(ret, key=lambda tag: ret[tag]['__run_num__'])
+        return [(tag, ret[tag]['result'], ret[tag]['comment'],
+                 bool(ret[tag]['changes'])) for tag in order]
+
+    def test_parallel_workers(self):
+        opts = salt.config.minion_config(None)
+        opts['state_parallel'] = 4
+        with patch('salt.state.State._gather_pillar',
+                   MagicMock(return_value={})):
+            state_obj = salt.state.State(opts)
+        chunks = [{'state': 'test', 'name': 'a', '__id__': 'a'},
+                  {'state': 'test', 'name': 'b', '__id__': 'b'}]
+        self.assertEqual(state_obj.parallel_workers(chunks), 4)
+        self.assertEqual(state_obj.parallel_workers(chunks[:1]), 0)
+        chunks[1]['prereq'] = [{'test': 'a'}]
+        self.assertEqual(state_obj.parallel_workers(chunks), 0)
+
+    def test_parallel_groups(self):
+        '''
+        Only the auto ordered chunks between explicit orders share a group
+        '''
+        lows = {'first': {'order': 0},
+                'explicit1': {'order': 10001},
+                'explicit2': {'order': 10002.0001},
+                'auto1': {'order': 10000, '__auto_order__': True},
+                'auto2': {'order': 10003, '__auto_order__': True},
+                'auto3': {'order': 10004.0002, '__auto_order__': True},
+                'last': {'order': 1000101}}
+        self.assertEqual(salt.state.State._parallel_groups(lows),
+                         {'first': 0,
+                          'explicit1': 10001,
+                          'explicit2': 10002,
+                          'auto1': 10000.5,
+                          'auto2': 1000100.5,
+                          'auto3': 1000100.5,
+                          'last': 1000101})
+        del lows['last']
+        self.assertEqual(salt.state.State._parallel_groups(lows)['auto3'],
+                         float('inf'))
+
+    def test_same_as_serial(self):
+        '''
+        The returns and their __run_num__ match a serial run
+        '''
+        serial = self._run(0)
+        self.assertEqual(self._run(3), serial)
+        # The require of h on the later i is run first
+        self.assertEqual([run[0].split('_|-')[1] for run in serial],
+                         ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'i', 'h'])
+        self.assertEqual(serial[2][2], 'Watch statement fired.')
+        self.assertIs(serial[6][1], False)
+
+
 class HighStateTestCase(TestCase):
     def setUp(self):
         self.root_dir = tempfile.mkdtemp(dir=integration.TMP)
@@ -108,6 +239,20 @@ class HighStateTestCase(TestCase):
                                                    'state2,state3')
         self.assertEqual(matches, {'env': ['state2', 'state3']})
 
+    def test_handle_iorder(self):
+        '''
+        The auto ordered states are only marked as such for parallel runs
+        '''
+        self.highstate.opts['state_auto_order'] = True
+        state = self.highstate._handle_iorder({'vim': {'pkg': ['installed']}})
+        self.assertEqual(state['vim']['pkg'],
+                         ['installed', {'order': self.highstate.iorder - 1}])
+        self.highstate.opts['state_parallel'] = 4
+        state = self.highstate._handle_iorder({'vim': {'pkg': ['installed']}})
+        self.assertEqual(state['vim']['pkg'],
+                         ['installed', {'order': self.highstate.iorder - 1},
+                          {'__auto_order__': True}])
+
     def test_show_state_usage(self):
         # monkey patch sub methods
         self.highstate.avail = {
@@ -909,6 +909,44 @@ class FileTestCase(TestCase):
                     ret.update({'comment': comt, 'result': True})
                     self.assertDictEqual(filestate.recurse(name, source), ret)
 
+    def test_recurse_manifest(self):
+        '''
+        Test that with a manifest the files synced into the minion's cache are
+        managed from the cache.
+        '''
+        name = '/opt/code/flask'
+        source = 'salt://code/flask'
+        mng_files = [(name + '/a', source + '/a'), (name + '/b', source + '/b')]
+        cached = {source + '/a': '/cache/a', source + '/b': '/cache/b'}
+        mock_managed = MagicMock(return_value={'result': True, 'comment': '',
+                                               'changes': {}})
+        mock_cache_dir = MagicMock(return_value=['/cache/a'])
+        with patch.dict(filestate.__salt__, {
+                    'file.source_list': MagicMock(return_value=(source, '')),
+                    'cp.list_master_dirs': MagicMock(return_value=['code/flask']),
+                    'cp.cache_dir': mock_cache_dir,
+                    'cp.is_cached': MagicMock(side_effect=lambda src, env: cached[src])}), \
+                patch.object(filestate, '_gen_recurse_managed_files',
+                             MagicMock(return_value=(mng_files, [], [], set()))), \
+                patch.object(filestate, 'managed', mock_managed), \
+                patch.object(os.path, 'isabs', MagicMock(return_value=True)), \
+                patch.object(os.path, 'isdir', MagicMock(return_value=True)):
+            ret = filestate.recurse(name, source, manifest=True)
+            self.assertTrue(ret['result'])
+            mock_cache_dir.assert_called_once_with(
+                source, 'base', include_pat=None, exclude_pat=None,
+                manifest=True)
+            # b was not synced, it is managed from the master
+            self.assertEqual(
+                [call[1]['source'] for call in mock_managed.call_args_list],
+                ['/cache/a', source + '/b'])
+
+            mock_managed.reset_mock()
+            filestate.recurse(name, source, manifest=True, template='jinja')
+            self.assertEqual(
+                [call[1]['source'] for call in mock_managed.call_args_list],
+                [source + '/a', source + '/b'])
+
     # 'replace' function tests: 1
 
     def test_replace(self):
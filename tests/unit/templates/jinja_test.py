@@ -9,11 +9,13 @@ import json
 import datetime
 import pprint
 import re
+import shutil
 
 # Import Salt Testing libs
 from salttesting.unit import skipIf, TestCase
 from salttesting.case import ModuleCase
 from salttesting.helpers import ensure_in_syspath
+from salttesting.mock import patch
 ensure_in_syspath('../../')
 
 # Import salt libs
@@ -21,6 +23,7 @@ import salt.config
 import salt.ext.six as six
 import salt.loader
 import salt.utils
+import salt.utils.templates
 from salt.exceptions import SaltRenderError
 from salt.ext.six.moves import builtins
 from salt.utils import get_context
@@ -35,6 +38,7 @@ from integration import TMP_CONF_DIR
 
 # Import 3rd party libs
 import yaml
+import jinja2
 from jinja2 import Environment, DictLoader, exceptions
 try:
     import timelib  # pylint: disable=W0611
@@ -165,6 +169,16 @@ class TestGetTemplate(TestCase):
                 'extmods'),
         }
 
+    def setUp(self):
+        # The fileserver keeps its hash index under the cachedir, keep it out
+        # of the source tree. The test files are already in the cache.
+        self.local_opts['cachedir'] = tempfile.mkdtemp()
+        os.symlink(os.path.join(TEMPLATES_DIR, 'files'),
+                   os.path.join(self.local_opts['cachedir'], 'files'))
+
+    def tearDown(self):
+        shutil.rmtree(self.local_opts['cachedir'], ignore_errors=True)
+
     def test_fallback(self):
         '''
         A Template with a filesystem loader is returned as fallback
@@ -460,6 +474,94 @@ class TestGetTemplate(TestCase):
         )
 
 
+class TestJinjaEnvCache(TestCase):
+    '''
+    Test reusing the jinja environments and compiled templates between renders
+    '''
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        roots = {'base': [os.path.join(self.tmpdir, 'roots')]}
+        os.makedirs(roots['base'][0])
+        self.opts = {'cachedir': os.path.join(self.tmpdir, 'cache'),
+                     'file_roots': roots,
+                     'pillar_roots': roots,
+                     'jinja_bytecode_cache': True}
+        self.tmplpath = self._write('top', '{% include "inc" %}')
+        self._write('inc', 'one')
+        salt.utils.templates.JINJA_ENVS.envs = {}
+
+    def tearDown(self):
+        salt.utils.templates.JINJA_ENVS.envs = {}
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _write(self, name, data, mtime=None):
+        path = os.path.join(self.tmpdir, 'roots', name)
+        with salt.utils.fopen(path, 'w') as fp_:
+            fp_.write(data)
+        if mtime:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def _render(self):
+        jinja_env = salt.utils.templates._get_jinja_env(self.opts, 'base')
+        fc = MockFileClient(jinja_env.loader)
+        context = {'opts': self.opts, 'saltenv': 'base'}
+        with salt.utils.fopen(self.tmplpath) as fp_:
+            ret = render_jinja_tmpl(fp_.read(), context, tmplpath=self.tmplpath)
+        return ret, [req['path'] for req in fc.requests]
+
+    def test_env_reused(self):
+        '''
+        The environment is kept, and included templates are fetched again and
+        only compiled again once they have changed
+        '''
+        jinja_env = salt.utils.templates._get_jinja_env(self.opts, 'base')
+        self.assertEqual(self._render(), ('one', ['salt://inc']))
+        self.assertIs(salt.utils.templates._get_jinja_env(self.opts, 'base'),
+                      jinja_env)
+        self.assertEqual(self._render(), ('one', ['salt://inc']))
+        self._write('inc', 'two', mtime=1)
+        self.assertEqual(self._render(), ('two', ['salt://inc']))
+
+    def test_context_not_shared(self):
+        '''
+        The context of a render does not leak into the next render through
+        the reused environment
+        '''
+        context = {'opts': self.opts, 'saltenv': 'base', 'secret': 'minionA-secret'}
+        self.assertEqual(render_jinja_tmpl('{{ secret }}', context), 'minionA-secret')
+        context = {'opts': self.opts, 'saltenv': 'base'}
+        self.assertEqual(
+            render_jinja_tmpl('{% if secret is defined %}LEAK {{ secret }}{% else %}clean{% endif %}',
+                              context),
+            'clean')
+        self.assertRaises(SaltRenderError, render_jinja_tmpl, '{{ secret }}', context)
+
+    def test_context_in_import(self):
+        '''
+        Imported templates still see the context of the render
+        '''
+        self._write('macro', '{% macro show() %}{{ secret }}{% endmacro %}')
+        tmplstr = '{% from "macro" import show %}{{ show() }}'
+        for secret in ('one', 'two'):
+            jinja_env = salt.utils.templates._get_jinja_env(self.opts, 'base')
+            MockFileClient(jinja_env.loader)
+            context = {'opts': self.opts, 'saltenv': 'base', 'secret': secret}
+            self.assertEqual(render_jinja_tmpl(tmplstr, context), secret)
+
+    def test_bytecode_cache(self):
+        '''
+        The compiled templates are persisted and used by new environments
+        '''
+        self.assertEqual(self._render()[0], 'one')
+        self.assertEqual(len(os.listdir(os.path.join(self.opts['cachedir'],
+                                                     'jinja'))), 2)
+        salt.utils.templates.JINJA_ENVS.envs = {}
+        with patch.object(jinja2.Environment, 'compile',
+                          side_effect=AssertionError('compiled')):
+            self.assertEqual(self._render()[0], 'one')
+
+
 class TestCustomExtensions(TestCase):
     def test_regex_escape(self):
         dataset = 'foo?:.*/\\bar'
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+'''
+unit tests for the master side auth admission control
+'''
+
+# Import Python Libs
+from __future__ import absolute_import
+
+# Import Salt Testing Libs
+from salttesting import TestCase, skipIf
+from salttesting.helpers import ensure_in_syspath
+from salttesting.mock import NO_MOCK, NO_MOCK_REASON, MagicMock
+
+ensure_in_syspath('../')
+
+# Import Salt Libs
+from salt.transport.mixins import auth
+
+
+class AuthAdmissionTestCase(TestCase):
+    '''
+    TestCase for salt.transport.mixins.auth.AuthAdmission
+    '''
+    def test_admit_unlimited(self):
+        admission = auth.AuthAdmission({})
+        for _ in range(100):
+            self.assertEqual(admission.admit(), 0)
+
+    def test_admit_rate_limit(self):
+        admission = auth.AuthAdmission({'auth_rate_limit': 2,
+                                        'auth_rate_burst': 2})
+        now = admission.state[admission.REFILLED]
+        self.assertEqual(admission.admit(now), 0)
+        self.assertEqual(admission.admit(now), 0)
+        # The deferred minions are spread over the following seconds
+        self.assertAlmostEqual(admission.admit(now), 0.5)
+        self.assertAlmostEqual(admission.admit(now), 1.0)
+        self.assertAlmostEqual(admission.admit(now + 0.25), 1.25)
+        # The first deferred minions come back when tokens are available
+        self.assertEqual(admission.admit(now + 0.5), 0)
+        self.assertEqual(admission.admit(now + 1.0), 0)
+        self.assertEqual(admission.admit(now + 3.0), 0)
+        self.assertEqual(admission.state[admission.DEFERRED], 0)
+
+    def test_auth_workers(self):
+        admission = auth.AuthAdmission({'auth_workers': 1})
+        self.assertTrue(admission.acquire_worker())
+        self.assertFalse(admission.acquire_worker())
+        admission.release_worker()
+        self.assertTrue(admission.acquire_worker())
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class AESReqServerMixinTestCase(TestCase):
+    '''
+    TestCase for the auth admission in AESReqServerMixin._auth
+    '''
+    def test_auth_busy(self):
+        server = auth.AESReqServerMixin()
+        server.auth_admission = auth.AuthAdmission({'auth_rate_limit': 1,
+                                                    'auth_workers': 1})
+        server._auth_minion = MagicMock(return_value={'enc': 'pub'})
+        self.assertEqual(server._auth({'id': 'web1'}), {'enc': 'pub'})
+        ret = server._auth({'id': 'web2'})
+        self.assertEqual(ret['load']['ret'], 'busy')
+        self.assertTrue(0 < ret['load']['retry_after'] <= 1)
+        self.assertEqual(server._auth_minion.call_count, 1)
+        # The auth worker was released
+        self.assertTrue(server.auth_admission.acquire_worker())
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(AuthAdmissionTestCase, AESReqServerMixinTestCase, needs_daemon=False)
@@ -10,6 +10,7 @@ import threading
 
 import tornado.gen
 import tornado.ioloop
+import tornado.concurrent
 from tornado.testing import AsyncTestCase
 
 import salt.config
@@ -17,11 +18,13 @@ import salt.ext.six as six
 import salt.utils
 import salt.transport.server
 import salt.transport.client
+import salt.transport.tcp
 import salt.exceptions
 
 # Import Salt Testing libs
 from salttesting import TestCase, skipIf
 from salttesting.helpers import ensure_in_syspath
+from salttesting.mock import NO_MOCK, NO_MOCK_REASON, MagicMock, patch
 ensure_in_syspath('../')
 import integration
 
@@ -199,7 +202,79 @@ class AsyncPubChannelTest(BaseTCPPubCase, PubChannelMixin):
     Tests around the publish system
     '''
 
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class PubServerTestCase(TestCase):
+    '''
+    Tests around the fan-out of the TCP PubServer
+    '''
+    def _server(self, **opts):
+        with patch('salt.master.AESFuncs', MagicMock()):
+            server = salt.transport.tcp.PubServer(opts, io_loop=MagicMock())
+        for id_ in ('web1', 'web2'):
+            client = salt.transport.tcp.Subscriber(MagicMock(), (id_, 4505))
+            client.id_ = id_
+            client.stream.write.side_effect = lambda data: tornado.concurrent.Future()
+            client.stream.closed.return_value = False
+            server.clients.add(client)
+            server.present[id_] = set([client])
+        return server
+
+    def _client(self, server, id_):
+        return next(iter(server.present[id_]))
+
+    def test_publish_backlog(self):
+        server = self._server()
+        package = {'payload': {'load': 'x' * 100}}
+        server.publish_payload(package, None)
+        server.publish_payload(dict(package, topic_lst=['web1', 'web3']), None)
+        size = len(salt.transport.frame.frame_msg(package['payload']))
+        web1 = self._client(server, 'web1')
+        web2 = self._client(server, 'web2')
+        self.assertEqual(web1.backlog, size * 2)
+        self.assertEqual(web2.backlog, size)
+        # The same framed buffer is written to all of the subscribers
+        self.assertIs(web1.stream.write.call_args_list[0][0][0],
+                      web2.stream.write.call_args_list[0][0][0])
+
+        fanout, future = salt.transport.tcp.FanOut(server, size), tornado.concurrent.Future()
+        future.set_result(None)
+        fanout.pending = 1
+        fanout.done(web1, future)
+        self.assertEqual(web1.backlog, size)
+
+    def test_publish_hwm(self):
+        package = {'payload': {'load': 'x' * 100}}
+        size = len(salt.transport.frame.frame_msg(package['payload']))
+        server = self._server(tcp_pub_hwm=size)
+        server.publish_payload(package, None)
+        server.publish_payload(package, None)
+        web1 = self._client(server, 'web1')
+        self.assertEqual(web1.stream.write.call_count, 1)
+        self.assertEqual(len(server.clients), 2)
+
+        server = self._server(tcp_pub_hwm=size, tcp_pub_hwm_action='disconnect')
+        server.publish_payload(package, None)
+        web1 = self._client(server, 'web1')
+        server.publish_payload(dict(package, topic_lst=['web1']), None)
+        self.assertEqual(web1.stream.write.call_count, 1)
+        self.assertNotIn(web1, server.clients)
+        self.assertNotIn('web1', server.present)
+        self.assertTrue(web1.stream.close.called)
+
+    def test_closed_stream(self):
+        server = self._server()
+        web1 = self._client(server, 'web1')
+        future = tornado.concurrent.Future()
+        future.set_exception(tornado.iostream.StreamClosedError())
+        fanout = salt.transport.tcp.FanOut(server, 10)
+        fanout.pending = 1
+        fanout.done(web1, future)
+        self.assertNotIn(web1, server.clients)
+
+
 if __name__ == '__main__':
     from integration import run_tests
     run_tests(ClearReqTestCases, needs_daemon=False)
     run_tests(AESReqTestCases, needs_daemon=False)
+    run_tests(PubServerTestCase, needs_daemon=False)
@@ -19,14 +19,18 @@ from tornado.testing import AsyncTestCase
 import tornado.gen
 
 import salt.config
+import salt.crypt
 import salt.ext.six as six
+import salt.master
 import salt.utils
 import salt.transport.server
 import salt.transport.client
+import salt.transport.zeromq
 import salt.exceptions
 
 # Import Salt Testing libs
 from salttesting import TestCase, skipIf
+from salttesting.mock import NO_MOCK, NO_MOCK_REASON, MagicMock, patch
 from salttesting.helpers import ensure_in_syspath
 ensure_in_syspath('../')
 
@@ -219,7 +223,69 @@ class AsyncPubChannelTest(BaseZMQPubCase, PubChannelMixin):
         return zmq.eventloop.ioloop.ZMQIOLoop()
 
 
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class PubServerChannelTest(TestCase):
+    '''
+    Test the reuse of the publish socket and Crypticle
+    '''
+    def setUp(self):
+        self.opts = salt.config.DEFAULT_MASTER_OPTS.copy()
+        self.opts.update({'sock_dir': integration.TMP,
+                          'cachedir': integration.TMP,
+                          'transport': 'zeromq'})
+        aes = MagicMock(value=salt.crypt.Crypticle.generate_key_string())
+        channel = salt.transport.zeromq.ZeroMQPubServerChannel
+        self.patches = [
+            patch.object(salt.master.SMaster, 'secrets',
+                         {'aes': {'secret': aes}}),
+            patch.object(channel, '_push_socks', {}),
+            patch.object(channel, '_crypticle', None),
+            patch.object(channel, '_stats', dict(channel._stats)),
+        ]
+        for patcher in self.patches:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patches:
+            patcher.stop()
+
+    def test_publish_reuses_socket_and_crypticle(self):
+        load = {'fun': 'test.ping', 'arg': [], 'tgt': '*', 'tgt_type': 'glob',
+                'jid': '20161018120000000000'}
+        channel = salt.transport.zeromq.ZeroMQPubServerChannel
+        with patch('zmq.Context') as context:
+            sock = context.return_value.socket.return_value
+            channel(self.opts).publish(load)
+            crypticle = channel._crypticle
+            channel(self.opts).publish(load)
+        self.assertEqual(context.call_count, 1)
+        self.assertEqual(sock.connect.call_count, 1)
+        self.assertEqual(sock.send.call_count, 2)
+        self.assertIs(channel._crypticle, crypticle)
+        self.assertEqual(channel.publish_stats()['publish_count'], 2)
+
+    def test_publish_stats_event(self):
+        '''
+        The publish counters are fired at most every loop_interval seconds
+        '''
+        funcs = salt.master.ClearFuncs.__new__(salt.master.ClearFuncs)
+        funcs.opts = {'loop_interval': 60}
+        funcs.event = MagicMock()
+        funcs._pub_stats_fired = {}
+        chan = salt.transport.zeromq.ZeroMQPubServerChannel
+        funcs._fire_pub_stats('zeromq', chan)
+        funcs._fire_pub_stats('zeromq', chan)
+        funcs.event.fire_event.assert_called_once_with(
+            {'pid': os.getpid(), 'transport': 'zeromq',
+             'stats': chan.publish_stats()},
+            'salt/publish/stats')
+        # Channels without counters are skipped
+        funcs._fire_pub_stats('tcp', object())
+        self.assertEqual(funcs.event.fire_event.call_count, 1)
+
+
 if __name__ == '__main__':
     from integration import run_tests
     run_tests(ClearReqTestCases, needs_daemon=False)
     run_tests(AESReqTestCases, needs_daemon=False)
+    run_tests(PubServerChannelTest, needs_daemon=False)
@@ -11,6 +11,9 @@
 from __future__ import absolute_import
 import os
 import hashlib
+import shutil
+import tempfile
+import threading
 import time
 from tornado.testing import AsyncTestCase
 import zmq
@@ -30,6 +33,7 @@ ensure_in_syspath('../../')
 # Import salt libs
 import integration
 from salt.utils.process import clean_proc
+import salt.utils
 from salt.utils import event, to_bytes
 
 # Import 3rd-+arty libs
@@ -369,6 +373,205 @@ class TestAsyncEventPublisher(AsyncTestCase):
         self.data.pop('_stamp')  # drop the stamp
         self.assertEqual(self.data, {'data': 'foo1'})
 
+
+class TestEventReturnWorker(TestCase):
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp(dir=integration.SYS_TMP_DIR)
+        self.opts = {'cachedir': self.cachedir, 'serial': 'msgpack'}
+        self.returned = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def tearDown(self):
+        shutil.rmtree(self.cachedir, ignore_errors=True)
+
+    def _returner(self, events):
+        self.release.wait()
+        self.returned.extend(events)
+
+    def _worker(self, **kwargs):
+        return event.EventReturnWorker(
+            self.opts, 'test.event_return', self._returner, **kwargs)
+
+    def test_drop_oldest(self):
+        '''
+        Queued events beyond max_pending are dropped oldest first
+        '''
+        worker = self._worker(max_pending=4, overflow='drop_oldest')
+        for idx in range(4):
+            worker.put([idx, idx + 10])
+        worker.start()
+        worker.stop()
+        worker.join()
+        self.assertEqual(self.returned, [2, 12, 3, 13])
+        stats = worker.get_stats()
+        self.assertEqual(stats['dropped'], 4)
+        self.assertEqual(stats['events'], 4)
+        self.assertEqual(stats['pending'], 0)
+
+    def test_spill(self):
+        '''
+        Batches which do not fit are spilled to disk and returned in order
+        '''
+        self.release.clear()
+        worker = self._worker(max_pending=2, overflow='spill')
+        worker.put([1, 2])
+        worker.put([3])
+        worker.put([4, 5])
+        self.assertEqual(worker.get_stats()['spilled'], 3)
+        self.assertEqual(
+            len(os.listdir(os.path.join(self.cachedir, 'event_return_spill'))),
+            2)
+        worker.start()
+        self.release.set()
+        for _ in range(50):
+            if len(self.returned) == 5:
+                break
+            time.sleep(0.1)
+        worker.stop()
+        worker.join()
+        self.assertEqual(self.returned, [1, 2, 3, 4, 5])
+        self.assertEqual(
+            os.listdir(os.path.join(self.cachedir, 'event_return_spill')), [])
+
+    def test_spill_left_on_disk(self):
+        '''
+        Spilled batches are picked up by the next worker of the returner
+        '''
+        worker = self._worker(max_pending=1, overflow='spill')
+        worker.put([1, 2])
+        worker.stop()
+        worker.start()
+        worker.join()
+        self.assertEqual(self.returned, [])
+        worker = self._worker(max_pending=1, overflow='spill')
+        worker.start()
+        for _ in range(50):
+            if self.returned:
+                break
+            time.sleep(0.1)
+        worker.stop()
+        worker.join()
+        self.assertEqual(self.returned, [1, 2])
+
+    def test_block(self):
+        '''
+        put blocks until the returner has caught up
+        '''
+        self.release.clear()
+        worker = self._worker(max_pending=2, overflow='block')
+        worker.start()
+        worker.put([1, 2])
+        threading.Timer(0.5, self.release.set).start()
+        start = time.time()
+        worker.put([3])
+        self.assertGreaterEqual(time.time() - start, 0.4)
+        worker.stop()
+        worker.join()
+        self.assertEqual(self.returned, [1, 2, 3])
+        self.assertEqual(worker.get_stats()['flushes'], 2)
+
+    def _event_return(self):
+        evr = event.EventReturn.__new__(event.EventReturn)
+        evr.opts = dict(self.opts,
+                        event_return_whitelist=[],
+                        event_return_blacklist=[])
+        evr.workers = {}
+        return evr
+
+    def test_stats_not_returned(self):
+        '''
+        The stats of the returners are not returned
+        '''
+        evr = self._event_return()
+        self.assertTrue(evr._filter({'tag': 'salt/job/1/ret/minion'}))
+        self.assertFalse(evr._filter({'tag': event.EventReturn.STATS_TAG}))
+
+    def test_max_pending(self):
+        '''
+        The pending events are bounded by default, with room for a few full
+        batches
+        '''
+        evr = self._event_return()
+        evr.event_return_queue = 0
+        evr.opts.pop('event_return_max_pending', None)
+        self.assertEqual(evr._max_pending(), 10000)
+        evr.event_return_queue = 5000
+        self.assertEqual(evr._max_pending(), 20000)
+        evr.opts['event_return_max_pending'] = 0
+        self.assertEqual(evr._max_pending(), 0)
+
+    def test_stop_workers_timeout(self):
+        '''
+        Stopping does not wait forever for a stuck returner
+        '''
+        self.release.clear()
+        evr = self._event_return()
+        worker = self._worker()
+        worker.start()
+        worker.put([1])
+        evr.workers['test.event_return'] = worker
+        start = time.time()
+        evr.stop_workers(timeout=0.5)
+        self.assertLess(time.time() - start, 5)
+        self.assertTrue(worker.is_alive())
+        self.assertEqual(evr.workers, {})
+        self.release.set()
+        worker.join()
+        self.assertEqual(self.returned, [1])
+
+
+class CountingSnapshot(event.EventSnapshot):
+    '''
+    Count the events seen by tag
+    '''
+    FILENAME = 'counting.p'
+
+    def __init__(self, opts, log_queue=None):
+        super(CountingSnapshot, self).__init__(opts, log_queue=log_queue)
+        self.counts = self.read().get('counts', {})
+
+    def handle_event(self, tag, data):
+        self.counts[tag] = self.counts.get(tag, 0) + 1
+        return True
+
+    def snapshot(self):
+        return {'counts': self.counts}
+
+
+class TestEventSnapshot(TestCase):
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp(dir=integration.SYS_TMP_DIR)
+        self.opts = {'cachedir': self.cachedir, 'serial': 'msgpack'}
+
+    def tearDown(self):
+        shutil.rmtree(self.cachedir, ignore_errors=True)
+
+    def test_write_and_read(self):
+        '''
+        The snapshot is written to the cachedir and read back, unless it is
+        out of date
+        '''
+        path = CountingSnapshot.snapshot_path(self.opts)
+        self.assertEqual(path, os.path.join(self.cachedir, 'counting.p'))
+        self.assertIsNone(event.read_event_snapshot(self.opts, path, 30))
+
+        proc = CountingSnapshot(self.opts)
+        self.assertTrue(proc.handle_event('salt/test', {}))
+        proc.write()
+        snapshot = event.read_event_snapshot(self.opts, path, 30)
+        self.assertEqual(snapshot['counts'], {'salt/test': 1})
+        self.assertAlmostEqual(snapshot['time'], time.time(), delta=5)
+
+        # A new process starts from the previous snapshot
+        self.assertEqual(CountingSnapshot(self.opts).counts, {'salt/test': 1})
+
+        # A snapshot the process stopped updating is ignored
+        with salt.utils.fopen(path, 'wb') as fp_:
+            proc.serial.dump({'counts': {}, 'time': time.time() - 60}, fp_)
+        self.assertIsNone(event.read_event_snapshot(self.opts, path, 30))
+
 if __name__ == '__main__':
     from integration import run_tests
-    run_tests(TestSaltEvent, needs_daemon=False)
+    run_tests([TestSaltEvent, TestEventReturnWorker, TestEventSnapshot],
+              needs_daemon=False)
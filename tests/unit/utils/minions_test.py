@@ -2,16 +2,27 @@
 
 # Import python libs
 from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+import time
 
 # Import Salt Libs
 from salt.utils import minions
+import salt.cache
+import salt.config
+import salt.minion
+import salt.utils
 
 # Import Salt Testing Libs
 from salttesting import TestCase
 from salttesting.helpers import ensure_in_syspath
+from salttesting.mock import MagicMock, call, patch
 
 ensure_in_syspath('../../')
 
+import integration
+
 NODEGROUPS = {
     'group1': 'L@host1,host2,host3',
     'group2': ['G@foo:bar', 'or', 'web1*'],
@@ -27,6 +38,117 @@ EXPECTED = {
 }
 
 
+class MinionRegistryTestCase(TestCase):
+    '''
+    TestCase for salt.utils.minions.MinionRegistry
+    '''
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(dir=integration.SYS_TMP_DIR)
+        self.opts = salt.config.DEFAULT_MASTER_OPTS.copy()
+        self.opts.update({'pki_dir': os.path.join(self.tmp, 'pki'),
+                          'cachedir': os.path.join(self.tmp, 'cache'),
+                          'extension_modules': os.path.join(self.tmp, 'extmods'),
+                          'minion_registry_sync_interval': 0})
+        os.makedirs(os.path.join(self.opts['pki_dir'], 'minions'))
+        for id_ in ('web2', 'Web1', 'db1'):
+            self._accept(id_)
+        self.registry = minions.MinionRegistry(self.opts)
+        self.registry.data_loaded = True
+        self.registry.update_data('web2', {'grains': {'os': 'Ubuntu', 'roles': ['web', 'lb']}})
+        self.registry.update_data('Web1', {'grains': {'os': 'CentOS', 'roles': [{'web': True}]}})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _accept(self, id_):
+        with salt.utils.fopen(os.path.join(self.opts['pki_dir'], 'minions', id_), 'w') as fp_:
+            fp_.write('key')
+
+    def _age(self, path):
+        mtime = time.time() - 60
+        os.utime(path, (mtime, mtime))
+
+    def test_sorted_ids(self):
+        self.assertEqual(self.registry.minions(), ['db1', 'Web1', 'web2'])
+        self.assertTrue(self.registry.has('Web1'))
+        self.assertFalse(self.registry.has('web1'))
+
+    def test_match_data(self):
+        self.assertEqual(self.registry.match_data('os:ubuntu', ':', 'grains'),
+                         set(['web2']))
+        self.assertEqual(self.registry.match_data('roles:web', ':', 'grains'),
+                         set(['web2', 'Web1']))
+        self.assertEqual(self.registry.match_data('os:*OS', ':', 'grains'),
+                         set(['Web1']))
+
+    def test_check_cache_minions(self):
+        ret = self.registry.check_cache_minions('os:Ubuntu', ':', True, 'grains')
+        self.assertEqual(ret, ['db1', 'web2'])
+        ret = self.registry.check_cache_minions('os:Ubuntu', ':', False, 'grains')
+        self.assertEqual(ret, ['web2'])
+
+    def test_update_data_reindexes(self):
+        self.registry.update_data('web2', {'grains': {'os': 'Debian'}})
+        self.assertEqual(self.registry.match_data('os:Ubuntu', ':', 'grains'), set())
+        self.registry.update_data('web2', None)
+        self.assertEqual(self.registry.match_data('os:Debian', ':', 'grains'), set())
+
+    def test_sync_ids(self):
+        accdir = os.path.join(self.opts['pki_dir'], 'minions')
+        self._age(accdir)
+        self.assertEqual(self.registry.minions(), ['db1', 'Web1', 'web2'])
+        with patch.object(self.registry, '_load_ids',
+                          MagicMock(side_effect=self.registry._load_ids)) as load:
+            self.assertTrue(self.registry.sync())
+            self.registry.minions()
+            self.assertFalse(load.called)
+        os.remove(os.path.join(accdir, 'db1'))
+        self._accept('app1')
+        self.assertTrue(self.registry.sync())
+        self.assertEqual(self.registry.minions(), ['app1', 'Web1', 'web2'])
+
+    def test_sync_data(self):
+        cache = salt.cache.Cache(self.opts)
+        cache.store('minions/web2', 'data', {'grains': {'os': 'Ubuntu'}})
+        cache.store('minions/db1', 'data', {'grains': {'os': 'CentOS'}})
+        data_file = os.path.join(self.opts['cachedir'], 'minions', 'web2', 'data.p')
+        self._age(data_file)
+        self.registry.data_loaded = False
+        self.assertEqual(sorted(self.registry.cached_minions()), ['db1', 'web2'])
+
+        # Only the data which was updated is loaded again
+        with patch.object(self.registry, 'load_minion_data',
+                          MagicMock(side_effect=self.registry.load_minion_data)) as load:
+            self.assertTrue(self.registry.sync())
+            self.assertEqual(load.call_args_list, [call('db1')])
+
+        cache.store('minions/web2', 'data', {'grains': {'os': 'Debian'}})
+        cache.store('minions/app1', 'data', {'grains': {'os': 'Debian'}})
+        cache.flush('minions/db1')
+        self.assertTrue(self.registry.sync())
+        self.assertEqual(self.registry.match_data('os:Debian', ':', 'grains'),
+                         set(['web2', 'app1']))
+        self.assertEqual(sorted(self.registry.cached_minions()), ['app1', 'web2'])
+
+    def test_sync_data_interval(self):
+        '''
+        The minion data cache is checked at most every
+        minion_registry_sync_interval seconds
+        '''
+        self.opts['minion_registry_sync_interval'] = 60
+        cache = salt.cache.Cache(self.opts)
+        cache.store('minions/web2', 'data', {'grains': {'os': 'Ubuntu'}})
+        self.registry.data_loaded = False
+        self.assertEqual(self.registry.cached_minions(), ['web2'])
+        cache.store('minions/db1', 'data', {'grains': {'os': 'CentOS'}})
+        with patch.object(self.registry.cache, 'list', MagicMock()) as list_:
+            self.assertTrue(self.registry.sync())
+            self.assertFalse(list_.called)
+        self.opts['minion_registry_sync_interval'] = 0
+        self.assertTrue(self.registry.sync())
+        self.assertEqual(sorted(self.registry.cached_minions()), ['db1', 'web2'])
+
+
 class MinionsTestCase(TestCase):
     '''
     TestCase for salt.utils.minions module functions
@@ -40,7 +162,87 @@ class MinionsTestCase(TestCase):
             ret = minions.nodegroup_comp(nodegroup, NODEGROUPS)
             self.assertEqual(ret, expected)
 
+    def test_compile_compound(self):
+        '''
+        Test the compound target compiler
+        '''
+        web = ('match', None, 'web*', None, 'web*')
+        grain = ('match', 'G', 'os:Ubuntu', None, 'G@os:Ubuntu')
+        listed = ('match', 'L', 'db1,db2', None, 'L@db1,db2')
+        self.assertEqual(minions.compile_compound('web* and G@os:Ubuntu or L@db1,db2'),
+                         ('or', ('and', web, grain), listed))
+        self.assertEqual(minions.compile_compound('web* and ( G@os:Ubuntu or L@db1,db2 )'),
+                         ('and', web, ('or', grain, listed)))
+        self.assertEqual(minions.compile_compound(['web*', 'not', 'G@os:Ubuntu']),
+                         ('and', web, ('not', grain)))
+        self.assertEqual(minions.compile_compound('J|@roles|web*'),
+                         ('match', 'J', 'roles|web*', '|', 'J|@roles|web*'))
+        for tgt in ('and web*', 'web* or', '( and web* )', '( web*',
+                    'web* )', 'web* db*', 'N@group1', ['web*', None]):
+            self.assertIsNone(minions.compile_compound(tgt))
+
+    def test_compile_compound_cached(self):
+        '''
+        Test that the compound target expressions are only parsed once
+        '''
+        with patch.object(minions, '_COMPOUND_CACHE', {}):
+            parse = MagicMock(side_effect=minions._CompoundParser.parse,
+                              autospec=True)
+            with patch.object(minions._CompoundParser, 'parse',
+                              lambda self: parse(self)):
+                first = minions.compile_compound('G@os:Ubuntu and web*')
+                second = minions.compile_compound('G@os:Ubuntu and web*')
+            self.assertIs(first, second)
+            self.assertEqual(parse.call_count, 1)
+
+    def test_check_compound_minions(self):
+        '''
+        Test the master side evaluation of compound targets
+        '''
+        ckminions = minions.CkMinions({'minion_data_cache': True,
+                                       'cache': 'localfs',
+                                       'cachedir': '/tmp'})
+        grains = MagicMock(return_value=['web2', 'db1'])
+        with patch.object(ckminions, '_pki_minions',
+                          MagicMock(return_value=['db1', 'web1', 'web2'])), \
+                patch.object(ckminions, '_check_grain_minions', grains):
+            self.assertEqual(
+                sorted(ckminions._check_compound_minions('web* and G@os:Ubuntu', None, True)),
+                ['web2'])
+            self.assertEqual(
+                sorted(ckminions._check_compound_minions('web* not L@web1', None, True)),
+                ['web2'])
+            self.assertEqual(
+                sorted(ckminions._check_compound_minions('not ( web* or L@db1 )', None, True)),
+                [])
+            self.assertEqual(grains.call_count, 1)
+            # The grains are not checked when no minion can match
+            self.assertEqual(
+                ckminions._check_compound_minions('L@app1 and G@os:Ubuntu', None, True),
+                [])
+            self.assertEqual(grains.call_count, 1)
+            self.assertEqual(
+                ckminions._check_compound_minions('web* and', None, True),
+                [])
+
+    def test_compound_match(self):
+        '''
+        Test the minion side evaluation of compound targets
+        '''
+        matcher = salt.minion.Matcher({'id': 'web1',
+                                       'grains': {'os': 'Ubuntu'},
+                                       'pillar': {'roles': ['web']}})
+        self.assertTrue(matcher.compound_match('web* and G@os:Ubuntu'))
+        self.assertTrue(matcher.compound_match('db* or I@roles:web'))
+        self.assertFalse(matcher.compound_match('web* not G@os:Ubuntu'))
+        self.assertTrue(matcher.compound_match(['not', '(', 'db*', 'or', 'L@web2', ')']))
+        self.assertFalse(matcher.compound_match('web* and'))
+        with patch.object(matcher, 'grain_match', MagicMock()) as grain_match:
+            self.assertFalse(matcher.compound_match('db* and G@os:Ubuntu'))
+            self.assertTrue(matcher.compound_match('web* or G@os:Ubuntu'))
+            self.assertFalse(grain_match.called)
+
 
 if __name__ == '__main__':
     from integration import run_tests
-    run_tests(MinionsTestCase, needs_daemon=False)
+    run_tests([MinionRegistryTestCase, MinionsTestCase], needs_daemon=False)
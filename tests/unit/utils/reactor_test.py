@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+'''
+    tests.unit.utils.reactor_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the compiled reactor map
+'''
+
+# Import python libs
+from __future__ import absolute_import
+import fnmatch
+import os
+import shutil
+import tempfile
+
+# Import Salt Testing libs
+from salttesting import TestCase, skipIf
+from salttesting.helpers import ensure_in_syspath
+from salttesting.mock import NO_MOCK, NO_MOCK_REASON, MagicMock, patch
+ensure_in_syspath('../../')
+
+# Import salt libs
+import salt.renderers.jinja
+import salt.renderers.mako
+import salt.renderers.yaml
+import salt.utils
+import salt.utils.cache
+import salt.utils.reactor
+from salt.utils.reactor import TagMatcher
+
+REACT_MAP = [
+    {'salt/auth': '/srv/reactor/auth.sls'},
+    {'salt/minion/*/start': ['/srv/reactor/start.sls',
+                             '/srv/reactor/highstate.sls']},
+    {'salt/job/*/ret/web?': '/srv/reactor/web.sls'},
+    {'salt/*': '/srv/reactor/salt.sls'},
+    {'salt/cloud/[ab]*': '/srv/reactor/cloud.sls'},
+    {'*': '/srv/reactor/all.sls'},
+    {'salt/auth': '/srv/reactor/auth2.sls'},
+    'not a mapping',
+    {'salt/invalid': {'not': 'a list'}},
+    {'salt/a': 'one', 'salt/b': 'two'},
+]
+
+TAGS = (
+    'salt/auth',
+    'salt/minion/web1/start',
+    'salt/minion/start',
+    'salt/job/20170101000000000000/ret/web1',
+    'salt/job/20170101000000000000/ret/web10',
+    'salt/cloud/alpha/created',
+    'salt/cloud/gamma/created',
+    'salt/invalid',
+    'salt',
+    '',
+    'custom/tag',
+)
+
+
+def _fnmatch_reactors(react_map, tag):
+    '''
+    The reactor list as matched before the map was compiled
+    '''
+    reactors = []
+    for ropt in react_map:
+        if not isinstance(ropt, dict) or len(ropt) != 1:
+            continue
+        key = next(iter(ropt))
+        val = ropt[key]
+        if fnmatch.fnmatch(tag, key):
+            if isinstance(val, str):
+                reactors.append(val)
+            elif isinstance(val, list):
+                reactors.extend(val)
+    return reactors
+
+
+class TagMatcherTestCase(TestCase):
+    '''
+    Test the TagMatcher
+    '''
+    def test_match(self):
+        matcher = TagMatcher(REACT_MAP)
+        self.assertEqual(
+            matcher.match('salt/auth'),
+            ['/srv/reactor/auth.sls',
+             '/srv/reactor/salt.sls',
+             '/srv/reactor/all.sls',
+             '/srv/reactor/auth2.sls'])
+        self.assertEqual(matcher.match('custom/tag'), ['/srv/reactor/all.sls'])
+
+    def test_match_same_as_fnmatch(self):
+        matcher = TagMatcher(REACT_MAP)
+        for tag in TAGS:
+            self.assertEqual(matcher.match(tag),
+                             _fnmatch_reactors(REACT_MAP, tag))
+
+    def test_empty_map(self):
+        self.assertEqual(TagMatcher([]).match('salt/auth'), [])
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class ReactorRenderCacheTestCase(TestCase):
+    '''
+    Test the reuse of the rendered reaction files
+    '''
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.reactor = salt.utils.reactor.Reactor.__new__(salt.utils.reactor.Reactor)
+        self.reactor.opts = {'renderer': 'jinja|yaml',
+                             'renderer_blacklist': [],
+                             'renderer_whitelist': []}
+        self.reactor.rend = {'jinja': salt.renderers.jinja.render,
+                             'mako': salt.renderers.mako.render,
+                             'yaml': salt.renderers.yaml.render}
+        self.reactor._render_cache = {}
+        self.reactor._cached_refs = salt.utils.cache.CacheDict(
+            salt.utils.reactor.SALT_REF_TTL)
+        self.reactor.render_template = MagicMock(
+            side_effect=lambda fn_, tag, data: {'reaction': {'tag': tag}})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _write(self, name, contents):
+        path = os.path.join(self.tmpdir, name)
+        with salt.utils.fopen(path, 'w') as fp_:
+            fp_.write(contents)
+        return path
+
+    def _renders(self, path, tag, data):
+        before = self.reactor.render_template.call_count
+        self.reactor._render_cached(path, tag, data)
+        return self.reactor.render_template.call_count - before
+
+    def test_static(self):
+        path = self._write('static.sls', 'reaction:\n  local.test.ping: []\n')
+        self.assertEqual(self._renders(path, 'a', {'_stamp': 1}), 1)
+        self.assertEqual(self._renders(path, 'b', {'_stamp': 2}), 0)
+
+    def test_event_vars(self):
+        '''
+        A template using only the event variables is rendered again when
+        their values change
+        '''
+        path = self._write('tag.sls', "{% if tag == 'a' %}reaction: {}{% endif %}\n")
+        self.assertEqual(self._renders(path, 'a', {'_stamp': 1}), 1)
+        self.assertEqual(self._renders(path, 'a', {'_stamp': 2}), 0)
+        self.assertEqual(self._renders(path, 'b', {'_stamp': 2}), 1)
+        path = self._write('data.sls', "reaction: {{ data['id'] }}\n")
+        self.assertEqual(self._renders(path, 'a', {'id': 'web1'}), 1)
+        self.assertEqual(self._renders(path, 'a', {'id': 'web1'}), 0)
+        self.assertEqual(self._renders(path, 'a', {'id': 'web2'}), 1)
+
+    def test_other_vars(self):
+        '''
+        A template using anything else than the event variables or including
+        another template is always rendered
+        '''
+        for name, contents in (
+                ('salt.sls', "reaction: {{ salt['pillar.get']('key') }}\n"),
+                ('include.sls', "{% include 'other.sls' %}\n"),
+                ('mako.sls', '#!mako|yaml\nreaction: {}\n')):
+            path = self._write(name, contents)
+            self.assertEqual(self._renders(path, 'a', {}), 1)
+            self.assertEqual(self._renders(path, 'a', {}), 1)
+
+    def test_file_changed(self):
+        path = self._write('static.sls', 'reaction: {}\n')
+        self.assertEqual(self._renders(path, 'a', {}), 1)
+        self._write('static.sls', 'reaction:\n  local.test.ping: []\n')
+        self.assertEqual(self._renders(path, 'a', {}), 1)
+        self.assertEqual(self._renders(path, 'a', {}), 0)
+
+    def test_cached_refs(self):
+        '''
+        salt:// reaction files are fetched again once their entry expired
+        '''
+        path = self._write('static.sls', 'reaction: {}\n')
+        cache_file = MagicMock(return_value=path)
+        self.reactor.minion = MagicMock(functions={'cp.cache_file': cache_file})
+        self.reactor.render_reaction('salt://static.sls', 'a', {})
+        self.reactor.render_reaction('salt://static.sls', 'a', {})
+        self.assertEqual(cache_file.call_count, 1)
+        with patch.object(self.reactor._cached_refs, '_ttl', -1):
+            self.reactor.render_reaction('salt://static.sls', 'a', {})
+        self.assertEqual(cache_file.call_count, 2)
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests([TagMatcherTestCase, ReactorRenderCacheTestCase], needs_daemon=False)
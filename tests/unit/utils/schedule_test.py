@@ -264,6 +264,79 @@ class ScheduleTestCase(TestCase):
         self.schedule.opts.update({'schedule': ''})
         self.assertRaises(ValueError, Schedule.eval, self.schedule)
 
+    def test_eval_only_due_jobs(self):
+        '''
+        Tests that only the jobs whose next fire time has come are evaluated
+        '''
+        self.schedule.opts.update({'schedule': {'job1': {'function': 'test.ping', 'seconds': 10},
+                                                'job2': {'function': 'test.ping', 'seconds': 30}},
+                                   'pillar': {}})
+        eval_job = MagicMock(side_effect=lambda job, data: {'job1': 110, 'job2': 130}[job])
+        with patch.object(self.schedule, '_eval_job', eval_job):
+            with patch('time.time', MagicMock(return_value=100)):
+                self.schedule.eval()
+            self.assertEqual(sorted(call[0][0] for call in eval_job.call_args_list), ['job1', 'job2'])
+            eval_job.reset_mock()
+            with patch('time.time', MagicMock(return_value=109)):
+                self.schedule.eval()
+            self.assertFalse(eval_job.called)
+            with patch('time.time', MagicMock(return_value=110)):
+                self.schedule.eval()
+            self.assertEqual([call[0][0] for call in eval_job.call_args_list], ['job1'])
+
+            # A modified schedule is evaluated again in full
+            eval_job.reset_mock()
+            self.schedule.add_job({'job3': {'function': 'test.ping', 'seconds': 60}}, persist=False)
+            eval_job.side_effect = lambda job, data: None
+            with patch('time.time', MagicMock(return_value=111)):
+                self.schedule.eval()
+            self.assertEqual(len(eval_job.call_args_list), 3)
+            eval_job.reset_mock()
+            with patch('time.time', MagicMock(return_value=10000)):
+                self.schedule.eval()
+            self.assertFalse(eval_job.called)
+
+    def test_eval_job_next_fire(self):
+        '''
+        Tests the next fire time of an interval job, including splay
+        '''
+        data = {'function': 'test.ping', 'seconds': 10, 'splay': 5}
+        self.schedule.intervals = {}
+        with patch.dict(self.schedule.opts, {'multiprocessing': False}), \
+                patch.object(self.schedule, 'handle_func', MagicMock()), \
+                patch('random.randint', MagicMock(return_value=3)), \
+                patch('time.time', MagicMock(return_value=100)):
+            self.assertEqual(self.schedule._eval_job('job1', data), 113)
+        self.assertEqual(self.schedule.intervals['job1'], 100)
+        with patch('time.time', MagicMock(return_value=105)):
+            self.assertEqual(self.schedule._eval_job('job1', data), 113)
+        self.assertEqual(self.schedule.intervals['job1'], 100)
+
+    def test_eval_job_next_fire_range(self):
+        '''
+        Tests that a job held back by its range is looked at again each tick
+        '''
+        data = {'function': 'test.ping', 'seconds': 10,
+                'range': {'start': '2:00pm', 'end': '3:00pm'}}
+        self.schedule.intervals = {}
+        with patch('salt.utils.schedule._RANGE_SUPPORTED', True), \
+                patch('salt.utils.schedule.dateutil_parser', create=True) as parser, \
+                patch('time.mktime', MagicMock(side_effect=[200, 300])), \
+                patch('time.time', MagicMock(return_value=100)):
+            self.assertEqual(self.schedule._eval_job('job1', data), 101)
+        self.assertEqual(parser.parse.call_count, 2)
+        self.assertNotIn('job1', self.schedule.intervals)
+
+    def test_next_fire(self):
+        '''
+        Tests the next fire time of when, cron and once jobs
+        '''
+        self.assertEqual(self.schedule._next_fire('job1', {'when': '5:00pm'}, 100, 500, 0), 500)
+        self.assertEqual(self.schedule._next_fire('job1', {'when': '5:00pm'}, 100, 100, 0), 101)
+        self.assertEqual(self.schedule._next_fire('job1', {'cron': '* * * * *'}, 100, 0, 160), 159)
+        self.assertEqual(self.schedule._next_fire('job1', {'cron': '* * * * *'}, 159, 0, 160), 160)
+        self.assertIsNone(self.schedule._next_fire('job1', {'once': '2016-01-07T14:30:00'}, 100, 0, 0))
+
 
 if __name__ == '__main__':
     from integration import run_tests